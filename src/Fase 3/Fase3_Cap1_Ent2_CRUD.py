@@ -3,29 +3,32 @@ Sistema de Gerenciamento de Dados Agrícolas
 Implementação de operações CRUD para o banco de dados agrícola
 
 Este script implementa operações CRUD (Create, Read, Update, Delete) para
-manipular dados agrícolas em um banco Oracle existente.
+manipular dados agrícolas em um banco Oracle existente (ou, com
+FARMTECH_BACKEND=sqlite, em um arquivo SQLite local; ver farmtech_backend).
 
 Autor: FarmTech Solutions
 Data: Maio 2025
 """
 
 import oracledb
-import csv
 import os
 import logging
 import sys
 from datetime import datetime
 from typing import List, Dict, Any, Tuple, Optional, Union
 
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('agricola_db.log'),
-        logging.StreamHandler()
-    ]
-)
+# Modulos compartilhados com a Fase 4 (backend de armazenamento e alocacao de chaves)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Fase 4'))
+from farmtech_backend import criar_backend, codigo_erro, ERROS_BANCO
+from farmtech_chaves import obter_alocador
+from farmtech_leituras import LAYOUT_LARGO, LAYOUT_PADRAO
+from farmtech_sensores import obter_registro_sensores
+from farmtech_metricas import medir_operacao
+from farmtech_logs import configurar_logs
+from farmtech_csv import ArquivoRejeitos, caminho_rejeitos, ler_csv_fase3, limites_sensores, valores_python
+
+# Configuração de logging (arquivo + console, gravados por uma thread)
+configurar_logs('agricola_db.log')
 
 logger = logging.getLogger(__name__)
 
@@ -47,9 +50,12 @@ class AgricolaDatabaseManager:
     Implementa operações CRUD e funções de análise de dados.
     """
 
-    def __init__(self):
+    def __init__(self, backend=None):
         """
         Inicializa o gerenciador de banco de dados Oracle.
+
+        Args:
+            backend: Backend de armazenamento (farmtech_backend); padrão: o de FARMTECH_BACKEND
         """
         # Configurações de conexão Oracle
         self.host = "localhost"
@@ -60,29 +66,37 @@ class AgricolaDatabaseManager:
 
         self.conn = None
         self.cursor = None
+        self.backend = backend or criar_backend(
+            user=self.user, password=self.password,
+            dsn=oracledb.makedsn(self.host, self.port, service_name=self.service_name)
+        )
+
+        # No layout largo as leituras do ESP32 ficam em T_LEITURAS_ESP32;
+        # a visão V_MEDICOES as devolve no formato de T_MEDICOES para as consultas
+        self.fonte_medicoes = 'V_MEDICOES' if LAYOUT_PADRAO == LAYOUT_LARGO else 'T_MEDICOES'
 
+    @medir_operacao('connect')
     def connect(self):
-        """Estabelece conexão com o banco de dados Oracle."""
+        """Obtém uma sessão do backend (pool Oracle compartilhado ou SQLite local)."""
         try:
-            dsn = oracledb.makedsn(self.host, self.port, service_name=self.service_name)
-            self.conn = oracledb.connect(user=self.user, password=self.password, dsn=dsn)
+            self.conn = self.backend.conectar()
             self.cursor = self.conn.cursor()
-            logger.info("Conexão com o banco de dados estabelecida com sucesso")
-        except oracledb.DatabaseError as e:
-            error, = e.args
-            logger.error(f"Erro Oracle (ORA-{error.code}): {error.message}")
-            raise DatabaseError(f"Falha na conexão com o banco de dados (ORA-{error.code})") from e
+            logger.debug(f"Sessão obtida do backend {self.backend}")
+        except ERROS_BANCO as e:
+            logger.error(f"Erro de banco ({codigo_erro(e)}): {e}")
+            raise DatabaseError(f"Falha na conexão com o banco de dados ({codigo_erro(e)})") from e
 
     def disconnect(self):
-        """Fecha a conexão com o banco de dados."""
+        """Devolve a sessão ao pool de conexões."""
         if self.conn:
             if self.cursor:
                 self.cursor.close()
             self.conn.close()
             self.conn = None
             self.cursor = None
-            logger.info("Conexão com o banco de dados encerrada")
+            logger.debug(f"Sessão devolvida ao backend {self.backend}")
 
+    @medir_operacao('executar_sql')
     def executar_sql(
             self,
             sql: str,
@@ -133,16 +147,21 @@ class AgricolaDatabaseManager:
                     return [dict(zip(columns, row)) for row in rows]
                 return []
 
-        except oracledb.DatabaseError as e:
-            error, = e.args
-            logger.error(f"Erro Oracle (ORA-{error.code}): {error.message}")
+        except ERROS_BANCO as e:
+            logger.error(f"Erro de banco ({codigo_erro(e)}): {e}")
             self.conn.rollback()
-            raise DatabaseError(f"Falha no banco de dados (ORA-{error.code})") from e
+            raise DatabaseError(f"Falha no banco de dados ({codigo_erro(e)})") from e
 
     def import_csv_data(self, csv_dir: str):
         """
         Importa dados de arquivos CSV para o banco de dados.
 
+        Cada arquivo é convertido e validado em blocos (farmtech_csv): tipos,
+        campos obrigatórios e, em t_medicoes, o valor dentro dos limites do
+        sensor em T_SENSORES. As linhas válidas são inseridas com executemany;
+        as rejeitadas (pela validação ou pelo banco) vão para
+        <tabela>.rejeitos.csv no mesmo diretório.
+
         Args:
             csv_dir: Diretório contendo os arquivos CSV
         """
@@ -157,32 +176,62 @@ class AgricolaDatabaseManager:
             "t_aplicacoes"
         ]
 
-        for table in tables:
-            csv_file = os.path.join(csv_dir, f"{table}.csv")
-            if not os.path.exists(csv_file):
-                logger.warning(f"Arquivo não encontrado: {csv_file}")
-                continue
+        try:
+            for table in tables:
+                csv_file = os.path.join(csv_dir, f"{table}.csv")
+                if not os.path.exists(csv_file):
+                    logger.warning(f"Arquivo não encontrado: {csv_file}")
+                    continue
+
+                # Limites dos sensores já importados (t_sensores vem antes de t_medicoes)
+                limites = limites_sensores(self.cursor) if table == "t_medicoes" else None
+                inseridas = 0
+                with ArquivoRejeitos(caminho_rejeitos(csv_file)) as rejeitos:
+                    for registros, rejeitadas in ler_csv_fase3(csv_file, table, limites):
+                        rejeitos.gravar(rejeitadas)
+                        inseridas += self._inserir_registros_csv(table, registros, rejeitos)
+
+                if rejeitos.quantidade:
+                    logger.warning(f"{rejeitos.quantidade} linhas de {table} rejeitadas: ver {rejeitos.caminho}")
+                logger.info(f"{inseridas} linhas importadas para a tabela {table.upper()}")
+        except ValueError as e:
+            raise ValidationError(str(e)) from e
+        finally:
+            self.disconnect()
 
-            with open(csv_file, 'r') as f:
-                csv_reader = csv.reader(f)
-                headers = next(csv_reader)  # Lê o cabeçalho
+    def _inserir_registros_csv(self, table: str, registros, rejeitos) -> int:
+        """
+        Insere um bloco validado de um CSV da Fase 3 em uma transação.
 
-                # Prepara a instrução SQL de inserção
-                placeholders = ', '.join([f':{i + 1}' for i in range(len(headers))])
-                insert_query = f"INSERT INTO {table.upper()} ({', '.join(headers)}) VALUES ({placeholders})"
+        Args:
+            table: Nome da tabela
+            registros: DataFrame de farmtech_csv.ler_csv_fase3 (coluna 'linha' + colunas da tabela)
+            rejeitos: ArquivoRejeitos que recebe as linhas recusadas pelo banco
 
-                # Insere os dados
-                for row in csv_reader:
-                    try:
-                        # Converte a lista de valores para uma lista de parâmetros posicionais
-                        self.executar_sql(insert_query, row, 'insert')
-                    except DatabaseError as e:
-                        logger.error(f"Erro ao inserir dados em {table}: {e}")
-                        logger.error(f"Dados: {row}")
+        Returns:
+            Número de linhas inseridas
+        """
+        if registros.empty:
+            return 0
+        colunas = [coluna for coluna in registros.columns if coluna != 'linha']
+        placeholders = ', '.join([f':{i + 1}' for i in range(len(colunas))])
+        insert_query = f"INSERT INTO {table.upper()} ({', '.join(colunas)}) VALUES ({placeholders})"
+        linhas = valores_python(registros, colunas)
 
-            logger.info(f"Dados importados com sucesso para a tabela {table.upper()}")
+        try:
+            self.cursor.executemany(insert_query, linhas, batcherrors=True)
+            erros = self.cursor.getbatcherrors()
+            self.conn.commit()
+        except ERROS_BANCO as e:
+            logger.error(f"Erro de banco ({codigo_erro(e)}) ao inserir dados em {table}: {e}")
+            self.conn.rollback()
+            raise DatabaseError(f"Falha ao importar {table} ({codigo_erro(e)})") from e
 
-        self.disconnect()
+        numeros = registros['linha'].tolist()
+        rejeitos.gravar([(numeros[erro.offset], erro.message,
+                          ','.join('' if valor is None else str(valor) for valor in linhas[erro.offset]))
+                         for erro in erros])
+        return len(linhas) - len(erros)
 
     # Operações CRUD para T_CULTURAS
 
@@ -202,8 +251,7 @@ class AgricolaDatabaseManager:
 
         try:
             # Obtém o próximo código de cultura
-            self.cursor.execute("SELECT NVL(MAX(cod_cultura), 0) + 1 FROM T_CULTURAS")
-            new_cod = self.cursor.fetchone()[0]
+            new_cod = obter_alocador('T_CULTURAS').proximo(self.cursor)
 
             # Insere a nova cultura com tratamento adequado para a data
             if data_prev_colheita is not None:
@@ -409,8 +457,7 @@ class AgricolaDatabaseManager:
 
         try:
             # Obtém o próximo código de sensor
-            self.cursor.execute("SELECT NVL(MAX(cod_sensor), 0) + 1 FROM T_SENSORES")
-            new_cod = self.cursor.fetchone()[0]
+            new_cod = obter_alocador('T_SENSORES').proximo(self.cursor)
 
             # Insere o novo sensor com tratamento adequado para a data
             if data_instalacao is not None:
@@ -445,6 +492,7 @@ class AgricolaDatabaseManager:
                 ]
 
             self.executar_sql(sql, params, 'insert')
+            obter_registro_sensores().invalidar()
             logger.info(f"Novo sensor inserido com ID: {new_cod}")
 
             return new_cod
@@ -516,7 +564,7 @@ class AgricolaDatabaseManager:
                 'nm_sensor', 'tipo_sensor', 'objetivo_sensor', 'fab_sensor',
                 'modelo_sensor', 'data_instalacao', 'latitude_instalacao',
                 'longitude_instalacao', 'valor_minimo', 'valor_maximo',
-                'unidade', 'cod_cultura'
+                'unidade', 'cod_cultura', 'tipo_dispositivo', 'cod_dispositivo'
             ]
 
             # Filtra apenas os campos válidos
@@ -551,6 +599,7 @@ class AgricolaDatabaseManager:
             success = affected_rows > 0
 
             if success:
+                obter_registro_sensores().invalidar()
                 logger.info(f"Sensor {cod_sensor} atualizado com sucesso")
             else:
                 logger.warning(f"Nenhum sensor encontrado com o código {cod_sensor}")
@@ -589,6 +638,7 @@ class AgricolaDatabaseManager:
             success = affected_rows > 0
 
             if success:
+                obter_registro_sensores().invalidar()
                 logger.info(f"Sensor {cod_sensor} removido com sucesso")
             else:
                 logger.warning(f"Nenhum sensor encontrado com o código {cod_sensor}")
@@ -621,8 +671,7 @@ class AgricolaDatabaseManager:
 
         try:
             # Obtém o próximo código de medição
-            self.cursor.execute("SELECT NVL(MAX(cod_medicao), 0) + 1 FROM T_MEDICOES")
-            new_cod = self.cursor.fetchone()[0]
+            new_cod = obter_alocador('T_MEDICOES').proximo(self.cursor)
 
             # Insere a nova medição com tratamento adequado para a data
             if data_hora_medicao is not None:
@@ -673,10 +722,10 @@ class AgricolaDatabaseManager:
         self.connect()
 
         try:
-            base_sql = """
+            base_sql = f"""
             SELECT cod_medicao, TO_CHAR(data_hora_medicao, 'YYYY-MM-DD HH24:MI:SS') as data_hora_medicao, 
                    valor_medicao, un_medicao, cod_sensor 
-            FROM T_MEDICOES
+            FROM {self.fonte_medicoes}
             """
 
             if cod_medicao is not None and cod_sensor is not None:
@@ -834,8 +883,7 @@ class AgricolaDatabaseManager:
 
         try:
             # Obtém o próximo código de sugestão
-            self.cursor.execute("SELECT NVL(MAX(cod_sugestao), 0) + 1 FROM T_SUGESTOES")
-            new_cod = self.cursor.fetchone()[0]
+            new_cod = obter_alocador('T_SUGESTOES').proximo(self.cursor)
 
             # Insere a nova sugestão com tratamento adequado para a data
             if data_hora_sugestao is not None:
@@ -1072,8 +1120,7 @@ class AgricolaDatabaseManager:
 
         try:
             # Obtém o próximo código de aplicação
-            self.cursor.execute("SELECT NVL(MAX(cod_aplicacao), 0) + 1 FROM T_APLICACOES")
-            new_cod = self.cursor.fetchone()[0]
+            new_cod = obter_alocador('T_APLICACOES').proximo(self.cursor)
 
             # Insere a nova aplicação com tratamento adequado para a data
             if data_hora_aplicacao is not None:
@@ -1294,11 +1341,11 @@ class AgricolaDatabaseManager:
         self.connect()
 
         try:
-            sql = """
+            sql = f"""
             SELECT m.cod_medicao, TO_CHAR(m.data_hora_medicao, 'YYYY-MM-DD HH24:MI:SS') as data_hora_medicao, 
                    m.valor_medicao, m.un_medicao, m.cod_sensor, 
                    s.nm_sensor, s.tipo_sensor, c.desc_cultura
-            FROM T_MEDICOES m
+            FROM {self.fonte_medicoes} m
             JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
             JOIN T_CULTURAS c ON s.cod_cultura = c.cod_cultura
             WHERE c.cod_cultura = :1
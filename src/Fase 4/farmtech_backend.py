@@ -0,0 +1,588 @@
+"""
+FarmTech Solutions - Backends de Armazenamento
+Oracle (servidor da Fase 3) ou SQLite embutido
+
+Os gerenciadores da Fase 3 e da Fase 4 nao abrem conexoes diretamente:
+pedem uma sessao ao backend configurado (FARMTECH_BACKEND), que devolve
+um objeto com a interface DB-API usada pelo projeto (cursor, execute,
+executemany, fetchmany, commit, rollback, close). Com ganchos de perfil
+registrados (farmtech_perfil) a sessao mede cada comando executado.
+
+- 'oracle': sessoes do pool compartilhado (farmtech_pool), como antes.
+- 'sqlite': arquivo local (FARMTECH_SQLITE) em modo WAL, para gateways de
+  campo sem servidor de banco e para benchmarks em um notebook. O esquema
+  (tabelas da Fase 3 com as migracoes 1 a 4 e 6 a 9, T_LEITURAS_ESP32,
+  V_MEDICOES, T_INGESTAO_CHECKPOINT e T_LEITURAS_ORIGEM) e criado na primeira conexao. O SQL
+  do projeto continua escrito para o Oracle: o cursor SQLite traduz as
+  construcoes usadas (binds :1, SYSTIMESTAMP, NVL, FETCH FIRST, TO_DATE,
+  TO_CHAR, PERCENTILE_CONT, FOR UPDATE) e emula executemany com
+  batcherrors. Os rollups (MERGE em tabelas index-organized) e as
+  migracoes continuam exclusivos do Oracle.
+
+Uso:
+    FARMTECH_BACKEND=sqlite FARMTECH_SQLITE=gateway.db python farmtech_database.py
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+import oracledb
+from farmtech_pool import adquirir_conexao
+from farmtech_perfil import perfilar_conexao
+from farmtech_leituras import TIPO_DISPOSITIVO_ESP32, DISPOSITIVO_PADRAO
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('oracle', 'sqlite')
+
+# Backend usado quando o gerenciador nao recebe um explicitamente
+BACKEND_PADRAO = os.environ.get('FARMTECH_BACKEND', 'oracle')
+
+# Arquivo do banco SQLite e espera maxima (ms) pela trava de escrita
+SQLITE_PADRAO = os.environ.get('FARMTECH_SQLITE', 'farmtech.db')
+SQLITE_TIMEOUT_MS = int(os.environ.get('FARMTECH_SQLITE_TIMEOUT', 5000))
+
+# Erros de banco de qualquer backend (para os blocos except dos gerenciadores)
+ERROS_BANCO = (oracledb.DatabaseError, sqlite3.Error)
+
+
+def dialeto(cursor):
+    """Dialeto SQL do cursor: 'sqlite' para cursores do BackendSQLite, senao 'oracle'."""
+    return getattr(cursor, 'dialeto', 'oracle')
+
+
+def tabela_existe(cursor, tabela):
+    """Indica se a tabela existe no esquema do usuario."""
+    if dialeto(cursor) == 'sqlite':
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND UPPER(name) = :1",
+                       [tabela.upper()])
+    else:
+        cursor.execute("SELECT COUNT(*) FROM USER_TABLES WHERE TABLE_NAME = :1", [tabela.upper()])
+    return cursor.fetchone()[0] > 0
+
+
+def identificar_banco(cursor):
+    """Chave do banco do cursor, para caches por banco (o processo pode usar mais de um)."""
+    if dialeto(cursor) == 'sqlite':
+        return ('sqlite', cursor.banco)
+    conexao = cursor.connection
+    return ('oracle', conexao.username, conexao.dsn)
+
+
+def codigo_erro(e):
+    """Identificacao curta do erro de banco (ORA-nnnnn ou o codigo SQLite)."""
+    if isinstance(e, oracledb.DatabaseError):
+        error, = e.args
+        return f"ORA-{error.code:05d}"
+    return f"SQLite {getattr(e, 'sqlite_errorname', type(e).__name__)}"
+
+
+def violacao_unicidade(mensagem):
+    """Indica se a mensagem de erro (ex.: de getbatcherrors) e de chave duplicada."""
+    return mensagem.startswith('ORA-00001') or 'UNIQUE constraint failed' in mensagem
+
+
+# --- ORACLE ---
+
+class BackendOracle:
+    """Sessoes do pool Oracle compartilhado (farmtech_pool)."""
+
+    nome = 'oracle'
+
+    def __init__(self, user, password, dsn):
+        self.user = user
+        self.password = password
+        self.dsn = dsn
+
+    def conectar(self):
+        """Sessao do pool; close() a devolve."""
+        return perfilar_conexao(adquirir_conexao(self.user, self.password, self.dsn))
+
+    def __str__(self):
+        return f"Oracle {self.user}@{self.dsn}"
+
+
+# --- SQLITE ---
+
+# Esquema equivalente ao Oracle da Fase 3 apos as migracoes 1 a 4 e 6 a 9. Datas e
+# instantes sao gravados como texto ISO ('AAAA-MM-DD HH:MM:SS[.ffffff]'),
+# que ordena corretamente e volta como datetime nas consultas.
+ESQUEMA_SQLITE = [
+    """
+    CREATE TABLE IF NOT EXISTS T_CULTURAS (
+        cod_cultura        INTEGER NOT NULL,
+        desc_cultura       TEXT NOT NULL,
+        tamanho_cultura    NUMERIC NOT NULL,
+        data_prev_colheita DATE,
+        CONSTRAINT PK_CUL PRIMARY KEY (cod_cultura),
+        CONSTRAINT UN_CULTURAS_DEC UNIQUE (desc_cultura)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS T_SENSORES (
+        cod_sensor           INTEGER NOT NULL,
+        nm_sensor            TEXT NOT NULL,
+        tipo_sensor          TEXT NOT NULL,
+        objetivo_sensor      TEXT,
+        fab_sensor           TEXT NOT NULL,
+        modelo_sensor        TEXT NOT NULL,
+        data_instalacao      DATE NOT NULL,
+        latitude_instalacao  NUMERIC NOT NULL,
+        longitude_instalacao NUMERIC NOT NULL,
+        valor_minimo         NUMERIC NOT NULL CONSTRAINT CK_SENSORES_VLRMIN CHECK (valor_minimo > 0),
+        valor_maximo         NUMERIC NOT NULL CONSTRAINT CK_SENSORES_VLRMAX CHECK (valor_maximo > 0),
+        unidade              TEXT NOT NULL,
+        cod_cultura          INTEGER NOT NULL REFERENCES T_CULTURAS (cod_cultura),
+        tipo_dispositivo     TEXT,
+        cod_dispositivo      TEXT,
+        CONSTRAINT PK_SENS PRIMARY KEY (cod_sensor),
+        CONSTRAINT UN_SENSORES_NOME UNIQUE (nm_sensor),
+        CONSTRAINT UN_SENSORES_LATITUDE UNIQUE (latitude_instalacao),
+        CONSTRAINT UN_SENSORES_LONGITUDE UNIQUE (longitude_instalacao)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS T_MEDICOES (
+        cod_medicao       INTEGER NOT NULL,
+        data_hora_medicao TIMESTAMP NOT NULL,
+        valor_medicao     NUMERIC NOT NULL,
+        un_medicao        TEXT NOT NULL,
+        cod_sensor        INTEGER NOT NULL REFERENCES T_SENSORES (cod_sensor),
+        CONSTRAINT PK_MED PRIMARY KEY (cod_medicao, cod_sensor)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS T_SUGESTOES (
+        cod_medicao        INTEGER NOT NULL,
+        cod_sugestao       INTEGER NOT NULL,
+        objetivo_sugestao  TEXT NOT NULL,
+        data_hora_sugestao TIMESTAMP NOT NULL,
+        valor_sugestao     NUMERIC NOT NULL,
+        un_sugestao        TEXT NOT NULL,
+        cod_sensor         INTEGER NOT NULL,
+        CONSTRAINT PK_SUG PRIMARY KEY (cod_sugestao, cod_medicao, cod_sensor),
+        FOREIGN KEY (cod_medicao, cod_sensor) REFERENCES T_MEDICOES (cod_medicao, cod_sensor)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS T_APLICACOES (
+        cod_medicao          INTEGER NOT NULL,
+        cod_sugestao         INTEGER NOT NULL,
+        cod_sensor           INTEGER NOT NULL,
+        cod_cultura          INTEGER NOT NULL REFERENCES T_CULTURAS (cod_cultura),
+        cod_aplicacao        INTEGER NOT NULL,
+        nm_produto_utilizado TEXT NOT NULL,
+        valor_aplicacao      NUMERIC NOT NULL,
+        un_aplicacao         TEXT NOT NULL,
+        data_hora_aplicacao  TIMESTAMP NOT NULL,
+        nm_resp_aplicacao    TEXT NOT NULL,
+        documento_resp       TEXT NOT NULL,
+        CONSTRAINT PK_APLIC PRIMARY KEY (cod_aplicacao, cod_medicao, cod_sugestao, cod_sensor),
+        FOREIGN KEY (cod_sugestao, cod_medicao, cod_sensor)
+            REFERENCES T_SUGESTOES (cod_sugestao, cod_medicao, cod_sensor)
+    )
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS T_SUG__IDX ON T_SUGESTOES (cod_medicao, cod_sensor)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS APLIC__IDX ON T_APLICACOES (cod_sugestao, cod_medicao, cod_sensor)",
+    f"""
+    CREATE TABLE IF NOT EXISTS T_LEITURAS_ESP32 (
+        cod_leitura       INTEGER NOT NULL,
+        data_hora_leitura TIMESTAMP NOT NULL,
+        fosforo           INTEGER NOT NULL,
+        potassio          INTEGER NOT NULL,
+        ph                NUMERIC NOT NULL,
+        umidade           NUMERIC NOT NULL,
+        bomba             INTEGER NOT NULL,
+        cod_dispositivo   TEXT NOT NULL DEFAULT '{DISPOSITIVO_PADRAO}',
+        CONSTRAINT PK_LEIT PRIMARY KEY (cod_leitura)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS IX_LEIT_DATA ON T_LEITURAS_ESP32 (data_hora_leitura, cod_leitura)",
+    "CREATE INDEX IF NOT EXISTS IX_SENS_DISP ON T_SENSORES "
+    "(tipo_dispositivo, cod_dispositivo, tipo_sensor, cod_sensor)",
+    "CREATE INDEX IF NOT EXISTS IX_MED_SENS_DATA ON T_MEDICOES "
+    "(cod_sensor, data_hora_medicao, cod_medicao, valor_medicao)",
+    "CREATE INDEX IF NOT EXISTS IX_MED_DATA ON T_MEDICOES (data_hora_medicao, cod_medicao, cod_sensor)",
+    f"""
+    CREATE VIEW IF NOT EXISTS V_MEDICOES AS
+    SELECT cod_medicao, data_hora_medicao, valor_medicao, un_medicao, cod_sensor
+    FROM T_MEDICOES
+    UNION ALL
+    SELECT l.cod_leitura, l.data_hora_leitura,
+           CASE s.tipo_sensor
+               WHEN 'FO' THEN l.fosforo
+               WHEN 'PO' THEN l.potassio
+               WHEN 'PH' THEN l.ph
+               WHEN 'UM' THEN l.umidade
+               ELSE l.bomba
+           END,
+           s.unidade, s.cod_sensor
+    FROM T_LEITURAS_ESP32 l
+    JOIN T_SENSORES s ON s.tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}' AND s.cod_dispositivo = l.cod_dispositivo
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS T_INGESTAO_CHECKPOINT (
+        id_spool         TEXT NOT NULL,
+        ultima_seq       INTEGER NOT NULL,
+        data_atualizacao TIMESTAMP NOT NULL,
+        CONSTRAINT PK_INGESTAO_CHECKPOINT PRIMARY KEY (id_spool)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS T_LEITURAS_ORIGEM (
+        id_dispositivo TEXT NOT NULL,
+        contador       INTEGER NOT NULL,
+        cod_medicao    INTEGER NOT NULL,
+        data_registro  TIMESTAMP NOT NULL,
+        CONSTRAINT PK_LEITURAS_ORIGEM PRIMARY KEY (id_dispositivo, contador)
+    ) WITHOUT ROWID
+    """,
+    # Substitui as sequences do Oracle (farmtech_chaves)
+    """
+    CREATE TABLE IF NOT EXISTS T_SEQUENCIAS (
+        nome    TEXT NOT NULL PRIMARY KEY,
+        proximo INTEGER NOT NULL
+    )
+    """,
+]
+
+# Elementos de formato do TO_CHAR usados no projeto -> strftime
+FORMATOS_DATA = {'YYYY': '%Y', 'MM': '%m', 'DD': '%d', 'HH24': '%H', 'MI': '%M', 'SS': '%S'}
+
+
+def _formato_strftime(formato):
+    return re.sub('|'.join(sorted(FORMATOS_DATA, key=len, reverse=True)),
+                  lambda m: FORMATOS_DATA[m.group(0)], formato)
+
+
+# Traducoes do SQL do projeto (Oracle) para o SQLite, aplicadas em ordem
+TRADUCOES_SQLITE = [
+    # Binds posicionais :1, :2 -> ?1, ?2 (numerados; a lista de valores e usada como esta)
+    (re.compile(r"(?<![\w:]):(\d+)\b"), r"?\1"),
+    (re.compile(r"\bSYSTIMESTAMP\b", re.I), "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"),
+    (re.compile(r"\bSYSDATE\b", re.I), "datetime('now', 'localtime')"),
+    (re.compile(r"\bNVL\(", re.I), "COALESCE("),
+    (re.compile(r"\bFETCH\s+FIRST\s+(\S+)\s+ROWS?\s+ONLY\b", re.I), r"LIMIT \1"),
+    (re.compile(r"\s+FROM\s+DUAL\b", re.I), ""),
+    # Datas chegam no formato ISO do proprio TO_DATE/TO_TIMESTAMP ('YYYY-MM-DD[ HH24:MI:SS]')
+    (re.compile(r"\bTO_(?:DATE|TIMESTAMP)\((\?\d+|:\w+),\s*'[^']*'\)", re.I), r"\1"),
+    (re.compile(r"\bTO_CHAR\(([\w.]+),\s*'([^']*)'\)", re.I),
+     lambda m: f"strftime('{_formato_strftime(m.group(2))}', {m.group(1)})"),
+    (re.compile(r"\bPERCENTILE_CONT\(([\d.]+)\)\s+WITHIN\s+GROUP\s+\(ORDER\s+BY\s+([\w.]+)\)", re.I),
+     r"PERCENTILE_CONT(\2, \1)"),
+    (re.compile(r"\s+FOR\s+UPDATE\b", re.I), ""),
+]
+
+_FOR_UPDATE = re.compile(r"\bFOR\s+UPDATE\b", re.I)
+
+
+@lru_cache(maxsize=256)
+def traduzir_sql(sql):
+    """Traduz um comando do projeto para o SQLite; retorna (sql, trava_escrita)."""
+    trava = bool(_FOR_UPDATE.search(sql))
+    for padrao, substituto in TRADUCOES_SQLITE:
+        sql = padrao.sub(substituto, sql)
+    return sql, trava
+
+
+def _converter_valor(valor):
+    """Texto no formato de instante gravado (AAAA-MM-DD HH:MM:SS...) volta como datetime."""
+    if isinstance(valor, str) and len(valor) >= 19 and valor[4] == '-' and valor[10] == ' ' and valor[13] == ':':
+        try:
+            return datetime.fromisoformat(valor)
+        except ValueError:
+            return valor
+    return valor
+
+
+def _converter_linha(cursor, linha):
+    return tuple(_converter_valor(valor) for valor in linha)
+
+
+class _DesvioPadrao:
+    """Agregado STDDEV (amostral, como no Oracle; 0 para uma unica linha)."""
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def step(self, valor):
+        if valor is None:
+            return
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+
+    def finalize(self):
+        if self.n == 0:
+            return None
+        return (self.m2 / (self.n - 1)) ** 0.5 if self.n > 1 else 0.0
+
+
+class _Percentil:
+    """Agregado PERCENTILE_CONT(valor, p) com interpolacao linear."""
+
+    def __init__(self):
+        self.valores = []
+        self.p = None
+
+    def step(self, valor, p):
+        self.p = p
+        if valor is not None:
+            self.valores.append(valor)
+
+    def finalize(self):
+        if not self.valores:
+            return None
+        valores = sorted(self.valores)
+        posicao = self.p * (len(valores) - 1)
+        abaixo = int(posicao)
+        acima = min(abaixo + 1, len(valores) - 1)
+        return valores[abaixo] + (posicao - abaixo) * (valores[acima] - valores[abaixo])
+
+
+class _ErroLote:
+    """Erro de uma linha do executemany, com os atributos do BatchError do oracledb."""
+
+    def __init__(self, offset, erro):
+        self.offset = offset
+        self.message = str(erro)
+        self.code = getattr(erro, 'sqlite_errorcode', None)
+
+
+class CursorSQLite:
+    """Cursor sqlite3 com a interface do cursor oracledb usada pelo projeto."""
+
+    dialeto = 'sqlite'
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._cursor = conexao.bruta.cursor()
+        self._cursor.row_factory = _converter_linha
+        self._erros_lote = []
+        self.arraysize = 100
+        self.prefetchrows = 2
+
+    @property
+    def banco(self):
+        """Caminho absoluto do arquivo do banco."""
+        return self._conexao.caminho
+
+    @property
+    def description(self):
+        # Nomes em maiusculas, como o Oracle devolve identificadores sem aspas
+        if self._cursor.description is None:
+            return None
+        return [(coluna[0].upper(), *coluna[1:]) for coluna in self._cursor.description]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def setinputsizes(self, *args, **kwargs):
+        """Sem efeito: os tipos sao inferidos dos valores."""
+
+    def execute(self, sql, parametros=None, **binds):
+        sql, trava = traduzir_sql(sql)
+        if trava:
+            self._conexao.iniciar_escrita()
+        if binds:
+            parametros = dict(parametros or {}, **binds)
+        self._cursor.execute(sql, parametros if parametros is not None else ())
+        return self
+
+    def executemany(self, sql, linhas, batcherrors=False):
+        """
+        Executa o comando para cada linha.
+
+        Com batcherrors=True, como no Oracle, as linhas rejeitadas nao
+        abortam o lote: os erros ficam em getbatcherrors() e as demais
+        linhas sao gravadas.
+        """
+        sql, _ = traduzir_sql(sql)
+        self._erros_lote = []
+        if not batcherrors:
+            self._cursor.executemany(sql, linhas)
+            return
+
+        self._conexao.iniciar_escrita()
+        self._cursor.execute("SAVEPOINT lote")
+        try:
+            self._cursor.executemany(sql, linhas)
+        except sqlite3.DatabaseError:
+            # Refaz linha a linha para separar as rejeitadas
+            self._cursor.execute("ROLLBACK TO lote")
+            for offset, linha in enumerate(linhas):
+                try:
+                    self._cursor.execute(sql, linha)
+                except sqlite3.DatabaseError as e:
+                    self._erros_lote.append(_ErroLote(offset, e))
+        finally:
+            self._cursor.execute("RELEASE lote")
+
+    def getbatcherrors(self):
+        return self._erros_lote
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamanho=None):
+        return self._cursor.fetchmany(tamanho or self.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexaoSQLite:
+    """Sessao sobre a conexao sqlite3 da thread; close() desfaz o que nao foi confirmado."""
+
+    dialeto = 'sqlite'
+
+    def __init__(self, bruta, caminho):
+        self.bruta = bruta
+        self.caminho = caminho
+
+    def cursor(self):
+        return CursorSQLite(self)
+
+    def iniciar_escrita(self):
+        """Abre a transacao ja com a trava de escrita (equivale ao SELECT ... FOR UPDATE)."""
+        if not self.bruta.in_transaction:
+            self.bruta.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self.bruta.commit()
+
+    def rollback(self):
+        self.bruta.rollback()
+
+    def close(self):
+        # Como no pool Oracle, a sessao devolvida nao leva transacao pendente
+        self.bruta.rollback()
+
+    def fetch_df_batches(self, sql, parametros=None, size=10000):
+        """Lotes Arrow da consulta (mesma interface do oracledb, usada na exportacao Parquet)."""
+        if pa is None:
+            raise RuntimeError("Lotes Arrow requerem o pacote pyarrow (pip install pyarrow)")
+        cursor = self.cursor()
+        try:
+            cursor.execute(sql, parametros)
+            nomes = [coluna[0] for coluna in cursor.description]
+            while True:
+                linhas = cursor.fetchmany(size)
+                if not linhas:
+                    break
+                yield pa.table(dict(zip(nomes, map(list, zip(*linhas)))))
+        finally:
+            cursor.close()
+
+
+class BackendSQLite:
+    """
+    Banco SQLite embutido em modo WAL.
+
+    Cada thread mantem a sua conexao aberta (o equivalente ao pool): com
+    WAL os leitores nao bloqueiam o gravador, e os gravadores esperam a
+    trava de escrita por ate FARMTECH_SQLITE_TIMEOUT ms.
+    """
+
+    nome = 'sqlite'
+
+    def __init__(self, caminho=SQLITE_PADRAO):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._esquema_criado = False
+        self._lock = threading.Lock()
+
+    def conectar(self):
+        """Sessao da thread sobre o arquivo (o esquema e criado no primeiro uso)."""
+        bruta = getattr(self._local, 'conexao', None)
+        if bruta is None:
+            bruta = self._abrir()
+            self._local.conexao = bruta
+        return perfilar_conexao(ConexaoSQLite(bruta, os.path.abspath(self.caminho)))
+
+    def _abrir(self):
+        # BEGIN IMMEDIATE implicito antes do primeiro comando de escrita: a trava
+        # e obtida no inicio da transacao, onde o busy_timeout se aplica
+        # check_same_thread=False: a conexao e de uma thread, mas lotes de
+        # fetch_df_batches podem ser consumidos pelas threads do pyarrow
+        bruta = sqlite3.connect(self.caminho, timeout=SQLITE_TIMEOUT_MS / 1000, isolation_level='IMMEDIATE',
+                                check_same_thread=False)
+        bruta.execute("PRAGMA journal_mode = WAL")
+        bruta.execute("PRAGMA synchronous = NORMAL")
+        bruta.execute("PRAGMA foreign_keys = ON")
+        bruta.execute(f"PRAGMA busy_timeout = {int(SQLITE_TIMEOUT_MS)}")
+        bruta.create_aggregate('STDDEV', 1, _DesvioPadrao)
+        bruta.create_aggregate('PERCENTILE_CONT', 2, _Percentil)
+        with self._lock:
+            if not self._esquema_criado:
+                _atualizar_esquema_sqlite(bruta)
+                for ddl in ESQUEMA_SQLITE:
+                    bruta.execute(ddl)
+                bruta.commit()
+                self._esquema_criado = True
+                logger.info(f"Banco SQLite {self.caminho} pronto (WAL)")
+        return bruta
+
+    def __str__(self):
+        return f"SQLite {self.caminho}"
+
+
+def _atualizar_esquema_sqlite(bruta):
+    """Leva um banco criado por versao anterior ao esquema atual, no que o IF NOT EXISTS nao cobre."""
+    colunas = {linha[1] for linha in bruta.execute("PRAGMA table_info(T_LEITURAS_ESP32)")}
+    if colunas and 'cod_dispositivo' not in colunas:
+        # Migracao 8: as leituras largas antigas sao do dispositivo padrao; a visao e recriada
+        # por ESQUEMA_SQLITE ligando cada leitura aos sensores do seu dispositivo
+        bruta.execute(f"ALTER TABLE T_LEITURAS_ESP32 ADD COLUMN cod_dispositivo TEXT NOT NULL "
+                      f"DEFAULT '{DISPOSITIVO_PADRAO}'")
+        bruta.execute("DROP VIEW IF EXISTS V_MEDICOES")
+
+
+# Instantes gravados como texto ISO (ver ESQUEMA_SQLITE)
+sqlite3.register_adapter(datetime, lambda instante: instante.isoformat(sep=' '))
+sqlite3.register_adapter(date, lambda dia: dia.isoformat())
+
+_backends_sqlite = {}
+_lock_backends = threading.Lock()
+
+
+def criar_backend(nome=None, user=None, password=None, dsn=None, caminho=None):
+    """
+    Retorna o backend nome ('oracle' ou 'sqlite'; padrao FARMTECH_BACKEND).
+
+    Backends SQLite sao compartilhados por arquivo dentro do processo.
+    """
+    nome = nome or BACKEND_PADRAO
+    if nome == 'oracle':
+        return BackendOracle(user, password, dsn)
+    if nome == 'sqlite':
+        caminho = os.path.abspath(caminho or SQLITE_PADRAO)
+        with _lock_backends:
+            backend = _backends_sqlite.get(caminho)
+            if backend is None:
+                backend = BackendSQLite(caminho)
+                _backends_sqlite[caminho] = backend
+            return backend
+    raise ValueError(f"Backend de armazenamento invalido: {nome}")
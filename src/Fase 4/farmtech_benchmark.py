@@ -0,0 +1,668 @@
+"""
+FarmTech Solutions - Benchmarks de Desempenho
+Medicoes de desempenho das camadas de acesso a dados
+
+Este modulo reune benchmarks executados via linha de comando para
+comparar o comportamento do sistema antes e depois das otimizacoes.
+
+A suite ponta a ponta (suite) roda sobre um banco SQLite local novo para
+cada tamanho de carga (1k a 10M leituras sinteticas de farmtech_gerador,
+com os cenarios e as regras da bomba do firmware) e mede, nessa ordem:
+importacao bulk do CSV, obter_estatisticas, listar_medicoes_recentes, o
+pipeline de ML (carga pivotada, features, treino, previsao unitaria e em
+lote) e as insercoes unitarias e em lote. Os casos de ML sao ignorados quando o scikit-learn
+nao esta instalado. Os resultados vao para JSON (e CSV), e comparar
+aponta as regressoes contra um baseline gravado (saida com codigo 1).
+
+Uso:
+    python farmtech_benchmark.py conexoes --iteracoes 100
+    python farmtech_benchmark.py consultas --iteracoes 20
+    python farmtech_benchmark.py suite --tamanhos 1000 100000 --saida bench.json [--baseline base.json]
+    python farmtech_benchmark.py comparar bench.json base.json [--tolerancia 0.2]
+    python farmtech_benchmark.py logs --leituras 200000 [--latencia-disco-ms 0.05]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import contextlib
+import logging
+import platform
+import argparse
+import tempfile
+from itertools import chain, islice
+from datetime import datetime
+import numpy as np
+import oracledb
+from farmtech_backend import criar_backend
+from farmtech_database import FarmTechOracleManager
+from farmtech_pool import adquirir_conexao, fechar_pools
+from farmtech_leituras import LAYOUT_EAV, TIPO_DISPOSITIVO_ESP32, sql_leituras, validar_layout
+from farmtech_paginacao import buscar_pagina
+from farmtech_sensores import obter_registro_sensores
+from farmtech_dedup import obter_deduplicador
+from farmtech_gerador import gerar_leituras, gerar_csv
+from farmtech_logs import LogAmostrado, FormatadorJSON, FORMATO_TEXTO, criar_fila
+
+try:
+    from farmtech_ml import FarmTechMLPredictor
+except ImportError:
+    # scikit-learn/joblib ausentes: a suite ignora os casos de ML
+    FarmTechMLPredictor = None
+
+logger = logging.getLogger(__name__)
+
+
+def _cronometrar(funcao, iteracoes):
+    """Executa a funcao N vezes e retorna o tempo total em segundos."""
+    inicio = time.perf_counter()
+    for _ in range(iteracoes):
+        funcao()
+    return time.perf_counter() - inicio
+
+
+def benchmark_conexoes(iteracoes=100):
+    """
+    Compara conexoes por segundo: oracledb.connect() direto x pool compartilhado.
+
+    Cada iteracao abre a sessao, executa um SELECT trivial e a fecha/devolve,
+    reproduzindo o ciclo connect()/disconnect() dos gerenciadores.
+    """
+    manager = FarmTechOracleManager()
+    dsn = oracledb.makedsn(manager.host, manager.port, service_name=manager.service_name)
+
+    def ciclo_direto():
+        conn = oracledb.connect(user=manager.user, password=manager.password, dsn=dsn)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM DUAL")
+            cursor.fetchone()
+        conn.close()
+
+    def ciclo_pool():
+        conn = adquirir_conexao(manager.user, manager.password, dsn)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM DUAL")
+            cursor.fetchone()
+        conn.close()
+
+    # Aquece o pool para nao contar a criacao da primeira sessao
+    ciclo_pool()
+
+    tempo_direto = _cronometrar(ciclo_direto, iteracoes)
+    tempo_pool = _cronometrar(ciclo_pool, iteracoes)
+    fechar_pools()
+
+    resultado = {
+        'iteracoes': iteracoes,
+        'direto_conexoes_seg': iteracoes / tempo_direto,
+        'pool_conexoes_seg': iteracoes / tempo_pool,
+        'ganho': tempo_direto / tempo_pool,
+    }
+
+    print("\n=== BENCHMARK DE CONEXOES ===")
+    print(f"Iteracoes: {iteracoes}")
+    print(f"Antes  (oracledb.connect): {resultado['direto_conexoes_seg']:.1f} conexoes/s")
+    print(f"Depois (pool compartilhado): {resultado['pool_conexoes_seg']:.1f} conexoes/s")
+    print(f"Ganho: {resultado['ganho']:.1f}x")
+    return resultado
+
+
+# Consultas de leitura do layout EAV anteriores a migracao 3, com os filtros
+# nm_sensor LIKE que nenhum indice atende
+SQL_LEGADO_LEITURAS = """
+SELECT m.cod_medicao, m.data_hora_medicao, s.nm_sensor, m.valor_medicao
+FROM T_MEDICOES m
+JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+WHERE s.nm_sensor LIKE '%ESP32%'
+ORDER BY m.data_hora_medicao DESC
+FETCH FIRST 1000 ROWS ONLY
+"""
+
+SQL_LEGADO_ESTATISTICA = """
+SELECT COUNT(*), AVG(valor_medicao), MIN(valor_medicao), MAX(valor_medicao)
+FROM T_MEDICOES m
+JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+WHERE s.nm_sensor LIKE '%{}%ESP32%'
+"""
+
+SQL_LEGADO_HISTORICO = """
+SELECT m.cod_medicao, m.data_hora_medicao, s.nm_sensor, m.valor_medicao
+FROM T_MEDICOES m
+JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+WHERE s.nm_sensor LIKE '%ESP32%'
+ORDER BY m.cod_medicao, s.nm_sensor
+"""
+
+SQL_LEGADO_EXPORTACAO = """
+SELECT m.cod_medicao, TO_CHAR(m.data_hora_medicao, 'YYYY-MM-DD HH24:MI:SS'),
+       s.nm_sensor, m.valor_medicao
+FROM T_MEDICOES m
+JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+WHERE s.nm_sensor LIKE '%ESP32%'
+ORDER BY m.cod_medicao, s.nm_sensor
+"""
+
+SQL_ESTATISTICAS = """
+SELECT s.tipo_sensor, COUNT(*), AVG(m.valor_medicao), MIN(m.valor_medicao), MAX(m.valor_medicao)
+FROM T_MEDICOES m
+JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+WHERE s.tipo_dispositivo = :1
+GROUP BY s.tipo_sensor
+"""
+
+SQL_EXPORTACAO = """
+SELECT m.cod_medicao, TO_CHAR(m.data_hora_medicao, 'YYYY-MM-DD HH24:MI:SS'),
+       s.nm_sensor, m.valor_medicao
+FROM T_MEDICOES m
+JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+WHERE s.tipo_dispositivo = :1
+ORDER BY m.cod_medicao, s.nm_sensor
+"""
+
+
+def benchmark_consultas(iteracoes=20):
+    """
+    Compara o tempo das consultas ESP32 do layout EAV antes e depois da migracao 3.
+
+    Antes: filtros nm_sensor LIKE '%ESP32%' (varredura completa + join).
+    Depois: filtros por tipo_dispositivo/tipo_sensor com os indices
+    IX_SENS_DISP e IX_MED_SENS_DATA. Requer o esquema na versao 3.
+    """
+    manager = FarmTechOracleManager(layout=LAYOUT_EAV)
+    if not manager.connect():
+        return None
+    cursor = manager.cursor
+    cursor.arraysize = 1000
+
+    def executar(sql, params=()):
+        cursor.execute(sql, params)
+        cursor.fetchall()
+
+    casos = [
+        ('leituras recentes',
+         lambda: executar(SQL_LEGADO_LEITURAS),
+         lambda: buscar_pagina(cursor, LAYOUT_EAV, 200)),
+        ('estatisticas',
+         lambda: [executar(SQL_LEGADO_ESTATISTICA.format(nome))
+                  for nome in ('Fosforo', 'Potassio', 'pH', 'Umidade', 'Bomba')],
+         lambda: executar(SQL_ESTATISTICAS, [TIPO_DISPOSITIVO_ESP32])),
+        ('historico completo (ML)',
+         lambda: executar(SQL_LEGADO_HISTORICO),
+         lambda: executar(sql_leituras(LAYOUT_EAV))),
+        ('exportacao CSV',
+         lambda: executar(SQL_LEGADO_EXPORTACAO),
+         lambda: executar(SQL_EXPORTACAO, [TIPO_DISPOSITIVO_ESP32])),
+    ]
+
+    resultado = {}
+    try:
+        print("\n=== BENCHMARK DE CONSULTAS ESP32 (LAYOUT EAV) ===")
+        print(f"Iteracoes por consulta: {iteracoes}")
+        for nome, antes, depois in casos:
+            # Uma execucao de cada para aquecer cache de cursores e buffer cache
+            antes()
+            depois()
+            ms_antes = _cronometrar(antes, iteracoes) / iteracoes * 1000
+            ms_depois = _cronometrar(depois, iteracoes) / iteracoes * 1000
+            resultado[nome] = {'antes_ms': ms_antes, 'depois_ms': ms_depois, 'ganho': ms_antes / ms_depois}
+            print(f"{nome}: antes {ms_antes:.1f} ms | depois {ms_depois:.1f} ms | "
+                  f"ganho {resultado[nome]['ganho']:.1f}x")
+    finally:
+        manager.disconnect()
+        fechar_pools()
+
+    return resultado
+
+
+# --- SUITE PONTA A PONTA (backend SQLite local) ---
+
+TAMANHOS_PADRAO = [1000, 10000, 100000]
+REPETICOES_PADRAO = 3
+# Razao tempo atual / baseline acima de 1 + tolerancia e regressao
+TOLERANCIA_PADRAO = 0.20
+
+# Casos medidos chamada a chamada fazem no maximo estas chamadas por repeticao
+MAX_CHAMADAS_UNITARIAS = 500
+TAMANHO_LOTE_SUITE = 5000
+
+CASOS_SUITE = ('importar_csv', 'obter_estatisticas', 'listar_medicoes_recentes',
+               'ml_carregar', 'ml_features', 'ml_treinar', 'ml_prever_unitaria', 'ml_prever_lote',
+               'insercao_unitaria', 'insercao_lote')
+CASOS_ML = tuple(caso for caso in CASOS_SUITE if caso.startswith('ml_'))
+
+# Carga sintetica (farmtech_gerador): cenarios sorteados com ruido, reprodutivel
+CARGA_SUITE = {'modo': 'aleatorio', 'ruido': 0.05, 'semente': 42}
+
+CAMPOS_RESULTADO = ['caso', 'tamanho', 'repeticoes', 'operacoes', 'mediana_s', 'minimo_s', 'maximo_s',
+                    'ops_seg', 'p50_ms', 'p99_ms', 'ignorado']
+
+
+def _resultado(caso, tamanho, tempos, operacoes, latencias=None):
+    """Resumo das repeticoes de um caso (tempos em segundos; latencias por chamada, se medidas)."""
+    mediana = float(np.median(tempos))
+    resultado = {
+        'caso': caso, 'tamanho': tamanho, 'repeticoes': len(tempos), 'operacoes': operacoes,
+        'mediana_s': mediana, 'minimo_s': float(min(tempos)), 'maximo_s': float(max(tempos)),
+        'ops_seg': operacoes / mediana if mediana > 0 else 0.0,
+        'p50_ms': None, 'p99_ms': None, 'ignorado': None,
+    }
+    if latencias:
+        resultado['p50_ms'] = float(np.percentile(latencias, 50) * 1000)
+        resultado['p99_ms'] = float(np.percentile(latencias, 99) * 1000)
+    return resultado
+
+
+def _medir(caso, tamanho, funcao, repeticoes, operacoes, por_chamada=False):
+    """Executa funcao() repeticoes vezes; com por_chamada, funcao devolve a latencia de cada chamada."""
+    tempos, latencias = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        retorno = funcao()
+        tempos.append(time.perf_counter() - inicio)
+        if por_chamada:
+            latencias.extend(retorno)
+    return _resultado(caso, tamanho, tempos, operacoes, latencias)
+
+
+def _latencias(funcao, argumentos):
+    """Chama funcao(*args) para cada args e devolve o tempo de cada chamada."""
+    latencias = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        funcao(*args)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def _ignorado(caso, tamanho, motivo):
+    resultado = dict.fromkeys(CAMPOS_RESULTADO)
+    resultado.update(caso=caso, tamanho=tamanho, ignorado=motivo)
+    return resultado
+
+
+def _novo_banco(diretorio, nome, layout):
+    """Gerenciador sobre um arquivo SQLite novo, com os sensores do ESP32 cadastrados."""
+    caminho = os.path.join(diretorio, f"{nome}.db")
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+    # Registros do processo guardam os sensores do banco anterior
+    obter_registro_sensores().invalidar()
+    obter_deduplicador().invalidar()
+    manager = FarmTechOracleManager(layout=layout, backend=criar_backend('sqlite', caminho=caminho))
+    with contextlib.redirect_stdout(io.StringIO()):
+        criados = manager.criar_sensores_esp32()
+    if not criados:
+        raise RuntimeError(f"Falha ao preparar o banco {caminho}")
+    return manager
+
+
+def _lotes_carga(tamanho):
+    """Leituras (fosforo, potassio, ph, umidade, bomba) da carga da suite, em lotes de TAMANHO_LOTE_SUITE."""
+    for _, bloco in gerar_leituras(tamanho, tamanho_bloco=TAMANHO_LOTE_SUITE, **CARGA_SUITE):
+        yield list(zip(*(bloco[nome].tolist() for nome in ('fosforo', 'potassio', 'ph', 'umidade', 'bomba'))))
+
+
+def _casos_tamanho(tamanho, diretorio, repeticoes, layout, casos):
+    """Resultados dos casos selecionados para uma carga de tamanho leituras."""
+    resultados = []
+    arquivo_csv = os.path.join(diretorio, f"leituras_{tamanho}.csv")
+    gerar_csv(arquivo_csv, tamanho, **CARGA_SUITE)
+
+    # Cada repeticao importa para um banco novo; o ultimo fica para os demais casos
+    bancos = []
+
+    def importar():
+        manager = _novo_banco(diretorio, f"suite_{tamanho}", layout)
+        bancos.append(manager)
+        if not manager.importar_csv_esp32(arquivo_csv, modo_bulk=True, tamanho_lote=TAMANHO_LOTE_SUITE,
+                                          commit_a_cada=TAMANHO_LOTE_SUITE * 4, exibir=False):
+            raise RuntimeError(f"Falha ao importar {arquivo_csv}")
+
+    if 'importar_csv' in casos:
+        resultados.append(_medir('importar_csv', tamanho, importar, repeticoes, tamanho))
+    else:
+        importar()
+    manager = bancos[-1]
+
+    if 'obter_estatisticas' in casos:
+        resultados.append(_medir('obter_estatisticas', tamanho, manager.obter_estatisticas, repeticoes, 1))
+    if 'listar_medicoes_recentes' in casos:
+        resultados.append(_medir('listar_medicoes_recentes', tamanho,
+                                 lambda: manager.listar_medicoes_recentes(100), repeticoes, 1))
+
+    casos_ml = [caso for caso in CASOS_ML if caso in casos]
+    if casos_ml and FarmTechMLPredictor is None:
+        resultados.extend(_ignorado(caso, tamanho, "scikit-learn nao instalado") for caso in casos_ml)
+    elif casos_ml:
+        resultados.extend(_casos_ml(tamanho, manager, repeticoes, casos_ml))
+
+    chamadas = min(tamanho, MAX_CHAMADAS_UNITARIAS)
+    # A carga e gerada em lotes (a mesma semente repete as leituras): a memoria nao cresce com o tamanho
+    amostra = list(islice(chain.from_iterable(_lotes_carga(tamanho)), chamadas))
+    if 'insercao_unitaria' in casos:
+        resultados.append(_medir('insercao_unitaria', tamanho,
+                                 lambda: _latencias(manager.inserir_medicao_esp32, amostra),
+                                 repeticoes, chamadas, por_chamada=True))
+    if 'insercao_lote' in casos:
+        def inserir_lotes():
+            # A geracao de cada lote (numpy) entra na medicao, mas e uma fracao pequena do envio ao banco
+            for lote in _lotes_carga(tamanho):
+                if manager.gravar_leituras(lote) is None:
+                    raise RuntimeError("Falha ao gravar lote de leituras")
+
+        resultados.append(_medir('insercao_lote', tamanho, inserir_lotes, repeticoes, tamanho))
+    return resultados
+
+
+def _casos_ml(tamanho, manager, repeticoes, casos):
+    """Pipeline de ML sobre o banco do tamanho (carga pivotada, features, treino, previsao)."""
+    resultados = []
+    preditor = FarmTechMLPredictor(layout=manager.layout, dataset=None, backend=manager.backend, colunar=None)
+    df = preditor.carregar_dados_historicos()
+    if df is None:
+        return [_ignorado(caso, tamanho, "historico vazio") for caso in casos]
+    X, y = preditor.preparar_features(df)
+
+    if 'ml_carregar' in casos:
+        resultados.append(_medir('ml_carregar', tamanho, preditor.carregar_dados_historicos, repeticoes, len(df)))
+    if 'ml_features' in casos:
+        resultados.append(_medir('ml_features', tamanho, lambda: preditor.preparar_features(df), repeticoes,
+                                 len(df)))
+    # O treino tambem e pre-requisito das previsoes
+    if 'ml_treinar' in casos:
+        resultados.append(_medir('ml_treinar', tamanho, lambda: preditor.treinar_modelos(X, y), repeticoes,
+                                 len(df)))
+    elif not preditor.treinar_modelos(X, y):
+        return resultados + [_ignorado(caso, tamanho, "falha no treino") for caso in casos
+                             if caso.startswith('ml_prever')]
+
+    if 'ml_prever_unitaria' in casos:
+        amostra = df[['fosforo', 'potassio', 'ph', 'umidade']].head(MAX_CHAMADAS_UNITARIAS).itertuples(index=False)
+        amostra = [tuple(linha) for linha in amostra]
+        resultados.append(_medir('ml_prever_unitaria', tamanho,
+                                 lambda: _latencias(preditor.prever_irrigacao, amostra), repeticoes, len(amostra),
+                                 por_chamada=True))
+    if 'ml_prever_lote' in casos:
+        # Sem metodo de lote no preditor: o modelo recebe todas as features de uma vez
+        resultados.append(_medir('ml_prever_lote', tamanho, lambda: preditor.rf_model.predict_proba(X),
+                                 repeticoes, len(X)))
+    return resultados
+
+
+def executar_suite(tamanhos=TAMANHOS_PADRAO, repeticoes=REPETICOES_PADRAO, layout=None, casos=CASOS_SUITE,
+                   diretorio=None):
+    """
+    Executa a suite para cada tamanho e retorna {'meta': {...}, 'resultados': [...]}.
+
+    diretorio: onde ficam os CSVs sinteticos e os bancos SQLite (padrao:
+    diretorio temporario removido ao final). Os modelos de ML treinados
+    tambem sao gravados nele, sem sobrescrever os do diretorio atual.
+    """
+    layout = validar_layout(layout)
+    temporario = diretorio is None
+    diretorio = tempfile.mkdtemp(prefix='farmtech_bench_') if temporario else diretorio
+    os.makedirs(diretorio, exist_ok=True)
+    origem = os.getcwd()
+    meta = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'backend': 'sqlite',
+        'layout': layout,
+        'repeticoes': repeticoes,
+        'tamanhos': list(tamanhos),
+    }
+
+    resultados = []
+    try:
+        os.chdir(diretorio)
+        for tamanho in tamanhos:
+            logger.info(f"Suite: {tamanho} leituras")
+            for resultado in _casos_tamanho(tamanho, diretorio, repeticoes, layout, casos):
+                resultados.append(resultado)
+                _exibir_resultado(resultado)
+    finally:
+        os.chdir(origem)
+        obter_registro_sensores().invalidar()
+        obter_deduplicador().invalidar()
+        if temporario:
+            shutil.rmtree(diretorio, ignore_errors=True)
+    return {'meta': meta, 'resultados': resultados}
+
+
+def _exibir_resultado(resultado):
+    if resultado['ignorado']:
+        print(f"{resultado['caso']:<26} {resultado['tamanho']:>10}  ignorado: {resultado['ignorado']}")
+        return
+    latencia = ''
+    if resultado['p50_ms'] is not None:
+        latencia = f"  p50 {resultado['p50_ms']:.2f} ms  p99 {resultado['p99_ms']:.2f} ms"
+    print(f"{resultado['caso']:<26} {resultado['tamanho']:>10}  {resultado['mediana_s']:>9.4f}s  "
+          f"{resultado['ops_seg']:>12.0f} ops/s{latencia}")
+
+
+def salvar_resultados(suite, caminho):
+    """Grava a suite em JSON e os resultados em CSV ao lado (mesmo nome, extensao .csv)."""
+    with open(caminho, 'w') as arquivo:
+        json.dump(suite, arquivo, indent=2)
+    caminho_csv = os.path.splitext(caminho)[0] + '.csv'
+    with open(caminho_csv, 'w', newline='') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS_RESULTADO)
+        escritor.writeheader()
+        escritor.writerows(suite['resultados'])
+    return caminho_csv
+
+
+def comparar_resultados(atual, baseline, tolerancia=TOLERANCIA_PADRAO):
+    """
+    Compara a mediana de cada (caso, tamanho) com o baseline.
+
+    Retorna uma linha por caso do resultado atual com 'razao' (atual /
+    baseline) e 'situacao': 'regressao' (razao > 1 + tolerancia),
+    'melhora' (razao < 1 - tolerancia), 'estavel', 'novo' (fora do
+    baseline) ou 'ignorado'.
+    """
+    base = {(r['caso'], r['tamanho']): r for r in baseline['resultados'] if not r['ignorado']}
+    comparacao = []
+    for resultado in atual['resultados']:
+        linha = {'caso': resultado['caso'], 'tamanho': resultado['tamanho'], 'atual_s': resultado['mediana_s'],
+                 'baseline_s': None, 'razao': None}
+        anterior = base.get((resultado['caso'], resultado['tamanho']))
+        if resultado['ignorado']:
+            linha['situacao'] = 'ignorado'
+        elif anterior is None or not anterior['mediana_s']:
+            linha['situacao'] = 'novo'
+        else:
+            linha['baseline_s'] = anterior['mediana_s']
+            linha['razao'] = resultado['mediana_s'] / anterior['mediana_s']
+            if linha['razao'] > 1 + tolerancia:
+                linha['situacao'] = 'regressao'
+            elif linha['razao'] < 1 - tolerancia:
+                linha['situacao'] = 'melhora'
+            else:
+                linha['situacao'] = 'estavel'
+        comparacao.append(linha)
+    return comparacao
+
+
+def exibir_comparacao(comparacao, tolerancia=TOLERANCIA_PADRAO):
+    """Imprime a comparacao e retorna o numero de regressoes."""
+    print(f"\n=== COMPARACAO COM O BASELINE (tolerancia {tolerancia:.0%}) ===")
+    print(f"{'CASO':<26} {'TAMANHO':>10} {'BASELINE(s)':>12} {'ATUAL(s)':>10} {'RAZAO':>7}  SITUACAO")
+    for linha in comparacao:
+        baseline = f"{linha['baseline_s']:.4f}" if linha['baseline_s'] is not None else '-'
+        atual = f"{linha['atual_s']:.4f}" if linha['atual_s'] is not None else '-'
+        razao = f"{linha['razao']:.2f}x" if linha['razao'] is not None else '-'
+        print(f"{linha['caso']:<26} {linha['tamanho']:>10} {baseline:>12} {atual:>10} {razao:>7}  "
+              f"{linha['situacao'].upper()}")
+    regressoes = sum(1 for linha in comparacao if linha['situacao'] == 'regressao')
+    print(f"{regressoes} regressoes")
+    return regressoes
+
+
+def _carregar_suite(caminho):
+    with open(caminho, 'r') as arquivo:
+        return json.load(arquivo)
+
+
+# --- CUSTO DOS LOGS NO CAMINHO DE INSERCAO ---
+
+class _ArquivoLento(logging.FileHandler):
+    """FileHandler com latencia fixa por escrita (disco lento, cartao SD, NFS)."""
+
+    def __init__(self, caminho, latencia):
+        super().__init__(caminho, encoding='utf-8')
+        self.latencia = latencia
+
+    def emit(self, record):
+        if self.latencia:
+            time.sleep(self.latencia)
+        super().emit(record)
+
+
+def benchmark_logs(leituras=100000, latencia_disco_ms=0.0):
+    """
+    Custo do log por leitura inserida, antes e depois de farmtech_logs.
+
+    Antes: logger.info com f-string a cada leitura em um FileHandler
+    sincrono (o basicConfig anterior de farmtech_database). Depois: a
+    mesma chamada pela fila assincrona (texto e JSON) e o LogAmostrado
+    usado em inserir_medicao_esp32. O custo e o tempo do chamador (o que a
+    insercao espera) menos o do laco sem log; a drenagem da fila pela
+    thread de gravacao e informada a parte. latencia_disco_ms simula um
+    disco lento em cada escrita, que so o modo sincrono repassa a insercao.
+    """
+    diretorio = tempfile.mkdtemp(prefix='farmtech_logs_')
+    logger_bench = logging.getLogger('farmtech.benchmark.logs')
+    logger_bench.propagate = False
+    logger_bench.setLevel(logging.INFO)
+
+    def arquivo(nome, formatador):
+        handler = _ArquivoLento(os.path.join(diretorio, nome), latencia_disco_ms / 1000)
+        handler.setFormatter(formatador)
+        return handler
+
+    def por_leitura():
+        for cod in range(leituras):
+            logger_bench.info(f"Medicao ESP32 inserida - ID: {cod}, 5 sensores")
+
+    def amostrado():
+        log = LogAmostrado(logger_bench)
+        for cod in range(leituras):
+            log.info("Medicao ESP32 inserida - ID: %s, %s sensores", cod, 5)
+
+    def sem_log():
+        for cod in range(leituras):
+            pass
+
+    texto = logging.Formatter(FORMATO_TEXTO)
+    cenarios = [
+        ('sincrono (antes)', lambda: arquivo('sincrono.log', texto), por_leitura),
+        ('fila', lambda: criar_fila([arquivo('fila.log', texto)], leituras), por_leitura),
+        ('fila + json', lambda: criar_fila([arquivo('json.log', FormatadorJSON())], leituras), por_leitura),
+        ('fila + amostrado (depois)', lambda: criar_fila([arquivo('amostrado.log', texto)], leituras), amostrado),
+    ]
+
+    resultado = {'leituras': leituras}
+    try:
+        base = _cronometrar(sem_log, 1)
+        print("\n=== BENCHMARK DE LOGS NO CAMINHO DE INSERCAO ===")
+        print(f"Leituras: {leituras} | latencia do disco: {latencia_disco_ms} ms por escrita")
+        print(f"{'CENARIO':<28} {'US/LEITURA':>11} {'DRENAGEM(s)':>12} {'REGISTROS':>10}")
+        for nome, criar, laco in cenarios:
+            criado = criar()
+            handler, ouvinte = criado if isinstance(criado, tuple) else (criado, None)
+            logger_bench.handlers = [handler]
+            segundos = _cronometrar(laco, 1)
+            inicio = time.perf_counter()
+            if ouvinte:
+                ouvinte.stop()
+                for destino in ouvinte.handlers:
+                    destino.close()
+            else:
+                handler.close()
+            drenagem = time.perf_counter() - inicio
+            caminho = ouvinte.handlers[0].baseFilename if ouvinte else handler.baseFilename
+            with open(caminho, 'rb') as arquivo_log:
+                registros = sum(1 for _ in arquivo_log)
+            resultado[nome] = {'us_leitura': max(segundos - base, 0.0) / leituras * 1e6,
+                               'drenagem_s': drenagem, 'registros': registros}
+            print(f"{nome:<28} {resultado[nome]['us_leitura']:>11.2f} {drenagem:>12.3f} {registros:>10}")
+    finally:
+        logger_bench.handlers = []
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    antes = resultado['sincrono (antes)']['us_leitura']
+    depois = resultado['fila + amostrado (depois)']['us_leitura']
+    if depois > 0:
+        print(f"Ganho por leitura: {antes / depois:.0f}x")
+    return resultado
+
+
+def main():
+    """Interface de linha de comando dos benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmarks FarmTech")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p_conexoes = subparsers.add_parser('conexoes', help="Conexoes/s com e sem pool")
+    p_conexoes.add_argument('--iteracoes', type=int, default=100)
+
+    p_consultas = subparsers.add_parser('consultas', help="Consultas ESP32 antes/depois dos indices")
+    p_consultas.add_argument('--iteracoes', type=int, default=20)
+
+    p_suite = subparsers.add_parser('suite', help="Suite ponta a ponta sobre SQLite local com carga sintetica")
+    p_suite.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                         help="Leituras por carga (ex.: 1000 100000 10000000)")
+    p_suite.add_argument('--repeticoes', type=int, default=REPETICOES_PADRAO)
+    p_suite.add_argument('--casos', nargs='+', choices=CASOS_SUITE, default=list(CASOS_SUITE))
+    p_suite.add_argument('--layout', choices=['eav', 'largo'])
+    p_suite.add_argument('--diretorio', help="Mantem CSVs e bancos neste diretorio (padrao: temporario)")
+    p_suite.add_argument('--saida', help="Grava os resultados em JSON (e CSV ao lado)")
+    p_suite.add_argument('--baseline', help="Compara com um resultado gravado")
+    p_suite.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+
+    p_logs = subparsers.add_parser('logs', help="Custo do log por leitura (sincrono x fila x amostrado)")
+    p_logs.add_argument('--leituras', type=int, default=100000)
+    p_logs.add_argument('--latencia-disco-ms', type=float, default=0.0, help="Simula disco lento")
+
+    p_comparar = subparsers.add_parser('comparar', help="Compara um resultado com o baseline")
+    p_comparar.add_argument('atual')
+    p_comparar.add_argument('baseline')
+    p_comparar.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+
+    args = parser.parse_args()
+
+    if args.comando == 'conexoes':
+        benchmark_conexoes(args.iteracoes)
+    elif args.comando == 'consultas':
+        benchmark_consultas(args.iteracoes)
+    elif args.comando == 'suite':
+        print("\n=== SUITE DE BENCHMARK (SQLite local) ===")
+        suite = executar_suite(args.tamanhos, args.repeticoes, args.layout, args.casos, args.diretorio)
+        if args.saida:
+            caminho_csv = salvar_resultados(suite, args.saida)
+            print(f"Resultados gravados em {args.saida} e {caminho_csv}")
+        if args.baseline:
+            comparacao = comparar_resultados(suite, _carregar_suite(args.baseline), args.tolerancia)
+            if exibir_comparacao(comparacao, args.tolerancia):
+                sys.exit(1)
+    elif args.comando == 'logs':
+        benchmark_logs(args.leituras, args.latencia_disco_ms)
+    elif args.comando == 'comparar':
+        comparacao = comparar_resultados(_carregar_suite(args.atual), _carregar_suite(args.baseline),
+                                         args.tolerancia)
+        if exibir_comparacao(comparacao, args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+FarmTech Solutions - Alocacao de Chaves Primarias
+Geracao de codigos sem SELECT MAX()+1
+
+Este modulo substitui o padrao "SELECT NVL(MAX(cod), 0) + 1" usado nos
+caminhos de insercao. Cada tabela tem uma sequence Oracle com INCREMENT BY
+igual ao tamanho do bloco (esquema hi/lo): um NEXTVAL reserva um bloco
+inteiro de codigos, que e distribuido em memoria sem novas idas ao banco.
+Como a sequence e atomica, processos concorrentes nunca recebem o mesmo
+codigo e o custo por insercao nao depende do tamanho da tabela.
+
+O alocador so le as sequences; uma sequence ausente e um erro. Elas sao
+criadas por criar_sequencias(), chamada pelas migracoes (farmtech_migracoes,
+migracao 7), ou pelo script DDL da Fase 3 numa instalacao nova.
+
+No backend SQLite (farmtech_backend) nao ha sequences: o contador de cada
+tabela fica em T_SEQUENCIAS e os codigos sao reservados com um UPDATE na
+transacao de quem os usa. A trava de escrita do SQLite ja serializa os
+gravadores, entao nao ha blocos em memoria.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import threading
+import logging
+import oracledb
+from farmtech_backend import dialeto
+
+logger = logging.getLogger(__name__)
+
+# Tabela -> (sequence, coluna da chave)
+SEQUENCIAS = {
+    'T_CULTURAS': ('SEQ_CULTURAS', 'cod_cultura'),
+    'T_SENSORES': ('SEQ_SENSORES', 'cod_sensor'),
+    'T_MEDICOES': ('SEQ_MEDICOES', 'cod_medicao'),
+    'T_SUGESTOES': ('SEQ_SUGESTOES', 'cod_sugestao'),
+    'T_APLICACOES': ('SEQ_APLICACOES', 'cod_aplicacao'),
+}
+
+# Tamanho do bloco usado ao criar uma sequence nova. Sequences ja existentes
+# mantem o INCREMENT BY com que foram criadas.
+TAMANHO_BLOCO_PADRAO = int(os.environ.get('FARMTECH_BLOCO_CHAVES', 20))
+
+# Codigo Oracle para "nome ja usado por outro objeto"
+_ORA_OBJETO_EXISTENTE = 955
+
+
+class AlocadorChaves:
+    """
+    Distribui codigos de uma tabela a partir de blocos reservados na sequence.
+
+    O bloco obtido com NEXTVAL = v cobre os codigos [v, v + incremento).
+    O alocador e thread-safe e deve ser compartilhado via obter_alocador().
+    """
+
+    def __init__(self, tabela):
+        """Inicializa o alocador para uma das tabelas de SEQUENCIAS."""
+        self.tabela = tabela
+        self.sequencia, self.coluna = SEQUENCIAS[tabela]
+        self._blocos = []  # lista de [proximo, limite_exclusivo]
+        self._lock = threading.Lock()
+
+    def proximo(self, cursor):
+        """Retorna o proximo codigo livre da tabela."""
+        return self.reservar(cursor, 1)[0]
+
+    def reservar(self, cursor, quantidade):
+        """
+        Reserva uma lista de codigos livres para a tabela.
+
+        O cursor so e usado quando os blocos em memoria se esgotam; a
+        reserva nao executa DDL e pode ser feita no meio da transacao.
+        """
+        if dialeto(cursor) == 'sqlite':
+            return self._reservar_sqlite(cursor, quantidade)
+
+        with self._lock:
+            disponivel = sum(limite - prox for prox, limite in self._blocos)
+            if disponivel < quantidade:
+                self._buscar_blocos(cursor, quantidade - disponivel)
+
+            codigos = []
+            while len(codigos) < quantidade:
+                bloco = self._blocos[0]
+                fim = min(bloco[1], bloco[0] + quantidade - len(codigos))
+                codigos.extend(range(bloco[0], fim))
+                bloco[0] = fim
+                if bloco[0] >= bloco[1]:
+                    self._blocos.pop(0)
+            return codigos
+
+    def _reservar_sqlite(self, cursor, quantidade):
+        """Reserva os codigos no contador de T_SEQUENCIAS (desfeita junto com a transacao)."""
+        sql = "UPDATE T_SEQUENCIAS SET proximo = proximo + :1 WHERE nome = :2 RETURNING proximo - :1"
+        cursor.execute(sql, [quantidade, self.sequencia])
+        row = cursor.fetchone()
+        if row is None:
+            # Primeiro uso: o contador comeca apos o maior codigo ja existente
+            cursor.execute(
+                f"INSERT INTO T_SEQUENCIAS (nome, proximo) "
+                f"SELECT :1, NVL(MAX({self.coluna}), 0) + 1 FROM {self.tabela}",
+                [self.sequencia]
+            )
+            cursor.execute(sql, [quantidade, self.sequencia])
+            row = cursor.fetchone()
+        return list(range(row[0], row[0] + quantidade))
+
+    def _buscar_blocos(self, cursor, faltantes):
+        """
+        Reserva na sequence os blocos necessarios.
+
+        O INCREMENT BY e lido a cada reserva, antes do NEXTVAL: um ALTER
+        SEQUENCE (ex.: migracao 1) vale para os processos ja em execucao a
+        partir do proximo bloco, sem reiniciar. Um aumento que ocorra entre
+        a leitura e o NEXTVAL so desperdica o resto daquele bloco; reduzir o
+        INCREMENT BY com processos gravando pode sobrepor codigos.
+        """
+        incremento = incremento_sequencia(cursor, self.sequencia)
+        if incremento is None:
+            raise oracledb.ProgrammingError(
+                f"Sequence {self.sequencia} inexistente: aplique as migracoes "
+                f"(python farmtech_migracoes.py migrar)"
+            )
+        num_blocos = -(-faltantes // incremento)
+        cursor.execute(
+            f"SELECT {self.sequencia}.NEXTVAL FROM DUAL CONNECT BY LEVEL <= :1",
+            [num_blocos]
+        )
+        for (inicio,) in cursor.fetchall():
+            self._blocos.append([inicio, inicio + incremento])
+        logger.debug(f"{num_blocos} bloco(s) de {incremento} chaves reservados para {self.tabela}")
+
+
+def incremento_sequencia(cursor, sequencia):
+    """INCREMENT BY da sequence, ou None se ela nao existir."""
+    cursor.execute("SELECT increment_by FROM USER_SEQUENCES WHERE sequence_name = :1", [sequencia])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def criar_sequencias(cursor, tamanho_bloco=TAMANHO_BLOCO_PADRAO, blocos=None):
+    """
+    Cria (DDL, com commit implicito) as sequences de SEQUENCIAS que ainda nao existem.
+
+    Cada sequence comeca apos o maior codigo ja gravado na tabela, com
+    INCREMENT BY igual a blocos[tabela] ou, sem entrada, a tamanho_bloco.
+    Retorna os nomes das sequences criadas.
+    """
+    blocos = blocos or {}
+    criadas = []
+    for tabela, (sequencia, coluna) in SEQUENCIAS.items():
+        if incremento_sequencia(cursor, sequencia) is not None:
+            continue
+        bloco = blocos.get(tabela, tamanho_bloco)
+        cursor.execute(f"SELECT NVL(MAX({coluna}), 0) + 1 FROM {tabela}")
+        inicio = cursor.fetchone()[0]
+        try:
+            cursor.execute(
+                f"CREATE SEQUENCE {sequencia} START WITH {int(inicio)} "
+                f"INCREMENT BY {int(bloco)} NOCACHE"
+            )
+        except oracledb.DatabaseError as e:
+            error, = e.args
+            if error.code != _ORA_OBJETO_EXISTENTE:
+                raise
+            # Outro processo criou a sequence ao mesmo tempo: usa a dele
+            continue
+        criadas.append(sequencia)
+        logger.info(f"Sequence {sequencia} criada (inicio={inicio}, bloco={bloco})")
+    return criadas
+
+
+_alocadores = {}
+_lock_alocadores = threading.Lock()
+
+
+def obter_alocador(tabela):
+    """Retorna o alocador compartilhado (por processo) da tabela."""
+    with _lock_alocadores:
+        alocador = _alocadores.get(tabela)
+        if alocador is None:
+            alocador = AlocadorChaves(tabela)
+            _alocadores[tabela] = alocador
+        return alocador
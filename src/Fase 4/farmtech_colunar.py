@@ -0,0 +1,552 @@
+"""
+FarmTech Solutions - Armazem Colunar de Leituras
+Serie temporal embutida, append-only, em colunas numpy mapeadas em memoria
+
+As leituras brutas do ESP32 (uma por segundo) nao precisam pagar o custo
+de cinco linhas EAV por leitura. Este armazem guarda cada leitura como
+uma posicao em colunas de largura fixa (COLUNAS_ARMAZEM), uma arquivo por
+coluna, divididas em segmentos:
+
+- o segmento ativo e pre-alocado com registros_por_segmento posicoes
+  (arquivo esparso) e mapeado em memoria; anexar() escreve direto nas
+  colunas, sem serializacao. O codigo (cod_medicao) e a ultima coluna
+  escrita e nunca e 0, de modo que a quantidade de leituras do segmento e
+  a posicao do primeiro codigo 0;
+- dentro de um segmento os instantes nao diminuem. Uma leitura mais
+  antiga que a ultima anexada inicia um segmento novo;
+- segmentos cheios sao selados por uma thread em segundo plano: os
+  arquivos sao truncados para a quantidade real, o indice esparso de
+  tempo (um instante a cada PASSO_INDICE leituras) vai para indice.npy e
+  selado.json marca o segmento como imutavel;
+- consultas por periodo descartam segmentos pelo intervalo de tempo e
+  localizam o trecho com o indice esparso (busca binaria em memoria e
+  depois em um unico bloco da coluna). O resultado sao visoes das colunas
+  mapeadas, sem copia: o ML e o dashboard montam o DataFrame sobre elas.
+
+Durabilidade: as escritas ficam visiveis imediatamente para leitores do
+mesmo processo e de outros processos (mapeamento compartilhado), mas so
+sao garantidas em disco apos sincronizar(), selar() ou fechar(). O spool
+(farmtech_spool) continua sendo o caminho duravel da ingestao.
+
+Cada diretorio deve ter um unico processo gravador; leitores abrem com
+somente_leitura=True.
+
+Uso:
+    python farmtech_colunar.py status [--dir colunar_esp32]
+    python farmtech_colunar.py importar --csv dados_esp32.csv [--inicio 2025-06-01T08:00:00] [--dir colunar_esp32]
+    python farmtech_colunar.py estatisticas [--horas 24] [--dir colunar_esp32]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import json
+import glob
+import queue
+import bisect
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from farmtech_leituras import COLUNAS_LEITURA, INTERVALO_LEITURA, TIPOS_SENSORES
+from farmtech_logs import configurar_logs
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_PADRAO = os.environ.get('FARMTECH_COLUNAR_DIR', 'colunar_esp32')
+
+# Coluna -> tipo numpy, na ordem de COLUNAS_LEITURA
+COLUNAS_ARMAZEM = {
+    'cod_medicao': np.dtype('int64'),
+    'timestamp': np.dtype('datetime64[ms]'),
+    'fosforo': np.dtype('int8'),
+    'potassio': np.dtype('int8'),
+    'ph': np.dtype('float32'),
+    'umidade': np.dtype('float32'),
+    'bomba_ativa': np.dtype('int8'),
+}
+
+# Colunas de valores, na ordem de (fosforo, potassio, ph, umidade, bomba)
+COLUNAS_VALORES = COLUNAS_LEITURA[2:]
+
+# As mesmas colunas no DataFrame de farmtech_csv.ler_csv_esp32
+COLUNAS_VALORES_CSV = list(TIPOS_SENSORES)
+
+# Leituras por segmento (cerca de 12 dias a uma leitura por segundo, 27 bytes por leitura)
+REGISTROS_POR_SEGMENTO = int(os.environ.get('FARMTECH_COLUNAR_SEGMENTO', 1 << 20))
+
+# Um instante do indice esparso a cada PASSO_INDICE leituras
+PASSO_INDICE = 4096
+
+_PREFIXO_SEGMENTO = 'segmento_'
+_EXTENSAO_COLUNA = '.col'
+
+
+class Segmento:
+    """Colunas mapeadas de um segmento (ativo ou selado)."""
+
+    def __init__(self, diretorio, capacidade=None):
+        """
+        Abre o segmento em diretorio.
+
+        Com capacidade o segmento e ativo (gravavel, pre-alocado); sem ela e
+        aberto somente para leitura (selado ou ativo de outro processo).
+        """
+        self.diretorio = diretorio
+        self.primeiro_cod = int(os.path.basename(diretorio)[len(_PREFIXO_SEGMENTO):])
+        self.selado = os.path.exists(self._caminho('selado.json'))
+        self.colunas = {}
+
+        if self.selado:
+            with open(self._caminho('selado.json'), 'r') as arquivo:
+                self.quantidade = json.load(arquivo)['quantidade']
+            self.indice = np.load(self._caminho('indice.npy'))
+        elif capacidade is not None:
+            for nome, tipo in COLUNAS_ARMAZEM.items():
+                caminho = self._caminho_coluna(nome)
+                if not os.path.exists(caminho) or os.path.getsize(caminho) < capacidade * tipo.itemsize:
+                    with open(caminho, 'ab') as arquivo:
+                        arquivo.truncate(capacidade * tipo.itemsize)
+                self.colunas[nome] = np.memmap(caminho, dtype=tipo, mode='r+', shape=(capacidade,))
+            self.quantidade = self._contar()
+            self.indice = None
+        else:
+            self.quantidade = None
+            self.indice = None
+        self.capacidade = capacidade
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _caminho_coluna(self, nome):
+        return self._caminho(nome + _EXTENSAO_COLUNA)
+
+    def _contar(self):
+        """Quantidade de leituras: posicao do primeiro cod_medicao 0 (busca binaria)."""
+        codigos = self.coluna('cod_medicao')
+        return bisect.bisect_left(range(len(codigos)), True, key=lambda i: codigos[i] == 0)
+
+    def coluna(self, nome):
+        """Coluna mapeada (somente leitura se o segmento nao for o ativo deste processo)."""
+        coluna = self.colunas.get(nome)
+        if coluna is None:
+            caminho = self._caminho_coluna(nome)
+            if os.path.getsize(caminho) == 0:
+                return np.empty(0, COLUNAS_ARMAZEM[nome])
+            coluna = np.memmap(caminho, dtype=COLUNAS_ARMAZEM[nome], mode='r')
+            self.colunas[nome] = coluna
+        return coluna
+
+    def atualizar(self):
+        """Rele a quantidade e o estado de um segmento ativo de outro processo."""
+        if self.capacidade is not None or self.selado:
+            return
+        if os.path.exists(self._caminho('selado.json')):
+            self.__init__(self.diretorio)
+        else:
+            self.quantidade = self._contar()
+
+    def instantes(self):
+        return self.coluna('timestamp')[:self.quantidade]
+
+    def intervalo(self):
+        """(primeiro, ultimo) instante do segmento, ou None se vazio."""
+        if not self.quantidade:
+            return None
+        instantes = self.coluna('timestamp')
+        return instantes[0], instantes[self.quantidade - 1]
+
+    def localizar(self, instante, lado='left'):
+        """Posicao de instante na coluna de tempo (como np.searchsorted), usando o indice esparso."""
+        instantes = self.instantes()
+        indice = self.indice if self.indice is not None else instantes[::PASSO_INDICE]
+        bloco = max(int(np.searchsorted(indice, instante, side=lado)) - 1, 0)
+        inicio = bloco * PASSO_INDICE
+        fim = min(inicio + 2 * PASSO_INDICE, self.quantidade)
+        # O trecho [inicio, fim) cobre o bloco encontrado e o seguinte
+        posicao = inicio + int(np.searchsorted(instantes[inicio:fim], instante, side=lado))
+        if posicao == fim and fim < self.quantidade:
+            posicao = int(np.searchsorted(instantes, instante, side=lado))
+        return posicao
+
+    def fatia(self, inicio=None, fim=None):
+        """Trecho [a, b) das leituras com instante em [inicio, fim)."""
+        a = 0 if inicio is None else self.localizar(inicio)
+        b = self.quantidade if fim is None else self.localizar(fim)
+        return a, max(a, b)
+
+    def sincronizar(self):
+        for coluna in self.colunas.values():
+            if isinstance(coluna, np.memmap) and coluna.mode == 'r+':
+                coluna.flush()
+
+    def selar(self):
+        """Trunca as colunas, grava o indice esparso e marca o segmento como selado."""
+        self.sincronizar()
+        quantidade = self.quantidade
+        indice = np.array(self.coluna('timestamp')[:quantidade:PASSO_INDICE])
+        self.colunas = {}
+        for nome, tipo in COLUNAS_ARMAZEM.items():
+            with open(self._caminho_coluna(nome), 'r+b') as arquivo:
+                arquivo.truncate(quantidade * tipo.itemsize)
+                os.fsync(arquivo.fileno())
+        np.save(self._caminho('indice.npy'), indice)
+        instantes = self.coluna('timestamp')
+        metadados = {'quantidade': quantidade,
+                     'inicio': str(instantes[0]) if quantidade else None,
+                     'fim': str(instantes[quantidade - 1]) if quantidade else None}
+        temporario = self._caminho('selado.json.tmp')
+        with open(temporario, 'w') as arquivo:
+            json.dump(metadados, arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self._caminho('selado.json'))
+        self.selado = True
+        self.capacidade = None
+        self.indice = indice
+
+
+class ArmazemColunar:
+    """Armazem append-only das leituras ESP32 em segmentos colunares mapeados."""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, registros_por_segmento=REGISTROS_POR_SEGMENTO,
+                 somente_leitura=False):
+        """Abre (ou cria) o armazem; somente_leitura=True para leitores de outro processo."""
+        self.diretorio = diretorio
+        self.registros_por_segmento = registros_por_segmento
+        self.somente_leitura = somente_leitura
+
+        self._lock = threading.Lock()
+        self._fila_selagem = None
+        self._selador = None
+        if not somente_leitura:
+            os.makedirs(diretorio, exist_ok=True)
+
+        self._segmentos = [Segmento(caminho) for caminho in self._listar()]
+        self._ativo = None
+        self._proximo_cod = 1
+        if self._segmentos:
+            ultimo = self._segmentos[-1]
+            if not ultimo.selado and not somente_leitura:
+                # Continua o segmento ativo deixado pela execucao anterior
+                ultimo = Segmento(ultimo.diretorio, registros_por_segmento)
+                self._segmentos[-1] = ultimo
+                self._ativo = ultimo
+            ultimo.atualizar()
+            self._proximo_cod = (int(ultimo.coluna('cod_medicao')[ultimo.quantidade - 1]) + 1
+                                 if ultimo.quantidade else ultimo.primeiro_cod)
+
+    def _listar(self):
+        padrao = os.path.join(self.diretorio, f"{_PREFIXO_SEGMENTO}*")
+        return sorted(caminho for caminho in glob.glob(padrao) if os.path.isdir(caminho))
+
+    # --- ESCRITA ---
+
+    def anexar(self, instantes, leituras, codigos=None):
+        """
+        Anexa leituras (fosforo, potassio, ph, umidade, bomba) com seus instantes (datetime).
+
+        codigos (opcional) sao os cod_medicao ja atribuidos pelo banco; sem
+        eles o armazem numera as leituras em sequencia. Retorna o ultimo
+        codigo anexado.
+        """
+        if self.somente_leitura:
+            raise RuntimeError(f"Armazem {self.diretorio} aberto somente para leitura")
+        instantes = np.asarray(instantes, dtype=COLUNAS_ARMAZEM['timestamp'])
+        valores = np.asarray(leituras, dtype=np.float64).reshape(len(instantes), len(COLUNAS_VALORES))
+        if not len(instantes):
+            return self._proximo_cod - 1
+
+        # Lote fora de ordem: ordena (estavel) pelo instante
+        if np.any(instantes[1:] < instantes[:-1]):
+            ordem = np.argsort(instantes, kind='stable')
+            instantes, valores = instantes[ordem], valores[ordem]
+            codigos = np.asarray(codigos)[ordem] if codigos is not None else None
+
+        with self._lock:
+            if codigos is None:
+                codigos = np.arange(self._proximo_cod, self._proximo_cod + len(instantes), dtype=np.int64)
+            else:
+                codigos = np.asarray(codigos, dtype=np.int64)
+
+            posicao = 0
+            while posicao < len(instantes):
+                ativo = self._segmento_para(instantes[posicao], codigos[posicao])
+                quantidade = min(len(instantes) - posicao, ativo.capacidade - ativo.quantidade)
+                a, b = ativo.quantidade, ativo.quantidade + quantidade
+                ativo.colunas['timestamp'][a:b] = instantes[posicao:posicao + quantidade]
+                for j, nome in enumerate(COLUNAS_VALORES):
+                    ativo.colunas[nome][a:b] = valores[posicao:posicao + quantidade, j]
+                # O codigo e escrito por ultimo: marca as posicoes como ocupadas
+                ativo.colunas['cod_medicao'][a:b] = codigos[posicao:posicao + quantidade]
+                ativo.quantidade = b
+                posicao += quantidade
+
+            self._proximo_cod = int(codigos[-1]) + 1
+            return int(codigos[-1])
+
+    def _segmento_para(self, instante, cod):
+        """Segmento ativo com espaco que aceita o instante; sela o atual e abre outro se preciso."""
+        ativo = self._ativo
+        if ativo is not None:
+            cheio = ativo.quantidade >= ativo.capacidade
+            fora_de_ordem = ativo.quantidade and instante < ativo.colunas['timestamp'][ativo.quantidade - 1]
+            if not cheio and not fora_de_ordem:
+                return ativo
+            self._agendar_selagem(ativo)
+
+        caminho = os.path.join(self.diretorio, f"{_PREFIXO_SEGMENTO}{int(cod):020d}")
+        os.makedirs(caminho, exist_ok=True)
+        self._ativo = Segmento(caminho, self.registros_por_segmento)
+        self._segmentos.append(self._ativo)
+        logger.info(f"Armazem colunar: segmento {os.path.basename(caminho)} iniciado")
+        return self._ativo
+
+    def _agendar_selagem(self, segmento):
+        """Entrega o segmento a thread de selagem (iniciada no primeiro uso)."""
+        self._ativo = None
+        if self._selador is None:
+            self._fila_selagem = queue.Queue()
+            self._selador = threading.Thread(target=self._selar_continuamente, name='colunar-selador',
+                                             daemon=True)
+            self._selador.start()
+        self._fila_selagem.put(segmento)
+
+    def _selar_continuamente(self):
+        while True:
+            segmento = self._fila_selagem.get()
+            try:
+                if segmento is None:
+                    return
+                segmento.selar()
+                logger.info(f"Armazem colunar: segmento {os.path.basename(segmento.diretorio)} selado "
+                            f"({segmento.quantidade} leituras)")
+            except OSError as e:
+                logger.error(f"Erro ao selar {segmento.diretorio}: {e}")
+            finally:
+                self._fila_selagem.task_done()
+
+    def selar(self):
+        """Sela o segmento ativo agora (a proxima leitura inicia outro) e espera a selagem."""
+        with self._lock:
+            if self._ativo is not None and self._ativo.quantidade:
+                self._agendar_selagem(self._ativo)
+        if self._fila_selagem is not None:
+            self._fila_selagem.join()
+
+    def sincronizar(self):
+        """Grava em disco as leituras anexadas ao segmento ativo."""
+        with self._lock:
+            if self._ativo is not None:
+                self._ativo.sincronizar()
+
+    def fechar(self):
+        """Sincroniza o segmento ativo e termina a thread de selagem (o ativo continua na proxima abertura)."""
+        self.sincronizar()
+        if self._selador is not None:
+            self._fila_selagem.put(None)
+            self._selador.join()
+            self._selador = None
+
+    # --- LEITURA ---
+
+    def _segmentos_atuais(self):
+        """Lista dos segmentos com a quantidade atual (leitores recarregam a lista do disco)."""
+        with self._lock:
+            if self.somente_leitura:
+                conhecidos = {segmento.diretorio: segmento for segmento in self._segmentos}
+                self._segmentos = [conhecidos.get(caminho) or Segmento(caminho) for caminho in self._listar()]
+                for segmento in self._segmentos:
+                    segmento.atualizar()
+            return [(segmento, segmento.quantidade) for segmento in self._segmentos]
+
+    def varrer(self, inicio=None, fim=None, colunas=None):
+        """
+        Gera, segmento a segmento, {coluna: visao} das leituras com instante em [inicio, fim).
+
+        As visoes apontam para as colunas mapeadas (sem copia) e sao somente
+        leitura para o chamador.
+        """
+        colunas = colunas or list(COLUNAS_ARMAZEM)
+        inicio = np.datetime64(inicio, 'ms') if inicio is not None else None
+        fim = np.datetime64(fim, 'ms') if fim is not None else None
+        for segmento, quantidade in self._segmentos_atuais():
+            if not quantidade:
+                continue
+            primeiro, ultimo = segmento.intervalo()
+            if (inicio is not None and ultimo < inicio) or (fim is not None and primeiro >= fim):
+                continue
+            a, b = segmento.fatia(inicio, fim)
+            if a == b:
+                continue
+            visoes = {}
+            for nome in colunas:
+                visao = segmento.coluna(nome)[a:b].view(np.ndarray)
+                visao.flags.writeable = False
+                visoes[nome] = visao
+            yield visoes
+
+    def ler(self, inicio=None, fim=None, colunas=None):
+        """
+        {coluna: array} das leituras em [inicio, fim), em ordem de gravacao.
+
+        Com um unico segmento no periodo os arrays sao visoes sem copia; com
+        varios, cada coluna e concatenada uma vez.
+        """
+        colunas = colunas or list(COLUNAS_ARMAZEM)
+        partes = list(self.varrer(inicio, fim, colunas))
+        if len(partes) == 1:
+            return partes[0]
+        if not partes:
+            return {nome: np.empty(0, COLUNAS_ARMAZEM[nome]) for nome in colunas}
+        return {nome: np.concatenate([parte[nome] for parte in partes]) for nome in colunas}
+
+    def ultimas(self, quantidade, colunas=None):
+        """{coluna: array} das ultimas leituras anexadas (ate quantidade), em ordem de gravacao."""
+        colunas = colunas or list(COLUNAS_ARMAZEM)
+        partes = []
+        faltam = quantidade
+        for segmento, total in reversed(self._segmentos_atuais()):
+            if faltam <= 0:
+                break
+            a = max(total - faltam, 0)
+            partes.insert(0, {nome: segmento.coluna(nome)[a:total].view(np.ndarray) for nome in colunas})
+            faltam -= total - a
+        if len(partes) == 1:
+            return partes[0]
+        if not partes:
+            return {nome: np.empty(0, COLUNAS_ARMAZEM[nome]) for nome in colunas}
+        return {nome: np.concatenate([parte[nome] for parte in partes]) for nome in colunas}
+
+    def para_dataframe(self, inicio=None, fim=None, ultimas=None):
+        """DataFrame (colunas de COLUNAS_LEITURA) montado sobre as colunas lidas, sem copia."""
+        if pd is None:
+            raise RuntimeError("para_dataframe requer o pacote pandas")
+        dados = self.ultimas(ultimas) if ultimas else self.ler(inicio, fim)
+        return pd.DataFrame(dados, columns=COLUNAS_LEITURA, copy=False)
+
+    def agregar(self, inicio=None, fim=None):
+        """
+        Estatisticas por grandeza das leituras em [inicio, fim).
+
+        Mesmo formato de farmtech_estatisticas.calcular_estatisticas (sem
+        percentis): {grandeza: {'total', 'media', 'minimo', 'maximo',
+        'desvio_padrao', 'percentis'}}. Cada segmento e reduzido sobre as
+        visoes mapeadas; so os totais parciais sao combinados.
+        """
+        parciais = {nome: [0, 0.0, 0.0, None, None] for nome in COLUNAS_VALORES}
+        for visoes in self.varrer(inicio, fim, COLUNAS_VALORES):
+            for nome, valores in visoes.items():
+                valores = valores.astype(np.float64)
+                parcial = parciais[nome]
+                parcial[0] += len(valores)
+                parcial[1] += float(valores.sum())
+                parcial[2] += float(np.dot(valores, valores))
+                minimo, maximo = float(valores.min()), float(valores.max())
+                parcial[3] = minimo if parcial[3] is None else min(parcial[3], minimo)
+                parcial[4] = maximo if parcial[4] is None else max(parcial[4], maximo)
+
+        stats = {}
+        for grandeza, nome in zip(TIPOS_SENSORES, COLUNAS_VALORES):
+            total, soma, soma_quadrados, minimo, maximo = parciais[nome]
+            if not total:
+                continue
+            media = soma / total
+            variancia = max(soma_quadrados - soma * soma / total, 0.0) / (total - 1) if total > 1 else 0.0
+            stats[grandeza] = {
+                'total': total,
+                'media': round(media, 2),
+                'minimo': minimo,
+                'maximo': maximo,
+                'desvio_padrao': round(variancia ** 0.5, 2),
+                'percentis': {},
+            }
+        return stats
+
+    def status(self):
+        """Resumo dos segmentos: [(nome, quantidade, selado, primeiro, ultimo)]."""
+        resumo = []
+        for segmento, quantidade in self._segmentos_atuais():
+            intervalo = segmento.intervalo() or (None, None)
+            resumo.append((os.path.basename(segmento.diretorio), quantidade, segmento.selado, *intervalo))
+        return resumo
+
+
+# --- IMPORTACAO DO CSV DO ESP32 ---
+
+def importar_csv(armazem, arquivo_csv, inicio=None, intervalo=INTERVALO_LEITURA, tamanho_lote=100000):
+    """
+    Anexa ao armazem as leituras de um CSV do ESP32 (contador,fosforo,potassio,ph,umidade,bomba).
+
+    O arquivo e lido e validado por farmtech_csv.ler_csv_esp32. A primeira
+    coluna e o contador de medicoes do firmware: o instante de cada leitura
+    e inicio + (contador - 1) * intervalo segundos (inicio padrao: agora).
+    Retorna {'lidas', 'anexadas', 'rejeitadas'}.
+    """
+    # Importado aqui: farmtech_csv exige pandas, opcional para o restante do armazem
+    from farmtech_csv import ler_csv_esp32
+
+    inicio = np.datetime64(inicio or datetime.now(), 'ms')
+    passo = np.timedelta64(int(round(intervalo * 1000)), 'ms')
+    relatorio = {'lidas': 0, 'anexadas': 0, 'rejeitadas': 0}
+    for leituras, rejeitadas in ler_csv_esp32(arquivo_csv, tamanho_bloco=tamanho_lote):
+        relatorio['lidas'] += len(leituras) + len(rejeitadas)
+        relatorio['rejeitadas'] += len(rejeitadas)
+        if leituras.empty:
+            continue
+        instantes = inicio + (leituras['contador'].to_numpy() - 1) * passo
+        armazem.anexar(instantes, leituras[COLUNAS_VALORES_CSV].to_numpy(dtype=np.float64))
+        relatorio['anexadas'] += len(leituras)
+    return relatorio
+
+
+def main():
+    """Interface de linha de comando do armazem colunar."""
+    configurar_logs(arquivo=None)
+    parser = argparse.ArgumentParser(description="Armazem colunar de leituras ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_status = subparsers.add_parser('status', help="Lista os segmentos")
+    p_status.add_argument('--dir', default=DIRETORIO_PADRAO)
+    p_importar = subparsers.add_parser('importar', help="Anexa as leituras de um CSV do ESP32")
+    p_importar.add_argument('--dir', default=DIRETORIO_PADRAO)
+    p_importar.add_argument('--csv', required=True)
+    p_importar.add_argument('--inicio', type=datetime.fromisoformat,
+                            help="Instante da leitura de contador 1 (ISO, padrao: agora)")
+    p_importar.add_argument('--intervalo', type=float, default=INTERVALO_LEITURA,
+                            help="Segundos entre leituras consecutivas do contador")
+    p_estatisticas = subparsers.add_parser('estatisticas', help="Estatisticas por grandeza")
+    p_estatisticas.add_argument('--dir', default=DIRETORIO_PADRAO)
+    p_estatisticas.add_argument('--horas', type=float, help="Somente as ultimas N horas")
+
+    args = parser.parse_args()
+
+    if args.comando == 'importar':
+        armazem = ArmazemColunar(args.dir)
+        try:
+            relatorio = importar_csv(armazem, args.csv, args.inicio, args.intervalo)
+        finally:
+            armazem.fechar()
+        print(f"{relatorio['anexadas']} leituras anexadas ({relatorio['rejeitadas']} rejeitadas)")
+        return
+
+    armazem = ArmazemColunar(args.dir, somente_leitura=True)
+    if args.comando == 'status':
+        for nome, quantidade, selado, primeiro, ultimo in armazem.status():
+            estado = "selado" if selado else "ativo"
+            print(f"{nome}: {quantidade} leituras [{estado}] {primeiro} .. {ultimo}")
+    elif args.comando == 'estatisticas':
+        inicio = datetime.now() - timedelta(hours=args.horas) if args.horas else None
+        for grandeza, dados in armazem.agregar(inicio).items():
+            print(f"{grandeza.upper()}: {dados['total']} leituras | Media: {dados['media']} | "
+                  f"Min: {dados['minimo']} | Max: {dados['maximo']} | Desvio: {dados['desvio_padrao']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+FarmTech Solutions - Leitura Vetorizada de CSVs
+Conversao e validacao em bloco dos CSVs do ESP32 e da Fase 3
+
+Os arquivos sao lidos em blocos de TAMANHO_BLOCO linhas. Em cada bloco:
+
+- linhas com o numero errado de campos sao separadas pela contagem de
+  delimitadores (numpy), sem percorrer os campos em Python;
+- as demais sao convertidas pelo parser C do pandas em colunas de texto
+  e depois em colunas tipadas (pd.to_numeric / pd.to_datetime);
+- cada regra de validacao e uma mascara booleana sobre a coluna inteira:
+  campo nao numerico ou vazio, flags de fosforo/potassio/bomba fora de
+  {0, 1}, pH fora de 0-14, umidade fora de 0-100 e os limites
+  valor_minimo/valor_maximo de T_SENSORES.
+
+Cada bloco devolve um DataFrame tipado com as linhas validas (e o numero
+da linha no arquivo) e a lista (linha, motivos, conteudo) das rejeitadas,
+que ArquivoRejeitos grava em <arquivo>.rejeitos.csv. Os CSVs devem usar
+virgula e nao ter campos entre aspas, como os gerados pelo firmware e os
+da Fase 3.
+
+Cabecalho do CSV do ESP32: a primeira linha e cabecalho quando nenhum
+campo dela e numerico (a coluna "timestamp" traz o contador_medicoes).
+
+Uso:
+    python farmtech_csv.py validar dados_esp32.csv [--rejeitos rejeitos.csv]
+    python farmtech_csv.py validar "assets/Fase 3/t_medicoes.csv" --tabela t_medicoes
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import io
+import os
+import csv
+import time
+import argparse
+from itertools import islice
+import numpy as np
+import pandas as pd
+from farmtech_leituras import FAIXAS_VALIDAS, TIPOS_SENSORES, TIPO_DISPOSITIVO_ESP32, DISPOSITIVO_PADRAO
+
+TAMANHO_BLOCO = 100000
+
+# Colunas do frame CSV do firmware (exibirDadosCSV), na ordem do arquivo
+COLUNAS_CSV_ESP32 = ['contador', 'fosforo', 'potassio', 'ph', 'umidade', 'bomba']
+
+# Grandezas que so podem valer 0 ou 1
+GRANDEZAS_BINARIAS = ('fosforo', 'potassio', 'bomba')
+
+# CK_SENSORES_VLRMIN (DDL da Fase 3) exige valor_minimo > 0: o menor valor
+# gravavel em NUMBER(5,2) representa o limite 0
+MINIMO_CONSTRAINT = 0.01
+
+# Tipos das colunas dos CSVs da Fase 3 (mesmos nomes das colunas das tabelas)
+TIPOS_FASE3 = {
+    't_culturas': {'cod_cultura': 'inteiro', 'desc_cultura': 'texto', 'tamanho_cultura': 'decimal',
+                   'data_prev_colheita': 'data'},
+    't_sensores': {'cod_sensor': 'inteiro', 'nm_sensor': 'texto', 'tipo_sensor': 'texto',
+                   'objetivo_sensor': 'texto', 'fab_sensor': 'texto', 'modelo_sensor': 'texto',
+                   'data_instalacao': 'data', 'latitude_instalacao': 'decimal',
+                   'longitude_instalacao': 'decimal', 'valor_minimo': 'decimal', 'valor_maximo': 'decimal',
+                   'unidade': 'texto', 'cod_cultura': 'inteiro'},
+    't_medicoes': {'cod_medicao': 'inteiro', 'data_hora_medicao': 'data', 'valor_medicao': 'decimal',
+                   'un_medicao': 'texto', 'cod_sensor': 'inteiro'},
+    't_sugestoes': {'cod_medicao': 'inteiro', 'cod_sugestao': 'inteiro', 'objetivo_sugestao': 'texto',
+                    'data_hora_sugestao': 'data', 'valor_sugestao': 'decimal', 'un_sugestao': 'texto',
+                    'cod_sensor': 'inteiro'},
+    't_aplicacoes': {'cod_medicao': 'inteiro', 'cod_sugestao': 'inteiro', 'cod_sensor': 'inteiro',
+                     'cod_cultura': 'inteiro', 'cod_aplicacao': 'inteiro', 'nm_produto_utilizado': 'texto',
+                     'valor_aplicacao': 'decimal', 'un_aplicacao': 'texto', 'data_hora_aplicacao': 'data',
+                     'nm_resp_aplicacao': 'texto', 'documento_resp': 'texto'},
+}
+
+# Colunas sem NOT NULL no DDL da Fase 3
+COLUNAS_OPCIONAIS = {'objetivo_sensor', 'data_prev_colheita'}
+
+SUFIXO_REJEITOS = '.rejeitos.csv'
+
+
+# --- LIMITES DOS SENSORES ---
+
+def _limite_minimo(valor):
+    return 0.0 if valor <= MINIMO_CONSTRAINT else float(valor)
+
+
+def faixas_sensores(cursor, dispositivo=DISPOSITIVO_PADRAO):
+    """
+    Faixas por grandeza do dispositivo: FAIXAS_VALIDAS restritas por valor_minimo/valor_maximo de T_SENSORES.
+
+    As flags binarias continuam validadas so como {0, 1}.
+    """
+    grandezas = {tipo: grandeza for grandeza, tipo in TIPOS_SENSORES.items()}
+    cursor.execute("""
+    SELECT tipo_sensor, valor_minimo, valor_maximo FROM T_SENSORES
+    WHERE tipo_dispositivo = :1 AND cod_dispositivo = :2
+    """, [TIPO_DISPOSITIVO_ESP32, dispositivo])
+    faixas = dict(FAIXAS_VALIDAS)
+    for tipo, minimo, maximo in cursor.fetchall():
+        grandeza = grandezas.get(tipo.strip())
+        if grandeza is None or grandeza in GRANDEZAS_BINARIAS:
+            continue
+        base_min, base_max = faixas[grandeza]
+        faixas[grandeza] = (max(base_min, _limite_minimo(minimo)), min(base_max, float(maximo)))
+    return faixas
+
+
+def limites_sensores(cursor):
+    """{cod_sensor: (valor_minimo, valor_maximo)} de todos os sensores de T_SENSORES."""
+    cursor.execute("SELECT cod_sensor, valor_minimo, valor_maximo FROM T_SENSORES")
+    return {int(cod): (_limite_minimo(minimo), float(maximo)) for cod, minimo, maximo in cursor.fetchall()}
+
+
+# --- BLOCOS DE CAMPOS ---
+
+def _blocos_de_campos(arquivo, num_campos, tamanho_bloco, primeira_linha=1):
+    """
+    Gera (linhas, campos, rejeitadas) por bloco de linhas do arquivo aberto.
+
+    linhas: numero no arquivo de cada linha valida; campos: DataFrame de
+    texto com num_campos colunas (0..n-1); rejeitadas: [(linha, motivo,
+    conteudo)] das linhas com outra quantidade de campos. Linhas em branco
+    sao ignoradas.
+    """
+    numero = primeira_linha
+    while True:
+        bloco = list(islice(arquivo, tamanho_bloco))
+        if not bloco:
+            return
+        texto = np.array([linha.rstrip('\r\n') for linha in bloco])
+        numeros = np.arange(numero, numero + len(bloco))
+        numero += len(bloco)
+
+        preenchidas = np.char.str_len(np.char.strip(texto)) > 0
+        quantidades = np.char.count(texto, ',') + 1
+        corretas = preenchidas & (quantidades == num_campos)
+        rejeitadas = [(int(n), f"esperadas {num_campos} colunas, encontradas {int(q)}", str(t))
+                      for n, q, t in zip(numeros[preenchidas & ~corretas], quantidades[preenchidas & ~corretas],
+                                         texto[preenchidas & ~corretas])]
+        if not corretas.any():
+            yield numeros[:0], pd.DataFrame(columns=range(num_campos), dtype=object), rejeitadas
+            continue
+
+        campos = pd.read_csv(io.StringIO('\n'.join(texto[corretas])), header=None, names=range(num_campos),
+                             dtype=str, keep_default_na=False, skip_blank_lines=False, quoting=csv.QUOTE_NONE)
+        campos.index = numeros[corretas]
+        yield numeros[corretas], campos, rejeitadas
+
+
+def _numericas(campos, colunas):
+    """Converte as colunas de texto indicadas (nome -> posicao) para float64 (NaN se invalido)."""
+    return {nome: pd.to_numeric(campos[posicao].str.strip(), errors='coerce').to_numpy(dtype=np.float64)
+            for nome, posicao in colunas.items()}
+
+
+def _rejeitar(campos, linhas, regras):
+    """
+    Aplica as regras [(mascara, motivo(posicao))] e retorna (validas, rejeitadas).
+
+    validas e a mascara das linhas sem nenhuma violacao; rejeitadas lista
+    (linha, motivos separados por '; ', conteudo original).
+    """
+    invalidas = np.zeros(len(linhas), dtype=bool)
+    for mascara, _ in regras:
+        invalidas |= mascara
+    rejeitadas = []
+    for posicao in np.flatnonzero(invalidas):
+        motivos = [motivo(posicao) for mascara, motivo in regras if mascara[posicao]]
+        rejeitadas.append((int(linhas[posicao]), '; '.join(motivos), ','.join(campos.iloc[posicao])))
+    return ~invalidas, rejeitadas
+
+
+# --- CSV DO ESP32 ---
+
+def _eh_cabecalho(linha):
+    """Primeira linha e cabecalho quando nenhum campo e numerico."""
+    campos = pd.Series(linha.rstrip('\r\n').split(','), dtype=object).str.strip()
+    return pd.to_numeric(campos, errors='coerce').isna().all()
+
+
+def ler_csv_esp32(caminho, faixas=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera (leituras, rejeitadas) por bloco do CSV do ESP32.
+
+    leituras: DataFrame com 'linha', 'contador' (int64), fosforo, potassio,
+    bomba (int8), ph e umidade (float64), so com as linhas validas.
+    faixas: {grandeza: (min, max)}, padrao FAIXAS_VALIDAS (ver faixas_sensores).
+    """
+    faixas = faixas or FAIXAS_VALIDAS
+    with open(caminho, 'r', encoding='utf-8', errors='replace') as arquivo:
+        primeira = arquivo.readline()
+        if not primeira:
+            return
+        primeira_linha = 1
+        if _eh_cabecalho(primeira):
+            primeira_linha = 2
+        else:
+            arquivo.seek(0)
+
+        for linhas, campos, rejeitadas in _blocos_de_campos(arquivo, len(COLUNAS_CSV_ESP32), tamanho_bloco,
+                                                            primeira_linha):
+            valores = _numericas(campos, {nome: i for i, nome in enumerate(COLUNAS_CSV_ESP32)})
+            regras = []
+            for i, nome in enumerate(COLUNAS_CSV_ESP32):
+                coluna = valores[nome]
+                nao_numerico = np.isnan(coluna)
+                regras.append((nao_numerico, lambda p, i=i, nome=nome: f"{nome} nao numerico: '{campos.iloc[p, i]}'"))
+                coluna = np.where(nao_numerico, 0.0, coluna)
+                if nome == 'contador':
+                    regras.append(((coluna < 0) | (coluna != np.floor(coluna)),
+                                   lambda p, c=coluna: f"contador invalido: {c[p]:g}"))
+                    continue
+                if nome in GRANDEZAS_BINARIAS:
+                    regras.append(((coluna != 0) & (coluna != 1),
+                                   lambda p, c=coluna, g=nome: f"{g} deve ser 0 ou 1: {c[p]:g}"))
+                else:
+                    minimo, maximo = faixas[nome]
+                    regras.append(((coluna < minimo) | (coluna > maximo),
+                                   lambda p, c=coluna, g=nome, a=minimo, b=maximo:
+                                   f"{g} fora da faixa [{a}, {b}]: {c[p]:g}"))
+
+            validas, invalidas = _rejeitar(campos, linhas, regras)
+            leituras = pd.DataFrame({
+                'linha': linhas[validas],
+                'contador': valores['contador'][validas].astype(np.int64),
+                'fosforo': valores['fosforo'][validas].astype(np.int8),
+                'potassio': valores['potassio'][validas].astype(np.int8),
+                'ph': valores['ph'][validas],
+                'umidade': valores['umidade'][validas],
+                'bomba': valores['bomba'][validas].astype(np.int8),
+            })
+            yield leituras, sorted(rejeitadas + invalidas)
+
+
+def tuplas_leituras(leituras):
+    """(contadores, [(fosforo, potassio, ph, umidade, bomba)]) em tipos Python, para os binds."""
+    colunas = [leituras[nome].tolist() for nome in COLUNAS_CSV_ESP32[1:]]
+    return leituras['contador'].tolist(), list(zip(*colunas))
+
+
+# --- CSVs DA FASE 3 ---
+
+def ler_csv_fase3(caminho, tabela, limites=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera (registros, rejeitadas) por bloco de um CSV da Fase 3 (com cabecalho).
+
+    registros: DataFrame tipado com 'linha' e as colunas do cabecalho
+    (inteiro -> Int64, decimal -> float64, data -> datetime64, texto -> str).
+    limites ({cod_sensor: (min, max)}, ver limites_sensores) valida
+    valor_medicao de t_medicoes pelo sensor da medicao.
+    """
+    tipos = TIPOS_FASE3[tabela]
+    with open(caminho, 'r', encoding='utf-8', errors='replace') as arquivo:
+        cabecalho = [nome.strip().lower() for nome in arquivo.readline().rstrip('\r\n').split(',')]
+        desconhecidas = [nome for nome in cabecalho if nome not in tipos]
+        if desconhecidas:
+            raise ValueError(f"Colunas desconhecidas em {caminho} para {tabela}: {', '.join(desconhecidas)}")
+
+        for linhas, campos, rejeitadas in _blocos_de_campos(arquivo, len(cabecalho), tamanho_bloco, 2):
+            regras = []
+            registros = {'linha': linhas}
+            for i, nome in enumerate(cabecalho):
+                texto = campos[i].str.strip()
+                vazio = (texto == '').to_numpy()
+                if nome not in COLUNAS_OPCIONAIS:
+                    regras.append((vazio, lambda p, nome=nome: f"{nome} obrigatorio"))
+
+                tipo = tipos[nome]
+                if tipo == 'texto':
+                    registros[nome] = texto.where(~vazio, None).to_numpy(dtype=object)
+                    continue
+                if tipo == 'data':
+                    coluna = pd.to_datetime(texto, format='ISO8601', errors='coerce')
+                    invalido = coluna.isna().to_numpy() & ~vazio
+                else:
+                    coluna = pd.to_numeric(texto, errors='coerce')
+                    invalido = coluna.isna().to_numpy() & ~vazio
+                    if tipo == 'inteiro':
+                        fracionario = (coluna.fillna(0) != np.floor(coluna.fillna(0))).to_numpy()
+                        invalido |= fracionario
+                        coluna = coluna.where(~fracionario).astype('Int64')
+                regras.append((invalido, lambda p, i=i, nome=nome, tipo=tipo:
+                               f"{nome} nao e {tipo} valido: '{campos.iloc[p, i]}'"))
+                registros[nome] = coluna.array
+
+            if tabela == 't_medicoes' and limites and 'valor_medicao' in registros and 'cod_sensor' in registros:
+                sensores = pd.Series(registros['cod_sensor'])
+                minimos = sensores.map({cod: faixa[0] for cod, faixa in limites.items()}).to_numpy(dtype=np.float64)
+                maximos = sensores.map({cod: faixa[1] for cod, faixa in limites.items()}).to_numpy(dtype=np.float64)
+                valor = pd.Series(registros['valor_medicao']).to_numpy(dtype=np.float64)
+                regras.append((np.isnan(minimos) & ~pd.isna(sensores).to_numpy(),
+                               lambda p: f"cod_sensor {registros['cod_sensor'][p]} nao cadastrado"))
+                regras.append(((valor < minimos) | (valor > maximos),
+                               lambda p: f"valor_medicao fora da faixa do sensor "
+                                         f"[{minimos[p]}, {maximos[p]}]: {valor[p]:g}"))
+
+            validas, invalidas = _rejeitar(campos, linhas, regras)
+            yield (pd.DataFrame({nome: coluna[validas] for nome, coluna in registros.items()}),
+                   sorted(rejeitadas + invalidas))
+
+
+def valores_python(registros, colunas):
+    """Linhas de registros (colunas indicadas) em tipos Python (None para nulos), para os binds."""
+    saida = []
+    for nome in colunas:
+        serie = registros[nome]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            valores = [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+        else:
+            valores = [None if pd.isna(v) else v for v in serie.astype(object)]
+        saida.append(valores)
+    return list(zip(*saida))
+
+
+# --- ARQUIVO DE REJEITOS ---
+
+def caminho_rejeitos(arquivo_csv):
+    """Caminho padrao do arquivo de rejeitos: <arquivo sem extensao>.rejeitos.csv."""
+    return os.path.splitext(arquivo_csv)[0] + SUFIXO_REJEITOS
+
+
+class ArquivoRejeitos:
+    """CSV (linha, motivo, conteudo) das linhas rejeitadas; so e criado na primeira rejeicao."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.quantidade = 0
+        self._arquivo = None
+        self._escritor = None
+
+    def gravar(self, rejeitadas):
+        if not rejeitadas:
+            return
+        if self._arquivo is None:
+            self._arquivo = open(self.caminho, 'w', newline='', encoding='utf-8')
+            self._escritor = csv.writer(self._arquivo)
+            self._escritor.writerow(['linha', 'motivo', 'conteudo'])
+        self._escritor.writerows(rejeitadas)
+        self.quantidade += len(rejeitadas)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+
+def main():
+    """Valida um CSV sem acessar o banco e grava as linhas rejeitadas."""
+    parser = argparse.ArgumentParser(description="Leitura vetorizada de CSVs do ESP32 e da Fase 3")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_validar = subparsers.add_parser('validar', help="Converte e valida o arquivo")
+    p_validar.add_argument('arquivo')
+    p_validar.add_argument('--tabela', choices=sorted(TIPOS_FASE3), help="CSV da Fase 3 (padrao: CSV do ESP32)")
+    p_validar.add_argument('--rejeitos', help="Arquivo das linhas rejeitadas (padrao: <arquivo>.rejeitos.csv)")
+    p_validar.add_argument('--bloco', type=int, default=TAMANHO_BLOCO)
+
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    validas = 0
+    blocos = (ler_csv_fase3(args.arquivo, args.tabela, tamanho_bloco=args.bloco) if args.tabela
+              else ler_csv_esp32(args.arquivo, tamanho_bloco=args.bloco))
+    with ArquivoRejeitos(args.rejeitos or caminho_rejeitos(args.arquivo)) as rejeitos:
+        for registros, rejeitadas in blocos:
+            validas += len(registros)
+            rejeitos.gravar(rejeitadas)
+    segundos = time.perf_counter() - inicio
+
+    total = validas + rejeitos.quantidade
+    print(f"{total} linhas em {segundos:.2f}s ({total / segundos if segundos > 0 else 0:.0f} linhas/s): "
+          f"{validas} validas, {rejeitos.quantidade} rejeitadas")
+    if rejeitos.quantidade:
+        print(f"Linhas rejeitadas gravadas em {rejeitos.caminho}")
+
+
+if __name__ == "__main__":
+    main()
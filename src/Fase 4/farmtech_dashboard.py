@@ -19,6 +19,11 @@ import oracledb
 from datetime import datetime, timedelta
 import logging
 from farmtech_ml import FarmTechMLPredictor
+from farmtech_leituras import COLUNAS_LEITURA
+from farmtech_estatisticas import calcular_estatisticas
+from farmtech_rollups import COLUNAS_SERIE, rollups_disponiveis, serie_temporal
+from farmtech_paginacao import buscar_pagina
+from farmtech_colunar import ArmazemColunar
 
 # Configuracao da pagina
 st.set_page_config(
@@ -63,55 +68,36 @@ class FarmTechDashboard:
         if 'oracle_connected' not in st.session_state:
             st.session_state.oracle_connected = False
 
+    def _armazem_colunar(self):
+        """Armazem colunar configurado para o ML (FARMTECH_COLUNAR_DIR), ou None."""
+        if not self.predictor.colunar:
+            return None
+        return ArmazemColunar(self.predictor.colunar, somente_leitura=True)
+
     @st.cache_data(ttl=300)  # Cache por 5 minutos
     def carregar_dados_sensores(_self):
-        """Carrega dados dos sensores ESP32 do Oracle."""
+        """Carrega dados dos sensores ESP32 do Oracle (ou do armazem colunar)."""
+        armazem = _self._armazem_colunar()
+        if armazem is not None:
+            df = armazem.para_dataframe(ultimas=1000)
+            return df if not df.empty else None
+
         try:
             if not _self.predictor.connect():
                 return None
                 
-            sql = """
-            SELECT 
-                m.cod_medicao,
-                m.data_hora_medicao,
-                s.nm_sensor,
-                m.valor_medicao
-            FROM T_MEDICOES m
-            JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
-            WHERE s.nm_sensor LIKE '%ESP32%'
-            ORDER BY m.data_hora_medicao DESC
-            FETCH FIRST 1000 ROWS ONLY
-            """
-            
-            _self.predictor.cursor.execute(sql)
-            rows = _self.predictor.cursor.fetchall()
+            # Ultimas 1000 leituras completas, lidas em ordem do indice (farmtech_paginacao)
+            rows, _ = buscar_pagina(_self.predictor.cursor, _self.predictor.layout, limite=1000)
             
             if not rows:
                 return None
             
-            df = pd.DataFrame(rows, columns=['cod_medicao', 'timestamp', 'sensor', 'valor'])
-            
-            # Pivotar dados
-            df_pivot = df.pivot(index=['cod_medicao', 'timestamp'], 
-                               columns='sensor', 
-                               values='valor').reset_index()
-            
-            # Renomear colunas
-            column_mapping = {
-                'Sensor Fosforo ESP32': 'fosforo',
-                'Sensor Potassio ESP32': 'potassio', 
-                'Sensor pH ESP32': 'ph',
-                'Sensor Umidade ESP32': 'umidade',
-                'Sensor Bomba ESP32': 'bomba_ativa'
-            }
-            
-            df_pivot = df_pivot.rename(columns=column_mapping)
-            df_pivot = df_pivot.dropna()
+            df = pd.DataFrame(rows, columns=COLUNAS_LEITURA)
             
             # Converter timestamp
-            df_pivot['timestamp'] = pd.to_datetime(df_pivot['timestamp'])
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
             
-            return df_pivot
+            return df
             
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
@@ -119,28 +105,74 @@ class FarmTechDashboard:
         finally:
             _self.predictor.disconnect()
 
-    def exibir_metricas_principais(self, df):
+    @st.cache_data(ttl=300)  # Cache por 5 minutos
+    def carregar_estatisticas(_self, horas=None):
+        """Estatisticas por grandeza (motor agrupado) das ultimas `horas`, ou de todo o historico."""
+        inicio = datetime.now() - timedelta(hours=horas) if horas else None
+        armazem = _self._armazem_colunar()
+        if armazem is not None:
+            return armazem.agregar(inicio)
+
+        try:
+            if not _self.predictor.connect():
+                return None
+
+            return calcular_estatisticas(_self.predictor.cursor, _self.predictor.layout,
+                                         inicio=inicio, percentis=())
+
+        except Exception as e:
+            st.error(f"Erro ao calcular estatisticas: {e}")
+            return None
+        finally:
+            _self.predictor.disconnect()
+
+    @st.cache_data(ttl=60)  # Rollups sao baratos: cache curto
+    def carregar_serie(_self, horas=None):
+        """Serie temporal agregada dos rollups (minuto/hora/dia conforme o periodo)."""
+        try:
+            if not _self.predictor.connect():
+                return None
+            if not rollups_disponiveis(_self.predictor.cursor):
+                return None
+
+            inicio = datetime.now() - timedelta(hours=horas) if horas else None
+            rows = serie_temporal(_self.predictor.cursor, inicio)
+            if not rows:
+                return None
+
+            df = pd.DataFrame(rows, columns=COLUNAS_SERIE)
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            return df
+
+        except Exception as e:
+            st.error(f"Erro ao carregar serie dos rollups: {e}")
+            return None
+        finally:
+            _self.predictor.disconnect()
+
+    def exibir_metricas_principais(self, stats):
         """Exibe metricas principais em cards."""
-        if df is None or len(df) == 0:
+        if not stats:
             st.warning("Nenhum dado disponivel")
             return
         
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            total_medicoes = len(df)
+            total_medicoes = max(dados['total'] for dados in stats.values())
             st.metric("Total de Medições", total_medicoes)
         
         with col2:
-            ph_medio = df['ph'].mean()
+            ph_medio = stats.get('ph', {}).get('media', 0)
             st.metric("pH Médio", f"{ph_medio:.2f}")
         
         with col3:
-            umidade_media = df['umidade'].mean()
+            umidade_media = stats.get('umidade', {}).get('media', 0)
             st.metric("Umidade Média", f"{umidade_media:.1f}%")
         
         with col4:
-            bomba_ativa_pct = (df['bomba_ativa'].sum() / len(df)) * 100
+            # Media de um sinal 0/1 = fracao do tempo com a bomba ligada
+            bomba_ativa_pct = stats.get('bomba', {}).get('media', 0) * 100
             st.metric("Bomba Ativa", f"{bomba_ativa_pct:.1f}%")
 
     def criar_grafico_temporal(self, df):
@@ -379,6 +411,51 @@ class FarmTechDashboard:
             st.write("**Bomba:**")
             st.write(f"Ativa: {bomba_count.get(1, 0)} | Inativa: {bomba_count.get(0, 0)}")
 
+    def carregar_pagina(self, token=None, limite=50):
+        """Uma pagina do historico de leituras (paginacao por chave, farmtech_paginacao)."""
+        try:
+            if not self.predictor.connect():
+                return None, None
+            leituras, proximo_token = buscar_pagina(self.predictor.cursor, self.predictor.layout,
+                                                    limite, token)
+            return pd.DataFrame(leituras, columns=COLUNAS_LEITURA), proximo_token
+        except Exception as e:
+            st.error(f"Erro ao carregar historico: {e}")
+            return None, None
+        finally:
+            self.predictor.disconnect()
+
+    def secao_historico(self):
+        """Seção com o histórico completo de leituras, página a página."""
+        st.header("🗂️ Histórico de Leituras")
+        
+        # Pilha de tokens: o topo e o token da pagina exibida (None = mais recentes)
+        if 'tokens_historico' not in st.session_state:
+            st.session_state.tokens_historico = [None]
+        tokens = st.session_state.tokens_historico
+        
+        df, proximo_token = self.carregar_pagina(tokens[-1])
+        if df is None or len(df) == 0:
+            st.warning("Nenhuma leitura encontrada")
+            return
+        
+        st.caption(f"Página {len(tokens)} (mais recentes primeiro)")
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if st.button("⏮️ Mais recentes", disabled=len(tokens) == 1):
+                st.session_state.tokens_historico = [None]
+                st.rerun()
+        with col2:
+            if st.button("◀️ Anterior", disabled=len(tokens) == 1):
+                tokens.pop()
+                st.rerun()
+        with col3:
+            if st.button("Mais antigas ▶️", disabled=proximo_token is None):
+                tokens.append(proximo_token)
+                st.rerun()
+
 def main():
     """Função principal do dashboard."""
     # Header
@@ -395,9 +472,14 @@ def main():
     # Seleção de página
     pagina = st.sidebar.selectbox(
         "Escolha a página:",
-        ["📊 Monitoramento", "🤖 Predição ML", "📈 Análise Features", "📋 Estatísticas"]
+        ["📊 Monitoramento", "🗂️ Histórico", "🤖 Predição ML", "📈 Análise Features", "📋 Estatísticas"]
     )
     
+    # Período das métricas principais
+    periodos = {"Todo o histórico": None, "Últimas 24 horas": 24,
+                "Últimos 7 dias": 24 * 7, "Últimos 30 dias": 24 * 30}
+    periodo = st.sidebar.selectbox("Período (métricas e gráfico):", list(periodos))
+    
     # Botão de atualização
     if st.sidebar.button("🔄 Atualizar Dados"):
         st.cache_data.clear()
@@ -417,7 +499,7 @@ def main():
         return
     
     # Exibir métricas principais
-    dashboard.exibir_metricas_principais(df)
+    dashboard.exibir_metricas_principais(dashboard.carregar_estatisticas(periodos[periodo]))
     
     st.divider()
     
@@ -425,8 +507,9 @@ def main():
     if pagina == "📊 Monitoramento":
         st.header("📊 Monitoramento em Tempo Real")
         
-        # Gráfico temporal
-        fig_temporal = dashboard.criar_grafico_temporal(df)
+        # Gráfico temporal: rollups do período (sem rollups, últimas 1000 leituras)
+        serie = dashboard.carregar_serie(periodos[periodo])
+        fig_temporal = dashboard.criar_grafico_temporal(serie if serie is not None else df)
         if fig_temporal:
             st.plotly_chart(fig_temporal, use_container_width=True)
         
@@ -443,6 +526,9 @@ def main():
             if fig_dist:
                 st.plotly_chart(fig_dist, use_container_width=True)
     
+    elif pagina == "🗂️ Histórico":
+        dashboard.secao_historico()
+    
     elif pagina == "🤖 Predição ML":
         dashboard.secao_predicao_ml()
     
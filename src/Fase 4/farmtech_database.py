@@ -4,38 +4,104 @@ FASE 4 - Integracao ESP32 + Oracle Database (Estrutura Fase 3)
 
 Este sistema conecta ao banco Oracle existente da Fase 3 e insere
 dados dos sensores ESP32 na estrutura original (T_MEDICOES, T_SENSORES).
+Com FARMTECH_BACKEND=sqlite a mesma estrutura fica em um arquivo SQLite
+local (farmtech_backend), sem servidor de banco.
 
 Autor: FarmTech Solutions
 Data: Junho 2025
 """
 
 import oracledb
-import csv
 import os
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
+from farmtech_backend import criar_backend, dialeto, tabela_existe, ERROS_BANCO
+from farmtech_chaves import obter_alocador
+from farmtech_spool import anexar_sem_reter
+from farmtech_sensores import obter_registro_sensores
+from farmtech_estatisticas import PERCENTIS_PADRAO, calcular_estatisticas
+from farmtech_rollups import rollups_disponiveis, atualizar_rollups, descartar_estado_bomba
+from farmtech_exportacao import exportar_leituras
+from farmtech_paginacao import buscar_pagina
+from farmtech_dedup import LEITURA_DUPLICADA, deduplicacao_disponivel, obter_deduplicador
+from farmtech_provisionamento import SENSORES_ESP32, TAMANHO_MAX_DISPOSITIVO, provisionar_dispositivos
+from farmtech_metricas import medir_operacao, falhou, contar_leituras
+from farmtech_logs import configurar_logs, LogAmostrado
+from farmtech_csv import (TAMANHO_BLOCO, ArquivoRejeitos, caminho_rejeitos, faixas_sensores, ler_csv_esp32,
+                          tuplas_leituras)
+from farmtech_leituras import LAYOUT_LARGO, NOMES_SENSORES, TIPOS_SENSORES, DISPOSITIVO_PADRAO, validar_layout
 
-# Configuracao de logging sem emojis
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('farmtech_oracle.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# Configuracao de logging sem emojis (arquivo + console, gravados por uma thread)
+configurar_logs()
 
 logger = logging.getLogger(__name__)
+# Insercoes unitarias: um registro por intervalo, nao por leitura
+log_insercoes = LogAmostrado(logger)
+
+# INSERTs com o instante de cada leitura (NULL = instante do INSERT). O instante
+# vem da aplicacao: a ingestao continua e o spool gravam leituras bem depois de
+# feitas, e os rollups (farmtech_rollups) usam o mesmo instante das medicoes.
+# Declarar os tipos evita que o driver refaca o bind quando o valor alterna entre
+# int e float; sao compativeis com as colunas ampliadas pela migracao 1.
+SQL_INSERT_MEDICAO_DATADA = """
+INSERT INTO T_MEDICOES (cod_medicao, data_hora_medicao, valor_medicao, un_medicao, cod_sensor)
+VALUES (:1, NVL(:2, SYSTIMESTAMP), :3, :4, :5)
+"""
+TIPOS_BIND_MEDICOES_DATADA = [oracledb.DB_TYPE_NUMBER, oracledb.DB_TYPE_TIMESTAMP,
+                              oracledb.DB_TYPE_NUMBER, 2, oracledb.DB_TYPE_NUMBER]
+
+SQL_INSERT_LEITURA_DATADA = """
+INSERT INTO T_LEITURAS_ESP32 (cod_leitura, data_hora_leitura, fosforo, potassio, ph, umidade, bomba,
+                              cod_dispositivo)
+VALUES (:1, NVL(:2, SYSTIMESTAMP), :3, :4, :5, :6, :7, :8)
+"""
+TIPOS_BIND_LEITURAS_DATADA = ([oracledb.DB_TYPE_NUMBER, oracledb.DB_TYPE_TIMESTAMP] + [oracledb.DB_TYPE_NUMBER] * 5
+                              + [TAMANHO_MAX_DISPOSITIVO])
+
+# Codigos por DELETE das leituras EAV parcialmente recusadas (limite de expressoes do IN no Oracle)
+TAMANHO_BLOCO_REMOCAO = 1000
+
+# Ultima seq aplicada de um spool (T_INGESTAO_CHECKPOINT), por dialeto do backend
+SQL_CHECKPOINT_SPOOL = {
+    'oracle': """
+    MERGE INTO T_INGESTAO_CHECKPOINT c
+    USING DUAL ON (c.id_spool = :id_spool)
+    WHEN MATCHED THEN UPDATE SET c.ultima_seq = :seq, c.data_atualizacao = SYSTIMESTAMP
+    WHEN NOT MATCHED THEN INSERT (id_spool, ultima_seq, data_atualizacao)
+         VALUES (:id_spool, :seq, SYSTIMESTAMP)
+    """,
+    'sqlite': """
+    INSERT INTO T_INGESTAO_CHECKPOINT (id_spool, ultima_seq, data_atualizacao)
+    VALUES (:id_spool, :seq, SYSTIMESTAMP)
+    ON CONFLICT (id_spool) DO UPDATE SET ultima_seq = excluded.ultima_seq,
+                                         data_atualizacao = excluded.data_atualizacao
+    """,
+}
+
 
 class FarmTechOracleManager:
     """
     Classe para gerenciar dados dos sensores ESP32 no banco Oracle da Fase 3.
     Usa a estrutura original: T_CULTURAS, T_SENSORES, T_MEDICOES.
+    Opcionalmente grava as leituras no layout largo (T_LEITURAS_ESP32).
     """
 
-    def __init__(self):
-        """Inicializa o gerenciador com configuracoes do Oracle da Fase 3."""
+    def __init__(self, layout=None, spool=None, backend=None):
+        """
+        Inicializa o gerenciador com configuracoes do Oracle da Fase 3.
+
+        layout: 'eav' (cinco linhas em T_MEDICOES por leitura) ou 'largo'
+        (uma linha em T_LEITURAS_ESP32). Padrao: variavel FARMTECH_LAYOUT.
+        spool: SpoolLocal onde inserir_medicao_esp32 guarda a leitura quando o
+        banco esta indisponivel (quem o passa e quem o drena). Padrao: o
+        spool do diretorio FARMTECH_SPOOL_DIR, aberto so durante cada
+        gravacao (farmtech_spool.anexar_sem_reter) para que
+        'python farmtech_spool.py drenar' possa drena-lo com o menu aberto.
+        backend: onde as sessoes sao obtidas (farmtech_backend). Padrao: o
+        backend de FARMTECH_BACKEND com as credenciais abaixo.
+        """
         # Configuracoes de conexao Oracle (da Fase 3)
         self.host = "localhost"
         self.port = 1522
@@ -45,6 +111,15 @@ class FarmTechOracleManager:
         
         self.conn = None
         self.cursor = None
+
+        self.backend = backend or criar_backend(
+            user=self.user, password=self.password,
+            dsn=oracledb.makedsn(self.host, self.port, service_name=self.service_name)
+        )
+        self.layout = validar_layout(layout)
+
+        self.spool = spool
+        self.diretorio_spool = None if spool is not None else os.environ.get('FARMTECH_SPOOL_DIR')
         
         # IDs dos sensores ESP32 (serao criados automaticamente)
         self.sensores_esp32 = {
@@ -55,27 +130,27 @@ class FarmTechOracleManager:
             'bomba': None
         }
 
+    @medir_operacao('connect', falha=falhou)
     def connect(self):
-        """Estabelece conexao com o banco Oracle existente."""
+        """Obtem uma sessao do backend (pool Oracle da Fase 3 ou SQLite local)."""
         try:
-            dsn = oracledb.makedsn(self.host, self.port, service_name=self.service_name)
-            self.conn = oracledb.connect(user=self.user, password=self.password, dsn=dsn)
+            self.conn = self.backend.conectar()
             self.cursor = self.conn.cursor()
-            logger.info("Conectado ao banco Oracle da Fase 3")
+            logger.debug(f"Sessao obtida do backend {self.backend}")
             return True
-        except oracledb.DatabaseError as e:
-            logger.error(f"Erro de conexao Oracle: {e}")
+        except ERROS_BANCO as e:
+            logger.error(f"Erro de conexao ({self.backend}): {e}")
             return False
 
     def disconnect(self):
-        """Fecha a conexao com o banco."""
+        """Devolve a sessao ao pool."""
         if self.conn:
             if self.cursor:
                 self.cursor.close()
             self.conn.close()
             self.conn = None
             self.cursor = None
-            logger.info("Conexao Oracle encerrada")
+            logger.debug(f"Sessao devolvida ao backend {self.backend}")
 
     def verificar_tabelas_existentes(self):
         """Verifica se as tabelas da Fase 3 existem no banco."""
@@ -87,11 +162,10 @@ class FarmTechOracleManager:
             tabelas_encontradas = []
             
             for tabela in tabelas_esperadas:
-                self.cursor.execute(f"SELECT COUNT(*) FROM USER_TABLES WHERE TABLE_NAME = '{tabela}'")
-                if self.cursor.fetchone()[0] > 0:
+                if tabela_existe(self.cursor, tabela):
                     tabelas_encontradas.append(tabela)
             
-            print(f"\nTABELAS ENCONTRADAS NO BANCO ORACLE:")
+            print(f"\nTABELAS ENCONTRADAS NO BANCO ({self.backend}):")
             for tabela in tabelas_encontradas:
                 self.cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
                 count = self.cursor.fetchone()[0]
@@ -114,129 +188,141 @@ class FarmTechOracleManager:
         """Cria sensores virtuais para o ESP32 na tabela T_SENSORES."""
         if not self.connect():
             return False
-            
+
         try:
-            # Verifica se ja existe uma cultura para associar os sensores
-            self.cursor.execute("SELECT cod_cultura FROM T_CULTURAS WHERE ROWNUM = 1")
-            cultura_row = self.cursor.fetchone()
-            if not cultura_row:
-                # Cria uma cultura padrao para ESP32
-                self.cursor.execute("SELECT NVL(MAX(cod_cultura), 0) + 1 FROM T_CULTURAS")
-                novo_cod_cultura = self.cursor.fetchone()[0]
-                
-                sql_cultura = """
-                INSERT INTO T_CULTURAS (cod_cultura, desc_cultura, tamanho_cultura)
-                VALUES (:1, :2, :3)
-                """
-                self.cursor.execute(sql_cultura, [novo_cod_cultura, "Cultura ESP32 - FarmTech", 1.0])
-                cod_cultura = novo_cod_cultura
-                print(f"Cultura ESP32 criada com codigo: {cod_cultura}")
-            else:
-                cod_cultura = cultura_row[0]
-                print(f"Usando cultura existente: {cod_cultura}")
-            
-            # Definicao dos sensores ESP32 (valores minimos > 0 devido a constraint)
-            sensores_config = [
-                ('fosforo', 'Sensor Fosforo ESP32', 'FO', 'Deteccao de fosforo', 'FarmTech', 'ESP32-FO', 0.01, 1, 'UN'),
-                ('potassio', 'Sensor Potassio ESP32', 'PO', 'Deteccao de potassio', 'FarmTech', 'ESP32-PO', 0.01, 1, 'UN'),
-                ('ph', 'Sensor pH ESP32', 'PH', 'Medicao de pH do solo', 'FarmTech', 'ESP32-PH', 0.01, 14, 'PH'),
-                ('umidade', 'Sensor Umidade ESP32', 'UM', 'Medicao de umidade do solo', 'FarmTech', 'ESP32-UM', 0.01, 100, '%'),
-                ('bomba', 'Sensor Bomba ESP32', 'BO', 'Status da bomba de irrigacao', 'FarmTech', 'ESP32-BO', 0.01, 1, 'UN')
-            ]
-            
-            for sensor_key, nome, tipo, objetivo, fab, modelo, val_min, val_max, unidade in sensores_config:
-                # Verifica se o sensor ja existe
-                self.cursor.execute("SELECT cod_sensor FROM T_SENSORES WHERE nm_sensor = :1", [nome])
-                sensor_existente = self.cursor.fetchone()
-                
-                if sensor_existente:
-                    self.sensores_esp32[sensor_key] = sensor_existente[0]
-                    print(f"Sensor {nome} ja existe com codigo: {sensor_existente[0]}")
-                else:
-                    # Obtem proximo codigo de sensor
-                    self.cursor.execute("SELECT NVL(MAX(cod_sensor), 0) + 1 FROM T_SENSORES")
-                    novo_cod_sensor = self.cursor.fetchone()[0]
-                    
-                    # Insere novo sensor
-                    sql_sensor = """
-                    INSERT INTO T_SENSORES (
-                        cod_sensor, nm_sensor, tipo_sensor, objetivo_sensor, fab_sensor,
-                        modelo_sensor, data_instalacao, latitude_instalacao, longitude_instalacao,
-                        valor_minimo, valor_maximo, unidade, cod_cultura
-                    ) VALUES (
-                        :1, :2, :3, :4, :5, :6, SYSDATE, :7, :8, :9, :10, :11, :12
-                    )
-                    """
-                    
-                    # Coordenadas unicas para cada sensor
-                    lat = -23.550520 + (novo_cod_sensor * 0.001)
-                    lng = -46.633308 + (novo_cod_sensor * 0.001)
-                    
-                    params = [novo_cod_sensor, nome, tipo, objetivo, fab, modelo, 
-                             lat, lng, val_min, val_max, unidade, cod_cultura]
-                    
-                    self.cursor.execute(sql_sensor, params)
-                    self.sensores_esp32[sensor_key] = novo_cod_sensor
-                    print(f"Sensor {nome} criado com codigo: {novo_cod_sensor}")
-            
-            self.conn.commit()
-            print("Sensores ESP32 configurados com sucesso!")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Erro ao criar sensores ESP32: {e}")
-            self.conn.rollback()
+            # Sensores ja cadastrados vem do registro (uma consulta para todos, ou nenhuma se em cache)
+            existentes = obter_registro_sensores().sensores(DISPOSITIVO_PADRAO, self.cursor) or {}
+        except ERROS_BANCO as e:
+            logger.error(f"Erro ao consultar sensores ESP32: {e}")
             return False
         finally:
             self.disconnect()
 
-    def carregar_ids_sensores(self):
-        """Carrega os IDs dos sensores ESP32 ja criados."""
+        if not all(chave in existentes for chave in TIPOS_SENSORES):
+            mapa = self.provisionar_dispositivos([DISPOSITIVO_PADRAO])
+            if mapa is None:
+                return False
+            existentes, criados = mapa[DISPOSITIVO_PADRAO], set(mapa[DISPOSITIVO_PADRAO]) - set(existentes)
+        else:
+            criados = set()
+
+        for sensor_key, nome in NOMES_SENSORES.items():
+            self.sensores_esp32[sensor_key] = existentes[sensor_key]
+            situacao = "criado" if sensor_key in criados else "ja existe"
+            print(f"Sensor {nome} {situacao} com codigo: {existentes[sensor_key]}")
+        print("Sensores ESP32 configurados com sucesso!")
+        return True
+
+    def provisionar_dispositivos(self, dispositivos, cod_cultura=None):
+        """
+        Cadastra em lote os sensores virtuais de varios dispositivos ESP32.
+
+        Os sensores que faltam sao criados com um unico MERGE
+        (farmtech_provisionamento); dispositivos ja provisionados nao sao
+        alterados. cod_cultura padrao: a primeira cultura cadastrada (ou uma
+        cultura ESP32 criada na hora). Retorna {dispositivo: {grandeza:
+        cod_sensor}} ou None em caso de erro.
+        """
         if not self.connect():
-            return False
-            
+            return None
+
         try:
-            sensores_nomes = {
-                'fosforo': 'Sensor Fosforo ESP32',
-                'potassio': 'Sensor Potassio ESP32',
-                'ph': 'Sensor pH ESP32',
-                'umidade': 'Sensor Umidade ESP32',
-                'bomba': 'Sensor Bomba ESP32'
-            }
-            
-            for sensor_key, nome in sensores_nomes.items():
-                self.cursor.execute("SELECT cod_sensor FROM T_SENSORES WHERE nm_sensor = :1", [nome])
-                sensor_row = self.cursor.fetchone()
-                if sensor_row:
-                    self.sensores_esp32[sensor_key] = sensor_row[0]
-                else:
-                    print(f"AVISO: Sensor {nome} nao encontrado!")
+            if cod_cultura is None:
+                cod_cultura = self._cultura_padrao()
+            mapa, criados = provisionar_dispositivos(self.cursor, dispositivos, cod_cultura)
+            self.conn.commit()
+            if criados:
+                obter_registro_sensores().invalidar()
+            logger.info(f"{len(mapa)} dispositivos provisionados ({criados} sensores criados)")
+            return mapa
+
+        except (ValueError, *ERROS_BANCO) as e:
+            logger.error(f"Erro ao provisionar dispositivos: {e}")
+            self._desfazer()
+            return None
+        finally:
+            self.disconnect()
+
+    def _cultura_padrao(self):
+        """cod_cultura dos sensores provisionados: a primeira cultura, criada se nao houver nenhuma."""
+        self.cursor.execute("SELECT cod_cultura FROM T_CULTURAS FETCH FIRST 1 ROWS ONLY")
+        cultura_row = self.cursor.fetchone()
+        if cultura_row:
+            print(f"Usando cultura existente: {cultura_row[0]}")
+            return cultura_row[0]
+
+        # Cria uma cultura padrao para ESP32
+        cod_cultura = obter_alocador('T_CULTURAS').proximo(self.cursor)
+        sql_cultura = """
+        INSERT INTO T_CULTURAS (cod_cultura, desc_cultura, tamanho_cultura)
+        VALUES (:1, :2, :3)
+        """
+        self.cursor.execute(sql_cultura, [cod_cultura, "Cultura ESP32 - FarmTech", 1.0])
+        print(f"Cultura ESP32 criada com codigo: {cod_cultura}")
+        return cod_cultura
+
+    def carregar_ids_sensores(self):
+        """
+        Carrega os IDs dos sensores ESP32 ja criados.
+
+        Os IDs vem do registro de sensores do processo (farmtech_sensores);
+        o banco so e consultado quando o registro ainda nao esta em memoria
+        nem no snapshot.
+        """
+        registro = obter_registro_sensores()
+        try:
+            if registro.carregado():
+                ids = registro.sensores(DISPOSITIVO_PADRAO)
+            else:
+                if not self.connect():
                     return False
-            
-            print("IDs dos sensores ESP32 carregados com sucesso!")
-            return True
-            
+                try:
+                    ids = registro.sensores(DISPOSITIVO_PADRAO, self.cursor)
+                finally:
+                    self.disconnect()
         except Exception as e:
             logger.error(f"Erro ao carregar IDs dos sensores: {e}")
             return False
-        finally:
-            self.disconnect()
 
+        ids = ids or {}
+        for sensor_key in TIPOS_SENSORES:
+            if sensor_key not in ids:
+                print(f"AVISO: Sensor {NOMES_SENSORES[sensor_key]} nao encontrado!")
+                return False
+            self.sensores_esp32[sensor_key] = ids[sensor_key]
+
+        logger.debug("IDs dos sensores ESP32 carregados do registro")
+        return True
+
+    @medir_operacao('inserir_medicao_esp32', falha=falhou)
     def inserir_medicao_esp32(self, fosforo, potassio, ph, umidade, bomba):
-        """Insere uma medicao completa do ESP32 na tabela T_MEDICOES."""
+        """Insere uma medicao completa do ESP32 (T_MEDICOES ou T_LEITURAS_ESP32)."""
         if not self.connect():
-            return False
-            
+            # So a falta de conexao leva a leitura ao spool; os demais erros sao reportados
+            return self._guardar_no_spool(fosforo, potassio, ph, umidade, bomba)
+
         try:
-            # Carrega IDs dos sensores se necessario
-            if not all(self.sensores_esp32.values()):
-                if not self.carregar_ids_sensores():
+            # IDs dos sensores pelo registro do processo, com a sessao ja aberta
+            if self.layout != LAYOUT_LARGO and not all(self.sensores_esp32.values()):
+                sensores = self._sensores_dispositivos([DISPOSITIVO_PADRAO]).get(DISPOSITIVO_PADRAO)
+                if sensores is None:
                     print("Erro: Sensores ESP32 nao encontrados. Execute a criacao primeiro.")
                     return False
-            
+                self.sensores_esp32.update(sensores)
+
             # Obtem proximo codigo de medicao
-            self.cursor.execute("SELECT NVL(MAX(cod_medicao), 0) + 1 FROM T_MEDICOES")
-            cod_medicao = self.cursor.fetchone()[0]
+            cod_medicao = obter_alocador('T_MEDICOES').proximo(self.cursor)
+            instante = datetime.now()
+            leitura = (fosforo, potassio, ph, umidade, bomba)
+
+            if self.layout == LAYOUT_LARGO:
+                self.cursor.setinputsizes(*TIPOS_BIND_LEITURAS_DATADA)
+                self.cursor.execute(SQL_INSERT_LEITURA_DATADA, [cod_medicao, instante, *leitura, DISPOSITIVO_PADRAO])
+                self._atualizar_rollups([leitura], [instante])
+                self.conn.commit()
+                contar_leituras(1, 'unitaria')
+                log_insercoes.info("Leitura ESP32 inserida - ID: %s", cod_medicao)
+                return cod_medicao
             
             # Dados para inserir (sensor_key, valor, unidade)
             medicoes_dados = [
@@ -248,199 +334,518 @@ class FarmTechOracleManager:
             ]
             
             # Insere uma medicao para cada sensor
-            sql_medicao = """
-            INSERT INTO T_MEDICOES (cod_medicao, data_hora_medicao, valor_medicao, un_medicao, cod_sensor)
-            VALUES (:1, SYSTIMESTAMP, :2, :3, :4)
-            """
-            
+            self.cursor.setinputsizes(*TIPOS_BIND_MEDICOES_DATADA)
             medicoes_inseridas = 0
             for sensor_key, valor, unidade in medicoes_dados:
                 cod_sensor = self.sensores_esp32[sensor_key]
-                params = [cod_medicao, valor, unidade, cod_sensor]
+                params = [cod_medicao, instante, valor, unidade, cod_sensor]
                 
-                self.cursor.execute(sql_medicao, params)
+                self.cursor.execute(SQL_INSERT_MEDICAO_DATADA, params)
                 medicoes_inseridas += 1
             
+            self._atualizar_rollups([leitura], [instante])
             self.conn.commit()
-            logger.info(f"Medicao ESP32 inserida - ID: {cod_medicao}, {medicoes_inseridas} sensores")
+            contar_leituras(1, 'unitaria')
+            log_insercoes.info("Medicao ESP32 inserida - ID: %s, %s sensores", cod_medicao, medicoes_inseridas)
             return cod_medicao
             
         except Exception as e:
             logger.error(f"Erro ao inserir medicao ESP32: {e}")
+            descartar_estado_bomba()
             self.conn.rollback()
             return None
         finally:
             self.disconnect()
 
-    def importar_csv_esp32(self, arquivo_csv):
-        """Importa dados CSV do ESP32 para o banco Oracle."""
+    @medir_operacao('importar_csv_esp32', falha=falhou)
+    def importar_csv_esp32(self, arquivo_csv, modo_bulk=False, tamanho_lote=1000, commit_a_cada=5000,
+                           dispositivo=DISPOSITIVO_PADRAO, exibir=True, arquivo_rejeitos=None):
+        """
+        Importa dados CSV do ESP32 para o banco Oracle.
+
+        O arquivo e convertido e validado em blocos (farmtech_csv) com as
+        faixas dos sensores do ESP32 em T_SENSORES. Com modo_bulk=True as
+        leituras validas sao gravadas com executemany em lotes de
+        tamanho_lote (ver _importar_csv_bulk); caso contrario cada leitura e
+        inserida individualmente. A primeira coluna (contador_medicoes do
+        firmware) e registrada com o dispositivo: reimportar o mesmo arquivo
+        nao duplica leituras (farmtech_dedup). As linhas rejeitadas sao
+        gravadas em arquivo_rejeitos (padrao: <arquivo>.rejeitos.csv).
+        exibir=False omite o resumo no console (importacao paralela,
+        farmtech_importacao).
+        """
         if not os.path.exists(arquivo_csv):
             print(f"Arquivo nao encontrado: {arquivo_csv}")
             return False
-            
+
+        arquivo_rejeitos = arquivo_rejeitos or caminho_rejeitos(arquivo_csv)
+        if modo_bulk:
+            return self._importar_csv_bulk(arquivo_csv, tamanho_lote, commit_a_cada, dispositivo, exibir,
+                                           arquivo_rejeitos)
+
+        faixas = self._faixas_sensores(dispositivo)
+        if faixas is None:
+            return False
+
         try:
-            with open(arquivo_csv, 'r') as file:
-                csv_reader = csv.reader(file)
-                
-                # Pula cabecalho se existir
-                first_line = next(csv_reader)
-                if not first_line[0].isdigit():
-                    # E cabecalho, continua
-                    pass
-                else:
-                    # Nao e cabecalho, processa a primeira linha
-                    self._processar_linha_csv(first_line)
-                
-                # Processa o resto do arquivo
-                count = 0
-                for row in csv_reader:
-                    if self._processar_linha_csv(row):
-                        count += 1
-                
-                print(f"{count} medicoes ESP32 importadas para o Oracle")
-                return True
-                
+            count = 0
+            duplicadas = 0
+            with ArquivoRejeitos(arquivo_rejeitos) as rejeitos:
+                for leituras, rejeitadas in ler_csv_esp32(arquivo_csv, faixas):
+                    rejeitos.gravar(rejeitadas)
+                    contadores, tuplas = tuplas_leituras(leituras)
+                    for num_linha, contador, leitura in zip(leituras['linha'].tolist(), contadores, tuplas):
+                        resultado = self._gravar_leitura_csv(leitura, contador, dispositivo)
+                        if resultado is True:
+                            count += 1
+                        elif resultado == LEITURA_DUPLICADA:
+                            duplicadas += 1
+                        else:
+                            rejeitos.gravar([(num_linha, resultado, ','.join(map(str, (contador,) + leitura)))])
+
+            print(f"{count} medicoes ESP32 importadas para o banco ({self.backend})")
+            if duplicadas:
+                print(f"{duplicadas} leituras ja importadas foram ignoradas")
+            if rejeitos.quantidade:
+                print(f"{rejeitos.quantidade} linhas rejeitadas gravadas em {rejeitos.caminho}")
+            return True
+
         except Exception as e:
             logger.error(f"Erro ao importar CSV: {e}")
             return False
 
-    def _processar_linha_csv(self, row):
-        """Processa uma linha do CSV e insere no banco."""
+    def _faixas_sensores(self, dispositivo=DISPOSITIVO_PADRAO):
+        """
+        Faixas validas das leituras do dispositivo (farmtech_csv.faixas_sensores).
+
+        Retorna None se o banco falhar ou se o dispositivo nao tiver os
+        sensores cadastrados (ver farmtech_provisionamento).
+        """
+        if not self.connect():
+            return None
         try:
-            # Formato: timestamp,fosforo,potassio,ph,umidade,bomba_status
-            if len(row) >= 6:
-                fosforo = int(row[1])
-                potassio = int(row[2])
-                ph = float(row[3])
-                umidade = float(row[4])
-                bomba = int(row[5])
-                
-                return self.inserir_medicao_esp32(fosforo, potassio, ph, umidade, bomba)
+            if dispositivo not in self._sensores_dispositivos([dispositivo]):
+                print(f"Erro: dispositivo {dispositivo} sem sensores ESP32 cadastrados "
+                      f"(provisione com 'python farmtech_provisionamento.py provisionar {dispositivo}')")
+                return None
+            return faixas_sensores(self.cursor, dispositivo)
+        except ERROS_BANCO as e:
+            logger.error(f"Erro ao consultar limites dos sensores: {e}")
+            return None
+        finally:
+            self.disconnect()
+
+    def _importar_csv_bulk(self, arquivo_csv, tamanho_lote, commit_a_cada, dispositivo=DISPOSITIVO_PADRAO,
+                           exibir=True, arquivo_rejeitos=None):
+        """
+        Importa o CSV em lotes usando array DML.
+
+        Os blocos validados por farmtech_csv.ler_csv_esp32 sao gravados por
+        _inserir_lote em lotes de tamanho_lote leituras, com a origem
+        (dispositivo, contador) de cada linha. O commit e feito a cada
+        commit_a_cada leituras. Retorna um relatorio com linhas/s, as linhas
+        duplicadas e as rejeitadas (tambem gravadas em arquivo_rejeitos).
+        """
+        faixas = self._faixas_sensores(dispositivo)
+        if faixas is None:
+            return False
+
+        if not self.connect():
             return False
-        except (ValueError, IndexError) as e:
-            logger.warning(f"Linha CSV invalida: {row} - {e}")
+
+        relatorio = {'lidas': 0, 'inseridas': 0, 'duplicadas': 0, 'rejeitadas': [], 'segundos': 0.0,
+                     'linhas_seg': 0.0, 'arquivo_rejeitos': None}
+        inicio = time.perf_counter()
+        pendentes_commit = 0
+        rejeitos = ArquivoRejeitos(arquivo_rejeitos or caminho_rejeitos(arquivo_csv))
+
+        try:
+            for bloco, rejeitadas in ler_csv_esp32(arquivo_csv, faixas, max(tamanho_lote, TAMANHO_BLOCO)):
+                relatorio['lidas'] += len(bloco) + len(rejeitadas)
+                rejeitos.gravar(rejeitadas)
+                relatorio['rejeitadas'].extend((num_linha, motivo) for num_linha, motivo, _ in rejeitadas)
+
+                for inicio_lote in range(0, len(bloco), tamanho_lote):
+                    lote = bloco.iloc[inicio_lote:inicio_lote + tamanho_lote]
+                    contadores, leituras = tuplas_leituras(lote)
+                    origem = lote['linha'].tolist()  # numero da linha do arquivo de cada leitura do lote
+
+                    leituras_com_erro = self._inserir_lote(leituras,
+                                                           origens=[(dispositivo, c) for c in contadores])
+                    recusadas = []
+                    for indice, mensagem in leituras_com_erro.items():
+                        if mensagem == LEITURA_DUPLICADA:
+                            relatorio['duplicadas'] += 1
+                        else:
+                            relatorio['rejeitadas'].append((origem[indice], mensagem))
+                            recusadas.append((origem[indice], mensagem,
+                                              ','.join(map(str, (contadores[indice],) + leituras[indice]))))
+                    rejeitos.gravar(recusadas)
+
+                    relatorio['inseridas'] += len(origem) - len(leituras_com_erro)
+                    pendentes_commit += len(origem)
+                    if pendentes_commit >= commit_a_cada:
+                        self.conn.commit()
+                        pendentes_commit = 0
+
+            self.conn.commit()
+
+        except Exception as e:
+            logger.error(f"Erro na importacao bulk do CSV: {e}")
+            self._desfazer()
+            return False
+        finally:
+            rejeitos.fechar()
+            self.disconnect()
+
+        relatorio['rejeitadas'].sort()
+        if rejeitos.quantidade:
+            relatorio['arquivo_rejeitos'] = rejeitos.caminho
+        relatorio['segundos'] = time.perf_counter() - inicio
+        if relatorio['segundos'] > 0:
+            relatorio['linhas_seg'] = relatorio['lidas'] / relatorio['segundos']
+        if not exibir:
+            return relatorio
+
+        print(f"{relatorio['inseridas']} medicoes ESP32 importadas para o banco ({self.backend}, modo bulk)")
+        print(f"Tempo: {relatorio['segundos']:.2f}s | {relatorio['linhas_seg']:.0f} linhas/s")
+        if relatorio['duplicadas']:
+            print(f"{relatorio['duplicadas']} leituras ja importadas foram ignoradas")
+        if relatorio['rejeitadas']:
+            print(f"{len(relatorio['rejeitadas'])} linhas rejeitadas (gravadas em {rejeitos.caminho}):")
+            for num_linha, motivo in relatorio['rejeitadas'][:10]:
+                print(f"   linha {num_linha}: {motivo}")
+        return relatorio
+
+    def _guardar_no_spool(self, fosforo, potassio, ph, umidade, bomba):
+        """
+        Guarda a leitura no spool local para ser gravada quando o banco voltar.
+
+        Retorna True, ou False se nao ha spool configurado (ou se ele esta
+        aberto por outro processo).
+        """
+        registros = [(time.time(), (fosforo, potassio, ph, umidade, bomba), (DISPOSITIVO_PADRAO, None))]
+        try:
+            if self.spool is not None:
+                seq, diretorio = self.spool.anexar(registros), self.spool.diretorio
+            elif self.diretorio_spool:
+                seq, diretorio = anexar_sem_reter(self.diretorio_spool, registros), self.diretorio_spool
+            else:
+                return False
+        except RuntimeError as e:
+            logger.error(f"Banco indisponivel e spool inacessivel: {e}")
             return False
+        logger.warning(f"Banco indisponivel: leitura guardada no spool local (seq {seq})")
+        print(f"Banco indisponivel: leitura guardada no spool {diretorio} "
+              f"(drene com 'python farmtech_spool.py drenar --dir {diretorio}')")
+        return True
+
+    def _sensores_dispositivos(self, dispositivos):
+        """
+        {dispositivo: {grandeza: cod_sensor}} dos dispositivos com os cinco sensores cadastrados.
+
+        Os sensores vem do registro do processo (farmtech_sensores). Se algum
+        dispositivo nao estiver no registro, ele e recarregado uma vez (o
+        dispositivo pode ter sido provisionado depois, por outro processo);
+        os que continuarem sem sensores ficam fora do mapa.
+        """
+        registro = obter_registro_sensores()
+
+        def completos():
+            mapa = {dispositivo: registro.sensores(dispositivo, self.cursor) for dispositivo in dispositivos}
+            return {dispositivo: sensores for dispositivo, sensores in mapa.items()
+                    if sensores and all(grandeza in sensores for grandeza in TIPOS_SENSORES)}
+
+        mapa = completos()
+        if len(mapa) < len(dispositivos):
+            registro.recarregar(self.cursor)
+            mapa = completos()
+        return mapa
+
+    def _inserir_lote(self, leituras, instantes=None, origens=None, dispositivo=DISPOSITIVO_PADRAO):
+        """
+        Insere um lote de leituras (fosforo, potassio, ph, umidade, bomba) com array DML.
+
+        Usa a sessao aberta, sem commit. Os codigos do lote inteiro sao
+        reservados de uma vez no alocador de chaves e as linhas de cada
+        leitura (cinco no layout EAV, uma no largo) sao enviadas com
+        executemany(batcherrors=True). instantes (datetime por leitura)
+        define data_hora; sem ele vale o instante do envio do lote.
+        origens ((dispositivo, contador) por leitura) registra a origem em
+        T_LEITURAS_ORIGEM e descarta as leituras ja gravadas (farmtech_dedup),
+        que voltam com o erro LEITURA_DUPLICADA; leituras com contador None
+        sao gravadas sem deduplicacao. Cada leitura vai para os
+        sensores do seu dispositivo (o da origem, ou dispositivo quando nao ha
+        origens); leituras de dispositivos sem sensores cadastrados sao
+        recusadas. No layout EAV uma linha recusada recusa a leitura inteira:
+        as demais linhas dela sao apagadas. As leituras aceitas atualizam os
+        rollups na mesma transacao. Retorna {indice da leitura: erro}.
+        """
+        codigos = obter_alocador('T_MEDICOES').reservar(self.cursor, len(leituras))
+        instantes = instantes or [datetime.now()] * len(leituras)
+        if origens is not None:
+            dispositivos = [origem[0] for origem in origens]
+        else:
+            dispositivos = [dispositivo] * len(leituras)
+        sensores = self._sensores_dispositivos(set(dispositivos))
+
+        leituras_com_erro = {indice: f"dispositivo {disp} sem sensores ESP32 cadastrados"
+                             for indice, disp in enumerate(dispositivos) if disp not in sensores}
+        if origens is not None:
+            if deduplicacao_disponivel(self.cursor):
+                # So as leituras com contador, de dispositivos conhecidos, sao registradas
+                conhecidas = [i for i in range(len(leituras))
+                              if i not in leituras_com_erro and origens[i][1] is not None]
+                recusadas = obter_deduplicador().registrar(self.cursor, [origens[i] for i in conhecidas],
+                                                           [codigos[i] for i in conhecidas])
+                leituras_com_erro.update((conhecidas[i], erro) for i, erro in recusadas.items())
+            else:
+                logger.warning("T_LEITURAS_ORIGEM ausente (migracao 6): leituras gravadas sem deduplicacao")
+                origens = None
+        # Indices das leituras enviadas ao INSERT (sem as duplicadas)
+        novas = [i for i in range(len(leituras)) if i not in leituras_com_erro]
+
+        if self.layout == LAYOUT_LARGO:
+            sql_insert = SQL_INSERT_LEITURA_DATADA
+            tipos_bind = TIPOS_BIND_LEITURAS_DATADA
+            linhas_sql = [(codigos[i], instantes[i], *leituras[i], dispositivos[i]) for i in novas]
+            linhas_por_leitura = 1
+        else:
+            sql_insert = SQL_INSERT_MEDICAO_DATADA
+            tipos_bind = TIPOS_BIND_MEDICOES_DATADA
+            # (cod_sensor, unidade) de cada grandeza, na ordem da leitura, por dispositivo
+            colunas = {disp: [(codigos_sensores[grandeza], SENSORES_ESP32[grandeza][4])
+                              for grandeza in TIPOS_SENSORES]
+                       for disp, codigos_sensores in sensores.items()}
+            linhas_sql = [
+                (codigos[i], instantes[i], valor, unidade, cod_sensor)
+                for i in novas
+                for (cod_sensor, unidade), valor in zip(colunas[dispositivos[i]], leituras[i])
+            ]
+            linhas_por_leitura = len(TIPOS_SENSORES)
+
+        if not linhas_sql:
+            return leituras_com_erro
+        self.cursor.setinputsizes(*tipos_bind)
+        self.cursor.executemany(sql_insert, linhas_sql, batcherrors=True)
+
+        # No layout EAV cada leitura ocupa 5 posicoes consecutivas no lote
+        recusadas = {}
+        for erro in self.cursor.getbatcherrors():
+            recusadas.setdefault(novas[erro.offset // linhas_por_leitura], erro.message)
+        leituras_com_erro.update(recusadas)
+        if recusadas and linhas_por_leitura > 1:
+            # Linhas da mesma leitura aceitas antes/depois da recusada nao podem ficar orfas
+            self._remover_medicoes([codigos[i] for i in recusadas])
+        if origens is not None and recusadas:
+            # A origem das leituras recusadas nao pode impedir um novo envio
+            obter_deduplicador().esquecer(self.cursor,
+                                          [origens[i] for i in recusadas if origens[i][1] is not None])
+
+        aceitas = [i for i in novas if i not in recusadas]
+        self._atualizar_rollups([leituras[i] for i in aceitas], [instantes[i] for i in aceitas],
+                                [dispositivos[i] for i in aceitas])
+        contar_leituras(len(aceitas), 'lote')
+        return leituras_com_erro
+
+    def _remover_medicoes(self, codigos):
+        """Apaga (sem commit) as linhas de T_MEDICOES dos cod_medicao informados, em blocos."""
+        for inicio in range(0, len(codigos), TAMANHO_BLOCO_REMOCAO):
+            bloco = codigos[inicio:inicio + TAMANHO_BLOCO_REMOCAO]
+            binds = ", ".join(f":c{i}" for i in range(len(bloco)))
+            self.cursor.execute(f"DELETE FROM T_MEDICOES WHERE cod_medicao IN ({binds})",
+                                {f"c{i}": codigo for i, codigo in enumerate(bloco)})
+
+    def _atualizar_rollups(self, leituras, instantes, dispositivos=None):
+        """
+        Atualiza os rollups por minuto/hora/dia com as leituras gravadas (sem commit).
+
+        dispositivos: id do dispositivo de cada leitura (padrao: DISPOSITIVO_PADRAO);
+        cada dispositivo atualiza as linhas dos seus sensores.
+        """
+        if not leituras or not rollups_disponiveis(self.cursor):
+            return
+        por_dispositivo = {}
+        for indice, disp in enumerate(dispositivos or [DISPOSITIVO_PADRAO] * len(leituras)):
+            por_dispositivo.setdefault(disp, []).append(indice)
+        registro = obter_registro_sensores()
+        for disp, indices in por_dispositivo.items():
+            sensores = registro.sensores(disp, self.cursor)
+            if sensores:
+                atualizar_rollups(self.cursor, sensores, [leituras[i] for i in indices],
+                                  [instantes[i] for i in indices])
+
+    def gravar_leituras(self, leituras, instantes=None, origens=None):
+        """
+        Grava um lote de leituras em uma unica transacao (usado pela ingestao continua).
+
+        origens: (dispositivo, contador) de cada leitura, para a deduplicacao.
+        Retorna {indice da leitura: erro} com as leituras rejeitadas pelo banco
+        (LEITURA_DUPLICADA para as ja gravadas), ou None se o banco estiver
+        indisponivel (nada foi gravado).
+        """
+        if not self.connect():
+            return None
+
+        try:
+            leituras_com_erro = self._inserir_lote(leituras, instantes, origens)
+            self.conn.commit()
+            return leituras_com_erro
+        except ERROS_BANCO as e:
+            logger.error(f"Erro ao gravar lote de leituras: {e}")
+            self._desfazer()
+            return None
+        finally:
+            self.disconnect()
+
+    def gravar_leituras_spool(self, id_spool, registros):
+        """
+        Grava registros (seq, instante_epoch, leitura, origem) do spool local de forma idempotente.
+
+        A ultima seq aplicada de cada spool fica em T_INGESTAO_CHECKPOINT
+        (migracao 4) e e atualizada na mesma transacao dos INSERTs; registros
+        com seq ja aplicada sao ignorados. A origem (dispositivo, contador)
+        passa pela deduplicacao como em gravar_leituras: uma leitura que ja
+        chegou ao banco por outro caminho tambem conta como duplicada.
+        Registros sem origem vao para o dispositivo padrao. Retorna {'gravadas', 'duplicadas',
+        'erros': {seq: erro}, 'aceitas': [seqs gravadas agora]} ou None se o
+        banco estiver indisponivel.
+        """
+        if not self.connect():
+            return None
+
+        try:
+            # FOR UPDATE serializa drenadores concorrentes do mesmo spool
+            # (no SQLite, a trava de escrita e obtida antes do SELECT)
+            self.cursor.execute(
+                "SELECT ultima_seq FROM T_INGESTAO_CHECKPOINT WHERE id_spool = :1 FOR UPDATE",
+                [id_spool]
+            )
+            row = self.cursor.fetchone()
+            aplicada = row[0] if row else 0
+
+            novos = [registro for registro in registros if registro[0] > aplicada]
+            erros, duplicadas, aceitas = {}, 0, []
+            if novos:
+                leituras_com_erro = self._inserir_lote(
+                    [leitura for _, _, leitura, _ in novos],
+                    [datetime.fromtimestamp(instante) for _, instante, _, _ in novos],
+                    [origem or (DISPOSITIVO_PADRAO, None) for _, _, _, origem in novos]
+                )
+                duplicadas = sum(mensagem == LEITURA_DUPLICADA for mensagem in leituras_com_erro.values())
+                erros = {novos[indice][0]: mensagem for indice, mensagem in leituras_com_erro.items()
+                         if mensagem != LEITURA_DUPLICADA}
+                aceitas = [registro[0] for indice, registro in enumerate(novos) if indice not in leituras_com_erro]
+
+            self.cursor.execute(SQL_CHECKPOINT_SPOOL[dialeto(self.cursor)],
+                                id_spool=id_spool, seq=max(aplicada, registros[-1][0]))
+            self.conn.commit()
+
+            return {'gravadas': len(novos) - len(erros) - duplicadas,
+                    'duplicadas': len(registros) - len(novos) + duplicadas,
+                    'erros': erros, 'aceitas': aceitas}
+        except ERROS_BANCO as e:
+            logger.error(f"Erro ao drenar spool {id_spool}: {e}")
+            self._desfazer()
+            return None
+        finally:
+            self.disconnect()
+
+    def _desfazer(self):
+        """Rollback tolerante a sessao perdida junto com o banco."""
+        descartar_estado_bomba()
+        try:
+            self.conn.rollback()
+        except ERROS_BANCO:
+            pass
+
+    def _gravar_leitura_csv(self, leitura, contador, dispositivo=DISPOSITIVO_PADRAO):
+        """
+        Insere uma leitura do CSV no banco (uma transacao por linha).
+
+        Retorna True se a leitura foi gravada, LEITURA_DUPLICADA se ja
+        estava gravada ou a mensagem de erro.
+        """
+        erros = self.gravar_leituras([leitura], origens=[(dispositivo, contador)])
+        if erros is None:
+            return "falha ao gravar no banco"
+        if erros:
+            if erros[0] != LEITURA_DUPLICADA:
+                logger.warning(f"Linha CSV recusada pelo banco: {leitura} - {erros[0]}")
+            return erros[0]
+        return True
 
     def listar_medicoes_recentes(self, limite=10):
         """Lista as medicoes mais recentes do ESP32."""
+        medicoes, _ = self.listar_pagina_medicoes(limite)
+        return medicoes
+
+    def listar_pagina_medicoes(self, limite=10, token=None):
+        """
+        Lista uma pagina de medicoes ESP32, da mais recente para a mais antiga.
+
+        token e o proximo_token devolvido pela pagina anterior (None para a
+        primeira). Retorna (medicoes, proximo_token); proximo_token e None
+        na ultima pagina.
+        """
         if not self.connect():
-            return []
+            return [], None
             
         try:
-            # Busca medicoes dos sensores ESP32
-            sql = """
-            SELECT m.cod_medicao, m.data_hora_medicao, s.nm_sensor, m.valor_medicao, m.un_medicao
-            FROM T_MEDICOES m
-            JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
-            WHERE s.nm_sensor LIKE '%ESP32%'
-            ORDER BY m.data_hora_medicao DESC, m.cod_medicao DESC
-            FETCH FIRST :1 ROWS ONLY
-            """
-            
-            self.cursor.execute(sql, [limite * 5])  # 5 sensores por medicao
-            rows = self.cursor.fetchall()
-            
-            # Agrupa por codigo de medicao
-            medicoes = {}
-            for row in rows:
-                cod_medicao = row[0]
-                if cod_medicao not in medicoes:
-                    medicoes[cod_medicao] = {
-                        'id': cod_medicao,
-                        'timestamp': row[1],
-                        'sensores': {}
-                    }
-                
-                sensor_nome = row[2]
-                valor = row[3]
-                
-                if 'Fosforo' in sensor_nome:
-                    medicoes[cod_medicao]['fosforo'] = 'PRESENTE' if valor else 'AUSENTE'
-                elif 'Potassio' in sensor_nome:
-                    medicoes[cod_medicao]['potassio'] = 'PRESENTE' if valor else 'AUSENTE'
-                elif 'pH' in sensor_nome:
-                    medicoes[cod_medicao]['ph'] = valor
-                elif 'Umidade' in sensor_nome:
-                    medicoes[cod_medicao]['umidade'] = valor
-                elif 'Bomba' in sensor_nome:
-                    medicoes[cod_medicao]['bomba'] = 'LIGADA' if valor else 'DESLIGADA'
-            
-            return list(medicoes.values())[:limite]
+            # Uma linha por leitura completa, lida em ordem do indice (farmtech_paginacao)
+            leituras, proximo_token = buscar_pagina(self.cursor, self.layout, limite, token)
+
+            medicoes = []
+            for cod_medicao, timestamp, fosforo, potassio, ph, umidade, bomba in leituras:
+                medicoes.append({
+                    'id': cod_medicao,
+                    'timestamp': timestamp,
+                    'fosforo': 'PRESENTE' if fosforo else 'AUSENTE',
+                    'potassio': 'PRESENTE' if potassio else 'AUSENTE',
+                    'ph': ph,
+                    'umidade': umidade,
+                    'bomba': 'LIGADA' if bomba else 'DESLIGADA'
+                })
+            return medicoes, proximo_token
             
         except Exception as e:
             logger.error(f"Erro ao listar medicoes: {e}")
-            return []
+            return [], None
         finally:
             self.disconnect()
 
-    def obter_estatisticas(self):
-        """Calcula estatisticas das medicoes ESP32."""
+    def obter_estatisticas(self, inicio=None, fim=None, cod_cultura=None, percentis=()):
+        """
+        Calcula estatisticas das medicoes ESP32 (opcionalmente por periodo e cultura).
+
+        Sem percentis as estatisticas saem dos rollups, quando existem;
+        percentis (ex.: PERCENTIS_PADRAO) leem as medicoes individuais.
+        """
         if not self.connect():
             return None
             
         try:
-            # Estatisticas por tipo de sensor
-            stats = {}
-            
-            sensores_tipos = [
-                ('Fosforo', 'fosforo'),
-                ('Potassio', 'potassio'),
-                ('pH', 'ph'),
-                ('Umidade', 'umidade'),
-                ('Bomba', 'bomba')
-            ]
-            
-            for sensor_nome, sensor_key in sensores_tipos:
-                sql = f"""
-                SELECT COUNT(*), AVG(valor_medicao), MIN(valor_medicao), MAX(valor_medicao)
-                FROM T_MEDICOES m
-                JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
-                WHERE s.nm_sensor LIKE '%{sensor_nome}%ESP32%'
-                """
-                
-                self.cursor.execute(sql)
-                result = self.cursor.fetchone()
-                
-                if result and result[0] > 0:
-                    stats[sensor_key] = {
-                        'total': result[0],
-                        'media': round(result[1], 2) if result[1] else 0,
-                        'minimo': result[2] if result[2] else 0,
-                        'maximo': result[3] if result[3] else 0
-                    }
-            
-            return stats
-                
+            return calcular_estatisticas(self.cursor, self.layout, inicio=inicio, fim=fim,
+                                         cod_cultura=cod_cultura, percentis=percentis)
         except Exception as e:
             logger.error(f"Erro ao calcular estatisticas: {e}")
             return None
         finally:
             self.disconnect()
 
-    def exportar_para_csv(self, arquivo_saida):
-        """Exporta medicoes ESP32 para um arquivo CSV."""
+    def exportar_para_csv(self, arquivo_saida, inicio=None, fim=None):
+        """
+        Exporta as leituras ESP32 para CSV, uma leitura por linha.
+
+        A exportacao e feita em streaming (farmtech_exportacao); arquivos
+        terminados em .gz ou .zst sao gravados comprimidos.
+        """
         if not self.connect():
             return False
             
         try:
-            sql = """
-            SELECT m.cod_medicao, TO_CHAR(m.data_hora_medicao, 'YYYY-MM-DD HH24:MI:SS'),
-                   s.nm_sensor, m.valor_medicao
-            FROM T_MEDICOES m
-            JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
-            WHERE s.nm_sensor LIKE '%ESP32%'
-            ORDER BY m.cod_medicao, s.nm_sensor
-            """
-            
-            self.cursor.execute(sql)
-            rows = self.cursor.fetchall()
-            
-            with open(arquivo_saida, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['cod_medicao', 'timestamp', 'sensor', 'valor'])
-                writer.writerows(rows)
-            
-            print(f"{len(rows)} registros exportados para {arquivo_saida}")
+            resultado = exportar_leituras(self.cursor, arquivo_saida, self.layout, inicio=inicio, fim=fim)
+            print(f"{resultado['linhas']} leituras exportadas para {arquivo_saida}")
             return True
             
         except Exception as e:
@@ -455,7 +860,8 @@ def menu_principal():
     manager = FarmTechOracleManager()
     
     print("=== SISTEMA FARMTECH - INTEGRACAO ESP32 + ORACLE (FASE 3) ===")
-    print("Conectando ao banco Oracle da Fase 3...")
+    print(f"Layout de armazenamento das leituras: {manager.layout}")
+    print(f"Conectando ao banco da Fase 3 ({manager.backend})...")
     
     # Verifica conexao e tabelas
     if not manager.verificar_tabelas_existentes():
@@ -485,9 +891,13 @@ def menu_principal():
             opcao = input("Escolha uma opcao: ").strip()
             
             if opcao == "1":
-                medicoes = manager.listar_medicoes_recentes(10)
-                if medicoes:
-                    print(f"\nULTIMAS {len(medicoes)} MEDICOES ESP32:")
+                medicoes, token = manager.listar_pagina_medicoes(10)
+                if not medicoes and token is None:
+                    print("Nenhuma medicao ESP32 encontrada")
+                pagina = 1
+                # Uma pagina so de leituras incompletas vem vazia, mas com token
+                while medicoes or token is not None:
+                    print(f"\nMEDICOES ESP32 - PAGINA {pagina} (mais recentes primeiro):")
                     print("-" * 80)
                     for m in medicoes:
                         fosforo = m.get('fosforo', 'N/A')
@@ -499,12 +909,18 @@ def menu_principal():
                         print(f"ID: {m['id']} | {m['timestamp']} | pH: {ph} | "
                               f"Umidade: {umidade}% | Fosforo: {fosforo} | "
                               f"Potassio: {potassio} | Bomba: {bomba}")
-                else:
-                    print("Nenhuma medicao ESP32 encontrada")
+                    if token is None:
+                        print("Fim do historico")
+                        break
+                    if input("Enter = medicoes mais antigas, 0 = voltar: ").strip() == "0":
+                        break
+                    medicoes, token = manager.listar_pagina_medicoes(10, token)
+                    pagina += 1
             
             elif opcao == "2":
                 arquivo = input("Digite o caminho do arquivo CSV: ").strip()
-                manager.importar_csv_esp32(arquivo)
+                bulk = input("Usar importacao em lote (bulk)? (s/N): ").strip().lower() == 's'
+                manager.importar_csv_esp32(arquivo, modo_bulk=bulk)
             
             elif opcao == "3":
                 try:
@@ -523,19 +939,28 @@ def menu_principal():
                     print("Valores invalidos inseridos")
             
             elif opcao == "4":
-                stats = manager.obter_estatisticas()
+                horas = input("Periodo em horas (Enter = todo o historico): ").strip()
+                cultura = input("Codigo da cultura (Enter = todas): ").strip()
+                brutos = input("Calcular mediana e P90 (le todas as medicoes)? (s/N): ").strip().lower() == 's'
+                inicio = datetime.now() - timedelta(hours=float(horas)) if horas else None
+                stats = manager.obter_estatisticas(inicio=inicio,
+                                                   cod_cultura=int(cultura) if cultura else None,
+                                                   percentis=PERCENTIS_PADRAO if brutos else ())
                 if stats:
                     print(f"\nESTATISTICAS DOS SENSORES ESP32:")
                     print("-" * 40)
                     for sensor, dados in stats.items():
+                        percentis = "".join(f" | P{int(p * 100)}: {round(v, 2)}"
+                                            for p, v in dados['percentis'].items())
                         print(f"{sensor.upper()}: {dados['total']} medicoes | "
                               f"Media: {dados['media']} | "
-                              f"Min: {dados['minimo']} | Max: {dados['maximo']}")
+                              f"Min: {dados['minimo']} | Max: {dados['maximo']} | "
+                              f"Desvio: {dados['desvio_padrao']}{percentis}")
                 else:
                     print("Nenhuma estatistica encontrada")
             
             elif opcao == "5":
-                arquivo = input("Nome do arquivo de saida (ex: medicoes_esp32.csv): ").strip()
+                arquivo = input("Nome do arquivo de saida (ex: medicoes_esp32.csv ou .csv.gz): ").strip()
                 if not arquivo:
                     arquivo = "medicoes_esp32.csv"
                 manager.exportar_para_csv(arquivo)
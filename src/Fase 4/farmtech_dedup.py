@@ -0,0 +1,272 @@
+"""
+FarmTech Solutions - Deduplicacao das Leituras
+Ingestao idempotente pela chave (dispositivo, contador_medicoes)
+
+O firmware (main.cpp) numera cada ciclo com contador_medicoes e imprime o
+numero na primeira coluna do frame CSV. Cada leitura gravada com origem
+registra essa chave em T_LEITURAS_ORIGEM (migracao 6), cuja chave
+primaria (id_dispositivo, contador) e a garantia final contra duplicatas:
+reimportar o mesmo log do Wokwi, ou repetir uma importacao que falhou no
+meio, nao duplica leituras.
+
+Para que a reimportacao de milhoes de linhas nao custe uma consulta por
+linha, cada dispositivo tem em memoria um filtro de Bloom com os
+contadores ja gravados (carregado uma vez de T_LEITURAS_ORIGEM, com
+espaco para o dobro deles; camadas novas acompanham o crescimento). So os
+MAX_DISPOSITIVOS_EM_MEMORIA dispositivos usados mais recentemente mantem
+o filtro; os demais o recarregam do banco se voltarem a gravar:
+
+- contador ausente do filtro: certamente novo, vai direto para o INSERT;
+- contador presente no filtro: provavelmente duplicado; os suspeitos do
+  lote sao confirmados em uma consulta pela chave primaria (falsos
+  positivos, ~TAXA_ERRO_PADRAO, continuam sendo gravados);
+- duplicatas que o filtro nao conhece (outro processo gravou a mesma
+  chave) sao recusadas pela chave primaria e tambem contadas como
+  duplicadas.
+
+O contador reinicia quando o ESP32 reinicia: capturas de sessoes
+diferentes do mesmo aparelho devem usar ids de dispositivo diferentes
+(ex.: 'ESP32@2025-06-10').
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import math
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from farmtech_backend import identificar_banco, tabela_existe, violacao_unicidade
+
+logger = logging.getLogger(__name__)
+
+# Valor de {indice: erro} para as leituras recusadas por ja estarem gravadas
+LEITURA_DUPLICADA = "leitura duplicada (dispositivo, contador)"
+
+# Capacidade minima da primeira camada do filtro de um dispositivo
+CAPACIDADE_MINIMA = 4096
+TAXA_ERRO_PADRAO = 0.001
+
+# Dispositivos com filtro em memoria (os usados menos recentemente sao descartados)
+MAX_DISPOSITIVOS_EM_MEMORIA = 64
+
+# Linhas por fetch na carga dos contadores de um dispositivo
+TAMANHO_FETCH_CARGA = 50000
+
+# Binds por consulta de confirmacao (limite de expressoes do IN no Oracle)
+TAMANHO_CONSULTA = 1000
+
+SQL_INSERT_ORIGEM = """
+INSERT INTO T_LEITURAS_ORIGEM (id_dispositivo, contador, cod_medicao, data_registro)
+VALUES (:1, :2, :3, SYSTIMESTAMP)
+"""
+
+# Bancos (identificar_banco) em que T_LEITURAS_ORIGEM ja foi encontrada
+_bancos_com_origem = set()
+
+
+def deduplicacao_disponivel(cursor):
+    """Indica se T_LEITURAS_ORIGEM existe no banco do cursor (a resposta positiva fica em cache)."""
+    banco = identificar_banco(cursor)
+    if banco not in _bancos_com_origem and tabela_existe(cursor, 'T_LEITURAS_ORIGEM'):
+        _bancos_com_origem.add(banco)
+    return banco in _bancos_com_origem
+
+
+def _misturar(valores):
+    """Hash splitmix64 vetorizado de um array uint64."""
+    with np.errstate(over='ignore'):
+        z = valores + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+class FiltroBloom:
+    """Filtro de Bloom de inteiros (numpy), sem remocao."""
+
+    def __init__(self, capacidade, taxa_erro=TAXA_ERRO_PADRAO):
+        self.capacidade = max(int(capacidade), 1)
+        self.bits = max(int(-self.capacidade * math.log(taxa_erro) / math.log(2) ** 2), 64)
+        self.funcoes = max(int(round(self.bits / self.capacidade * math.log(2))), 1)
+        self.quantidade = 0
+        self._mapa = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+        self._saltos = np.arange(self.funcoes, dtype=np.uint64)
+
+    def _posicoes(self, chaves):
+        """Posicoes (len(chaves) x funcoes) por hashing duplo."""
+        h1 = _misturar(np.asarray(chaves, dtype=np.int64).astype(np.uint64))
+        h2 = _misturar(h1) | np.uint64(1)
+        with np.errstate(over='ignore'):
+            return (h1[:, None] + self._saltos[None, :] * h2[:, None]) % np.uint64(self.bits)
+
+    def adicionar(self, chaves):
+        posicoes = self._posicoes(chaves).ravel()
+        np.bitwise_or.at(self._mapa, posicoes >> np.uint64(3),
+                         np.left_shift(1, posicoes & np.uint64(7)).astype(np.uint8))
+        self.quantidade += len(chaves)
+
+    def contem(self, chaves):
+        """Array booleano: True = talvez presente, False = certamente ausente."""
+        if not len(chaves):
+            return np.zeros(0, dtype=bool)
+        posicoes = self._posicoes(chaves)
+        bits = (self._mapa[posicoes >> np.uint64(3)] >> (posicoes & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    def cheio(self):
+        return self.quantidade >= self.capacidade
+
+
+class DeduplicadorLeituras:
+    """Filtros de Bloom por dispositivo sobre T_LEITURAS_ORIGEM."""
+
+    def __init__(self, capacidade=CAPACIDADE_MINIMA, taxa_erro=TAXA_ERRO_PADRAO,
+                 max_dispositivos=MAX_DISPOSITIVOS_EM_MEMORIA):
+        self.capacidade = capacidade
+        self.taxa_erro = taxa_erro
+        self.max_dispositivos = max_dispositivos
+        self._filtros = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.consultas = 0
+        self.falsos_positivos = 0
+
+    def registrar(self, cursor, origens, codigos):
+        """
+        Registra a origem (dispositivo, contador) das leituras do lote (sem commit).
+
+        codigos sao os cod_medicao reservados para as leituras. Retorna
+        {indice: erro}: LEITURA_DUPLICADA para as ja gravadas (ou repetidas
+        no lote), a mensagem do banco para outros erros. As demais leituras
+        ficam registradas e devem ser inseridas na mesma transacao.
+        """
+        recusadas = {}
+        por_dispositivo = {}
+        for indice, (dispositivo, contador) in enumerate(origens):
+            por_dispositivo.setdefault(dispositivo, []).append((indice, int(contador)))
+
+        for dispositivo, itens in por_dispositivo.items():
+            # Importacoes paralelas de dispositivos diferentes nao disputam a trava
+            with self._lock_dispositivo(dispositivo):
+                indices = np.array([indice for indice, _ in itens])
+                contadores = np.array([contador for _, contador in itens], dtype=np.int64)
+                filtros = self._obter_filtros(cursor, dispositivo)
+
+                suspeitos = np.zeros(len(contadores), dtype=bool)
+                for filtro in filtros:
+                    suspeitos |= filtro.contem(contadores)
+                if suspeitos.any():
+                    existentes = self._existentes(cursor, dispositivo, contadores[suspeitos])
+                    duplicados = suspeitos & np.isin(contadores, existentes)
+                    self.falsos_positivos += int(suspeitos.sum() - duplicados.sum())
+                    for indice in indices[duplicados]:
+                        recusadas[int(indice)] = LEITURA_DUPLICADA
+                    indices, contadores = indices[~duplicados], contadores[~duplicados]
+                if not len(indices):
+                    continue
+
+                linhas = [(dispositivo, int(contador), codigos[indice])
+                          for indice, contador in zip(indices, contadores)]
+                cursor.executemany(SQL_INSERT_ORIGEM, linhas, batcherrors=True)
+                falhas = set()
+                for erro in cursor.getbatcherrors():
+                    falhas.add(erro.offset)
+                    recusadas[int(indices[erro.offset])] = (LEITURA_DUPLICADA if violacao_unicidade(erro.message)
+                                                            else erro.message)
+                if falhas:
+                    contadores = np.delete(contadores, list(falhas))
+                self._adicionar(filtros, contadores)
+        return recusadas
+
+    def esquecer(self, cursor, origens):
+        """
+        Remove o registro de origem de leituras que nao chegaram a ser gravadas.
+
+        Os contadores continuam no filtro; sao apenas falsos positivos
+        confirmados pela consulta na proxima vez.
+        """
+        if origens:
+            cursor.executemany("DELETE FROM T_LEITURAS_ORIGEM WHERE id_dispositivo = :1 AND contador = :2",
+                               [(dispositivo, int(contador)) for dispositivo, contador in origens])
+
+    def invalidar(self):
+        """Descarta os filtros (recarregados de T_LEITURAS_ORIGEM no proximo uso)."""
+        with self._lock:
+            self._filtros = OrderedDict()
+
+    def _lock_dispositivo(self, dispositivo):
+        with self._lock:
+            return self._locks.setdefault(dispositivo, threading.Lock())
+
+    def _obter_filtros(self, cursor, dispositivo):
+        """Camadas do filtro do dispositivo, carregadas do banco no primeiro uso."""
+        with self._lock:
+            filtros = self._filtros.get(dispositivo)
+            if filtros is not None:
+                self._filtros.move_to_end(dispositivo)
+                return filtros
+
+        cursor.execute("SELECT COUNT(*) FROM T_LEITURAS_ORIGEM WHERE id_dispositivo = :1", [dispositivo])
+        total = cursor.fetchone()[0]
+        filtros = [FiltroBloom(max(self.capacidade, 2 * total), self.taxa_erro)]
+        if total:
+            # O cursor e o da sessao do chamador: o arraysize dele volta ao valor anterior
+            arraysize = cursor.arraysize
+            cursor.arraysize = TAMANHO_FETCH_CARGA
+            try:
+                cursor.execute("SELECT contador FROM T_LEITURAS_ORIGEM WHERE id_dispositivo = :1", [dispositivo])
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    filtros[0].adicionar(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+            finally:
+                cursor.arraysize = arraysize
+        with self._lock:
+            self._filtros[dispositivo] = filtros
+            while len(self._filtros) > self.max_dispositivos:
+                descartado, _ = self._filtros.popitem(last=False)
+                logger.debug(f"Filtro de duplicatas do dispositivo {descartado} descartado da memoria")
+        logger.info(f"Filtro de duplicatas do dispositivo {dispositivo}: {total} contadores carregados")
+        return filtros
+
+    def _adicionar(self, filtros, contadores):
+        """Adiciona a ultima camada; uma camada cheia ganha uma sucessora com o dobro da capacidade."""
+        while len(contadores):
+            atual = filtros[-1]
+            if atual.cheio():
+                atual = FiltroBloom(atual.capacidade * 2, self.taxa_erro / 2)
+                filtros.append(atual)
+            espaco = atual.capacidade - atual.quantidade
+            atual.adicionar(contadores[:espaco])
+            contadores = contadores[espaco:]
+
+    def _existentes(self, cursor, dispositivo, contadores):
+        """Contadores do dispositivo ja presentes em T_LEITURAS_ORIGEM (consultas pela chave primaria)."""
+        existentes = []
+        for inicio in range(0, len(contadores), TAMANHO_CONSULTA):
+            bloco = [int(contador) for contador in contadores[inicio:inicio + TAMANHO_CONSULTA]]
+            binds = ", ".join(f":c{i}" for i in range(len(bloco)))
+            cursor.execute(
+                f"SELECT contador FROM T_LEITURAS_ORIGEM WHERE id_dispositivo = :dispositivo "
+                f"AND contador IN ({binds})",
+                {'dispositivo': dispositivo, **{f"c{i}": contador for i, contador in enumerate(bloco)}}
+            )
+            existentes.extend(row[0] for row in cursor.fetchall())
+            self.consultas += 1
+        return np.array(existentes, dtype=np.int64)
+
+
+_deduplicador = None
+_lock_deduplicador = threading.Lock()
+
+
+def obter_deduplicador():
+    """Retorna o deduplicador compartilhado (por processo)."""
+    global _deduplicador
+    with _lock_deduplicador:
+        if _deduplicador is None:
+            _deduplicador = DeduplicadorLeituras()
+        return _deduplicador
@@ -0,0 +1,168 @@
+"""
+FarmTech Solutions - Estatisticas dos Sensores
+Motor de estatisticas agrupadas por grandeza
+
+Todas as estatisticas (contagem, media, minimo, maximo, desvio padrao e
+percentis) de todas as grandezas saem de uma unica consulta agrupada por
+tipo_sensor, com filtros opcionais de periodo e de cultura. O mesmo motor
+atende a opcao 4 do menu da Fase 4 e os cards do dashboard.
+
+No layout largo a consulta agrega as colunas de T_LEITURAS_ESP32 em uma
+unica varredura (uma linha por leitura), sem passar por V_MEDICOES, que
+repete cada leitura uma vez por sensor.
+
+Sem percentis, e com os rollups da migracao 5 presentes, a consulta le
+T_ROLLUP_MINUTO/HORA/DIA (farmtech_rollups) em vez das medicoes; o desvio
+padrao sai da soma dos quadrados. Percentis exigem os valores individuais
+e sempre leem as medicoes: a opcao 4 do menu e os cards do dashboard pedem
+so as estatisticas basicas, e o menu calcula os percentis apenas se o
+usuario pedir.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+from farmtech_leituras import LAYOUT_LARGO, TIPOS_SENSORES, TIPO_DISPOSITIVO_ESP32, validar_layout
+from farmtech_rollups import rollups_disponiveis, segmentos
+
+# Percentis calculados por padrao (mediana e p90)
+PERCENTIS_PADRAO = (0.5, 0.9)
+
+
+def _filtros(inicio, fim, cod_cultura, coluna_data):
+    """Monta as condicoes opcionais de periodo/cultura e os binds nomeados."""
+    condicoes = ["s.tipo_dispositivo = :tipo_dispositivo"]
+    binds = {'tipo_dispositivo': TIPO_DISPOSITIVO_ESP32}
+    if inicio is not None:
+        condicoes.append(f"{coluna_data} >= :inicio")
+        binds['inicio'] = inicio
+    if fim is not None:
+        condicoes.append(f"{coluna_data} < :fim")
+        binds['fim'] = fim
+    if cod_cultura is not None:
+        condicoes.append("s.cod_cultura = :cod_cultura")
+        binds['cod_cultura'] = cod_cultura
+    return condicoes, binds
+
+
+def _montar_resultado(linhas, percentis):
+    """Converte as linhas (tipo_sensor, total, media, min, max, desvio, percentis...) em dicionario."""
+    grandezas = {tipo: grandeza for grandeza, tipo in TIPOS_SENSORES.items()}
+    stats = {}
+    for tipo, total, media, minimo, maximo, desvio, *valores_percentis in linhas:
+        if tipo not in grandezas or not total:
+            continue
+        stats[grandezas[tipo]] = {
+            'total': total,
+            'media': round(media, 2) if media else 0,
+            'minimo': minimo if minimo else 0,
+            'maximo': maximo if maximo else 0,
+            'desvio_padrao': round(desvio, 2) if desvio else 0,
+            'percentis': {p: v for p, v in zip(percentis, valores_percentis)},
+        }
+    # Mantem a ordem de exibicao (fosforo, potassio, ph, umidade, bomba)
+    return {grandeza: stats[grandeza] for grandeza in TIPOS_SENSORES if grandeza in stats}
+
+
+def calcular_estatisticas(cursor, layout=None, inicio=None, fim=None, cod_cultura=None,
+                          percentis=PERCENTIS_PADRAO):
+    """
+    Calcula as estatisticas de cada grandeza em uma unica consulta.
+
+    inicio/fim (datetime) limitam o periodo [inicio, fim); cod_cultura
+    filtra pelos sensores da cultura. Retorna {grandeza: {'total', 'media',
+    'minimo', 'maximo', 'desvio_padrao', 'percentis': {p: valor}}}.
+    """
+    for p in percentis:
+        if not 0 <= p <= 1:
+            raise ValueError(f"Percentil invalido: {p}")
+    if not percentis and rollups_disponiveis(cursor):
+        return _estatisticas_rollups(cursor, inicio, fim, cod_cultura)
+
+    if validar_layout(layout) == LAYOUT_LARGO:
+        return _estatisticas_layout_largo(cursor, inicio, fim, cod_cultura, percentis)
+
+    condicoes, binds = _filtros(inicio, fim, cod_cultura, 'm.data_hora_medicao')
+    colunas_percentis = "".join(
+        f",\n               PERCENTILE_CONT({float(p)}) WITHIN GROUP (ORDER BY m.valor_medicao)"
+        for p in percentis
+    )
+
+    cursor.execute(f"""
+        SELECT s.tipo_sensor, COUNT(*), AVG(m.valor_medicao), MIN(m.valor_medicao),
+               MAX(m.valor_medicao), STDDEV(m.valor_medicao){colunas_percentis}
+        FROM T_MEDICOES m
+        JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+        WHERE {' AND '.join(condicoes)}
+        GROUP BY s.tipo_sensor
+    """, binds)
+    return _montar_resultado(cursor.fetchall(), percentis)
+
+
+def _estatisticas_layout_largo(cursor, inicio, fim, cod_cultura, percentis):
+    """Mesmas estatisticas do layout largo: uma unica varredura de T_LEITURAS_ESP32."""
+    condicoes, binds = [], {}
+    if inicio is not None:
+        condicoes.append("l.data_hora_leitura >= :inicio")
+        binds['inicio'] = inicio
+    if fim is not None:
+        condicoes.append("l.data_hora_leitura < :fim")
+        binds['fim'] = fim
+    if cod_cultura is not None:
+        # A leitura pertence aos sensores do seu dispositivo (como em V_MEDICOES)
+        condicoes.append("""EXISTS (SELECT 1 FROM T_SENSORES s
+                       WHERE s.tipo_dispositivo = :tipo_dispositivo AND s.cod_dispositivo = l.cod_dispositivo
+                         AND s.cod_cultura = :cod_cultura)""")
+        binds.update(tipo_dispositivo=TIPO_DISPOSITIVO_ESP32, cod_cultura=cod_cultura)
+    where = f"\n        WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+    agregados = []
+    for grandeza in TIPOS_SENSORES:
+        coluna = f"l.{grandeza}"
+        agregados.append(f"COUNT({coluna}), AVG({coluna}), MIN({coluna}), MAX({coluna}), STDDEV({coluna})")
+        agregados.extend(f"PERCENTILE_CONT({float(p)}) WITHIN GROUP (ORDER BY {coluna})" for p in percentis)
+
+    colunas = ",\n               ".join(agregados)
+
+    cursor.execute(f"""
+        SELECT {colunas}
+        FROM T_LEITURAS_ESP32 l{where}
+    """, binds)
+    resultado = cursor.fetchone()
+
+    # Uma fatia de colunas por grandeza, no formato das linhas agrupadas por tipo_sensor
+    largura = 5 + len(percentis)
+    linhas = [
+        (tipo, *resultado[i * largura:(i + 1) * largura])
+        for i, tipo in enumerate(TIPOS_SENSORES.values())
+    ] if resultado else []
+    return _montar_resultado(linhas, percentis)
+
+
+def _estatisticas_rollups(cursor, inicio, fim, cod_cultura):
+    """Mesmas estatisticas (sem percentis) somando as linhas de rollup do periodo."""
+    condicoes, binds = _filtros(None, None, cod_cultura, None)
+    partes = []
+    for i, (tabela, inicio_segmento, fim_segmento) in enumerate(segmentos(inicio, fim)):
+        limites = []
+        if inicio_segmento is not None:
+            limites.append(f"inicio_periodo >= :inicio{i}")
+            binds[f'inicio{i}'] = inicio_segmento
+        if fim_segmento is not None:
+            limites.append(f"inicio_periodo < :fim{i}")
+            binds[f'fim{i}'] = fim_segmento
+        where = f" WHERE {' AND '.join(limites)}" if limites else ""
+        partes.append(f"SELECT cod_sensor, quantidade, soma, soma_quadrados, minimo, maximo FROM {tabela}{where}")
+    uniao = "\n            UNION ALL ".join(partes)
+
+    cursor.execute(f"""
+        SELECT s.tipo_sensor, SUM(r.quantidade), SUM(r.soma) / SUM(r.quantidade), MIN(r.minimo),
+               MAX(r.maximo),
+               SQRT(GREATEST(SUM(r.soma_quadrados) - POWER(SUM(r.soma), 2) / SUM(r.quantidade), 0)
+                    / NULLIF(SUM(r.quantidade) - 1, 0))
+        FROM ({uniao}) r
+        JOIN T_SENSORES s ON r.cod_sensor = s.cod_sensor
+        WHERE {' AND '.join(condicoes)}
+        GROUP BY s.tipo_sensor
+    """, binds)
+    return _montar_resultado(cursor.fetchall(), ())
@@ -0,0 +1,377 @@
+"""
+FarmTech Solutions - Exportacao das Leituras
+Exportacao em streaming, comprimida e incremental
+
+As leituras ESP32 sao exportadas ja pivotadas (uma linha por leitura,
+colunas de COLUNAS_LEITURA) direto do cursor para o arquivo: o cursor
+busca lotes de tamanho_lote linhas (arraysize/prefetchrows ajustados) e
+cada lote e escrito e descartado, de modo que a memoria nao cresce com o
+tamanho da tabela. A saida pode ser comprimida com gzip ou zstd
+(pacote opcional zstandard).
+
+Exportacao incremental: a marca d'agua (arquivo JSON) guarda o instante
+e o codigo da ultima leitura exportada, na ordem da consulta (instante,
+codigo); a proxima execucao exporta so as leituras depois desse par e
+atualiza a marca ao terminar. O codigo sozinho nao serve de marca: os
+codigos sao reservados em blocos por processo (farmtech_chaves), entao
+uma leitura de um bloco antigo pode ser confirmada depois de outra de
+codigo maior. A exportacao incremental para ATRASO_MARCA (5 min,
+FARMTECH_EXPORTACAO_ATRASO_SEG ou --atraso) antes do momento atual: uma
+leitura confirmada ate esse tempo depois do seu instante sempre entra na
+exportacao seguinte. Leituras gravadas com atraso maior (ex.: spool
+drenado depois de uma queda longa) ficam antes da marca: reexporte o
+periodo em uma exportacao avulsa, sem --marca, com --desde/--ate (as
+duas opcoes nao se combinam com --marca).
+
+O arquivo CSV e escrito em um temporario ao lado do destino e so
+substitui o destino (os.replace) depois de completo; no Parquet os
+arquivos sao escritos em um subdiretorio oculto do dataset e movidos
+para as particoes ao final. Uma exportacao que falha nao deixa arquivo
+parcial nem avanca a marca.
+
+Para analise e ML as leituras tambem podem ser exportadas como dataset
+Parquet (pacote opcional pyarrow), particionado por data e cultura no
+formato hive (data=2025-06-01/cod_cultura=1/...); a cultura de cada
+leitura e a dos sensores do dispositivo que a fez. O banco entrega lotes
+direto em formato Arrow (fetch_df_batches), sem tuplas Python, e as
+colunas sao gravadas com tipos compactos (int8 para os sinais 0/1,
+float32 para pH e umidade). Cada exportacao acrescenta arquivos novos ao
+dataset, entao a marca d'agua funciona do mesmo jeito.
+
+Uso:
+    python farmtech_exportacao.py csv --saida medicoes.csv.gz
+    python farmtech_exportacao.py csv --saida noite.csv.zst --marca exportacao.json [--atraso 600]
+    python farmtech_exportacao.py csv --saida junho.csv --desde 2025-06-01 --ate 2025-07-01
+    python farmtech_exportacao.py parquet --saida dataset_esp32 --marca parquet.json
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import io
+import os
+import csv
+import gzip
+import json
+import time
+import uuid
+import shutil
+import logging
+import argparse
+from datetime import datetime, timedelta
+from farmtech_leituras import COLUNAS_LEITURA, LAYOUTS, sql_leituras
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Linhas por ida ao banco (arraysize) e por escrita no arquivo
+TAMANHO_LOTE_PADRAO = 10000
+
+# Margem da exportacao incremental: leituras com instante mais recente ficam para a proxima
+ATRASO_MARCA = timedelta(seconds=int(os.environ.get('FARMTECH_EXPORTACAO_ATRASO_SEG', 300)))
+
+COMPRESSOES = ('gzip', 'zstd', 'nenhuma')
+EXTENSOES_COMPRESSAO = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def compressao_do_arquivo(caminho):
+    """Compressao indicada pela extensao do arquivo (.gz, .zst; demais sem compressao)."""
+    return EXTENSOES_COMPRESSAO.get(os.path.splitext(caminho)[1].lower(), 'nenhuma')
+
+
+def abrir_saida(caminho, compressao):
+    """Abre o arquivo de saida em modo texto, comprimindo conforme compressao."""
+    if compressao == 'gzip':
+        return gzip.open(caminho, 'wt', newline='', compresslevel=6)
+    if compressao == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Compressao zstd requer o pacote zstandard (pip install zstandard)")
+        binario = zstandard.ZstdCompressor(level=3).stream_writer(open(caminho, 'wb'))
+        return io.TextIOWrapper(binario, newline='')
+    if compressao == 'nenhuma':
+        return open(caminho, 'w', newline='')
+    raise ValueError(f"Compressao invalida: {compressao}")
+
+
+def ler_marca(caminho):
+    """(instante, codigo) da ultima leitura exportada segundo a marca d'agua (None se ainda nao existe)."""
+    if not caminho or not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r') as arquivo:
+        marca = json.load(arquivo)
+    return datetime.fromisoformat(marca['data_hora']), marca['cod']
+
+
+def gravar_marca(caminho, marca):
+    """Grava a marca d'agua (instante, codigo) de forma atomica (arquivo temporario + rename)."""
+    if marca is None:
+        return
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w') as arquivo:
+        json.dump({'data_hora': marca[0].isoformat(), 'cod': marca[1],
+                   'data_exportacao': datetime.now().isoformat()}, arquivo)
+    os.replace(temporario, caminho)
+
+
+def _filtros(inicio, fim, desde):
+    """(filtros de sql_leituras, binds) do periodo [inicio, fim) e da marca desde = (instante, codigo)."""
+    binds = {nome: valor for nome, valor in (('inicio', inicio), ('fim', fim)) if valor is not None}
+    filtros = list(binds)
+    if desde is not None:
+        filtros.append('desde_marca')
+        binds['marca_data'], binds['marca_cod'] = desde
+    return tuple(filtros), binds
+
+
+def exportar_leituras(cursor, caminho, layout=None, inicio=None, fim=None, desde=None,
+                      compressao=None, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exporta as leituras para CSV em streaming.
+
+    inicio/fim (datetime) limitam o periodo [inicio, fim) e desde
+    ((instante, codigo), ver ler_marca) exporta so as leituras seguintes
+    na ordem (instante, codigo). compressao None usa a extensao do
+    arquivo. Retorna {'linhas', 'marca', 'segundos'}; marca e o par da
+    ultima leitura exportada (ou desde se nada foi exportado).
+    """
+    filtros, binds = _filtros(inicio, fim, desde)
+    compressao = compressao or compressao_do_arquivo(caminho)
+
+    cursor.arraysize = tamanho_lote
+    cursor.prefetchrows = tamanho_lote + 1
+    cursor.execute(sql_leituras(layout, filtros=filtros), binds)
+
+    inicio_exportacao = time.perf_counter()
+    linhas = 0
+    marca = desde
+    temporario = f"{caminho}.tmp"
+    try:
+        with abrir_saida(temporario, compressao) as arquivo:
+            writer = csv.writer(arquivo)
+            writer.writerow(COLUNAS_LEITURA)
+            while True:
+                lote = cursor.fetchmany()
+                if not lote:
+                    break
+                writer.writerows(
+                    (cod, instante.isoformat(sep=' ', timespec='seconds'), *valores)
+                    for cod, instante, *valores in lote
+                )
+                # Linhas em ordem (instante, codigo): a ultima do lote e a mais adiantada
+                marca = (lote[-1][1], lote[-1][0])
+                linhas += len(lote)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    segundos = time.perf_counter() - inicio_exportacao
+    logger.info(f"{linhas} leituras exportadas para {caminho} ({compressao}) em {segundos:.2f}s")
+    return {'linhas': linhas, 'marca': marca, 'segundos': segundos}
+
+
+# --- DATASET PARQUET ---
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise RuntimeError("Exportacao Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+
+def esquema_parquet():
+    """Esquema das leituras no dataset Parquet (colunas de COLUNAS_LEITURA + particoes)."""
+    _exigir_pyarrow()
+    return pa.schema([
+        ('cod_medicao', pa.int64()),
+        ('timestamp', pa.timestamp('ms')),
+        ('fosforo', pa.int8()),
+        ('potassio', pa.int8()),
+        ('ph', pa.float32()),
+        ('umidade', pa.float32()),
+        ('bomba_ativa', pa.int8()),
+        ('data', pa.date32()),
+        ('cod_cultura', pa.int32()),
+    ])
+
+
+def particionamento():
+    """Particionamento hive do dataset: data/cod_cultura."""
+    _exigir_pyarrow()
+    esquema = esquema_parquet()
+    return ds.partitioning(pa.schema([esquema.field('data'), esquema.field('cod_cultura')]), flavor='hive')
+
+
+def abrir_dataset(diretorio):
+    """Abre o dataset Parquet exportado (filtros por data/cultura podam as particoes)."""
+    _exigir_pyarrow()
+    return ds.dataset(diretorio, format='parquet', partitioning=particionamento())
+
+
+def _tabela_parquet(lote):
+    """Converte um lote Arrow do banco para o esquema do dataset (tipos compactos + particoes)."""
+    esquema = esquema_parquet()
+    lote = lote.rename_columns(COLUNAS_LEITURA + ['cod_cultura'])
+    # Instantes com microssegundos sao truncados para milissegundos
+    colunas = [pc.cast(lote[nome], esquema.field(nome).type, safe=nome != 'timestamp')
+               for nome in COLUNAS_LEITURA]
+    data = pc.cast(colunas[COLUNAS_LEITURA.index('timestamp')], pa.date32())
+    cultura = pc.cast(lote['cod_cultura'], pa.int32())
+    return pa.Table.from_arrays(colunas + [data, cultura], schema=esquema)
+
+
+def exportar_parquet(conn, diretorio, layout=None, inicio=None, fim=None, desde=None,
+                     tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Exporta as leituras para o dataset Parquet em diretorio, em streaming.
+
+    Mesmos filtros de exportar_leituras. Os arquivos novos recebem um
+    nome unico por exportacao, sem sobrescrever os existentes.
+    Retorna {'linhas', 'marca', 'segundos'}.
+    """
+    _exigir_pyarrow()
+    filtros, binds = _filtros(inicio, fim, desde)
+    inicio_exportacao = time.perf_counter()
+    estado = {'linhas': 0, 'marca': desde}
+
+    def lotes():
+        # cod_cultura de cada leitura (os dispositivos podem ser de culturas diferentes)
+        sql = sql_leituras(layout, filtros=filtros, cultura=True)
+        for lote in conn.fetch_df_batches(sql, binds, size=tamanho_lote):
+            lote = pa.table(lote)
+            if lote.num_rows:
+                estado['linhas'] += lote.num_rows
+                # Instante exato do banco (no dataset ele e truncado para milissegundos)
+                estado['marca'] = (lote.column(1)[-1].as_py(), lote.column(0)[-1].as_py())
+            yield from _tabela_parquet(lote).to_batches()
+
+    # Diretorio iniciado por '_' e ignorado pela leitura do dataset (abrir_dataset)
+    temporario = os.path.join(diretorio, f"_exportacao-{uuid.uuid4().hex}")
+    try:
+        ds.write_dataset(
+            lotes(), temporario, schema=esquema_parquet(), format='parquet',
+            partitioning=particionamento(),
+            basename_template=f"leituras-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+        )
+        _mover_arquivos(temporario, diretorio)
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+    segundos = time.perf_counter() - inicio_exportacao
+    logger.info(f"{estado['linhas']} leituras exportadas para o dataset {diretorio} em {segundos:.2f}s")
+    return dict(estado, segundos=segundos)
+
+
+def _mover_arquivos(origem, destino):
+    """Move os arquivos de origem para os mesmos caminhos relativos em destino (os.replace)."""
+    for raiz, _, arquivos in os.walk(origem):
+        relativo = os.path.relpath(raiz, origem)
+        for nome in arquivos:
+            pasta = os.path.normpath(os.path.join(destino, relativo))
+            os.makedirs(pasta, exist_ok=True)
+            os.replace(os.path.join(raiz, nome), os.path.join(pasta, nome))
+
+
+def exportar_incremental(manager, caminho, marca, fim=None, compressao=None,
+                         tamanho_lote=TAMANHO_LOTE_PADRAO, formato='csv', atraso=ATRASO_MARCA):
+    """
+    Exporta so as leituras novas desde a marca d'agua e avanca a marca.
+
+    So entram leituras com instante ate atraso antes de agora (ou antes de
+    fim, se for anterior), para que gravacoes ainda em andamento nao fiquem
+    atras da marca. A marca so e gravada depois que o arquivo foi escrito
+    por completo: uma exportacao interrompida e refeita inteira na proxima
+    execucao. formato 'parquet' acrescenta as leituras ao dataset em caminho.
+    """
+    limite = datetime.now() - atraso
+    fim = min(fim, limite) if fim is not None else limite
+    if not manager.connect():
+        return None
+    try:
+        if formato == 'parquet':
+            resultado = exportar_parquet(manager.conn, caminho, manager.layout, fim=fim,
+                                         desde=ler_marca(marca), tamanho_lote=tamanho_lote)
+        else:
+            resultado = exportar_leituras(manager.cursor, caminho, manager.layout, fim=fim,
+                                          desde=ler_marca(marca), compressao=compressao,
+                                          tamanho_lote=tamanho_lote)
+        gravar_marca(marca, resultado['marca'])
+        return resultado
+    finally:
+        manager.disconnect()
+
+
+def main():
+    """Interface de linha de comando da exportacao."""
+    # Importado aqui: farmtech_database usa este modulo em exportar_para_csv
+    from farmtech_database import FarmTechOracleManager
+
+    def data(texto):
+        return datetime.strptime(texto, '%Y-%m-%d')
+
+    parser = argparse.ArgumentParser(description="Exportacao das leituras ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_csv = subparsers.add_parser('csv', help="Exporta as leituras em CSV (opcionalmente comprimido)")
+    p_csv.add_argument('--saida', required=True, help="Arquivo de saida (.csv, .csv.gz, .csv.zst)")
+    p_csv.add_argument('--compressao', choices=COMPRESSOES, help="Padrao: pela extensao da saida")
+    p_csv.add_argument('--desde', type=data, help="Primeiro dia (AAAA-MM-DD)")
+    p_csv.add_argument('--ate', type=data, help="Dia final, exclusivo (AAAA-MM-DD)")
+    p_csv.add_argument('--marca', help="Marca d'agua JSON para exportacao incremental")
+    p_csv.add_argument('--atraso', type=int, default=int(ATRASO_MARCA.total_seconds()),
+                         help="Com --marca: segundos mais recentes deixados para a proxima exportacao")
+    p_csv.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO)
+    p_csv.add_argument('--layout', choices=LAYOUTS)
+    p_parquet = subparsers.add_parser('parquet', help="Exporta as leituras para um dataset Parquet")
+    p_parquet.add_argument('--saida', required=True, help="Diretorio do dataset")
+    p_parquet.add_argument('--desde', type=data, help="Primeiro dia (AAAA-MM-DD)")
+    p_parquet.add_argument('--ate', type=data, help="Dia final, exclusivo (AAAA-MM-DD)")
+    p_parquet.add_argument('--marca', help="Marca d'agua JSON para exportacao incremental")
+    p_parquet.add_argument('--atraso', type=int, default=int(ATRASO_MARCA.total_seconds()),
+                         help="Com --marca: segundos mais recentes deixados para a proxima exportacao")
+    p_parquet.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO)
+    p_parquet.add_argument('--layout', choices=LAYOUTS)
+
+    args = parser.parse_args()
+    if args.marca and args.desde:
+        # As leituras depois da marca ja sao o inicio do periodo; leituras atrasadas
+        # (antes da marca) sao reexportadas em uma exportacao avulsa, sem --marca
+        parser.error("--desde nao se combina com --marca (reexporte o periodo sem --marca)")
+    manager = FarmTechOracleManager(layout=args.layout)
+
+    if args.marca:
+        resultado = exportar_incremental(manager, args.saida, args.marca, fim=args.ate,
+                                         compressao=getattr(args, 'compressao', None),
+                                         tamanho_lote=args.lote, formato=args.comando,
+                                         atraso=timedelta(seconds=args.atraso))
+    else:
+        if not manager.connect():
+            return
+        try:
+            if args.comando == 'parquet':
+                resultado = exportar_parquet(manager.conn, args.saida, manager.layout,
+                                             inicio=args.desde, fim=args.ate, tamanho_lote=args.lote)
+            else:
+                resultado = exportar_leituras(manager.cursor, args.saida, manager.layout,
+                                              inicio=args.desde, fim=args.ate,
+                                              compressao=args.compressao, tamanho_lote=args.lote)
+        finally:
+            manager.disconnect()
+    if resultado:
+        marca = resultado['marca']
+        print(f"{resultado['linhas']} leituras exportadas para {args.saida} em {resultado['segundos']:.2f}s"
+              + (f" (ultima leitura: {marca[0]}, codigo {marca[1]})" if marca else ""))
+
+
+if __name__ == "__main__":
+    main()
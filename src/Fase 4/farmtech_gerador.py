@@ -0,0 +1,346 @@
+"""
+FarmTech Solutions - Gerador de Dados Sinteticos
+Leituras rotuladas do ESP32 em escala, com os cenarios do firmware
+
+Reproduz em bloco (numpy) a simulacao de main.cpp: os seis cenarios de
+simularCenario (nutrientes, umidade e pH de cada um) e a decisao da bomba
+de analisarDadosEControlarBomba:
+
+- umidade < 30% liga a bomba; acima de 70% ou entre os limites, desliga;
+- pH fora de 6.0-8.0 bloqueia a irrigacao;
+- sem nutrientes, ou com um so deles, a bomba e forcada a ligar.
+
+Cada dispositivo gera contadores 1..N, um a cada --intervalo segundos
+(INTERVALO_LEITURA do firmware, 3 s). No modo ciclo os cenarios se
+alternam a cada leitura, como no firmware (cada placa comeca em um
+cenario sorteado); no modo aleatorio sao sorteados. Sobre o valor do
+cenario:
+
+- ruido: desvio padrao gaussiano como fracao da faixa do sensor (0.05 =
+  5 pontos de umidade, 0.7 de pH);
+- deriva: desvio de calibracao por dia, como fracao da faixa, com
+  sentido sorteado por dispositivo.
+
+Os valores sao limitados a faixa fisica e arredondados como o firmware
+imprime (pH com 2 casas, umidade com 1). A bomba e decidida sobre os
+valores resultantes, entao o rotulo segue a regra do firmware.
+
+Saidas:
+
+- csv: frame CSV do firmware (exibirDadosCSV), um arquivo por
+  dispositivo (<dispositivo>.csv, importavel por farmtech_importacao) ou
+  um unico arquivo quando ha um dispositivo e o destino termina em .csv;
+  as linhas sao formatadas em uma matriz de bytes, sem Python por linha;
+- parquet: dataset no esquema de farmtech_exportacao (pacote opcional
+  pyarrow), utilizavel no treino com FARMTECH_DATASET;
+- banco: gravacao bulk (gravar_leituras) com a origem (dispositivo,
+  contador) de cada leitura, nos sensores de cada dispositivo
+  (provisionados antes da gravacao).
+
+Uso:
+    python farmtech_gerador.py csv capturas/ --leituras 1000000 --dispositivos 8 --ruido 0.03
+    python farmtech_gerador.py csv sintetico.csv --leituras 100000 --modo aleatorio
+    python farmtech_gerador.py parquet dataset_sintetico --leituras 5000000 --deriva 0.01
+    python farmtech_gerador.py banco --leituras 200000 --dispositivos 2 [--layout largo]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import time
+import uuid
+import logging
+import argparse
+from datetime import datetime
+import numpy as np
+from farmtech_leituras import CENARIOS, FAIXAS_VALIDAS, INTERVALO_LEITURA, decidir_bomba
+from farmtech_dedup import LEITURA_DUPLICADA
+from farmtech_logs import configurar_logs
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_PADRAO = INTERVALO_LEITURA
+MODOS = ('ciclo', 'aleatorio')
+PREFIXO_PADRAO = 'esp32-'
+
+# Leituras geradas por vez (por dispositivo)
+TAMANHO_BLOCO = 500000
+
+CABECALHO_CSV = b'timestamp,fosforo,potassio,ph,umidade,bomba_status\n'
+
+_TABELA_CENARIOS = np.array([cenario[1:] for cenario in CENARIOS], dtype=np.float64)
+
+
+def ids_dispositivos(quantidade, prefixo=PREFIXO_PADRAO):
+    """Ids dos dispositivos simulados (esp32-01, esp32-02, ...)."""
+    largura = max(2, len(str(quantidade)))
+    return [f"{prefixo}{i:0{largura}d}" for i in range(1, quantidade + 1)]
+
+
+def gerar_leituras(leituras, dispositivos=1, intervalo=INTERVALO_PADRAO, ruido=0.0, deriva=0.0, modo='ciclo',
+                   inicio=None, semente=None, prefixo=PREFIXO_PADRAO, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera (dispositivo, bloco) com leituras rotuladas de cada dispositivo.
+
+    leituras: leituras por dispositivo. bloco: dict de arrays 'contador',
+    'instante' (datetime64[ms]), 'cenario' (indice em CENARIOS), 'fosforo',
+    'potassio', 'ph', 'umidade' e 'bomba'.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo invalido: {modo} (use {', '.join(MODOS)})")
+    if intervalo <= 0:
+        raise ValueError(f"Intervalo invalido: {intervalo}")
+    gerador = np.random.default_rng(semente)
+    inicio = np.datetime64(inicio or datetime.now().replace(microsecond=0), 'ms')
+    passo_ms = int(round(intervalo * 1000))
+    amplitude_ph = FAIXAS_VALIDAS['ph'][1] - FAIXAS_VALIDAS['ph'][0]
+    amplitude_umidade = FAIXAS_VALIDAS['umidade'][1] - FAIXAS_VALIDAS['umidade'][0]
+
+    for dispositivo in ids_dispositivos(dispositivos, prefixo):
+        primeiro_cenario = gerador.integers(len(CENARIOS))
+        sentido = gerador.choice((-1.0, 1.0))
+        for comeco in range(0, leituras, tamanho_bloco):
+            n = min(tamanho_bloco, leituras - comeco)
+            contador = np.arange(comeco + 1, comeco + n + 1, dtype=np.int64)
+            if modo == 'ciclo':
+                cenario = ((contador - 1 + primeiro_cenario) % len(CENARIOS)).astype(np.int8)
+            else:
+                cenario = gerador.integers(0, len(CENARIOS), n, dtype=np.int8)
+            fosforo, potassio, umidade, ph = _TABELA_CENARIOS[cenario].T
+
+            if ruido:
+                umidade = umidade + gerador.normal(0.0, ruido * amplitude_umidade, n)
+                ph = ph + gerador.normal(0.0, ruido * amplitude_ph, n)
+            if deriva:
+                dias = (contador - 1) * (intervalo / 86400)
+                umidade = umidade + sentido * deriva * amplitude_umidade * dias
+                ph = ph + sentido * deriva * amplitude_ph * dias
+            umidade = np.round(np.clip(umidade, *FAIXAS_VALIDAS['umidade']), 1)
+            ph = np.round(np.clip(ph, *FAIXAS_VALIDAS['ph']), 2)
+            fosforo = fosforo.astype(np.int8)
+            potassio = potassio.astype(np.int8)
+
+            yield dispositivo, {
+                'contador': contador,
+                'instante': inicio + (contador - 1) * np.timedelta64(passo_ms, 'ms'),
+                'cenario': cenario,
+                'fosforo': fosforo,
+                'potassio': potassio,
+                'ph': ph,
+                'umidade': umidade,
+                'bomba': decidir_bomba(fosforo, potassio, ph, umidade),
+            }
+
+
+# --- CSV ---
+
+def _tabela_textos(textos, largura):
+    """Matriz de bytes dos textos alinhados a direita (0 marca o enchimento descartado)."""
+    return np.frombuffer(b''.join(texto.encode().rjust(largura, b'\0') for texto in textos),
+                         dtype=np.uint8).reshape(len(textos), largura)
+
+
+_TEXTOS_PH = _tabela_textos([f"{i / 100:.2f}" for i in range(1401)], 5)
+_TEXTOS_UMIDADE = _tabela_textos([f"{i / 10:.1f}" for i in range(1001)], 5)
+
+
+def formatar_csv(bloco):
+    """
+    Linhas do frame CSV do firmware (contador,fosforo,potassio,ph,umidade,bomba) em bytes.
+
+    Cada linha e montada em uma linha de uma matriz uint8 de largura fixa;
+    o enchimento (0) e descartado no final.
+    """
+    contador = bloco['contador']
+    n = len(contador)
+    if not n:
+        return b''
+    digitos = len(str(int(contador.max())))
+    matriz = np.zeros((n, digitos + 19), dtype=np.uint8)
+    for k in range(digitos):
+        base = 10 ** (digitos - 1 - k)
+        coluna = contador // base % 10 + ord('0')
+        matriz[:, k] = np.where(contador >= base, coluna, 0) if k < digitos - 1 else coluna
+
+    virgula = ord(',')
+    pos = digitos
+    matriz[:, pos] = virgula
+    matriz[:, pos + 1] = bloco['fosforo'] + ord('0')
+    matriz[:, pos + 2] = virgula
+    matriz[:, pos + 3] = bloco['potassio'] + ord('0')
+    matriz[:, pos + 4] = virgula
+    matriz[:, pos + 5:pos + 10] = _TEXTOS_PH[np.rint(bloco['ph'] * 100).astype(np.intp)]
+    matriz[:, pos + 10] = virgula
+    matriz[:, pos + 11:pos + 16] = _TEXTOS_UMIDADE[np.rint(bloco['umidade'] * 10).astype(np.intp)]
+    matriz[:, pos + 16] = virgula
+    matriz[:, pos + 17] = bloco['bomba'] + ord('0')
+    matriz[:, pos + 18] = ord('\n')
+    return matriz[matriz != 0].tobytes()
+
+
+def gerar_csv(destino, leituras, dispositivos=1, **opcoes):
+    """
+    Grava as leituras em CSV e retorna o resumo {'leituras', 'arquivos', 'segundos', 'leituras_seg'}.
+
+    destino: arquivo .csv (um dispositivo) ou diretorio com um <dispositivo>.csv por dispositivo.
+    """
+    arquivo_unico = dispositivos == 1 and destino.endswith('.csv')
+    if not arquivo_unico:
+        os.makedirs(destino, exist_ok=True)
+    inicio = time.perf_counter()
+    arquivos, total = [], 0
+    saida, atual = None, None
+    try:
+        for dispositivo, bloco in gerar_leituras(leituras, dispositivos, **opcoes):
+            if dispositivo != atual:
+                if saida:
+                    saida.close()
+                caminho = destino if arquivo_unico else os.path.join(destino, f"{dispositivo}.csv")
+                saida = open(caminho, 'wb')
+                saida.write(CABECALHO_CSV)
+                arquivos.append(caminho)
+                atual = dispositivo
+            saida.write(formatar_csv(bloco))
+            total += len(bloco['contador'])
+    finally:
+        if saida:
+            saida.close()
+    return _resumo(total, inicio, arquivos=arquivos)
+
+
+# --- PARQUET ---
+
+def gerar_parquet(diretorio, leituras, dispositivos=1, cod_cultura=1, **opcoes):
+    """Grava as leituras no dataset Parquet de farmtech_exportacao (particoes data/cod_cultura)."""
+    # Importado aqui: farmtech_exportacao so e necessario para esta saida
+    from farmtech_exportacao import esquema_parquet, particionamento
+
+    esquema = esquema_parquet()
+    inicio = time.perf_counter()
+    estado = {'leituras': 0}
+
+    def lotes():
+        for _, bloco in gerar_leituras(leituras, dispositivos, **opcoes):
+            n = len(bloco['contador'])
+            codigos = np.arange(estado['leituras'] + 1, estado['leituras'] + n + 1, dtype=np.int64)
+            estado['leituras'] += n
+            instantes = pa.array(bloco['instante'], pa.timestamp('ms'))
+            tabela = pa.Table.from_arrays([
+                pa.array(codigos),
+                instantes,
+                pa.array(bloco['fosforo']),
+                pa.array(bloco['potassio']),
+                pa.array(bloco['ph'].astype(np.float32)),
+                pa.array(bloco['umidade'].astype(np.float32)),
+                pa.array(bloco['bomba']),
+                instantes.cast(pa.date32()),
+                pa.array(np.full(n, cod_cultura, dtype=np.int32)),
+            ], schema=esquema)
+            yield from tabela.to_batches()
+
+    ds.write_dataset(
+        lotes(), diretorio, schema=esquema, format='parquet', partitioning=particionamento(),
+        basename_template=f"sintetico-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+    )
+    return _resumo(estado['leituras'], inicio, diretorio=diretorio)
+
+
+# --- BANCO ---
+
+def gerar_no_banco(manager, leituras, dispositivos=1, tamanho_lote=5000, **opcoes):
+    """
+    Grava as leituras com manager.gravar_leituras em lotes de tamanho_lote.
+
+    A origem (dispositivo, contador) acompanha cada leitura: gerar de novo
+    com a mesma semente nao duplica leituras (farmtech_dedup).
+    """
+    if manager.provisionar_dispositivos(ids_dispositivos(dispositivos, opcoes.get('prefixo', PREFIXO_PADRAO))) is None:
+        raise RuntimeError("Falha ao provisionar os dispositivos simulados")
+    inicio = time.perf_counter()
+    gravadas = duplicadas = recusadas = 0
+    for dispositivo, bloco in gerar_leituras(leituras, dispositivos, **opcoes):
+        colunas = [bloco[nome].tolist() for nome in ('fosforo', 'potassio', 'ph', 'umidade', 'bomba')]
+        tuplas = list(zip(*colunas))
+        instantes = bloco['instante'].astype('datetime64[us]').tolist()
+        contadores = bloco['contador'].tolist()
+        for comeco in range(0, len(tuplas), tamanho_lote):
+            fim = comeco + tamanho_lote
+            erros = manager.gravar_leituras(tuplas[comeco:fim], instantes[comeco:fim],
+                                            [(dispositivo, contador) for contador in contadores[comeco:fim]])
+            if erros is None:
+                raise RuntimeError("Banco indisponivel: geracao interrompida")
+            repetidas = sum(1 for erro in erros.values() if erro == LEITURA_DUPLICADA)
+            duplicadas += repetidas
+            recusadas += len(erros) - repetidas
+            gravadas += len(tuplas[comeco:fim]) - len(erros)
+    return _resumo(gravadas + duplicadas + recusadas, inicio, gravadas=gravadas, duplicadas=duplicadas,
+                   recusadas=recusadas)
+
+
+def _resumo(leituras, inicio, **extras):
+    segundos = time.perf_counter() - inicio
+    return {'leituras': leituras, 'segundos': segundos,
+            'leituras_seg': leituras / segundos if segundos > 0 else 0.0, **extras}
+
+
+def main():
+    """Interface de linha de comando do gerador."""
+    configurar_logs(arquivo=None)
+    comuns = argparse.ArgumentParser(add_help=False)
+    comuns.add_argument('--leituras', type=int, default=100000, help="Leituras por dispositivo")
+    comuns.add_argument('--dispositivos', type=int, default=1)
+    comuns.add_argument('--intervalo', type=float, default=INTERVALO_PADRAO, help="Segundos entre leituras")
+    comuns.add_argument('--ruido', type=float, default=0.0, help="Desvio padrao (fracao da faixa do sensor)")
+    comuns.add_argument('--deriva', type=float, default=0.0, help="Deriva por dia (fracao da faixa do sensor)")
+    comuns.add_argument('--modo', choices=MODOS, default='ciclo')
+    comuns.add_argument('--inicio', type=datetime.fromisoformat, help="Instante da primeira leitura (ISO)")
+    comuns.add_argument('--semente', type=int)
+    comuns.add_argument('--prefixo', default=PREFIXO_PADRAO, help="Prefixo dos ids dos dispositivos")
+
+    parser = argparse.ArgumentParser(description="Gerador de leituras sinteticas do ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_csv = subparsers.add_parser('csv', parents=[comuns], help="Frame CSV do firmware")
+    p_csv.add_argument('destino', help="Arquivo .csv (um dispositivo) ou diretorio")
+    p_parquet = subparsers.add_parser('parquet', parents=[comuns], help="Dataset Parquet (pyarrow)")
+    p_parquet.add_argument('destino', help="Diretorio do dataset")
+    p_parquet.add_argument('--cultura', type=int, default=1, help="cod_cultura da particao")
+    p_banco = subparsers.add_parser('banco', parents=[comuns], help="Gravacao bulk no banco")
+    p_banco.add_argument('--layout', choices=['eav', 'largo'])
+    p_banco.add_argument('--lote', type=int, default=5000, help="Leituras por executemany")
+
+    args = parser.parse_args()
+    opcoes = {'intervalo': args.intervalo, 'ruido': args.ruido, 'deriva': args.deriva, 'modo': args.modo,
+              'inicio': args.inicio, 'semente': args.semente, 'prefixo': args.prefixo}
+
+    if args.comando == 'csv':
+        resumo = gerar_csv(args.destino, args.leituras, args.dispositivos, **opcoes)
+        destino = f"{len(resumo['arquivos'])} arquivo(s) em {args.destino}"
+    elif args.comando == 'parquet':
+        if pa is None:
+            print("Saida Parquet requer o pacote pyarrow (pip install pyarrow)")
+            return
+        resumo = gerar_parquet(args.destino, args.leituras, args.dispositivos, args.cultura, **opcoes)
+        destino = f"dataset {args.destino}"
+    else:
+        from farmtech_database import FarmTechOracleManager
+
+        manager = FarmTechOracleManager(layout=args.layout)
+        resumo = gerar_no_banco(manager, args.leituras, args.dispositivos, args.lote, **opcoes)
+        destino = (f"{manager.backend} ({resumo['gravadas']} gravadas, {resumo['duplicadas']} duplicadas, "
+                   f"{resumo['recusadas']} recusadas)")
+
+    print(f"{resumo['leituras']} leituras geradas em {resumo['segundos']:.2f}s "
+          f"({resumo['leituras_seg']:.0f} leituras/s) -> {destino}")
+
+
+if __name__ == "__main__":
+    main()
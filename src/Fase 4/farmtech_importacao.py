@@ -0,0 +1,237 @@
+"""
+FarmTech Solutions - Importacao Paralela de CSVs
+Importa muitos arquivos do ESP32 (um por dispositivo por dia) de uma vez
+
+Cada arquivo e importado inteiro por um unico trabalhador, com o mesmo
+caminho bulk de importar_csv_esp32 (executemany em lotes, deduplicacao
+por dispositivo e contador). As linhas de um arquivo sao gravadas na
+ordem em que aparecem; arquivos diferentes sao importados em paralelo:
+
+- threads (padrao): os trabalhadores compartilham o pool de sessoes do
+  processo (farmtech_pool), dimensionado para --sessoes;
+- processos (--processos): cada processo importa um arquivo por vez com
+  a sua propria sessao; a conversao das linhas deixa de disputar o GIL.
+
+Em ambos os modos ha no maximo --sessoes sessoes de banco abertas (no
+backend SQLite, que aceita um unico gravador, uma so). Os arquivos
+maiores sao distribuidos primeiro, para que um arquivo grande nao fique
+sozinho no final.
+
+Por padrao o id do dispositivo de cada arquivo e o nome do arquivo sem
+extensao (ex.: esp32-01_2025-06-10): o contador do firmware reinicia a
+cada sessao de captura, entao cada arquivo tem o seu espaco de
+contadores. --dispositivo usa o mesmo id para todos. Os sensores virtuais
+dos dispositivos que faltam sao cadastrados de uma vez antes da
+importacao (farmtech_provisionamento). As linhas rejeitadas de cada
+arquivo ficam em <arquivo>.rejeitos.csv (farmtech_csv).
+
+Uso:
+    python farmtech_importacao.py importar capturas/ [--trabalhadores 4] [--sessoes 4]
+    python farmtech_importacao.py importar "capturas/*.csv" --processos --relatorio importacao.json
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import glob
+import json
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from farmtech_database import FarmTechOracleManager
+from farmtech_csv import SUFIXO_REJEITOS
+from farmtech_pool import configurar_pool
+from farmtech_logs import configurar_logs
+
+logger = logging.getLogger(__name__)
+
+TRABALHADORES_PADRAO = int(os.environ.get('FARMTECH_IMPORTACAO_TRABALHADORES', os.cpu_count() or 1))
+
+# Linhas rejeitadas guardadas por arquivo no relatorio
+MAX_REJEITADAS_RELATORIO = 20
+
+# Gerenciador de cada thread (ou do processo, no modo processos)
+_local = threading.local()
+
+
+def listar_arquivos(padroes):
+    """
+    Arquivos CSV de uma lista de caminhos, diretorios e padroes glob (sem repeticao, ordenados).
+
+    Os arquivos de rejeitos de importacoes anteriores (*.rejeitos.csv) sao ignorados.
+    """
+    arquivos = set()
+    for padrao in padroes:
+        if os.path.isdir(padrao):
+            arquivos.update(glob.glob(os.path.join(padrao, '*.csv')))
+        else:
+            arquivos.update(caminho for caminho in glob.glob(padrao) if os.path.isfile(caminho))
+    return sorted(arquivo for arquivo in arquivos if not arquivo.endswith(SUFIXO_REJEITOS))
+
+
+def _gerenciador(layout):
+    manager = getattr(_local, 'manager', None)
+    if manager is None:
+        manager = _local.manager = FarmTechOracleManager(layout=layout)
+    return manager
+
+
+def importar_arquivo(tarefa):
+    """
+    Importa um arquivo (executado por um trabalhador) e retorna o seu resumo.
+
+    tarefa: {'arquivo', 'dispositivo', 'layout', 'tamanho_lote', 'commit_a_cada'}.
+    """
+    inicio = time.perf_counter()
+    resumo = {'arquivo': tarefa['arquivo'], 'dispositivo': tarefa['dispositivo'],
+              'lidas': 0, 'inseridas': 0, 'duplicadas': 0, 'rejeitadas': 0,
+              'exemplos_rejeitadas': [], 'arquivo_rejeitos': None, 'segundos': 0.0, 'linhas_seg': 0.0,
+              'erro': None}
+    try:
+        relatorio = _gerenciador(tarefa['layout']).importar_csv_esp32(
+            tarefa['arquivo'], modo_bulk=True, tamanho_lote=tarefa['tamanho_lote'],
+            commit_a_cada=tarefa['commit_a_cada'], dispositivo=tarefa['dispositivo'], exibir=False
+        )
+    except Exception as e:
+        logger.error(f"Erro ao importar {tarefa['arquivo']}: {e}")
+        relatorio = None
+        resumo['erro'] = str(e)
+
+    if relatorio:
+        resumo.update(lidas=relatorio['lidas'], inseridas=relatorio['inseridas'],
+                      duplicadas=relatorio['duplicadas'], rejeitadas=len(relatorio['rejeitadas']),
+                      exemplos_rejeitadas=relatorio['rejeitadas'][:MAX_REJEITADAS_RELATORIO],
+                      arquivo_rejeitos=relatorio['arquivo_rejeitos'])
+    elif resumo['erro'] is None:
+        # importar_csv_esp32 registra o motivo no log e retorna False
+        resumo['erro'] = "importacao interrompida (ver farmtech_oracle.log)"
+    resumo['segundos'] = time.perf_counter() - inicio
+    if resumo['segundos'] > 0:
+        resumo['linhas_seg'] = resumo['lidas'] / resumo['segundos']
+    return resumo
+
+
+def importar_arquivos(arquivos, trabalhadores=TRABALHADORES_PADRAO, sessoes=None, processos=False,
+                      layout=None, dispositivo=None, tamanho_lote=5000, commit_a_cada=20000):
+    """
+    Importa os arquivos em paralelo e retorna o relatorio agregado.
+
+    sessoes limita as sessoes de banco abertas ao mesmo tempo (padrao: uma
+    por trabalhador). Retorna {'arquivos': [resumo por arquivo, na ordem
+    de arquivos], 'total': {...}, 'segundos', 'linhas_seg', 'modo',
+    'trabalhadores'}.
+    """
+    sessoes = sessoes or trabalhadores
+    manager = FarmTechOracleManager(layout=layout)
+    if manager.backend.nome == 'sqlite' and sessoes > 1:
+        # Cada importacao mantem a trava de escrita do arquivo ate o commit
+        logger.warning("Backend SQLite aceita um unico gravador: importando com 1 sessao")
+        sessoes = 1
+    # Cada trabalhador usa uma sessao por vez: trabalhadores alem de sessoes so esperariam
+    trabalhadores = max(1, min(trabalhadores, sessoes, len(arquivos) or 1))
+    tarefas = [{'arquivo': arquivo,
+                'dispositivo': dispositivo or os.path.splitext(os.path.basename(arquivo))[0],
+                'layout': layout, 'tamanho_lote': tamanho_lote, 'commit_a_cada': commit_a_cada}
+               for arquivo in arquivos]
+    # Maiores primeiro: o ultimo arquivo a terminar tende a ser pequeno
+    tarefas.sort(key=lambda tarefa: os.path.getsize(tarefa['arquivo']), reverse=True)
+    # Sensores de todos os dispositivos em um unico MERGE; sem eles cada arquivo falha com o motivo
+    if tarefas and manager.provisionar_dispositivos(sorted({tarefa['dispositivo'] for tarefa in tarefas})) is None:
+        logger.error("Falha ao provisionar os dispositivos dos arquivos (ver farmtech_oracle.log)")
+
+    if processos:
+        # spawn: os processos filhos nao herdam sessoes nem pools do processo pai
+        executor = ProcessPoolExecutor(max_workers=trabalhadores,
+                                       mp_context=multiprocessing.get_context('spawn'))
+    else:
+        configurar_pool(max=sessoes)
+        executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='importacao')
+
+    inicio = time.perf_counter()
+    resumos = {}
+    with executor:
+        futuros = {executor.submit(importar_arquivo, tarefa): tarefa['arquivo'] for tarefa in tarefas}
+        for futuro in as_completed(futuros):
+            resumo = futuro.result()
+            resumos[resumo['arquivo']] = resumo
+            logger.info(f"{os.path.basename(resumo['arquivo'])}: {resumo['inseridas']} inseridas, "
+                        f"{resumo['duplicadas']} duplicadas, {resumo['rejeitadas']} rejeitadas "
+                        f"({resumo['segundos']:.1f}s)" + (f" - ERRO: {resumo['erro']}" if resumo['erro'] else ""))
+    segundos = time.perf_counter() - inicio
+
+    por_arquivo = [resumos[arquivo] for arquivo in arquivos]
+    total = {chave: sum(resumo[chave] for resumo in por_arquivo)
+             for chave in ('lidas', 'inseridas', 'duplicadas', 'rejeitadas')}
+    total['arquivos'] = len(por_arquivo)
+    total['falhas'] = sum(1 for resumo in por_arquivo if resumo['erro'])
+    return {
+        'arquivos': por_arquivo,
+        'total': total,
+        'segundos': segundos,
+        'linhas_seg': total['lidas'] / segundos if segundos > 0 else 0.0,
+        'modo': 'processos' if processos else 'threads',
+        'trabalhadores': trabalhadores,
+    }
+
+
+def exibir_relatorio(relatorio):
+    """Imprime o relatorio agregado e o resumo de cada arquivo."""
+    total = relatorio['total']
+    print(f"\nIMPORTACAO PARALELA ({relatorio['modo']}, {relatorio['trabalhadores']} trabalhadores)")
+    print("-" * 100)
+    print(f"{'ARQUIVO':<40} {'DISPOSITIVO':<24} {'LIDAS':>9} {'NOVAS':>9} {'DUPLIC.':>8} "
+          f"{'REJEIT.':>8} {'LINHAS/S':>9}")
+    for resumo in relatorio['arquivos']:
+        print(f"{os.path.basename(resumo['arquivo'])[:40]:<40} {resumo['dispositivo'][:24]:<24} "
+              f"{resumo['lidas']:>9} {resumo['inseridas']:>9} {resumo['duplicadas']:>8} "
+              f"{resumo['rejeitadas']:>8} {resumo['linhas_seg']:>9.0f}")
+        if resumo['erro']:
+            print(f"   ERRO: {resumo['erro']}")
+        for num_linha, motivo in resumo['exemplos_rejeitadas'][:3]:
+            print(f"   linha {num_linha}: {motivo}")
+        if resumo['arquivo_rejeitos']:
+            print(f"   rejeitadas em {resumo['arquivo_rejeitos']}")
+    print("-" * 100)
+    print(f"{total['arquivos']} arquivos ({total['falhas']} com erro) | {total['lidas']} linhas lidas | "
+          f"{total['inseridas']} inseridas | {total['duplicadas']} duplicadas | {total['rejeitadas']} rejeitadas")
+    print(f"Tempo: {relatorio['segundos']:.2f}s | {relatorio['linhas_seg']:.0f} linhas/s")
+
+
+def main():
+    """Interface de linha de comando da importacao paralela."""
+    configurar_logs(arquivo=None)
+    parser = argparse.ArgumentParser(description="Importacao paralela de CSVs do ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_importar = subparsers.add_parser('importar', help="Importa arquivos, diretorios ou padroes glob")
+    p_importar.add_argument('caminhos', nargs='+', help="Arquivos CSV, diretorios ou padroes (ex.: 'dados/*.csv')")
+    p_importar.add_argument('--trabalhadores', type=int, default=TRABALHADORES_PADRAO)
+    p_importar.add_argument('--sessoes', type=int, help="Maximo de sessoes de banco (padrao: uma por trabalhador)")
+    p_importar.add_argument('--processos', action='store_true', help="Usa processos em vez de threads")
+    p_importar.add_argument('--layout', choices=['eav', 'largo'])
+    p_importar.add_argument('--dispositivo', help="Id de dispositivo para todos os arquivos (padrao: nome do arquivo)")
+    p_importar.add_argument('--lote', type=int, default=5000, help="Linhas por executemany")
+    p_importar.add_argument('--commit', type=int, default=20000, help="Linhas por commit")
+    p_importar.add_argument('--relatorio', help="Grava o relatorio completo em JSON")
+
+    args = parser.parse_args()
+
+    arquivos = listar_arquivos(args.caminhos)
+    if not arquivos:
+        print("Nenhum arquivo CSV encontrado")
+        return
+
+    relatorio = importar_arquivos(arquivos, args.trabalhadores, args.sessoes, args.processos,
+                                  args.layout, args.dispositivo, args.lote, args.commit)
+    exibir_relatorio(relatorio)
+    if args.relatorio:
+        with open(args.relatorio, 'w') as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
+        print(f"Relatorio gravado em {args.relatorio}")
+
+
+if __name__ == "__main__":
+    main()
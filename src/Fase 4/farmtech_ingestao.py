@@ -0,0 +1,484 @@
+"""
+FarmTech Solutions - Ingestao Continua ESP32
+Servico que le os frames CSV do ESP32 e os grava em lotes no Oracle
+
+O firmware (main.cpp) imprime a cada ciclo, entre as linhas de log, um
+frame "contador,fosforo,potassio,ph,umidade,bomba" (exibirDadosCSV). Este
+servico le essas linhas de uma porta serial, de um pseudo-terminal (pty)
+ou da entrada padrao, valida os frames e os grava em micro-lotes:
+
+- um lote e gravado quando atinge --lote leituras ou quando a leitura mais
+  antiga do lote espera ha --intervalo segundos;
+- a fila entre a leitura e a gravacao e limitada (--fila); quando enche, a
+  thread de leitura bloqueia ate o banco drenar o lote (backpressure com
+  memoria limitada);
+- contadores de vazao e atraso sao registrados periodicamente no log e
+  nas metricas (farmtech_metricas; --metricas-porta expoe /metrics).
+
+Com --spool os lotes vao primeiro para o spool local (farmtech_spool) e uma
+thread de drenagem os grava no banco: a ingestao segue no ritmo do sensor
+durante uma queda do banco e recupera o atraso em lotes grandes depois.
+O spool guarda a origem (dispositivo, contador) de cada leitura, e a
+drenagem aplica a mesma deduplicacao da gravacao direta.
+
+Cada frame leva o contador_medicoes do firmware; com o id do dispositivo
+(--dispositivo) ele forma a chave de deduplicacao (farmtech_dedup):
+reprocessar uma captura ja ingerida nao duplica leituras. O contador
+reinicia quando o ESP32 reinicia; o servico avisa no log quando isso
+acontece, e capturas de sessoes diferentes devem usar ids diferentes.
+
+Com --colunar as leituras aceitas pelo banco (sem duplicadas nem
+recusadas) tambem sao anexadas ao armazem colunar (farmtech_colunar), lido
+pelo ML e pelo dashboard sem passar pelo banco. Com --spool quem as anexa
+e a thread de drenagem, depois que o banco as grava.
+
+Uso:
+    python farmtech_ingestao.py ingerir --serial /dev/ttyUSB0 [--baud 115200]
+    python farmtech_ingestao.py ingerir --pty /dev/pts/3
+    python farmtech_ingestao.py ingerir --serial /dev/ttyUSB0 --spool spool_esp32
+    python farmtech_ingestao.py ingerir --serial /dev/ttyUSB0 --colunar colunar_esp32
+    python farmtech_ingestao.py ingerir --dispositivo ESP32@2025-06-10 < captura_serial.txt
+    python farmtech_ingestao.py simular [--frames 100] [--intervalo 0.1]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import sys
+import time
+import queue
+import signal
+import logging
+import argparse
+import threading
+from datetime import datetime
+from farmtech_database import FarmTechOracleManager
+from farmtech_leituras import CENARIOS, DISPOSITIVO_PADRAO, decidir_bomba, validar_leitura
+from farmtech_dedup import LEITURA_DUPLICADA
+from farmtech_spool import DrenadorSpool, obter_spool
+from farmtech_provisionamento import validar_dispositivos
+from farmtech_colunar import ArmazemColunar
+from farmtech_metricas import registrar_metricas_lote, iniciar_servidor
+
+try:
+    import serial  # pyserial, necessario apenas para a leitura da porta serial
+except ImportError:
+    serial = None
+
+logger = logging.getLogger(__name__)
+
+# Marca de fim da origem colocada na fila pela thread de leitura
+_FIM = object()
+
+# Espera maxima (s) entre tentativas de gravacao com o banco indisponivel
+ESPERA_MAXIMA_REENVIO = 30.0
+
+
+def interpretar_frame(linha):
+    """
+    Interpreta uma linha da saida serial do ESP32.
+
+    Retorna (contador, (fosforo, potassio, ph, umidade, bomba)) para um frame
+    CSV, None para as demais linhas de log do firmware e levanta ValueError
+    para um frame com valores invalidos.
+    """
+    campos = linha.strip().split(',')
+    if len(campos) != 6 or not campos[0].strip().isdigit():
+        return None
+    leitura = (int(campos[1]), int(campos[2]), float(campos[3]), float(campos[4]), int(campos[5]))
+    validar_leitura(leitura)
+    return int(campos[0]), leitura
+
+
+class IngestaoContinua:
+    """
+    Le frames de uma origem de linhas e os grava em micro-lotes no banco.
+
+    A leitura roda em uma thread propria e entrega as leituras validas a
+    uma fila limitada; a gravacao roda na thread que chama executar().
+    """
+
+    def __init__(self, manager=None, tamanho_lote=500, intervalo_max=2.0,
+                 capacidade_fila=10000, intervalo_relatorio=30.0, spool=None, colunar=None,
+                 dispositivo=DISPOSITIVO_PADRAO):
+        """
+        Inicializa o servico; manager e o FarmTechOracleManager usado na gravacao.
+
+        Com spool (SpoolLocal) os lotes sao anexados ao spool e um
+        DrenadorSpool os grava no banco (a seq do spool torna o reenvio
+        idempotente, e a origem (dispositivo, contador) guardada em cada
+        registro passa pela deduplicacao). Com colunar (ArmazemColunar)
+        as leituras aceitas pelo banco tambem sao anexadas ao armazem (com
+        spool, pelo DrenadorSpool). dispositivo e o id gravado com o
+        contador de cada frame para a deduplicacao.
+        """
+        self.manager = manager or FarmTechOracleManager()
+        self.spool = spool
+        self.drenador = DrenadorSpool(spool, self.manager, colunar=colunar) if spool is not None else None
+        self.colunar = colunar
+        self.dispositivo = dispositivo
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_max = intervalo_max
+        self.intervalo_relatorio = intervalo_relatorio
+        self.fila = queue.Queue(maxsize=capacidade_fila)
+
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._inicio = None
+        self._ultimo_relatorio = None
+        self._contadores = {
+            'linhas': 0,            # linhas lidas da origem
+            'frames': 0,            # frames CSV validos enfileirados
+            'ignoradas': 0,         # linhas de log do firmware
+            'rejeitadas': 0,        # frames com valores invalidos
+            'gravadas': 0,          # leituras confirmadas no banco (ou no spool, se usado)
+            'rejeitadas_banco': 0,  # leituras recusadas pelo banco (batcherrors)
+            'duplicadas': 0,        # leituras ja gravadas (mesmo dispositivo e contador)
+            'lotes': 0,
+            'falhas_banco': 0,      # tentativas de gravacao com o banco indisponivel
+            'bloqueios_fila': 0,    # vezes em que a leitura esperou por fila cheia
+            'lag_ultimo_seg': 0.0,  # da chegada do frame mais antigo do lote ate o commit/fsync
+            'lag_max_seg': 0.0,
+        }
+
+    def _incrementar(self, contador, valor=1):
+        with self._lock:
+            self._contadores[contador] += valor
+
+    def contadores(self):
+        """Retorna uma copia dos contadores com vazao e ocupacao da fila."""
+        with self._lock:
+            dados = dict(self._contadores)
+        decorrido = time.monotonic() - self._inicio if self._inicio else 0.0
+        dados['fila'] = self.fila.qsize()
+        dados['segundos'] = decorrido
+        dados['leituras_seg'] = dados['gravadas'] / decorrido if decorrido > 0 else 0.0
+        if self.drenador is not None:
+            dados.update(self.drenador.contadores())
+        return dados
+
+    def parar(self):
+        """Solicita o encerramento; o que ja estiver na fila ainda e gravado."""
+        self._parar.set()
+
+    def executar(self, linhas):
+        """
+        Processa as linhas (qualquer iteravel de str) ate o fim da origem ou parar().
+
+        Retorna os contadores finais.
+        """
+        self._inicio = self._ultimo_relatorio = time.monotonic()
+        leitor = threading.Thread(target=self._ler, args=(linhas,), name='ingestao-leitor', daemon=True)
+        leitor.start()
+        if self.drenador is not None:
+            self.drenador.start()
+        try:
+            self._gravar_continuamente()
+        finally:
+            self._parar.set()
+            if self.drenador is not None:
+                # O que nao for drenado agora continua no spool para a proxima execucao
+                self.drenador.parar()
+                self.drenador.join()
+                self.drenador.drenar_tudo()
+            if self.colunar is not None:
+                self.colunar.fechar()
+            self._registrar_contadores()
+        return self.contadores()
+
+    # --- THREAD DE LEITURA ---
+
+    def _ler(self, linhas):
+        """Interpreta as linhas e enfileira as leituras validas."""
+        ultimo_contador = 0
+        try:
+            for linha in linhas:
+                if self._parar.is_set():
+                    break
+                if not linha.strip():
+                    continue
+                self._incrementar('linhas')
+                try:
+                    frame = interpretar_frame(linha)
+                except ValueError as e:
+                    self._incrementar('rejeitadas')
+                    logger.warning(f"Frame invalido descartado: {linha.strip()} - {e}")
+                    continue
+                if frame is None:
+                    self._incrementar('ignoradas')
+                    continue
+                contador, leitura = frame
+                if contador < ultimo_contador:
+                    logger.warning(f"Contador do firmware reiniciado ({ultimo_contador} -> {contador}): "
+                                   f"leituras ja gravadas de {self.dispositivo} com esses contadores "
+                                   f"serao tratadas como duplicadas")
+                ultimo_contador = contador
+                self._enfileirar((leitura, time.time(), contador))
+                self._incrementar('frames')
+        except Exception as e:
+            logger.error(f"Erro na leitura da origem: {e}")
+        finally:
+            self._enfileirar(_FIM)
+
+    def _enfileirar(self, item):
+        """Coloca o item na fila, bloqueando enquanto ela estiver cheia."""
+        try:
+            self.fila.put_nowait(item)
+            return
+        except queue.Full:
+            self._incrementar('bloqueios_fila')
+        while True:
+            try:
+                self.fila.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if self._parar.is_set():
+                    return
+
+    # --- GRAVACAO EM MICRO-LOTES ---
+
+    def _gravar_continuamente(self):
+        """Forma lotes por tamanho/tempo e os grava ate o fim da origem."""
+        fim = False
+        while not fim:
+            lote = []
+            prazo = None
+            while len(lote) < self.tamanho_lote:
+                espera = 0.5 if prazo is None else prazo - time.time()
+                try:
+                    # Com o prazo vencido (ex.: apos uma falha do banco) o lote ainda
+                    # leva o que ja estiver na fila, para recuperar o atraso em lotes cheios
+                    item = self.fila.get(timeout=espera) if espera > 0 else self.fila.get_nowait()
+                except queue.Empty:
+                    if prazo is not None:
+                        break
+                    if self._parar.is_set():
+                        fim = True
+                        break
+                    continue
+                if item is _FIM:
+                    fim = True
+                    break
+                lote.append(item)
+                if prazo is None:
+                    # O prazo conta a partir da chegada da leitura mais antiga do lote
+                    prazo = item[1] + self.intervalo_max
+
+            if lote:
+                self._gravar_lote(lote)
+            self._relatorio_periodico()
+
+    def _gravar_lote(self, lote):
+        """Grava o lote, repetindo com espera crescente enquanto o banco estiver indisponivel."""
+        if self.spool is not None:
+            self.spool.anexar([(instante, leitura, (self.dispositivo, contador))
+                               for leitura, instante, contador in lote])
+            # O armazem colunar recebe o lote na drenagem, ja deduplicado e validado pelo banco
+            self._registrar_lote(lote, {})
+            return
+
+        leituras = [leitura for leitura, _, _ in lote]
+        instantes = [datetime.fromtimestamp(instante) for _, instante, _ in lote]
+        origens = [(self.dispositivo, contador) for _, _, contador in lote]
+        espera = 1.0
+        while True:
+            erros = self.manager.gravar_leituras(leituras, instantes, origens)
+            if erros is not None:
+                break
+            self._incrementar('falhas_banco')
+            if self._parar.is_set():
+                logger.error(f"Banco indisponivel no encerramento: {len(lote)} leituras nao gravadas")
+                return
+            logger.warning(f"Banco indisponivel; nova tentativa em {espera:.0f}s ({self.fila.qsize()} na fila)")
+            self._parar.wait(espera)
+            espera = min(espera * 2, ESPERA_MAXIMA_REENVIO)
+
+        for indice, mensagem in erros.items():
+            if mensagem != LEITURA_DUPLICADA:
+                logger.warning(f"Leitura recusada pelo banco: {leituras[indice]} - {mensagem}")
+        self._anexar_colunar(lote, erros)
+        self._registrar_lote(lote, erros)
+
+    def _anexar_colunar(self, lote, erros):
+        """Anexa ao armazem colunar as leituras do lote que o banco aceitou."""
+        if self.colunar is None:
+            return
+        aceitas = [item for indice, item in enumerate(lote) if indice not in erros]
+        if aceitas:
+            self.colunar.anexar([datetime.fromtimestamp(instante) for _, instante, _ in aceitas],
+                                [leitura for leitura, _, _ in aceitas])
+
+    def _registrar_lote(self, lote, erros):
+        lag = time.time() - lote[0][1]
+        duplicadas = sum(1 for mensagem in erros.values() if mensagem == LEITURA_DUPLICADA)
+        registrar_metricas_lote(len(lote) - len(erros), duplicadas, len(erros) - duplicadas, lag,
+                                self.fila.qsize())
+        with self._lock:
+            self._contadores['gravadas'] += len(lote) - len(erros)
+            self._contadores['rejeitadas_banco'] += len(erros) - duplicadas
+            self._contadores['duplicadas'] += duplicadas
+            self._contadores['lotes'] += 1
+            self._contadores['lag_ultimo_seg'] = lag
+            self._contadores['lag_max_seg'] = max(self._contadores['lag_max_seg'], lag)
+
+    def _relatorio_periodico(self):
+        """Registra os contadores no log a cada intervalo_relatorio segundos."""
+        agora = time.monotonic()
+        if agora - self._ultimo_relatorio >= self.intervalo_relatorio:
+            self._ultimo_relatorio = agora
+            self._registrar_contadores()
+
+    def _registrar_contadores(self):
+        c = self.contadores()
+        logger.info(
+            f"Ingestao: {c['gravadas']} gravadas ({c['leituras_seg']:.1f}/s) | "
+            f"{c['frames']} frames, {c['ignoradas']} linhas de log, {c['rejeitadas']} invalidos, "
+            f"{c['duplicadas']} duplicadas | "
+            f"fila {c['fila']} | lag {c['lag_ultimo_seg']:.2f}s (max {c['lag_max_seg']:.2f}s) | "
+            f"{c['lotes']} lotes, {c['falhas_banco']} falhas de banco"
+        )
+        if self.drenador is not None:
+            logger.info(
+                f"Spool: {c['drenadas']} drenadas em {c['lotes_drenados']} lotes | "
+                f"{c['pendentes_spool']} pendentes | {c['falhas_drenagem']} falhas de banco"
+            )
+
+
+# --- ORIGENS DE LINHAS ---
+
+def _linhas_binarias(arquivo):
+    """Decodifica as linhas de um arquivo binario (stdin, pty ou FIFO) ate o EOF."""
+    try:
+        for linha in arquivo:
+            yield linha.decode('utf-8', errors='replace')
+    except OSError:
+        # EIO: o outro lado do pty foi fechado
+        return
+
+
+def _linhas_serial(porta):
+    """Linhas da porta serial; timeouts de leitura devolvem '' para a thread checar parar()."""
+    with porta:
+        while True:
+            yield porta.readline().decode('utf-8', errors='replace')
+
+
+def abrir_origem(porta_serial=None, baud=115200, caminho=None):
+    """Retorna o iteravel de linhas da serial, do pty/arquivo indicado ou do stdin."""
+    if porta_serial:
+        if serial is None:
+            raise RuntimeError("Leitura serial requer o pacote pyserial (pip install pyserial)")
+        return _linhas_serial(serial.Serial(porta_serial, baud, timeout=1))
+    if caminho:
+        return _linhas_binarias(open(caminho, 'rb'))
+    return _linhas_binarias(sys.stdin.buffer)
+
+
+# --- SIMULADOR DO ESP32 ---
+
+def linhas_simuladas(total):
+    """Gera a saida serial do firmware (log + frame CSV) para total ciclos."""
+    for contador in range(1, total + 1):
+        descricao, fosforo, potassio, umidade, ph = CENARIOS[(contador - 1) % len(CENARIOS)]
+        bomba = decidir_bomba(fosforo, potassio, ph, umidade)
+        yield f">>> CENARIO {(contador - 1) % len(CENARIOS) + 1}/{len(CENARIOS)}: {descricao}\r\n"
+        yield f"BOMBA: {'LIGADA' if bomba else 'DESLIGADA'}\r\n"
+        yield f"{contador},{fosforo},{potassio},{ph:.2f},{umidade:.1f},{bomba}\r\n"
+        yield "\r\n"
+
+
+def simular_esp32(total=100, intervalo=0.1):
+    """
+    Cria um pseudo-terminal que imita a porta serial do ESP32.
+
+    O caminho do pty e impresso para ser usado em 'ingerir --pty'; o que for
+    escrito antes do leitor abrir o terminal fica no buffer do pty.
+    """
+    # Importado aqui: tty (termios) so existe em sistemas POSIX; a ingestao roda tambem no Windows
+    import tty
+
+    mestre, escravo = os.openpty()
+    tty.setraw(escravo)
+    print(f"ESP32 simulado em {os.ttyname(escravo)} ({total} frames, 1 a cada {intervalo}s)", flush=True)
+    try:
+        for linha in linhas_simuladas(total):
+            os.write(mestre, linha.encode('utf-8'))
+            if linha[0].isdigit():
+                time.sleep(intervalo)
+    finally:
+        os.close(mestre)
+        os.close(escravo)
+    print("Simulacao concluida")
+
+
+def main():
+    """Interface de linha de comando da ingestao continua."""
+    parser = argparse.ArgumentParser(description="Ingestao continua de frames ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    p_ingerir = subparsers.add_parser('ingerir', help="Le frames e grava no banco")
+    origem = p_ingerir.add_mutually_exclusive_group()
+    origem.add_argument('--serial', help="Porta serial (ex.: /dev/ttyUSB0, COM3)")
+    origem.add_argument('--pty', help="Pseudo-terminal ou FIFO (padrao: stdin)")
+    p_ingerir.add_argument('--baud', type=int, default=115200)
+    p_ingerir.add_argument('--lote', type=int, default=500, help="Leituras por lote")
+    p_ingerir.add_argument('--intervalo', type=float, default=2.0, help="Espera maxima (s) de um lote")
+    p_ingerir.add_argument('--fila', type=int, default=10000, help="Capacidade da fila em memoria")
+    p_ingerir.add_argument('--layout', choices=['eav', 'largo'])
+    p_ingerir.add_argument('--spool', help="Diretorio do spool local (gravacao duravel antes do banco)")
+    p_ingerir.add_argument('--dispositivo', default=DISPOSITIVO_PADRAO,
+                           help="Id do dispositivo gravado com o contador de cada frame (deduplicacao)")
+    p_ingerir.add_argument('--colunar', help="Diretorio do armazem colunar (copia das leituras para ML/dashboard)")
+    p_ingerir.add_argument('--metricas-porta', type=int,
+                           help="Porta do endpoint de metricas (/metrics e /metrics.json)")
+
+    p_simular = subparsers.add_parser('simular', help="Cria um pty que imita o ESP32")
+    p_simular.add_argument('--frames', type=int, default=100)
+    p_simular.add_argument('--intervalo', type=float, default=0.1)
+
+    args = parser.parse_args()
+
+    if args.comando == 'simular':
+        simular_esp32(args.frames, args.intervalo)
+        return
+
+    try:
+        validar_dispositivos([args.dispositivo])
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.metricas_porta:
+        iniciar_servidor(args.metricas_porta)
+
+    try:
+        spool = obter_spool(args.spool) if args.spool else None
+    except RuntimeError as e:
+        print(f"Erro: {e}")
+        sys.exit(1)
+
+    manager = FarmTechOracleManager(layout=args.layout)
+    # As leituras vao para os sensores do dispositivo, cadastrados aqui se faltarem
+    if manager.provisionar_dispositivos([args.dispositivo]) is None:
+        if spool is None:
+            print(f"Erro: nao foi possivel provisionar o dispositivo {args.dispositivo}")
+            sys.exit(1)
+        logger.warning(f"Dispositivo {args.dispositivo} nao provisionado: o spool guarda as leituras ate o banco voltar")
+
+    servico = IngestaoContinua(
+        manager,
+        tamanho_lote=args.lote,
+        intervalo_max=args.intervalo,
+        capacidade_fila=args.fila,
+        spool=spool,
+        colunar=ArmazemColunar(args.colunar) if args.colunar else None,
+        dispositivo=args.dispositivo
+    )
+    # Ctrl+C/SIGTERM encerram apos gravar o que ja estiver na fila
+    signal.signal(signal.SIGINT, lambda *_: servico.parar())
+    signal.signal(signal.SIGTERM, lambda *_: servico.parar())
+    servico.executar(abrir_origem(args.serial, args.baud, args.pty))
+
+
+if __name__ == "__main__":
+    main()
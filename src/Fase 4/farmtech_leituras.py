@@ -0,0 +1,183 @@
+"""
+FarmTech Solutions - Leituras ESP32
+Layouts de armazenamento e consultas das leituras dos sensores
+
+Uma leitura do ESP32 (fosforo, potassio, ph, umidade, bomba) pode ser
+armazenada de duas formas:
+
+- 'eav': layout original da Fase 3, cinco linhas em T_MEDICOES (uma por
+  sensor virtual cadastrado em T_SENSORES).
+- 'largo': uma linha por leitura em T_LEITURAS_ESP32, com uma coluna
+  tipada para cada grandeza (criada pela migracao 2) e o dispositivo
+  que fez a leitura (cod_dispositivo, migracao 8).
+
+As funcoes deste modulo montam o SQL que devolve uma leitura completa
+por linha em qualquer um dos layouts, para que o CRUD, o ML e o
+dashboard nao precisem pivotar os dados em pandas.
+
+O modulo tambem guarda as regras do firmware (main.cpp) usadas pelo
+simulador da ingestao e pelo gerador de carga: os cenarios de
+simularCenario, os limites de controle e a decisao da bomba.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import numpy as np
+
+LAYOUT_EAV = 'eav'
+LAYOUT_LARGO = 'largo'
+LAYOUTS = (LAYOUT_EAV, LAYOUT_LARGO)
+
+# Layout usado quando o gerenciador nao recebe um explicitamente
+LAYOUT_PADRAO = os.environ.get('FARMTECH_LAYOUT', LAYOUT_EAV)
+
+# Classificacao dos sensores (migracao 3): T_SENSORES.tipo_dispositivo
+# identifica a familia do dispositivo e cod_dispositivo a placa especifica.
+# Os sensores virtuais criados antes da migracao pertencem ao dispositivo 'ESP32'.
+TIPO_DISPOSITIVO_ESP32 = 'ESP32'
+DISPOSITIVO_PADRAO = 'ESP32'
+
+# Grandeza -> tipo_sensor (CHAR(2)) do sensor virtual em T_SENSORES
+TIPOS_SENSORES = {
+    'fosforo': 'FO',
+    'potassio': 'PO',
+    'ph': 'PH',
+    'umidade': 'UM',
+    'bomba': 'BO'
+}
+
+# Grandeza -> nome do sensor virtual do dispositivo padrao em T_SENSORES
+NOMES_SENSORES = {
+    'fosforo': 'Sensor Fosforo ESP32',
+    'potassio': 'Sensor Potassio ESP32',
+    'ph': 'Sensor pH ESP32',
+    'umidade': 'Sensor Umidade ESP32',
+    'bomba': 'Sensor Bomba ESP32'
+}
+
+# Faixa valida de cada grandeza, na ordem das colunas do CSV do ESP32
+# (mesmos limites dos sensores virtuais cadastrados em T_SENSORES)
+FAIXAS_VALIDAS = {
+    'fosforo': (0, 1),
+    'potassio': (0, 1),
+    'ph': (0, 14),
+    'umidade': (0, 100),
+    'bomba': (0, 1)
+}
+
+# Segundos entre duas leituras do firmware (INTERVALO_LEITURA no codigo do ESP32);
+# o contador do CSV vezes este intervalo da o instante relativo da leitura
+INTERVALO_LEITURA = 3.0
+
+# Cenarios de simularCenario() em main.cpp: (descricao, fosforo, potassio, umidade, ph)
+CENARIOS = [
+    ("SEM NUTRIENTES + UMIDADE NORMAL", 0, 0, 45.0, 7.2),
+    ("APENAS FOSFORO + UMIDADE BAIXA", 1, 0, 25.0, 7.0),
+    ("APENAS POTASSIO + UMIDADE ALTA", 0, 1, 75.0, 6.8),
+    ("AMBOS NUTRIENTES + pH ACIDO", 1, 1, 40.0, 5.5),
+    ("AMBOS NUTRIENTES + pH ALCALINO", 1, 1, 50.0, 8.5),
+    ("CONDICOES IDEAIS", 1, 1, 55.0, 7.0),
+]
+
+# Parametros de controle do firmware
+LIMITE_UMIDADE_BAIXA = 30.0
+LIMITE_UMIDADE_ALTA = 70.0
+LIMITE_PH_BAIXO = 6.0
+LIMITE_PH_ALTO = 8.0
+
+# Colunas devolvidas por sql_leituras(), na ordem do SELECT
+COLUNAS_LEITURA = ['cod_medicao', 'timestamp', 'fosforo', 'potassio', 'ph', 'umidade', 'bomba_ativa']
+
+# Filtros opcionais de sql_leituras(): nome do bind -> condicao sobre o instante/codigo
+FILTROS_LEITURA = {
+    'inicio': "{data} >= :inicio",
+    'fim': "{data} < :fim",
+    # Marca d'agua da exportacao incremental: depois de (:marca_data, :marca_cod) na ordem da consulta
+    'desde_marca': "({data} > :marca_data OR ({data} = :marca_data AND {cod} > :marca_cod))",
+}
+
+
+def validar_layout(layout):
+    """Retorna o layout informado (ou o padrao), validando o valor."""
+    layout = layout or LAYOUT_PADRAO
+    if layout not in LAYOUTS:
+        raise ValueError(f"Layout de armazenamento invalido: {layout}")
+    return layout
+
+
+def validar_leitura(leitura):
+    """Levanta ValueError se algum valor de (fosforo, ..., bomba) estiver fora da faixa."""
+    for (grandeza, (minimo, maximo)), valor in zip(FAIXAS_VALIDAS.items(), leitura):
+        if not minimo <= valor <= maximo:
+            raise ValueError(f"{grandeza} fora da faixa [{minimo}, {maximo}]: {valor}")
+
+
+def decidir_bomba(fosforo, potassio, ph, umidade):
+    """
+    Regra de analisarDadosEControlarBomba() em main.cpp (1 = bomba ligada).
+
+    Aceita escalares (retorna int) ou arrays numpy (retorna array int8).
+    """
+    fosforo, potassio, ph, umidade = map(np.asarray, (fosforo, potassio, ph, umidade))
+    ligar = (umidade < LIMITE_UMIDADE_BAIXA) & (ph >= LIMITE_PH_BAIXO) & (ph <= LIMITE_PH_ALTO)
+    # Sem nutrientes ou com um so deles a irrigacao e forcada
+    ligar = ligar | ~((fosforo == 1) & (potassio == 1))
+    bomba = np.asarray(ligar).astype(np.int8)
+    return int(bomba) if bomba.ndim == 0 else bomba
+
+
+def sql_leituras(layout, decrescente=False, filtros=(), cultura=False):
+    """
+    Monta o SELECT que devolve uma leitura completa por linha.
+
+    As colunas seguem COLUNAS_LEITURA; cultura=True acrescenta ao fim a
+    coluna cod_cultura dos sensores que fizeram a leitura. Os binds sao nomeados: cada nome
+    em filtros (FILTROS_LEITURA) acrescenta uma condicao com o(s) bind(s)
+    que ela usa. A consulta le o periodo inteiro (no layout EAV agrupa
+    todas as linhas antes de ordenar); para as N leituras mais recentes use
+    farmtech_paginacao.buscar_pagina, que para no indice apos N linhas.
+    """
+    ordem = "DESC" if decrescente else "ASC"
+    for filtro in filtros:
+        if filtro not in FILTROS_LEITURA:
+            raise ValueError(f"Filtro de leituras invalido: {filtro}")
+
+    if validar_layout(layout) == LAYOUT_LARGO:
+        condicoes = [FILTROS_LEITURA[f].format(data='data_hora_leitura', cod='cod_leitura') for f in filtros]
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        # A cultura e a dos sensores do dispositivo da leitura (cod_dispositivo, migracao 8)
+        coluna_cultura = f""",
+               (SELECT MIN(s.cod_cultura) FROM T_SENSORES s
+                WHERE s.tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}'
+                  AND s.cod_dispositivo = l.cod_dispositivo) cod_cultura""" if cultura else ""
+        sql = f"""
+        SELECT cod_leitura, data_hora_leitura, fosforo, potassio, ph, umidade, bomba{coluna_cultura}
+        FROM T_LEITURAS_ESP32 l
+        {where}
+        ORDER BY data_hora_leitura {ordem}, cod_leitura {ordem}
+        """
+    else:
+        # Pivot feito no banco: uma linha por cod_medicao, somente leituras completas.
+        # O filtro por tipo_dispositivo usa IX_SENS_DISP e o acesso a T_MEDICOES
+        # segue pelo indice composto IX_MED_SENS_DATA (migracao 3).
+        colunas = ",\n               ".join(
+            f"MAX(CASE WHEN s.tipo_sensor = '{tipo}' THEN m.valor_medicao END)"
+            for tipo in TIPOS_SENSORES.values()
+        )
+        condicoes = [FILTROS_LEITURA[f].format(data='m.data_hora_medicao', cod='m.cod_medicao') for f in filtros]
+        # Os cinco sensores de uma leitura sao do mesmo dispositivo e da mesma cultura
+        coluna_cultura = ",\n               MIN(s.cod_cultura) cod_cultura" if cultura else ""
+        sql = f"""
+        SELECT m.cod_medicao, MIN(m.data_hora_medicao),
+               {colunas}{coluna_cultura}
+        FROM T_MEDICOES m
+        JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+        WHERE {' AND '.join([f"s.tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}'"] + condicoes)}
+        GROUP BY m.cod_medicao
+        HAVING COUNT(*) = {len(TIPOS_SENSORES)}
+        ORDER BY MIN(m.data_hora_medicao) {ordem}, m.cod_medicao {ordem}
+        """
+
+    return sql
@@ -0,0 +1,209 @@
+"""
+FarmTech Solutions - Configuracao de Logs
+Log assincrono por fila, registros JSON e amostragem do caminho quente
+
+Todos os modulos registram pelo logger do proprio modulo; a configuracao
+do processo e feita uma unica vez por configurar_logs():
+
+- o logger raiz recebe um FilaLogs (QueueHandler): o chamador so monta o
+  registro e o coloca em uma fila limitada, sem tocar no disco. Uma
+  thread (QueueListener) grava no arquivo e no console;
+- com a fila cheia o registro e descartado em vez de bloquear a
+  insercao (contado em farmtech_logs_descartados_total, farmtech_metricas);
+- FARMTECH_LOG_FORMATO=json grava no arquivo um objeto JSON por linha
+  (instante, nivel, logger, mensagem, modulo, funcao, linha, thread e os
+  campos de extra=); o console continua em texto.
+
+Logs por leitura no caminho de insercao passam por LogAmostrado: no
+maximo um registro por intervalo (e um a cada N chamadas), com a
+quantidade de registros suprimidos desde o anterior.
+
+Variaveis de ambiente: FARMTECH_LOG_NIVEL (INFO), FARMTECH_LOG_ARQUIVO
+(farmtech_oracle.log), FARMTECH_LOG_FORMATO (texto|json),
+FARMTECH_LOG_FILA (registros na fila, 10000) e FARMTECH_LOG_AMOSTRA_SEG
+(intervalo do LogAmostrado, 1 s).
+
+Uso:
+    from farmtech_logs import configurar_logs, LogAmostrado
+    configurar_logs()                      # arquivo + console, uma vez por processo
+    FARMTECH_LOG_FORMATO=json python farmtech_ingestao.py ingerir --serial /dev/ttyUSB0
+    python farmtech_benchmark.py logs --leituras 200000
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+NIVEL_PADRAO = os.environ.get('FARMTECH_LOG_NIVEL', 'INFO').upper()
+ARQUIVO_PADRAO = os.environ.get('FARMTECH_LOG_ARQUIVO', 'farmtech_oracle.log')
+FORMATO_PADRAO = os.environ.get('FARMTECH_LOG_FORMATO', 'texto')
+TAMANHO_FILA = int(os.environ.get('FARMTECH_LOG_FILA', 10000))
+INTERVALO_AMOSTRA = float(os.environ.get('FARMTECH_LOG_AMOSTRA_SEG', 1.0))
+
+FORMATOS = ('texto', 'json')
+FORMATO_TEXTO = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Atributos de todo LogRecord (o restante veio de extra=)
+_ATRIBUTOS_REGISTRO = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class FormatadorJSON(logging.Formatter):
+    """Um objeto JSON por registro, com os campos de extra=."""
+
+    def format(self, record):
+        dados = {
+            'instante': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+            'modulo': record.module,
+            'funcao': record.funcName,
+            'linha': record.lineno,
+            'thread': record.threadName,
+        }
+        dados.update((chave, valor) for chave, valor in vars(record).items() if chave not in _ATRIBUTOS_REGISTRO)
+        excecao = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if excecao:
+            dados['excecao'] = excecao
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FilaLogs(QueueHandler):
+    """QueueHandler que descarta o registro com a fila cheia em vez de bloquear."""
+
+    def __init__(self, fila):
+        super().__init__(fila)
+        self.descartados = 0
+
+    def prepare(self, record):
+        """Junta msg e args no chamador; a formatacao fica para a thread de gravacao."""
+        # Sem a copia e o format() completos do QueueHandler, que custam mais que a escrita
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+            # Importado aqui: farmtech_metricas registra pelo proprio logger
+            from farmtech_metricas import obter_registro_metricas
+            obter_registro_metricas().contador(
+                'farmtech_logs_descartados_total', "Registros de log descartados com a fila cheia"
+            ).inc()
+
+
+def criar_fila(handlers, tamanho=TAMANHO_FILA):
+    """FilaLogs e o QueueListener (ja iniciado) que entrega os registros aos handlers."""
+    fila = FilaLogs(queue.Queue(tamanho))
+    ouvinte = QueueListener(fila.queue, *handlers, respect_handler_level=True)
+    ouvinte.start()
+    return fila, ouvinte
+
+
+class LogAmostrado:
+    """
+    Log de caminho quente: no maximo um registro por intervalo segundos e
+    um a cada amostra chamadas; o registro emitido informa quantos foram
+    suprimidos desde o anterior (tambem em extra 'suprimidas').
+    """
+
+    def __init__(self, logger, intervalo=INTERVALO_AMOSTRA, amostra=1):
+        self.logger = logger
+        self.intervalo = intervalo
+        self.amostra = max(1, amostra)
+        self._chamadas = 0
+        self._suprimidas = 0
+        self._ultimo = float('-inf')
+        self._lock = threading.Lock()
+
+    def _emitir(self, nivel, mensagem, args, kwargs):
+        if not self.logger.isEnabledFor(nivel):
+            return
+        with self._lock:
+            self._chamadas += 1
+            agora = time.monotonic()
+            if self._chamadas % self.amostra or agora - self._ultimo < self.intervalo:
+                self._suprimidas += 1
+                return
+            suprimidas, self._suprimidas = self._suprimidas, 0
+            self._ultimo = agora
+        if suprimidas:
+            mensagem = f"{mensagem} (+{suprimidas} suprimidas)"
+        kwargs['extra'] = dict(kwargs.get('extra') or {}, suprimidas=suprimidas)
+        # funcName/lineno do chamador, nao deste modulo
+        self.logger.log(nivel, mensagem, *args, stacklevel=3, **kwargs)
+
+    def log(self, nivel, mensagem, *args, **kwargs):
+        self._emitir(nivel, mensagem, args, kwargs)
+
+    def debug(self, mensagem, *args, **kwargs):
+        self._emitir(logging.DEBUG, mensagem, args, kwargs)
+
+    def info(self, mensagem, *args, **kwargs):
+        self._emitir(logging.INFO, mensagem, args, kwargs)
+
+    def warning(self, mensagem, *args, **kwargs):
+        self._emitir(logging.WARNING, mensagem, args, kwargs)
+
+
+_fila = None
+_ouvinte = None
+_lock_configuracao = threading.Lock()
+
+
+def configurar_logs(arquivo=ARQUIVO_PADRAO, nivel=NIVEL_PADRAO, formato=FORMATO_PADRAO, console=True):
+    """
+    Configura o logger raiz com a fila assincrona (uma vez por processo).
+
+    arquivo=None desativa o arquivo. Como logging.basicConfig, nao faz nada
+    se o logger raiz ja tiver handlers.
+    """
+    global _fila, _ouvinte
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de log invalido: {formato} (use {', '.join(FORMATOS)})")
+    with _lock_configuracao:
+        raiz = logging.getLogger()
+        if raiz.handlers:
+            return
+        handlers = []
+        if arquivo:
+            handler = logging.FileHandler(arquivo, encoding='utf-8')
+            handler.setFormatter(FormatadorJSON() if formato == 'json' else logging.Formatter(FORMATO_TEXTO))
+            handlers.append(handler)
+        if console:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(FORMATO_TEXTO))
+            handlers.append(handler)
+        _fila, _ouvinte = criar_fila(handlers)
+        raiz.addHandler(_fila)
+        raiz.setLevel(nivel)
+        atexit.register(encerrar_logs)
+
+
+def encerrar_logs():
+    """Grava os registros pendentes e fecha os handlers (registrado no atexit)."""
+    global _fila, _ouvinte
+    with _lock_configuracao:
+        if _ouvinte is None:
+            return
+        logging.getLogger().removeHandler(_fila)
+        _ouvinte.stop()
+        for handler in _ouvinte.handlers:
+            handler.close()
+        if _fila.descartados:
+            print(f"AVISO: {_fila.descartados} registros de log descartados (fila cheia)")
+        _fila, _ouvinte = None, None
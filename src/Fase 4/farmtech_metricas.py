@@ -0,0 +1,405 @@
+"""
+FarmTech Solutions - Metricas
+Contadores, medidores e histogramas de latencia dos caminhos criticos
+
+O registro de metricas e compartilhado pelo processo
+(obter_registro_metricas). Os caminhos de banco, ingestao e ML sao
+instrumentados com o decorador medir_operacao, que registra:
+
+- farmtech_operacao_segundos{operacao}: histograma de latencia;
+- farmtech_operacao_total{operacao, resultado}: chamadas ok/erro.
+
+Outras metricas: farmtech_leituras_gravadas_total{caminho} (leituras por
+segundo = taxa do contador), farmtech_ingestao_leituras_total{resultado},
+farmtech_ingestao_lag_segundos e farmtech_ingestao_fila.
+
+Exportacao:
+
+- formato texto do Prometheus em http://127.0.0.1:<porta>/metrics;
+- instantaneo JSON (com p50/p90/p99 estimados dos histogramas) em
+  /metrics.json ou por instantaneo().
+
+O servidor HTTP sobe com o primeiro uso do registro quando
+FARMTECH_METRICAS_PORTA esta definida, ou por iniciar_servidor().
+
+Uso:
+    FARMTECH_METRICAS_PORTA=9464 python farmtech_ingestao.py ingerir --serial /dev/ttyUSB0
+    python farmtech_metricas.py consultar [--url http://127.0.0.1:9464]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import json
+import math
+import time
+import bisect
+import logging
+import argparse
+import threading
+import functools
+import urllib.request
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# Porta do endpoint HTTP (desativado se a variavel nao estiver definida)
+PORTA_PADRAO = os.environ.get('FARMTECH_METRICAS_PORTA')
+ENDERECO_PADRAO = os.environ.get('FARMTECH_METRICAS_ENDERECO', '127.0.0.1')
+
+# Limites (segundos) dos histogramas de latencia: 100us a ~26s, dobrando
+LIMITES_LATENCIA = tuple(0.0001 * 2 ** i for i in range(19))
+
+QUANTIS_INSTANTANEO = (0.5, 0.9, 0.99)
+
+
+def _chave(nomes, rotulos):
+    """Tupla de valores na ordem dos nomes de rotulo da metrica."""
+    if set(rotulos) != set(nomes):
+        raise ValueError(f"Rotulos esperados: {', '.join(nomes) or '(nenhum)'}; recebidos: {', '.join(rotulos)}")
+    return tuple(str(rotulos[nome]) for nome in nomes)
+
+
+def _escapar(valor):
+    """Escapa barra invertida, aspas e quebra de linha no valor de um rotulo."""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(nomes, valores, extra=None):
+    pares = list(zip(nomes, valores)) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + '}'
+
+
+def _formatar_numero(valor):
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Valor que so cresce (ex.: chamadas, leituras gravadas)."""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1, **rotulos):
+        if valor < 0:
+            raise ValueError("Contador so pode ser incrementado")
+        chave = _chave(self.rotulos, rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        with self._lock:
+            return self._valores.get(_chave(self.rotulos, rotulos), 0)
+
+    def _series(self):
+        with self._lock:
+            return sorted(self._valores.items())
+
+    def _linhas_prometheus(self):
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_numero(valor)}"
+                for chave, valor in self._series()]
+
+    def _instantaneo(self):
+        return [{'rotulos': dict(zip(self.rotulos, chave)), 'valor': valor} for chave, valor in self._series()]
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (ex.: tamanho da fila)."""
+
+    tipo = 'gauge'
+
+    def definir(self, valor, **rotulos):
+        chave = _chave(self.rotulos, rotulos)
+        with self._lock:
+            self._valores[chave] = valor
+
+    def inc(self, valor=1, **rotulos):
+        chave = _chave(self.rotulos, rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def dec(self, valor=1, **rotulos):
+        self.inc(-valor, **rotulos)
+
+
+class Histograma:
+    """Distribuicao de valores em faixas cumulativas (ex.: latencia em segundos)."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(sorted(limites))
+        self._series_dados = {}  # chave -> [contagens por faixa (+ faixa +Inf), soma, quantidade]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = _chave(self.rotulos, rotulos)
+        faixa = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            dados = self._series_dados.get(chave)
+            if dados is None:
+                dados = self._series_dados[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            dados[0][faixa] += 1
+            dados[1] += valor
+            dados[2] += 1
+
+    def quantil(self, q, **rotulos):
+        """Estimativa do quantil q (0-1) por interpolacao linear dentro da faixa (como histogram_quantile)."""
+        with self._lock:
+            dados = self._series_dados.get(_chave(self.rotulos, rotulos))
+            contagens = list(dados[0]) if dados else None
+        return self._estimar_quantil(contagens, q)
+
+    def _estimar_quantil(self, contagens, q):
+        if not contagens or not sum(contagens):
+            return None
+        alvo = q * sum(contagens)
+        acumulado = 0
+        for faixa, contagem in enumerate(contagens):
+            if acumulado + contagem >= alvo and contagem:
+                if faixa == len(self.limites):
+                    # Acima do ultimo limite: o melhor palpite e o proprio limite
+                    return self.limites[-1]
+                inferior = self.limites[faixa - 1] if faixa else 0.0
+                return inferior + (self.limites[faixa] - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+    def _series(self):
+        with self._lock:
+            return sorted((chave, (list(dados[0]), dados[1], dados[2])) for chave, dados in self._series_dados.items())
+
+    def _linhas_prometheus(self):
+        linhas = []
+        for chave, (contagens, soma, quantidade) in self._series():
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (math.inf,), contagens):
+                acumulado += contagem
+                rotulos = _formatar_rotulos(self.rotulos, chave, ('le', _formatar_numero(float(limite))))
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {quantidade}")
+        return linhas
+
+    def _instantaneo(self):
+        series = []
+        for chave, (contagens, soma, quantidade) in self._series():
+            serie = {'rotulos': dict(zip(self.rotulos, chave)), 'quantidade': quantidade, 'soma': soma,
+                     'media': soma / quantidade if quantidade else None}
+            for q in QUANTIS_INSTANTANEO:
+                serie[f"p{int(q * 100)}"] = self._estimar_quantil(contagens, q)
+            series.append(serie)
+        return series
+
+
+class RegistroMetricas:
+    """Metricas do processo, criadas sob demanda pelo nome."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _obter(self, classe, nome, ajuda, rotulos, **opcoes):
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, ajuda, rotulos, **opcoes)
+            elif type(metrica) is not classe or metrica.rotulos != tuple(rotulos):
+                raise ValueError(f"Metrica {nome} ja registrada como {metrica.tipo} {metrica.rotulos}")
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._obter(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome, ajuda, rotulos=()):
+        return self._obter(Medidor, nome, ajuda, rotulos)
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        return self._obter(Histograma, nome, ajuda, rotulos, limites=limites)
+
+    def exportar_prometheus(self):
+        """Todas as metricas no formato texto de exposicao do Prometheus (0.0.4)."""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda metrica: metrica.nome)
+        linhas = []
+        for metrica in metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica._linhas_prometheus())
+        return '\n'.join(linhas) + '\n'
+
+    def instantaneo(self):
+        """Dicionario serializavel em JSON com o valor atual de todas as metricas."""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda metrica: metrica.nome)
+        return {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'metricas': {metrica.nome: {'tipo': metrica.tipo, 'ajuda': metrica.ajuda,
+                                        'series': metrica._instantaneo()}
+                         for metrica in metricas},
+        }
+
+
+# --- INSTRUMENTACAO ---
+
+def medir_operacao(operacao, falha=None):
+    """
+    Decorador que mede latencia e resultado de uma operacao.
+
+    Excecoes contam como resultado 'erro' (e sao propagadas); falha e um
+    predicado opcional sobre o retorno para as funcoes que sinalizam erro
+    pelo valor retornado (ex.: False/None).
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            registro = obter_registro_metricas()
+            inicio = time.perf_counter()
+            resultado = 'erro'
+            try:
+                retorno = funcao(*args, **kwargs)
+                resultado = 'erro' if falha is not None and falha(retorno) else 'ok'
+                return retorno
+            finally:
+                registro.histograma('farmtech_operacao_segundos', "Latencia das operacoes (segundos)",
+                                    ('operacao',)).observar(time.perf_counter() - inicio, operacao=operacao)
+                registro.contador('farmtech_operacao_total', "Chamadas das operacoes por resultado",
+                                  ('operacao', 'resultado')).inc(operacao=operacao, resultado=resultado)
+        return medida
+    return decorador
+
+
+def falhou(retorno):
+    """Predicado de falha das funcoes que retornam False ou None em caso de erro."""
+    return retorno is False or retorno is None
+
+
+def contar_leituras(quantidade, caminho):
+    """Soma leituras gravadas no banco (caminho: 'lote' ou 'unitaria')."""
+    if quantidade:
+        obter_registro_metricas().contador(
+            'farmtech_leituras_gravadas_total', "Leituras ESP32 gravadas no banco", ('caminho',)
+        ).inc(quantidade, caminho=caminho)
+
+
+def registrar_metricas_lote(gravadas, duplicadas, rejeitadas, lag, fila):
+    """Metricas de um lote da ingestao continua (farmtech_ingestao)."""
+    registro = obter_registro_metricas()
+    leituras = registro.contador('farmtech_ingestao_leituras_total', "Leituras da ingestao por resultado",
+                                 ('resultado',))
+    for resultado, quantidade in (('gravada', gravadas), ('duplicada', duplicadas), ('rejeitada', rejeitadas)):
+        if quantidade:
+            leituras.inc(quantidade, resultado=resultado)
+    registro.histograma('farmtech_ingestao_lag_segundos',
+                        "Atraso da chegada do frame mais antigo do lote ate a gravacao").observar(lag)
+    registro.medidor('farmtech_ingestao_fila', "Leituras aguardando gravacao na fila").definir(fila)
+
+
+# --- ENDPOINT HTTP ---
+
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+    registro = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            corpo = self.registro.exportar_prometheus().encode('utf-8')
+            tipo = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.split('?')[0] == '/metrics.json':
+            corpo = json.dumps(self.registro.instantaneo()).encode('utf-8')
+            tipo = 'application/json'
+        else:
+            self.send_error(404, "Use /metrics ou /metrics.json")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(f"Metricas HTTP: {formato % args}")
+
+
+def iniciar_servidor(porta, endereco=ENDERECO_PADRAO, registro=None):
+    """Sobe o endpoint HTTP das metricas em uma thread daemon e retorna o servidor."""
+    manipulador = type('ManipuladorMetricas', (_ManipuladorMetricas,),
+                       {'registro': registro or obter_registro_metricas()})
+    servidor = ThreadingHTTPServer((endereco, int(porta)), manipulador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='metricas-http', daemon=True).start()
+    logger.info(f"Metricas em http://{endereco}:{servidor.server_address[1]}/metrics")
+    return servidor
+
+
+_registro = None
+_servidor = None
+_lock_registro = threading.Lock()
+
+
+def obter_registro_metricas():
+    """Retorna o registro de metricas compartilhado (por processo)."""
+    global _registro, _servidor
+    if _registro is not None:
+        return _registro
+    with _lock_registro:
+        if _registro is None:
+            registro = RegistroMetricas()
+            if PORTA_PADRAO:
+                try:
+                    _servidor = iniciar_servidor(PORTA_PADRAO, registro=registro)
+                except OSError as e:
+                    logger.warning(f"Endpoint de metricas nao iniciado na porta {PORTA_PADRAO}: {e}")
+            _registro = registro
+        return _registro
+
+
+def _exibir_instantaneo(dados):
+    print(f"METRICAS ({dados['gerado_em']})")
+    for nome, metrica in dados['metricas'].items():
+        for serie in metrica['series']:
+            rotulos = ','.join(f"{chave}={valor}" for chave, valor in serie['rotulos'].items())
+            if metrica['tipo'] == 'histogram':
+                quantis = ' | '.join(f"{q}: {serie[q] * 1000:.2f}ms" for q in ('p50', 'p90', 'p99')
+                                     if serie[q] is not None)
+                print(f"  {nome}{{{rotulos}}}: {serie['quantidade']} obs. | {quantis}")
+            else:
+                print(f"  {nome}{{{rotulos}}}: {serie['valor']}")
+
+
+def main():
+    """Consulta o endpoint de metricas de um processo em execucao."""
+    parser = argparse.ArgumentParser(description="Metricas FarmTech")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_consultar = subparsers.add_parser('consultar', help="Resumo (p50/p90/p99) do endpoint /metrics.json")
+    p_consultar.add_argument('--url', default=f"http://{ENDERECO_PADRAO}:{PORTA_PADRAO or 9464}")
+    p_consultar.add_argument('--json', help="Grava o instantaneo JSON no arquivo")
+
+    args = parser.parse_args()
+
+    with urllib.request.urlopen(f"{args.url.rstrip('/')}/metrics.json", timeout=10) as resposta:
+        dados = json.load(resposta)
+    _exibir_instantaneo(dados)
+    if args.json:
+        with open(args.json, 'w') as arquivo:
+            json.dump(dados, arquivo, indent=2)
+        print(f"Instantaneo gravado em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
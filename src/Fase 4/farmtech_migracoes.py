@@ -0,0 +1,557 @@
+"""
+FarmTech Solutions - Migracoes de Esquema
+Evolucao versionada do banco Oracle da Fase 3
+
+Cada migracao tem um numero de versao e e aplicada uma unica vez; a
+versao atual do esquema fica registrada na tabela T_SCHEMA_VERSAO.
+
+Uso:
+    python farmtech_migracoes.py status
+    python farmtech_migracoes.py migrar [--modo alter|copia] [--lote 5000]
+
+O modo padrao 'alter' roda com o sistema em uso. O modo 'copia' da
+migracao 1 e offline: pare todas as escritas antes de executa-lo.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import argparse
+import logging
+from farmtech_backend import tabela_existe
+from farmtech_chaves import criar_sequencias, incremento_sequencia
+from farmtech_database import FarmTechOracleManager
+from farmtech_leituras import NOMES_SENSORES, TIPO_DISPOSITIVO_ESP32, DISPOSITIVO_PADRAO
+from farmtech_rollups import TABELAS_ROLLUP
+
+logger = logging.getLogger(__name__)
+
+# Bloco de chaves de medicao apos a ampliacao (antes limitado pelo NUMBER(3))
+BLOCO_CHAVES_MEDICOES = 1000
+
+
+# --- MIGRACAO 1: AMPLIACAO DAS CHAVES ---
+
+# Colunas ampliadas por tabela, em ordem de dependencia (pais antes dos filhos)
+COLUNAS_AMPLIADAS = {
+    'T_SENSORES': {'cod_sensor': 'NUMBER(18)'},
+    'T_MEDICOES': {'cod_medicao': 'NUMBER(18)', 'cod_sensor': 'NUMBER(18)',
+                   'valor_medicao': 'NUMBER(10,2)'},
+    'T_SUGESTOES': {'cod_medicao': 'NUMBER(18)', 'cod_sugestao': 'NUMBER(18)',
+                    'cod_sensor': 'NUMBER(18)'},
+    'T_APLICACOES': {'cod_medicao': 'NUMBER(18)', 'cod_sugestao': 'NUMBER(18)',
+                     'cod_sensor': 'NUMBER(18)', 'cod_aplicacao': 'NUMBER(18)'},
+}
+
+# Chave usada para ordenar a copia em lotes
+CHAVES_COPIA = {
+    'T_SENSORES': 'cod_sensor',
+    'T_MEDICOES': 'cod_medicao, cod_sensor',
+    'T_SUGESTOES': 'cod_sugestao, cod_medicao, cod_sensor',
+    'T_APLICACOES': 'cod_aplicacao, cod_medicao, cod_sugestao, cod_sensor',
+}
+
+# Restricoes das tabelas copiadas (mesmas do SCRIPT_DDL_PROJETO_FASE2_CAP1.SQL),
+# removidas das tabelas antigas e recriadas nas novas durante a troca: (nome, sql)
+REMOCAO_RESTRICOES = [
+    ('FK_APLIC_SUG', "ALTER TABLE T_APLICACOES DROP CONSTRAINT FK_APLIC_SUG"),
+    ('FK_APLIC_CUL', "ALTER TABLE T_APLICACOES DROP CONSTRAINT FK_APLIC_CUL"),
+    ('PK_APLIC', "ALTER TABLE T_APLICACOES DROP CONSTRAINT PK_APLIC"),
+    ('APLIC__IDX', "DROP INDEX APLIC__IDX"),
+    ('FK_SUG_MED', "ALTER TABLE T_SUGESTOES DROP CONSTRAINT FK_SUG_MED"),
+    ('PK_SUG', "ALTER TABLE T_SUGESTOES DROP CONSTRAINT PK_SUG"),
+    ('T_SUG__IDX', "DROP INDEX T_SUG__IDX"),
+    ('FK_MED_SENS', "ALTER TABLE T_MEDICOES DROP CONSTRAINT FK_MED_SENS"),
+    ('PK_MED', "ALTER TABLE T_MEDICOES DROP CONSTRAINT PK_MED"),
+    ('FK_SENS_CUL', "ALTER TABLE T_SENSORES DROP CONSTRAINT FK_SENS_CUL"),
+    ('PK_SENS', "ALTER TABLE T_SENSORES DROP CONSTRAINT PK_SENS"),
+    ('UN_SENSORES_NOME', "ALTER TABLE T_SENSORES DROP CONSTRAINT UN_SENSORES_NOME"),
+    ('UN_SENSORES_LATITUDE', "ALTER TABLE T_SENSORES DROP CONSTRAINT UN_SENSORES_LATITUDE"),
+    ('UN_SENSORES_LONGITUDE', "ALTER TABLE T_SENSORES DROP CONSTRAINT UN_SENSORES_LONGITUDE"),
+    ('CK_SENSORES_VLRMIN', "ALTER TABLE T_SENSORES DROP CONSTRAINT CK_SENSORES_VLRMIN"),
+    ('CK_SENSORES_VLRMAX', "ALTER TABLE T_SENSORES DROP CONSTRAINT CK_SENSORES_VLRMAX"),
+]
+
+CRIACAO_RESTRICOES = [
+    ('PK_SENS', "ALTER TABLE T_SENSORES ADD CONSTRAINT PK_SENS PRIMARY KEY (cod_sensor)"),
+    ('UN_SENSORES_NOME', "ALTER TABLE T_SENSORES ADD CONSTRAINT UN_SENSORES_NOME UNIQUE (nm_sensor)"),
+    ('UN_SENSORES_LATITUDE', "ALTER TABLE T_SENSORES ADD CONSTRAINT UN_SENSORES_LATITUDE "
+     "UNIQUE (latitude_instalacao)"),
+    ('UN_SENSORES_LONGITUDE', "ALTER TABLE T_SENSORES ADD CONSTRAINT UN_SENSORES_LONGITUDE "
+     "UNIQUE (longitude_instalacao)"),
+    ('CK_SENSORES_VLRMIN', "ALTER TABLE T_SENSORES ADD CONSTRAINT CK_SENSORES_VLRMIN CHECK (valor_minimo > 0)"),
+    ('CK_SENSORES_VLRMAX', "ALTER TABLE T_SENSORES ADD CONSTRAINT CK_SENSORES_VLRMAX CHECK (valor_maximo > 0)"),
+    ('FK_SENS_CUL', "ALTER TABLE T_SENSORES ADD CONSTRAINT FK_SENS_CUL FOREIGN KEY (cod_cultura) "
+     "REFERENCES T_CULTURAS (cod_cultura)"),
+    ('PK_MED', "ALTER TABLE T_MEDICOES ADD CONSTRAINT PK_MED PRIMARY KEY (cod_medicao, cod_sensor)"),
+    ('FK_MED_SENS', "ALTER TABLE T_MEDICOES ADD CONSTRAINT FK_MED_SENS FOREIGN KEY (cod_sensor) "
+     "REFERENCES T_SENSORES (cod_sensor)"),
+    ('T_SUG__IDX', "CREATE UNIQUE INDEX T_SUG__IDX ON T_SUGESTOES (cod_medicao ASC, cod_sensor ASC)"),
+    ('PK_SUG', "ALTER TABLE T_SUGESTOES ADD CONSTRAINT PK_SUG PRIMARY KEY "
+     "(cod_sugestao, cod_medicao, cod_sensor)"),
+    ('FK_SUG_MED', "ALTER TABLE T_SUGESTOES ADD CONSTRAINT FK_SUG_MED FOREIGN KEY (cod_medicao, cod_sensor) "
+     "REFERENCES T_MEDICOES (cod_medicao, cod_sensor)"),
+    ('APLIC__IDX', "CREATE UNIQUE INDEX APLIC__IDX ON T_APLICACOES "
+     "(cod_sugestao ASC, cod_medicao ASC, cod_sensor ASC)"),
+    ('PK_APLIC', "ALTER TABLE T_APLICACOES ADD CONSTRAINT PK_APLIC PRIMARY KEY "
+     "(cod_aplicacao, cod_medicao, cod_sugestao, cod_sensor)"),
+    ('FK_APLIC_CUL', "ALTER TABLE T_APLICACOES ADD CONSTRAINT FK_APLIC_CUL FOREIGN KEY (cod_cultura) "
+     "REFERENCES T_CULTURAS (cod_cultura)"),
+    ('FK_APLIC_SUG', "ALTER TABLE T_APLICACOES ADD CONSTRAINT FK_APLIC_SUG "
+     "FOREIGN KEY (cod_sugestao, cod_medicao, cod_sensor) "
+     "REFERENCES T_SUGESTOES (cod_sugestao, cod_medicao, cod_sensor)"),
+]
+
+
+def _clausula_modify(colunas):
+    """Monta a lista '(col TIPO, ...)' de um ALTER TABLE ... MODIFY."""
+    return ", ".join(f"{coluna} {tipo}" for coluna, tipo in colunas.items())
+
+
+def _objeto_existe(cursor, nome):
+    """Indica se ha uma restricao ou um indice com o nome no esquema do usuario."""
+    cursor.execute("""
+    SELECT COUNT(*) FROM (
+        SELECT constraint_name FROM USER_CONSTRAINTS WHERE constraint_name = :nome
+        UNION ALL
+        SELECT index_name FROM USER_INDEXES WHERE index_name = :nome
+    )
+    """, nome=nome)
+    return cursor.fetchone()[0] > 0
+
+
+def _copiar_em_lotes(conn, origem, destino, ordem, tamanho_lote):
+    """
+    Copia para destino as linhas de origem que ainda nao estao la, em lotes de tamanho_lote.
+
+    Cada lote e confirmado ao ser gravado; as linhas ja copiadas (pela
+    chave em ordem) sao puladas, entao uma copia interrompida continua de
+    onde parou.
+    """
+    leitura = conn.cursor()
+    escrita = conn.cursor()
+    leitura.arraysize = tamanho_lote
+    leitura.prefetchrows = tamanho_lote + 1
+
+    chaves = [chave.strip() for chave in ordem.split(',')]
+    copiada = " AND ".join(f"d.{chave} = o.{chave}" for chave in chaves)
+    leitura.execute(f"""
+    SELECT o.* FROM {origem} o
+    WHERE NOT EXISTS (SELECT 1 FROM {destino} d WHERE {copiada})
+    ORDER BY {', '.join(f'o.{chave}' for chave in chaves)}
+    """)
+    colunas = [desc[0] for desc in leitura.description]
+    sql_insert = (f"INSERT INTO {destino} ({', '.join(colunas)}) "
+                  f"VALUES ({', '.join(f':{i + 1}' for i in range(len(colunas)))})")
+
+    total = 0
+    while True:
+        lote = leitura.fetchmany(tamanho_lote)
+        if not lote:
+            break
+        escrita.executemany(sql_insert, lote)
+        conn.commit()
+        total += len(lote)
+        logger.info(f"{origem}: {total} linhas copiadas")
+
+    leitura.close()
+    escrita.close()
+    return total
+
+
+def _m001_ampliar_chaves(conn, cursor, modo, tamanho_lote):
+    """
+    Amplia as chaves NUMBER(3) para NUMBER(18) e valor_medicao para NUMBER(10,2).
+
+    modo='alter': ALTER TABLE ... MODIFY em cada tabela. Aumentar a precisao
+    de um NUMBER so altera o dicionario de dados, sem reescrever as linhas,
+    por isso pode ser feito com o sistema em uso.
+
+    modo='copia': cria tabelas novas ja com os tipos ampliados, copia os dados
+    existentes em lotes (commit a cada lote) e troca as tabelas ao final. As
+    tabelas originais sao mantidas como <TABELA>_OLD. E um passo offline: a
+    copia nao acompanha linhas alteradas ou apagadas depois de copiadas, e
+    as gravacoes feitas durante a troca se perdem, entao todas as escritas
+    (ingestao, importacoes, CRUD) devem estar paradas do inicio ao fim. Use
+    o modo 'alter' para migrar com o sistema em uso. Como os lotes e o DDL
+    sao confirmados antes da versao ser registrada, cada passo verifica o
+    que ja foi feito: uma execucao interrompida pode ser repetida e continua
+    de onde parou.
+
+    Nos dois modos, se SEQ_MEDICOES ja existe, o seu INCREMENT BY passa a
+    BLOCO_CHAVES_MEDICOES; os processos em execucao adotam o novo bloco na
+    proxima reserva (farmtech_chaves le o incremento a cada NEXTVAL), sem
+    reiniciar. Sem a sequence nada e feito: a migracao 7 a cria ja com esse
+    bloco.
+    """
+    if modo == 'alter':
+        for tabela, colunas in COLUNAS_AMPLIADAS.items():
+            cursor.execute(f"ALTER TABLE {tabela} MODIFY ({_clausula_modify(colunas)})")
+            logger.info(f"{tabela}: colunas ampliadas ({', '.join(colunas)})")
+
+    elif modo == 'copia':
+        # A troca so comeca depois de todas as copias e da remocao das restricoes:
+        # com alguma <TABELA>_OLD criada, essas duas fases ja terminaram
+        trocadas = [tabela for tabela in COLUNAS_AMPLIADAS if tabela_existe(cursor, f"{tabela}_OLD")]
+        if not trocadas:
+            for tabela, colunas in COLUNAS_AMPLIADAS.items():
+                nova = f"{tabela}_NOVA"
+                if not tabela_existe(cursor, nova):
+                    cursor.execute(f"CREATE TABLE {nova} AS SELECT * FROM {tabela} WHERE 1 = 0")
+                    cursor.execute(f"ALTER TABLE {nova} MODIFY ({_clausula_modify(colunas)})")
+                total = _copiar_em_lotes(conn, tabela, nova, CHAVES_COPIA[tabela], tamanho_lote)
+                print(f"   {tabela}: {total} linhas copiadas")
+
+            for nome, sql in REMOCAO_RESTRICOES:
+                if _objeto_existe(cursor, nome):
+                    cursor.execute(sql)
+
+        for tabela in COLUNAS_AMPLIADAS:
+            if not tabela_existe(cursor, f"{tabela}_OLD"):
+                cursor.execute(f"ALTER TABLE {tabela} RENAME TO {tabela}_OLD")
+            if tabela_existe(cursor, f"{tabela}_NOVA"):
+                cursor.execute(f"ALTER TABLE {tabela}_NOVA RENAME TO {tabela}")
+        for nome, sql in CRIACAO_RESTRICOES:
+            if not _objeto_existe(cursor, nome):
+                cursor.execute(sql)
+
+    else:
+        raise ValueError(f"Modo de migracao invalido: {modo}")
+
+    # Com chaves largas o bloco de codigos de medicao (farmtech_chaves) pode crescer.
+    # Aumentar o INCREMENT BY nao sobrepoe blocos ja distribuidos.
+    if incremento_sequencia(cursor, 'SEQ_MEDICOES') is not None:
+        cursor.execute(f"ALTER SEQUENCE SEQ_MEDICOES INCREMENT BY {BLOCO_CHAVES_MEDICOES}")
+
+
+# --- MIGRACAO 2: LAYOUT LARGO DAS LEITURAS ESP32 ---
+
+def _m002_tabela_leituras(conn, cursor, modo, tamanho_lote):
+    """
+    Cria T_LEITURAS_ESP32 (uma linha por leitura) e a visao V_MEDICOES.
+
+    As chaves de T_LEITURAS_ESP32 saem do mesmo alocador de T_MEDICOES, de
+    modo que V_MEDICOES pode unir os dois layouts no formato EAV da Fase 3
+    (cod_medicao, data_hora_medicao, valor_medicao, un_medicao, cod_sensor)
+    sem conflito de codigos.
+    """
+    cursor.execute("""
+    CREATE TABLE T_LEITURAS_ESP32 (
+        cod_leitura       NUMBER(18) NOT NULL,
+        data_hora_leitura TIMESTAMP WITH LOCAL TIME ZONE NOT NULL,
+        fosforo           NUMBER(1) NOT NULL,
+        potassio          NUMBER(1) NOT NULL,
+        ph                NUMBER(4,2) NOT NULL,
+        umidade           NUMBER(5,2) NOT NULL,
+        bomba             NUMBER(1) NOT NULL,
+        CONSTRAINT PK_LEIT PRIMARY KEY (cod_leitura)
+    )
+    """)
+    cursor.execute("CREATE INDEX IX_LEIT_DATA ON T_LEITURAS_ESP32 (data_hora_leitura, cod_leitura)")
+
+    nomes = ", ".join(f"'{nome}'" for nome in NOMES_SENSORES.values())
+    cursor.execute(_sql_visao_medicoes(f"CROSS JOIN T_SENSORES s WHERE s.nm_sensor IN ({nomes})"))
+
+
+def _sql_visao_medicoes(juncao_sensores):
+    """DDL de V_MEDICOES; juncao_sensores liga cada leitura larga (l) aos sensores (s) que a fizeram."""
+    return f"""
+    CREATE OR REPLACE VIEW V_MEDICOES AS
+    SELECT cod_medicao, data_hora_medicao, valor_medicao, un_medicao, cod_sensor
+    FROM T_MEDICOES
+    UNION ALL
+    SELECT l.cod_leitura, l.data_hora_leitura,
+           CASE s.tipo_sensor
+               WHEN 'FO' THEN l.fosforo
+               WHEN 'PO' THEN l.potassio
+               WHEN 'PH' THEN l.ph
+               WHEN 'UM' THEN l.umidade
+               ELSE l.bomba
+           END,
+           s.unidade, s.cod_sensor
+    FROM T_LEITURAS_ESP32 l
+    {juncao_sensores}
+    """
+
+
+# --- MIGRACAO 3: CLASSIFICACAO DOS SENSORES E INDICES ---
+
+def _m003_classificacao_sensores(conn, cursor, modo, tamanho_lote):
+    """
+    Classifica os sensores por dispositivo e cria os indices das consultas ESP32.
+
+    As consultas filtravam os sensores com nm_sensor LIKE '%ESP32%', predicado
+    que nenhum indice atende. Com tipo_dispositivo/cod_dispositivo (e a
+    grandeza ja presente em tipo_sensor) o filtro vira igualdade sobre
+    IX_SENS_DISP, e IX_MED_SENS_DATA leva de cada sensor as suas medicoes
+    em ordem de tempo sem varrer T_MEDICOES. O indice inclui valor_medicao
+    para que as consultas das leituras nao precisem acessar a tabela.
+    """
+    cursor.execute("""
+    ALTER TABLE T_SENSORES ADD (
+        tipo_dispositivo VARCHAR2(10),
+        cod_dispositivo  VARCHAR2(20)
+    )
+    """)
+
+    nomes = ", ".join(f"'{nome}'" for nome in NOMES_SENSORES.values())
+    cursor.execute(
+        f"UPDATE T_SENSORES SET tipo_dispositivo = :1, cod_dispositivo = :2 WHERE nm_sensor IN ({nomes})",
+        [TIPO_DISPOSITIVO_ESP32, DISPOSITIVO_PADRAO]
+    )
+    logger.info(f"{cursor.rowcount} sensores classificados como {TIPO_DISPOSITIVO_ESP32}")
+    conn.commit()
+
+    cursor.execute("CREATE INDEX IX_SENS_DISP ON T_SENSORES "
+                   "(tipo_dispositivo, cod_dispositivo, tipo_sensor, cod_sensor)")
+    cursor.execute("CREATE INDEX IX_MED_SENS_DATA ON T_MEDICOES "
+                   "(cod_sensor, data_hora_medicao, cod_medicao, valor_medicao)")
+
+    cursor.execute(_sql_visao_medicoes(
+        f"CROSS JOIN T_SENSORES s WHERE s.tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}' "
+        f"AND s.cod_dispositivo = '{DISPOSITIVO_PADRAO}'"
+    ))
+
+
+# --- MIGRACAO 4: CHECKPOINT DOS SPOOLS LOCAIS ---
+
+def _m004_checkpoint_spool(conn, cursor, modo, tamanho_lote):
+    """
+    Cria T_INGESTAO_CHECKPOINT, com a ultima seq aplicada de cada spool local.
+
+    A linha do spool e atualizada na mesma transacao dos INSERTs de cada
+    lote drenado (farmtech_spool), o que torna o reenvio idempotente.
+    """
+    cursor.execute("""
+    CREATE TABLE T_INGESTAO_CHECKPOINT (
+        id_spool         VARCHAR2(36) NOT NULL,
+        ultima_seq       NUMBER(18) NOT NULL,
+        data_atualizacao TIMESTAMP WITH LOCAL TIME ZONE NOT NULL,
+        CONSTRAINT PK_INGESTAO_CHECKPOINT PRIMARY KEY (id_spool)
+    )
+    """)
+
+
+# --- MIGRACAO 5: ROLLUPS POR MINUTO, HORA E DIA ---
+
+def _m005_tabelas_rollup(conn, cursor, modo, tamanho_lote):
+    """
+    Cria T_ROLLUP_MINUTO, T_ROLLUP_HORA e T_ROLLUP_DIA.
+
+    Cada linha resume as medicoes de um sensor em um periodo (quantidade,
+    soma, soma dos quadrados, minimo, maximo, ultimo valor e tempo de bomba
+    ligada). As tabelas sao index-organized pela chave (cod_sensor,
+    inicio_periodo): o MERGE incremental da ingestao e as consultas por
+    intervalo leem so o trecho do indice do sensor. O historico anterior e
+    carregado com 'python farmtech_rollups.py reconstruir'.
+    """
+    for tabela in TABELAS_ROLLUP.values():
+        cursor.execute(f"""
+        CREATE TABLE {tabela} (
+            cod_sensor      NUMBER(18) NOT NULL,
+            inicio_periodo  DATE NOT NULL,
+            quantidade      NUMBER(18) NOT NULL,
+            soma            NUMBER NOT NULL,
+            soma_quadrados  NUMBER NOT NULL,
+            minimo          NUMBER NOT NULL,
+            maximo          NUMBER NOT NULL,
+            ultimo_valor    NUMBER NOT NULL,
+            ultimo_instante TIMESTAMP NOT NULL,
+            segundos_bomba  NUMBER DEFAULT 0 NOT NULL,
+            CONSTRAINT PK_{tabela[2:]} PRIMARY KEY (cod_sensor, inicio_periodo)
+        ) ORGANIZATION INDEX
+        """)
+
+
+# --- MIGRACAO 6: ORIGEM DAS LEITURAS (DEDUPLICACAO) ---
+
+def _m006_origem_leituras(conn, cursor, modo, tamanho_lote):
+    """
+    Cria T_LEITURAS_ORIGEM, com a chave (dispositivo, contador) de cada leitura.
+
+    A chave primaria recusa a segunda gravacao da mesma leitura do
+    firmware (farmtech_dedup). A tabela e index-organized: o filtro de
+    duplicatas le os contadores de um dispositivo e confirma os suspeitos
+    direto no indice. Leituras gravadas antes desta migracao nao tem
+    origem registrada.
+    """
+    cursor.execute("""
+    CREATE TABLE T_LEITURAS_ORIGEM (
+        id_dispositivo VARCHAR2(40) NOT NULL,
+        contador       NUMBER(18) NOT NULL,
+        cod_medicao    NUMBER(18) NOT NULL,
+        data_registro  TIMESTAMP NOT NULL,
+        CONSTRAINT PK_LEITURAS_ORIGEM PRIMARY KEY (id_dispositivo, contador)
+    ) ORGANIZATION INDEX
+    """)
+
+
+# --- MIGRACAO 7: SEQUENCES DAS CHAVES ---
+
+def _m007_sequencias_chaves(conn, cursor, modo, tamanho_lote):
+    """
+    Cria as sequences de farmtech_chaves que ainda nao existem.
+
+    SEQ_MEDICOES usa o bloco BLOCO_CHAVES_MEDICOES (ver migracao 1); as
+    demais, o bloco padrao de farmtech_chaves. O DDL fica aqui, fora da
+    gravacao, porque no Oracle ele faz commit implicito da transacao.
+    """
+    for sequencia in criar_sequencias(cursor, blocos={'T_MEDICOES': BLOCO_CHAVES_MEDICOES}):
+        print(f"   {sequencia} criada")
+
+
+# --- MIGRACAO 8: DISPOSITIVO DAS LEITURAS LARGAS ---
+
+def _m008_dispositivo_leituras(conn, cursor, modo, tamanho_lote):
+    """
+    Acrescenta cod_dispositivo a T_LEITURAS_ESP32 e liga V_MEDICOES por ele.
+
+    Sem a coluna o layout largo nao sabia de qual dispositivo veio cada
+    leitura: os rollups incrementais usavam o dispositivo real, mas
+    V_MEDICOES (e a reconstrucao dos rollups), o filtro de cultura das
+    estatisticas e a cultura da exportacao Parquet atribuiam tudo ao
+    dispositivo padrao. Com DEFAULT a coluna NOT NULL e acrescentada so no
+    dicionario, sem regravar a tabela; as leituras ja gravadas ficam com o
+    dispositivo padrao, o unico que elas podiam ter no Oracle antes desta
+    versao.
+    """
+    cursor.execute(f"""
+    ALTER TABLE T_LEITURAS_ESP32 ADD (
+        cod_dispositivo VARCHAR2(20) DEFAULT '{DISPOSITIVO_PADRAO}' NOT NULL
+    )
+    """)
+    cursor.execute(_sql_visao_medicoes(
+        f"JOIN T_SENSORES s ON s.tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}' "
+        f"AND s.cod_dispositivo = l.cod_dispositivo"
+    ))
+
+
+# --- MIGRACAO 9: INDICE POR DATA DAS MEDICOES ---
+
+def _m009_indice_data_medicoes(conn, cursor, modo, tamanho_lote):
+    """
+    Cria IX_MED_DATA (data_hora_medicao, cod_medicao, cod_sensor) em T_MEDICOES.
+
+    A paginacao do layout EAV (farmtech_paginacao) le este indice em ordem
+    decrescente e filtra os sensores da bomba pelo cod_sensor das proprias
+    entradas: cada pagina para apos limite leituras, qualquer que seja o
+    numero de dispositivos ESP32.
+    """
+    cursor.execute("CREATE INDEX IX_MED_DATA ON T_MEDICOES (data_hora_medicao, cod_medicao, cod_sensor)")
+
+
+# Lista ordenada de migracoes: (versao, descricao, funcao)
+MIGRACOES = [
+    (1, "Amplia chaves NUMBER(3) e valor_medicao", _m001_ampliar_chaves),
+    (2, "Cria T_LEITURAS_ESP32 e visao V_MEDICOES", _m002_tabela_leituras),
+    (3, "Classifica sensores por dispositivo e cria indices", _m003_classificacao_sensores),
+    (4, "Cria T_INGESTAO_CHECKPOINT para os spools locais", _m004_checkpoint_spool),
+    (5, "Cria as tabelas de rollup por minuto, hora e dia", _m005_tabelas_rollup),
+    (6, "Cria T_LEITURAS_ORIGEM para a deduplicacao", _m006_origem_leituras),
+    (7, "Cria as sequences das chaves primarias", _m007_sequencias_chaves),
+    (8, "Acrescenta cod_dispositivo a T_LEITURAS_ESP32", _m008_dispositivo_leituras),
+    (9, "Cria IX_MED_DATA para a paginacao das leituras", _m009_indice_data_medicoes),
+]
+
+
+# --- CONTROLE DE VERSAO ---
+
+def _garantir_tabela_versao(cursor):
+    """Cria a tabela T_SCHEMA_VERSAO se ainda nao existir."""
+    if not tabela_existe(cursor, 'T_SCHEMA_VERSAO'):
+        cursor.execute("""
+        CREATE TABLE T_SCHEMA_VERSAO (
+            versao         NUMBER(5) PRIMARY KEY,
+            descricao      VARCHAR2(100) NOT NULL,
+            data_aplicacao TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+        )
+        """)
+
+
+def versao_atual(cursor):
+    """Retorna a maior versao de esquema aplicada (0 se nenhuma)."""
+    _garantir_tabela_versao(cursor)
+    cursor.execute("SELECT NVL(MAX(versao), 0) FROM T_SCHEMA_VERSAO")
+    return cursor.fetchone()[0]
+
+
+def aplicar_migracoes(manager=None, modo='alter', tamanho_lote=5000):
+    """
+    Aplica em ordem as migracoes pendentes.
+
+    Cada migracao e registrada em T_SCHEMA_VERSAO logo apos terminar, de modo
+    que uma execucao interrompida retoma a partir da migracao que falhou.
+    """
+    manager = manager or FarmTechOracleManager()
+    if manager.backend.nome != 'oracle':
+        print(f"Migracoes se aplicam ao Oracle; o esquema de {manager.backend} e criado completo ao conectar")
+        return True
+    if not manager.connect():
+        return False
+
+    try:
+        atual = versao_atual(manager.cursor)
+        pendentes = [m for m in MIGRACOES if m[0] > atual]
+        if not pendentes:
+            print(f"Esquema ja esta na versao {atual}")
+            return True
+
+        for versao, descricao, funcao in pendentes:
+            print(f"Aplicando migracao {versao}: {descricao}...")
+            funcao(manager.conn, manager.cursor, modo, tamanho_lote)
+            manager.cursor.execute(
+                "INSERT INTO T_SCHEMA_VERSAO (versao, descricao) VALUES (:1, :2)",
+                [versao, descricao]
+            )
+            manager.conn.commit()
+            logger.info(f"Migracao {versao} aplicada")
+
+        print(f"Esquema atualizado para a versao {pendentes[-1][0]}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Erro ao aplicar migracoes: {e}")
+        manager.conn.rollback()
+        return False
+    finally:
+        manager.disconnect()
+
+
+def exibir_status(manager=None):
+    """Mostra a versao atual e as migracoes pendentes."""
+    manager = manager or FarmTechOracleManager()
+    if manager.backend.nome != 'oracle':
+        print(f"Esquema de {manager.backend} criado pelo backend (equivale as migracoes 1 a 4 e 6 a 9)")
+        return
+    if not manager.connect():
+        return
+    try:
+        atual = versao_atual(manager.cursor)
+        print(f"Versao atual do esquema: {atual}")
+        for versao, descricao, _ in MIGRACOES:
+            estado = "aplicada" if versao <= atual else "pendente"
+            print(f"   {versao}: {descricao} [{estado}]")
+    finally:
+        manager.disconnect()
+
+
+def main():
+    """Interface de linha de comando das migracoes."""
+    parser = argparse.ArgumentParser(description="Migracoes de esquema FarmTech")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    subparsers.add_parser('status', help="Exibe a versao do esquema")
+    p_migrar = subparsers.add_parser('migrar', help="Aplica as migracoes pendentes")
+    p_migrar.add_argument('--modo', choices=['alter', 'copia'], default='alter',
+                          help="Migracao 1: 'alter' (online) ou 'copia' (offline, escritas paradas)")
+    p_migrar.add_argument('--lote', type=int, default=5000)
+
+    args = parser.parse_args()
+
+    if args.comando == 'status':
+        exibir_status()
+    elif args.comando == 'migrar':
+        aplicar_migracoes(modo=args.modo, tamanho_lote=args.lote)
+
+
+if __name__ == "__main__":
+    main()
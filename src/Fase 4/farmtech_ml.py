@@ -10,6 +10,7 @@ Autor: FarmTech Solutions
 Data: Junho 2025
 """
 
+import os
 import oracledb
 import pandas as pd
 import numpy as np
@@ -22,23 +23,40 @@ import joblib
 import logging
 from datetime import datetime, timedelta
 import warnings
+from farmtech_backend import criar_backend, ERROS_BANCO
+from farmtech_leituras import COLUNAS_LEITURA, validar_layout, sql_leituras
+from farmtech_exportacao import abrir_dataset
+from farmtech_colunar import ArmazemColunar
+from farmtech_metricas import medir_operacao, falhou
+from farmtech_logs import configurar_logs
 warnings.filterwarnings('ignore')
 
-# Configuracao de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Configuracao de logging (console; o arquivo vem de farmtech_database, se importado antes)
+configurar_logs(arquivo=None)
 logger = logging.getLogger(__name__)
 
+# Dataset Parquet exportado por farmtech_exportacao (treino sem acessar o Oracle)
+DATASET_PADRAO = os.environ.get('FARMTECH_DATASET')
+
+# Armazem colunar alimentado pela ingestao (farmtech_colunar)
+COLUNAR_PADRAO = os.environ.get('FARMTECH_COLUNAR_DIR')
+
 class FarmTechMLPredictor:
     """
     Classe para predicao inteligente de irrigacao usando Machine Learning.
     Utiliza dados historicos dos sensores ESP32 para treinar modelos preditivos.
     """
     
-    def __init__(self):
-        """Inicializa o preditor ML com configuracoes Oracle da Fase 3."""
+    def __init__(self, layout=None, dataset=DATASET_PADRAO, backend=None, colunar=COLUNAR_PADRAO):
+        """
+        Inicializa o preditor ML com configuracoes Oracle da Fase 3.
+
+        dataset: diretorio do dataset Parquet das leituras; quando informado,
+        o historico de treino e lido dele em vez do banco.
+        colunar: diretorio do armazem colunar; quando informado (e sem
+        dataset), o historico e lido das colunas mapeadas, sem copia.
+        backend: onde as sessoes sao obtidas (farmtech_backend; padrao FARMTECH_BACKEND).
+        """
         # Configuracoes de conexao Oracle (mesmas do sistema CRUD)
         self.host = "localhost"
         self.port = 1522
@@ -48,6 +66,15 @@ class FarmTechMLPredictor:
         
         self.conn = None
         self.cursor = None
+        self.backend = backend or criar_backend(
+            user=self.user, password=self.password,
+            dsn=oracledb.makedsn(self.host, self.port, service_name=self.service_name)
+        )
+
+        # Layout de armazenamento das leituras ('eav' ou 'largo')
+        self.layout = validar_layout(layout)
+        self.dataset = dataset
+        self.colunar = colunar
         
         # Modelos ML
         self.rf_model = None
@@ -58,47 +85,39 @@ class FarmTechMLPredictor:
         self.model_metrics = {}
 
     def connect(self):
-        """Estabelece conexao com o banco Oracle existente."""
+        """Obtem uma sessao do backend (pool Oracle da Fase 3 ou SQLite local)."""
         try:
-            dsn = oracledb.makedsn(self.host, self.port, service_name=self.service_name)
-            self.conn = oracledb.connect(user=self.user, password=self.password, dsn=dsn)
+            self.conn = self.backend.conectar()
             self.cursor = self.conn.cursor()
-            logger.info("Conectado ao Oracle para ML")
+            logger.debug(f"Sessao para ML obtida do backend {self.backend}")
             return True
-        except oracledb.DatabaseError as e:
-            logger.error(f"Erro de conexao Oracle ML: {e}")
+        except ERROS_BANCO as e:
+            logger.error(f"Erro de conexao ML ({self.backend}): {e}")
             return False
 
     def disconnect(self):
-        """Fecha a conexao com o banco."""
+        """Devolve a sessao ao pool."""
         if self.conn:
             if self.cursor:
                 self.cursor.close()
             self.conn.close()
             self.conn = None
             self.cursor = None
-            logger.info("Conexao Oracle ML encerrada")
+            logger.debug(f"Sessao ML devolvida ao backend {self.backend}")
 
     def carregar_dados_historicos(self):
         """Carrega dados historicos dos sensores ESP32 para treinamento."""
+        if self.dataset:
+            return self._carregar_dataset()
+        if self.colunar:
+            return self._carregar_colunar()
+
         if not self.connect():
             return None
             
         try:
-            # Query para buscar dados dos sensores ESP32
-            sql = """
-            SELECT 
-                m.cod_medicao,
-                m.data_hora_medicao,
-                s.nm_sensor,
-                m.valor_medicao
-            FROM T_MEDICOES m
-            JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
-            WHERE s.nm_sensor LIKE '%ESP32%'
-            ORDER BY m.cod_medicao, s.nm_sensor
-            """
-            
-            self.cursor.execute(sql)
+            # Uma linha por leitura completa, ja pivotada no banco
+            self.cursor.execute(sql_leituras(self.layout))
             rows = self.cursor.fetchall()
             
             if not rows:
@@ -106,29 +125,10 @@ class FarmTechMLPredictor:
                 return None
             
             # Converter para DataFrame
-            df = pd.DataFrame(rows, columns=['cod_medicao', 'timestamp', 'sensor', 'valor'])
-            
-            # Pivotar dados para ter uma linha por medicao
-            df_pivot = df.pivot(index=['cod_medicao', 'timestamp'], 
-                               columns='sensor', 
-                               values='valor').reset_index()
-            
-            # Renomear colunas para facilitar uso
-            column_mapping = {
-                'Sensor Fosforo ESP32': 'fosforo',
-                'Sensor Potassio ESP32': 'potassio', 
-                'Sensor pH ESP32': 'ph',
-                'Sensor Umidade ESP32': 'umidade',
-                'Sensor Bomba ESP32': 'bomba_ativa'
-            }
+            df = pd.DataFrame(rows, columns=COLUNAS_LEITURA)
             
-            df_pivot = df_pivot.rename(columns=column_mapping)
-            
-            # Remover linhas com dados faltantes
-            df_pivot = df_pivot.dropna()
-            
-            logger.info(f"Dados carregados: {len(df_pivot)} medicoes para ML")
-            return df_pivot
+            logger.info(f"Dados carregados: {len(df)} medicoes para ML")
+            return df
             
         except Exception as e:
             logger.error(f"Erro ao carregar dados historicos: {e}")
@@ -136,6 +136,37 @@ class FarmTechMLPredictor:
         finally:
             self.disconnect()
 
+    def _carregar_dataset(self):
+        """Le o historico do dataset Parquet (somente as colunas das leituras)."""
+        try:
+            df = abrir_dataset(self.dataset).to_table(columns=COLUNAS_LEITURA).to_pandas()
+            if df.empty:
+                logger.warning(f"Dataset {self.dataset} sem leituras para ML")
+                return None
+
+            df = df.sort_values(['timestamp', 'cod_medicao'], ignore_index=True)
+            logger.info(f"Dados carregados do dataset {self.dataset}: {len(df)} medicoes para ML")
+            return df
+
+        except Exception as e:
+            logger.error(f"Erro ao ler o dataset {self.dataset}: {e}")
+            return None
+
+    def _carregar_colunar(self):
+        """Le o historico do armazem colunar (DataFrame sobre as colunas mapeadas)."""
+        try:
+            df = ArmazemColunar(self.colunar, somente_leitura=True).para_dataframe()
+            if df.empty:
+                logger.warning(f"Armazem colunar {self.colunar} sem leituras para ML")
+                return None
+
+            logger.info(f"Dados carregados do armazem colunar {self.colunar}: {len(df)} medicoes para ML")
+            return df
+
+        except Exception as e:
+            logger.error(f"Erro ao ler o armazem colunar {self.colunar}: {e}")
+            return None
+
     def preparar_features(self, df):
         """Prepara features para treinamento do modelo."""
         try:
@@ -164,6 +195,7 @@ class FarmTechMLPredictor:
             logger.error(f"Erro ao preparar features: {e}")
             return None, None
 
+    @medir_operacao('treinar_modelos', falha=falhou)
     def treinar_modelos(self, X, y):
         """Treina modelos de machine learning."""
         try:
@@ -259,6 +291,7 @@ class FarmTechMLPredictor:
             logger.warning(f"Erro ao carregar modelos: {e}")
             return False
 
+    @medir_operacao('prever_irrigacao', falha=falhou)
     def prever_irrigacao(self, fosforo, potassio, ph, umidade, modelo='random_forest'):
         """Faz predicao de necessidade de irrigacao."""
         try:
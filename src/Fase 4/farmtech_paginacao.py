@@ -0,0 +1,134 @@
+"""
+FarmTech Solutions - Paginacao das Leituras
+Paginas de leituras completas, da mais recente para a mais antiga
+
+Paginacao por chave (keyset): cada pagina continua a partir do
+(instante, codigo) da ultima leitura da pagina anterior, guardado em um
+token opaco. Nao ha OFFSET; toda pagina e uma leitura ordenada do indice
+que para apos limite linhas, entao a pagina 1000 custa o mesmo que a
+primeira.
+
+- layout largo: IX_LEIT_DATA (data_hora_leitura, cod_leitura);
+- layout EAV: as linhas dos sensores da bomba (uma por leitura, de
+  qualquer dispositivo ESP32) escolhem as leituras da pagina. Uma unica
+  leitura descendente de IX_MED_DATA (data_hora_medicao, cod_medicao,
+  cod_sensor, migracao 9) filtra essas linhas pelo cod_sensor do proprio
+  indice e para apos limite delas: cerca de cinco entradas por leitura,
+  qualquer que seja o numero de dispositivos, e o texto do SQL nao muda
+  quando um dispositivo e provisionado. PK_MED (cod_medicao, cod_sensor)
+  traz as demais grandezas de cada leitura. Leituras incompletas (sem as
+  cinco grandezas) sao omitidas, como em sql_leituras(), mas continuam
+  contando para o token: uma pagina pode ter menos de limite leituras sem
+  ser a ultima.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+import oracledb
+from farmtech_leituras import LAYOUT_LARGO, TIPOS_SENSORES, TIPO_DISPOSITIVO_ESP32, validar_layout
+
+# Continua depois de (:antes_data, :antes_cod) em ordem decrescente; a forma
+# "data <= x AND (...)" deixa a condicao sobre data como limite do indice
+CONDICAO_CONTINUACAO = "{data} <= :antes_data AND ({data} < :antes_data OR {cod} < :antes_cod)"
+
+
+def codificar_token(instante, cod):
+    """Token opaco (base64 url-safe) com a chave da ultima leitura da pagina."""
+    bruto = json.dumps([instante.isoformat(), cod]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+
+def decodificar_token(token):
+    """(instante, cod) do token; ValueError se o token for invalido."""
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        instante, cod = json.loads(bruto)
+        return datetime.fromisoformat(instante), int(cod)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Token de paginacao invalido: {token}") from e
+
+
+def sql_pagina_leituras(layout, continuar=False):
+    """
+    SELECT de uma pagina (colunas de COLUNAS_LEITURA), mais recentes primeiro.
+
+    Binds: :limite e, com continuar=True, :antes_data/:antes_cod. No
+    layout EAV cada linha traz ao fim o numero de grandezas gravadas da
+    leitura (completa = len(TIPOS_SENSORES)).
+    """
+    if validar_layout(layout) == LAYOUT_LARGO:
+        where = ("WHERE " + CONDICAO_CONTINUACAO.format(data='data_hora_leitura', cod='cod_leitura')
+                 if continuar else "")
+        return f"""
+        SELECT cod_leitura, data_hora_leitura, fosforo, potassio, ph, umidade, bomba
+        FROM T_LEITURAS_ESP32
+        {where}
+        ORDER BY data_hora_leitura DESC, cod_leitura DESC
+        FETCH FIRST :limite ROWS ONLY
+        """
+
+    condicao = (" AND " + CONDICAO_CONTINUACAO.format(data='a.data_hora_medicao', cod='a.cod_medicao')
+                if continuar else "")
+    colunas = ",\n               ".join(
+        f"MAX(CASE WHEN s.tipo_sensor = '{tipo}' THEN m.valor_medicao END)"
+        for tipo in TIPOS_SENSORES.values()
+    )
+    # "cod_sensor + 0" impede que o filtro dos sensores da bomba seja lido por
+    # IX_MED_SENS_DATA (um trecho por sensor, depois ordenado): a pagina sai da
+    # leitura descendente de IX_MED_DATA. Os CROSS JOIN com as juncoes no WHERE
+    # fixam no SQLite a pagina como tabela externa; no Oracle equivalem ao JOIN.
+    return f"""
+        SELECT p.cod_medicao, p.data_hora_medicao,
+               {colunas},
+               COUNT(*)
+        FROM (
+            SELECT a.cod_medicao, a.data_hora_medicao
+            FROM T_MEDICOES a
+            WHERE a.cod_sensor + 0 IN (
+                SELECT cod_sensor FROM T_SENSORES
+                WHERE tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}' AND tipo_sensor = '{TIPOS_SENSORES['bomba']}'
+            ){condicao}
+            ORDER BY a.data_hora_medicao DESC, a.cod_medicao DESC
+            FETCH FIRST :limite ROWS ONLY
+        ) p
+        CROSS JOIN T_MEDICOES m
+        CROSS JOIN T_SENSORES s
+        WHERE m.cod_medicao = p.cod_medicao
+          AND s.cod_sensor = m.cod_sensor
+          AND s.tipo_dispositivo = '{TIPO_DISPOSITIVO_ESP32}'
+        GROUP BY p.cod_medicao, p.data_hora_medicao
+        ORDER BY p.data_hora_medicao DESC, p.cod_medicao DESC
+        """
+
+
+def buscar_pagina(cursor, layout=None, limite=10, token=None):
+    """
+    Retorna (leituras, proximo_token) a partir do token (None = mais recentes).
+
+    leituras sao tuplas na ordem de COLUNAS_LEITURA; proximo_token e None
+    na ultima pagina. Uma linha a mais e lida para saber se ha outra pagina.
+    No layout EAV a continuacao e decidida pelas linhas da bomba, antes de
+    descartar as leituras incompletas.
+    """
+    if limite < 1:
+        raise ValueError(f"Limite de pagina invalido: {limite}")
+
+    binds = {'limite': limite + 1}
+    largo = validar_layout(layout) == LAYOUT_LARGO
+    if token is not None:
+        binds['antes_data'], binds['antes_cod'] = decodificar_token(token)
+        cursor.setinputsizes(antes_data=oracledb.DB_TYPE_TIMESTAMP)
+
+    cursor.execute(sql_pagina_leituras(layout, continuar=token is not None), binds)
+    linhas = cursor.fetchall()
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+    proximo_token = codificar_token(linhas[-1][1], linhas[-1][0]) if mais else None
+    if not largo:
+        linhas = [linha[:-1] for linha in linhas if linha[-1] == len(TIPOS_SENSORES)]
+    return linhas, proximo_token
@@ -0,0 +1,421 @@
+"""
+FarmTech Solutions - Perfil das Instrucoes SQL
+Ganchos em volta de cada comando, log de consultas lentas e relatorio top-N
+
+Todas as sessoes do projeto (Fase 3, Fase 4, ML, dashboard) vem de
+backend.conectar() (farmtech_backend). Com algum gancho registrado, a
+sessao devolvida e envolvida por ConexaoPerfilada, cujos cursores medem
+cada comando e entregam aos ganchos um registro InstrucaoExecutada:
+
+- sql: texto normalizado (binds, literais e listas IN trocados por ?),
+  que agrupa execucoes do mesmo comando;
+- binds: quantidade de binds por execucao; execucoes: linhas do
+  executemany (1 para execute);
+- segundos: tempo do execute mais o dos fetch do resultado;
+- linhas: linhas lidas (consultas) ou afetadas (DML);
+- idas: round-trips estimados (1 do execute + os fetch alem do prefetch,
+  em blocos de arraysize);
+- origem: modulo:funcao do projeto que executou o comando.
+
+O registro e entregue quando o resultado termina de ser lido, no proximo
+execute do cursor ou no close. Sem ganchos registrados conectar() devolve
+a sessao original, sem custo.
+
+Ganchos prontos (ativados por variaveis de ambiente):
+
+- FARMTECH_CONSULTAS_LENTAS_MS=N: LogConsultasLentas grava em
+  FARMTECH_CONSULTAS_LENTAS_LOG (padrao farmtech_consultas_lentas.log) os
+  comandos acima de N ms;
+- FARMTECH_PERFIL=arquivo.json: PerfilAgregado soma os comandos por SQL
+  normalizado e grava o agregado no arquivo ao final do processo.
+
+Uso:
+    FARMTECH_PERFIL=perfil.json python farmtech_importacao.py importar capturas/
+    python farmtech_perfil.py relatorio perfil.json [--top 20] [--ordem total|media|maximo|execucoes|idas]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import atexit
+import logging
+import argparse
+import threading
+import weakref
+from functools import lru_cache
+from farmtech_logs import criar_fila
+
+logger = logging.getLogger(__name__)
+
+LIMITE_LENTAS_MS = os.environ.get('FARMTECH_CONSULTAS_LENTAS_MS')
+LOG_LENTAS = os.environ.get('FARMTECH_CONSULTAS_LENTAS_LOG', 'farmtech_consultas_lentas.log')
+ARQUIVO_PERFIL = os.environ.get('FARMTECH_PERFIL')
+
+# Ordens aceitas pelo relatorio top-N
+ORDENS_RELATORIO = ('total', 'media', 'maximo', 'execucoes', 'idas', 'linhas')
+
+# Arquivos cujos quadros nao contam como origem do comando
+_MODULOS_INTERNOS = ('farmtech_perfil.py', 'farmtech_backend.py')
+
+_NORMALIZACOES = [
+    (re.compile(r"--[^\n]*|/\*.*?\*/", re.S), " "),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r":\w+|\?\d*"), "?"),
+    (re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+@lru_cache(maxsize=1024)
+def normalizar_sql(sql):
+    """SQL sem binds, literais, comentarios e espacos repetidos, para agrupar as execucoes."""
+    for padrao, substituto in _NORMALIZACOES:
+        sql = padrao.sub(substituto, sql)
+    return sql.strip()
+
+
+def _contar_binds(parametros):
+    if parametros is None:
+        return 0
+    return len(parametros)
+
+
+def _origem():
+    """modulo:funcao do primeiro quadro da pilha fora do perfil e do backend."""
+    quadro = sys._getframe(2)
+    while quadro is not None and os.path.basename(quadro.f_code.co_filename) in _MODULOS_INTERNOS:
+        quadro = quadro.f_back
+    if quadro is None:
+        return '?'
+    modulo = os.path.splitext(os.path.basename(quadro.f_code.co_filename))[0]
+    return f"{modulo}:{quadro.f_code.co_name}"
+
+
+class InstrucaoExecutada:
+    """Medidas de um comando executado (entregue aos ganchos)."""
+
+    __slots__ = ('sql', 'sql_original', 'binds', 'execucoes', 'segundos', 'linhas', 'idas', 'origem', 'erro')
+
+    def __init__(self, sql_original, binds, execucoes, origem):
+        self.sql_original = sql_original
+        self.sql = normalizar_sql(sql_original)
+        self.binds = binds
+        self.execucoes = execucoes
+        self.segundos = 0.0
+        self.linhas = 0
+        self.idas = 1
+        self.origem = origem
+        self.erro = None
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__ if campo != 'sql_original'}
+
+
+# --- REGISTRO DE GANCHOS ---
+
+_ganchos = []
+_lock_ganchos = threading.Lock()
+
+
+def registrar_gancho(gancho):
+    """Registra gancho(instrucao) chamado para cada comando das sessoes abertas a partir de agora."""
+    with _lock_ganchos:
+        if gancho not in _ganchos:
+            _ganchos.append(gancho)
+    return gancho
+
+
+def remover_gancho(gancho):
+    with _lock_ganchos:
+        if gancho in _ganchos:
+            _ganchos.remove(gancho)
+
+
+def ganchos_ativos():
+    return bool(_ganchos)
+
+
+def _notificar(instrucao):
+    for gancho in list(_ganchos):
+        try:
+            gancho(instrucao)
+        except Exception as e:
+            # Um gancho com defeito nao pode derrubar o acesso ao banco
+            logger.warning(f"Gancho de perfil {gancho!r} falhou: {e}")
+
+
+# --- SESSAO E CURSOR PERFILADOS ---
+
+class CursorPerfilado:
+    """Cursor que mede cada comando e repassa o resto ao cursor original."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_atual', None)
+        object.__setattr__(self, '_lidas', 0)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __setattr__(self, nome, valor):
+        # arraysize, prefetchrows etc. pertencem ao cursor original
+        setattr(self._cursor, nome, valor)
+
+    def _iniciar(self, sql, binds, execucoes):
+        self._finalizar()
+        instrucao = InstrucaoExecutada(sql, binds, execucoes, _origem())
+        object.__setattr__(self, '_atual', instrucao)
+        object.__setattr__(self, '_lidas', 0)
+        return instrucao
+
+    def _finalizar(self):
+        instrucao = self._atual
+        if instrucao is None:
+            return
+        object.__setattr__(self, '_atual', None)
+        if self._cursor.description is not None:
+            instrucao.linhas = self._lidas
+            arraysize = max(getattr(self._cursor, 'arraysize', 100) or 1, 1)
+            alem_prefetch = max(self._lidas - (getattr(self._cursor, 'prefetchrows', 2) or 0), 0)
+            instrucao.idas = 1 + math.ceil(alem_prefetch / arraysize)
+        _notificar(instrucao)
+
+    def _executar(self, metodo, sql, parametros, binds, execucoes, *args, **kwargs):
+        instrucao = self._iniciar(sql, binds, execucoes)
+        inicio = time.perf_counter()
+        try:
+            retorno = metodo(sql, parametros, *args, **kwargs) if parametros is not None \
+                else metodo(sql, *args, **kwargs)
+        except Exception as e:
+            instrucao.erro = str(e).splitlines()[0] if str(e) else type(e).__name__
+            instrucao.segundos = time.perf_counter() - inicio
+            object.__setattr__(self, '_atual', None)
+            _notificar(instrucao)
+            raise
+        instrucao.segundos = time.perf_counter() - inicio
+        if self._cursor.description is None:
+            # DML/DDL: nao ha resultado a ler
+            instrucao.linhas = max(self._cursor.rowcount or 0, 0)
+            if not instrucao.linhas and kwargs.get('batcherrors'):
+                # O executemany emulado do SQLite nao informa rowcount
+                instrucao.linhas = execucoes - len(self._cursor.getbatcherrors())
+            object.__setattr__(self, '_atual', None)
+            _notificar(instrucao)
+        return self if retorno is self._cursor else retorno
+
+    def execute(self, sql, parametros=None, **binds):
+        quantidade = len(binds) if binds else _contar_binds(parametros)
+        return self._executar(self._cursor.execute, sql, parametros, quantidade, 1, **binds)
+
+    def executemany(self, sql, linhas, *args, **kwargs):
+        binds = _contar_binds(linhas[0]) if len(linhas) else 0
+        return self._executar(self._cursor.executemany, sql, linhas, binds, len(linhas), *args, **kwargs)
+
+    def _medir_fetch(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        if self._atual is not None:
+            self._atual.segundos += time.perf_counter() - inicio
+        return resultado
+
+    def fetchone(self):
+        linha = self._medir_fetch(self._cursor.fetchone)
+        if linha is None:
+            self._finalizar()
+        else:
+            object.__setattr__(self, '_lidas', self._lidas + 1)
+        return linha
+
+    def fetchmany(self, *args):
+        linhas = self._medir_fetch(self._cursor.fetchmany, *args)
+        object.__setattr__(self, '_lidas', self._lidas + len(linhas))
+        if not linhas:
+            self._finalizar()
+        return linhas
+
+    def fetchall(self):
+        linhas = self._medir_fetch(self._cursor.fetchall)
+        object.__setattr__(self, '_lidas', self._lidas + len(linhas))
+        self._finalizar()
+        return linhas
+
+    def __iter__(self):
+        while True:
+            linha = self.fetchone()
+            if linha is None:
+                return
+            yield linha
+
+    def close(self):
+        self._finalizar()
+        self._cursor.close()
+
+
+class ConexaoPerfilada:
+    """Sessao cujos cursores sao perfilados; o resto e repassado a sessao original."""
+
+    def __init__(self, conexao):
+        self._conexao = conexao
+        self._cursores = weakref.WeakSet()
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+    def cursor(self, *args, **kwargs):
+        cursor = CursorPerfilado(self._conexao.cursor(*args, **kwargs))
+        self._cursores.add(cursor)
+        return cursor
+
+    def close(self):
+        # Entrega o que ficou pendente em cursores nao fechados
+        for cursor in list(self._cursores):
+            cursor._finalizar()
+        self._cursores = weakref.WeakSet()
+        self._conexao.close()
+
+
+def perfilar_conexao(conexao):
+    """Envolve a sessao em ConexaoPerfilada se houver ganchos registrados."""
+    return ConexaoPerfilada(conexao) if _ganchos else conexao
+
+
+# --- GANCHOS PRONTOS ---
+
+class LogConsultasLentas:
+    """Grava no log de consultas lentas os comandos acima de limite_ms."""
+
+    def __init__(self, limite_ms, caminho=LOG_LENTAS):
+        self.limite = float(limite_ms) / 1000
+        self.caminho = caminho
+        self.logger = logging.getLogger('farmtech.consultas_lentas')
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            # Gravado pela thread da fila (farmtech_logs), fora do tempo do comando
+            handler = logging.FileHandler(caminho, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            fila, ouvinte = criar_fila([handler])
+            atexit.register(ouvinte.stop)
+            self.logger.addHandler(fila)
+            self.logger.setLevel(logging.INFO)
+
+    def __call__(self, instrucao):
+        if instrucao.segundos >= self.limite:
+            self.logger.info(json.dumps({'ms': round(instrucao.segundos * 1000, 3), **instrucao.como_dict()},
+                                        ensure_ascii=False))
+
+
+class PerfilAgregado:
+    """Soma das medidas por SQL normalizado, para o relatorio top-N."""
+
+    def __init__(self):
+        self._agregado = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, instrucao):
+        with self._lock:
+            dados = self._agregado.get(instrucao.sql)
+            if dados is None:
+                dados = self._agregado[instrucao.sql] = {
+                    'sql': instrucao.sql, 'chamadas': 0, 'execucoes': 0, 'total': 0.0, 'maximo': 0.0,
+                    'linhas': 0, 'idas': 0, 'binds': instrucao.binds, 'erros': 0, 'origens': {},
+                }
+            dados['chamadas'] += 1
+            dados['execucoes'] += instrucao.execucoes
+            dados['total'] += instrucao.segundos
+            dados['maximo'] = max(dados['maximo'], instrucao.segundos)
+            dados['linhas'] += instrucao.linhas
+            dados['idas'] += instrucao.idas
+            dados['erros'] += instrucao.erro is not None
+            dados['origens'][instrucao.origem] = dados['origens'].get(instrucao.origem, 0) + 1
+
+    def instantaneo(self):
+        with self._lock:
+            return [dict(dados, origens=dict(dados['origens'])) for dados in self._agregado.values()]
+
+    def relatorio(self, top=20, ordem='total'):
+        return relatorio_top(self.instantaneo(), top, ordem)
+
+    def salvar(self, caminho):
+        with open(caminho, 'w') as arquivo:
+            json.dump(self.instantaneo(), arquivo, indent=2, ensure_ascii=False)
+
+    def limpar(self):
+        with self._lock:
+            self._agregado = {}
+
+
+def relatorio_top(agregado, top=20, ordem='total'):
+    """Os top comandos do agregado (lista de PerfilAgregado.instantaneo) pela ordem escolhida."""
+    if ordem not in ORDENS_RELATORIO:
+        raise ValueError(f"Ordem invalida: {ordem} (use {', '.join(ORDENS_RELATORIO)})")
+    chaves = {'media': lambda d: d['total'] / d['chamadas'], 'total': lambda d: d['total'],
+              'maximo': lambda d: d['maximo'], 'execucoes': lambda d: d['execucoes'],
+              'idas': lambda d: d['idas'], 'linhas': lambda d: d['linhas']}
+    return sorted(agregado, key=chaves[ordem], reverse=True)[:top]
+
+
+def exibir_relatorio(linhas, total=None, largura_sql=70):
+    """Imprime o relatorio top-N; total (segundos de todos os comandos) e a base da coluna %."""
+    total = total or sum(d['total'] for d in linhas) or 1.0
+    print(f"{'TOTAL(s)':>9} {'%':>5} {'CHAMADAS':>9} {'MEDIA(ms)':>10} {'MAX(ms)':>9} {'LINHAS':>9} "
+          f"{'IDAS':>7}  SQL")
+    for d in linhas:
+        sql = d['sql'] if len(d['sql']) <= largura_sql else d['sql'][:largura_sql - 3] + '...'
+        print(f"{d['total']:>9.3f} {d['total'] / total * 100:>5.1f} {d['chamadas']:>9} "
+              f"{d['total'] / d['chamadas'] * 1000:>10.2f} {d['maximo'] * 1000:>9.2f} {d['linhas']:>9} "
+              f"{d['idas']:>7}  {sql}")
+        origens = sorted(d['origens'].items(), key=lambda item: item[1], reverse=True)[:3]
+        print(f"{'':>57}{', '.join(f'{origem} ({n})' for origem, n in origens)}"
+              + (f" | {d['erros']} erros" if d['erros'] else ""))
+
+
+_perfil = None
+
+
+def obter_perfil():
+    """PerfilAgregado do processo, registrado como gancho no primeiro uso."""
+    global _perfil
+    with _lock_ganchos:
+        if _perfil is None:
+            _perfil = PerfilAgregado()
+    return registrar_gancho(_perfil)
+
+
+def _configurar_pelo_ambiente():
+    if LIMITE_LENTAS_MS:
+        registrar_gancho(LogConsultasLentas(LIMITE_LENTAS_MS))
+    if ARQUIVO_PERFIL:
+        perfil = obter_perfil()
+        atexit.register(perfil.salvar, ARQUIVO_PERFIL)
+
+
+_configurar_pelo_ambiente()
+
+
+def main():
+    """Relatorio top-N de um perfil gravado com FARMTECH_PERFIL."""
+    parser = argparse.ArgumentParser(description="Perfil das instrucoes SQL")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_relatorio = subparsers.add_parser('relatorio', help="Top-N comandos de um perfil JSON")
+    p_relatorio.add_argument('arquivo')
+    p_relatorio.add_argument('--top', type=int, default=20)
+    p_relatorio.add_argument('--ordem', choices=ORDENS_RELATORIO, default='total')
+
+    args = parser.parse_args()
+
+    with open(args.arquivo, 'r') as arquivo:
+        agregado = json.load(arquivo)
+    exibir_relatorio(relatorio_top(agregado, args.top, args.ordem), sum(d['total'] for d in agregado))
+    print(f"{len(agregado)} comandos distintos, {sum(d['chamadas'] for d in agregado)} chamadas, "
+          f"{sum(d['total'] for d in agregado):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
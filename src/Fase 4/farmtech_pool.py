@@ -0,0 +1,97 @@
+"""
+FarmTech Solutions - Pool de Conexoes Oracle
+Camada de sessoes compartilhada por todos os modulos do projeto
+
+Este modulo mantem um unico pool de sessoes por processo (um por
+usuario/DSN). Os gerenciadores da Fase 3 e da Fase 4 pedem sessoes
+ao pool em vez de abrir uma conexao nova (handshake TCP + autenticacao)
+a cada operacao.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import threading
+import logging
+import oracledb
+
+logger = logging.getLogger(__name__)
+
+# Configuracoes padrao do pool (podem ser alteradas por variaveis de ambiente
+# ou pela funcao configurar_pool antes da primeira conexao)
+_config_pool = {
+    'min': int(os.environ.get('FARMTECH_POOL_MIN', 1)),
+    'max': int(os.environ.get('FARMTECH_POOL_MAX', 4)),
+    'increment': int(os.environ.get('FARMTECH_POOL_INCREMENTO', 1)),
+    # Cache de statements por sessao (evita re-parse dos INSERTs repetidos)
+    'stmtcachesize': int(os.environ.get('FARMTECH_POOL_STMT_CACHE', 40)),
+    # Sessoes ociosas ha mais de N segundos sao verificadas (ping) antes do reuso
+    'ping_interval': int(os.environ.get('FARMTECH_POOL_PING', 60)),
+    # Sessoes acima do minimo ociosas ha mais de N segundos sao fechadas
+    'timeout': int(os.environ.get('FARMTECH_POOL_TIMEOUT', 300)),
+}
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def configurar_pool(**parametros):
+    """
+    Altera a configuracao usada na criacao de novos pools.
+
+    Parametros aceitos: min, max, increment, stmtcachesize, ping_interval, timeout.
+    Pools ja criados nao sao afetados; use fechar_pools() para recria-los.
+    """
+    invalidos = set(parametros) - set(_config_pool)
+    if invalidos:
+        raise ValueError(f"Parametros de pool invalidos: {', '.join(sorted(invalidos))}")
+    _config_pool.update(parametros)
+
+
+def obter_pool(user, password, dsn):
+    """Retorna o pool do processo para o usuario/DSN, criando-o se necessario."""
+    chave = (user, dsn)
+    with _lock:
+        pool = _pools.get(chave)
+        if pool is None:
+            pool = oracledb.create_pool(
+                user=user,
+                password=password,
+                dsn=dsn,
+                getmode=oracledb.POOL_GETMODE_WAIT,
+                **_config_pool
+            )
+            _pools[chave] = pool
+            logger.info(f"Pool Oracle criado para {user}@{dsn} "
+                        f"(min={_config_pool['min']}, max={_config_pool['max']})")
+        return pool
+
+
+def adquirir_conexao(user, password, dsn):
+    """
+    Obtem uma sessao do pool compartilhado.
+
+    A sessao retornada deve ser fechada com close(), que a devolve ao pool.
+    """
+    return obter_pool(user, password, dsn).acquire()
+
+
+def estatisticas_pools():
+    """Retorna o estado atual de cada pool (sessoes abertas e em uso)."""
+    with _lock:
+        return {
+            f"{user}@{dsn}": {'abertas': pool.opened, 'em_uso': pool.busy, 'max': pool.max}
+            for (user, dsn), pool in _pools.items()
+        }
+
+
+def fechar_pools():
+    """Fecha todos os pools do processo (usado no encerramento e em benchmarks)."""
+    with _lock:
+        for pool in _pools.values():
+            try:
+                pool.close(force=True)
+            except oracledb.Error as e:
+                logger.warning(f"Erro ao fechar pool Oracle: {e}")
+        _pools.clear()
@@ -0,0 +1,235 @@
+"""
+FarmTech Solutions - Provisionamento de Dispositivos
+Cadastro em lote dos sensores virtuais de muitas placas ESP32
+
+Cada placa tem cinco sensores virtuais em T_SENSORES (fosforo, potassio,
+ph, umidade e bomba), classificados por tipo_dispositivo/cod_dispositivo
+(migracao 3). O provisionamento de N placas e feito por conjunto:
+
+- uma consulta (IX_SENS_DISP) traz os sensores ja cadastrados;
+- os codigos dos sensores que faltam sao reservados de uma vez
+  (farmtech_chaves) e as coordenadas calculadas em bloco (numpy);
+- um unico MERGE com array DML (no SQLite, INSERT ... WHERE NOT EXISTS)
+  cadastra o que falta; placas ja provisionadas nao sao alteradas;
+- uma consulta final devolve o mapa {dispositivo: {grandeza: cod_sensor}}.
+
+Nomes: o dispositivo padrao mantem os nomes de NOMES_SENSORES; os demais
+usam 'Sensor <tipo> <dispositivo>' (nm_sensor e UNIQUE e VARCHAR2(30),
+por isso o id do dispositivo tem no maximo 20 bytes em UTF-8, o tamanho
+de cod_dispositivo e do campo do spool local).
+
+Uso:
+    python farmtech_provisionamento.py provisionar esp32-01 esp32-02 [--cultura 1]
+    python farmtech_provisionamento.py provisionar --prefixo esp32- --quantidade 500 --mapa ids.json
+    python farmtech_provisionamento.py provisionar --arquivo frota.txt
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import json
+import time
+import logging
+import argparse
+import numpy as np
+from farmtech_backend import dialeto, violacao_unicidade
+from farmtech_chaves import obter_alocador
+from farmtech_leituras import NOMES_SENSORES, TIPOS_SENSORES, TIPO_DISPOSITIVO_ESP32, DISPOSITIVO_PADRAO
+from farmtech_logs import configurar_logs
+
+logger = logging.getLogger(__name__)
+
+# Configuracao de cada sensor virtual: grandeza -> (objetivo, modelo, minimo, maximo, unidade).
+# Valores minimos > 0 devido a CK_SENSORES_VLRMIN.
+SENSORES_ESP32 = {
+    'fosforo': ('Deteccao de fosforo', 'ESP32-FO', 0.01, 1, 'UN'),
+    'potassio': ('Deteccao de potassio', 'ESP32-PO', 0.01, 1, 'UN'),
+    'ph': ('Medicao de pH do solo', 'ESP32-PH', 0.01, 14, 'PH'),
+    'umidade': ('Medicao de umidade do solo', 'ESP32-UM', 0.01, 100, '%'),
+    'bomba': ('Status da bomba de irrigacao', 'ESP32-BO', 0.01, 1, 'UN'),
+}
+FABRICANTE = 'FarmTech'
+
+# Coordenadas unicas (UN_SENSORES_LATITUDE/LONGITUDE): base + cod_sensor * passo, em
+# microgrados, dando a volta dentro de [-90, 90) e [-180, 180). O passo (~0.001 grau) e
+# primo com as duas faixas, entao codigos diferentes nunca repetem coordenada ate
+# 180 milhoes de sensores.
+LATITUDE_BASE = -23.550520
+LONGITUDE_BASE = -46.633308
+PASSO_COORDENADA = 1009
+MICROGRAUS = 1000000
+
+# Tamanho (bytes) de T_SENSORES.cod_dispositivo
+TAMANHO_MAX_DISPOSITIVO = 20
+
+_COLUNAS = """cod_sensor, nm_sensor, tipo_sensor, objetivo_sensor, fab_sensor,
+        modelo_sensor, data_instalacao, latitude_instalacao, longitude_instalacao,
+        valor_minimo, valor_maximo, unidade, cod_cultura,
+        tipo_dispositivo, cod_dispositivo"""
+
+# Cadastro dos sensores que faltam, por dialeto do backend. Binds: 1 cod_sensor,
+# 2 nm_sensor, 3 tipo_sensor, 4 objetivo, 5 fabricante, 6 modelo, 7 latitude,
+# 8 longitude, 9 minimo, 10 maximo, 11 unidade, 12 cod_cultura,
+# 13 tipo_dispositivo, 14 cod_dispositivo
+SQL_PROVISIONAR = {
+    'oracle': f"""
+    MERGE INTO T_SENSORES s
+    USING (SELECT :1 cod_sensor, :2 nm_sensor, :3 tipo_sensor, :4 objetivo_sensor, :5 fab_sensor,
+                  :6 modelo_sensor, :7 latitude_instalacao, :8 longitude_instalacao, :9 valor_minimo,
+                  :10 valor_maximo, :11 unidade, :12 cod_cultura, :13 tipo_dispositivo, :14 cod_dispositivo
+           FROM DUAL) n
+    ON (s.tipo_dispositivo = n.tipo_dispositivo AND s.cod_dispositivo = n.cod_dispositivo
+        AND s.tipo_sensor = n.tipo_sensor)
+    WHEN NOT MATCHED THEN INSERT ({_COLUNAS})
+    VALUES (n.cod_sensor, n.nm_sensor, n.tipo_sensor, n.objetivo_sensor, n.fab_sensor,
+            n.modelo_sensor, SYSDATE, n.latitude_instalacao, n.longitude_instalacao,
+            n.valor_minimo, n.valor_maximo, n.unidade, n.cod_cultura,
+            n.tipo_dispositivo, n.cod_dispositivo)
+    """,
+    'sqlite': f"""
+    INSERT INTO T_SENSORES ({_COLUNAS})
+    SELECT :1, :2, :3, :4, :5, :6, SYSDATE, :7, :8, :9, :10, :11, :12, :13, :14
+    WHERE NOT EXISTS (SELECT 1 FROM T_SENSORES
+                      WHERE tipo_dispositivo = :13 AND cod_dispositivo = :14 AND tipo_sensor = :3)
+    """,
+}
+
+
+def nome_sensor(dispositivo, grandeza):
+    """nm_sensor do sensor virtual da grandeza no dispositivo."""
+    if dispositivo == DISPOSITIVO_PADRAO:
+        return NOMES_SENSORES[grandeza]
+    return f"Sensor {TIPOS_SENSORES[grandeza]} {dispositivo}"
+
+
+def coordenadas(codigos):
+    """(latitudes, longitudes) unicas dos sensores, calculadas em bloco a partir dos codigos."""
+    deslocamento = np.asarray(codigos, dtype=np.int64) * PASSO_COORDENADA
+    return _na_faixa(LATITUDE_BASE, 90, deslocamento), _na_faixa(LONGITUDE_BASE, 180, deslocamento)
+
+
+def _na_faixa(base, limite, deslocamento):
+    """base + deslocamento (microgrados) levado para [-limite, limite), em aritmetica inteira."""
+    amplitude = 2 * limite * MICROGRAUS
+    posicao = (round((base + limite) * MICROGRAUS) + deslocamento) % amplitude
+    return np.round(posicao / MICROGRAUS - limite, 6)
+
+
+def validar_dispositivos(dispositivos):
+    """Ids sem repeticao (na ordem recebida); ValueError se algum for vazio ou longo demais."""
+    unicos = list(dict.fromkeys(str(dispositivo).strip() for dispositivo in dispositivos))
+    # Limite em bytes: acentos ocupam mais de um byte em UTF-8
+    invalidos = [d for d in unicos if not d or len(d.encode('utf-8')) > TAMANHO_MAX_DISPOSITIVO]
+    if invalidos:
+        raise ValueError(f"Ids de dispositivo invalidos (1 a {TAMANHO_MAX_DISPOSITIVO} bytes em UTF-8): "
+                         f"{', '.join(repr(d) for d in invalidos[:5])}")
+    return unicos
+
+
+def mapa_sensores(cursor, dispositivos=None):
+    """{dispositivo: {grandeza: cod_sensor}} dos sensores ESP32 (uma consulta), opcionalmente filtrado."""
+    grandezas = {tipo: grandeza for grandeza, tipo in TIPOS_SENSORES.items()}
+    cursor.execute("""
+    SELECT cod_dispositivo, tipo_sensor, cod_sensor FROM T_SENSORES
+    WHERE tipo_dispositivo = :1
+    """, [TIPO_DISPOSITIVO_ESP32])
+
+    filtro = set(dispositivos) if dispositivos is not None else None
+    mapa = {}
+    for dispositivo, tipo, cod_sensor in cursor.fetchall():
+        grandeza = grandezas.get(tipo.strip())
+        if grandeza and (filtro is None or dispositivo in filtro):
+            mapa.setdefault(dispositivo, {})[grandeza] = int(cod_sensor)
+    return mapa
+
+
+def provisionar_dispositivos(cursor, dispositivos, cod_cultura):
+    """
+    Cadastra os sensores virtuais que faltam para os dispositivos (sem commit).
+
+    Retorna (mapa, criados): mapa = {dispositivo: {grandeza: cod_sensor}}
+    de todos os dispositivos pedidos, criados = numero de sensores
+    cadastrados agora. Chave unica violada por um sensor que outra sessao
+    acabou de provisionar e ignorada; qualquer outra falha (ex.: nome ou
+    coordenadas ja usados por um sensor do CRUD) gera ValueError.
+    """
+    dispositivos = validar_dispositivos(dispositivos)
+    existentes = mapa_sensores(cursor, dispositivos)
+    faltantes = [(dispositivo, grandeza) for dispositivo in dispositivos for grandeza in TIPOS_SENSORES
+                 if grandeza not in existentes.get(dispositivo, {})]
+    if not faltantes:
+        return existentes, 0
+
+    codigos = obter_alocador('T_SENSORES').reservar(cursor, len(faltantes))
+    latitudes, longitudes = coordenadas(codigos)
+    linhas = []
+    for (dispositivo, grandeza), codigo, lat, lng in zip(faltantes, codigos, latitudes.tolist(),
+                                                          longitudes.tolist()):
+        objetivo, modelo, minimo, maximo, unidade = SENSORES_ESP32[grandeza]
+        linhas.append((codigo, nome_sensor(dispositivo, grandeza), TIPOS_SENSORES[grandeza], objetivo,
+                       FABRICANTE, modelo, lat, lng, minimo, maximo, unidade, cod_cultura,
+                       TIPO_DISPOSITIVO_ESP32, dispositivo))
+
+    cursor.executemany(SQL_PROVISIONAR[dialeto(cursor)], linhas, batcherrors=True)
+    erros = cursor.getbatcherrors()
+
+    mapa = mapa_sensores(cursor, dispositivos)
+    for erro in erros:
+        dispositivo, grandeza = faltantes[erro.offset]
+        # Outra sessao provisionou o mesmo sensor ao mesmo tempo: ele ja aparece no mapa
+        if violacao_unicidade(erro.message) and grandeza in mapa.get(dispositivo, {}):
+            continue
+        raise ValueError(f"Falha ao cadastrar {linhas[erro.offset][1]}: {erro.message}")
+    criados = sum(len(sensores) for sensores in mapa.values()) - sum(len(s) for s in existentes.values())
+    return mapa, criados
+
+
+def _ler_ids(args):
+    dispositivos = list(args.dispositivos)
+    if args.arquivo:
+        with open(args.arquivo, 'r') as arquivo:
+            dispositivos.extend(linha.strip() for linha in arquivo if linha.strip())
+    if args.prefixo:
+        largura = len(str(args.quantidade))
+        dispositivos.extend(f"{args.prefixo}{i:0{largura}d}" for i in range(1, args.quantidade + 1))
+    return dispositivos
+
+
+def main():
+    """Interface de linha de comando do provisionamento."""
+    from farmtech_database import FarmTechOracleManager
+
+    configurar_logs(arquivo=None)
+    parser = argparse.ArgumentParser(description="Provisionamento em lote de dispositivos ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_provisionar = subparsers.add_parser('provisionar', help="Cadastra os sensores virtuais dos dispositivos")
+    p_provisionar.add_argument('dispositivos', nargs='*', help="Ids dos dispositivos")
+    p_provisionar.add_argument('--arquivo', help="Arquivo com um id de dispositivo por linha")
+    p_provisionar.add_argument('--prefixo', help="Gera ids <prefixo>1..<prefixo>N (com --quantidade)")
+    p_provisionar.add_argument('--quantidade', type=int, default=1)
+    p_provisionar.add_argument('--cultura', type=int, help="cod_cultura dos sensores (padrao: a primeira cultura)")
+    p_provisionar.add_argument('--mapa', help="Grava o mapa {dispositivo: {grandeza: cod_sensor}} em JSON")
+
+    args = parser.parse_args()
+
+    dispositivos = _ler_ids(args)
+    if not dispositivos:
+        parser.error("informe ao menos um dispositivo (ids, --arquivo ou --prefixo)")
+
+    inicio = time.perf_counter()
+    mapa = FarmTechOracleManager().provisionar_dispositivos(dispositivos, args.cultura)
+    if mapa is None:
+        print("Falha no provisionamento (ver farmtech_oracle.log)")
+        return
+    segundos = time.perf_counter() - inicio
+
+    print(f"{len(mapa)} dispositivos provisionados em {segundos:.2f}s "
+          f"({sum(len(sensores) for sensores in mapa.values())} sensores)")
+    if args.mapa:
+        with open(args.mapa, 'w') as arquivo:
+            json.dump(mapa, arquivo, indent=2)
+        print(f"Mapa gravado em {args.mapa}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+FarmTech Solutions - Rollups das Medicoes
+Agregados por minuto, hora e dia mantidos durante a ingestao
+
+As tabelas T_ROLLUP_MINUTO, T_ROLLUP_HORA e T_ROLLUP_DIA (migracao 5)
+guardam, por sensor e periodo, quantidade, soma, soma dos quadrados,
+minimo, maximo, ultimo valor e segundos de bomba ligada. Cada lote gravado
+(farmtech_database._inserir_lote) atualiza os tres niveis com um MERGE por
+tabela, na mesma transacao dos INSERTs. Estatisticas e series de semanas
+de dados leem algumas centenas de linhas agregadas em vez das medicoes.
+
+Tempo de bomba ligada: o intervalo entre duas leituras consecutivas do
+sensor da bomba conta como ligado quando a leitura anterior estava ligada;
+intervalos maiores que INTERVALO_MAX_BOMBA (dispositivo fora do ar) sao
+limitados a esse valor. O intervalo e atribuido ao periodo da leitura
+mais nova. Leituras que chegam fora de ordem entram nos agregados mas nao
+no tempo de bomba; 'reconstruir' recalcula tudo a partir das medicoes.
+
+Os rollups existem so no backend Oracle; no SQLite (farmtech_backend)
+estatisticas e series leem as medicoes.
+
+Uso:
+    python farmtech_rollups.py reconstruir [--desde 2025-06-01] [--ate 2025-06-30]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+import oracledb
+from farmtech_backend import dialeto, identificar_banco, tabela_existe
+from farmtech_leituras import TIPOS_SENSORES, TIPO_DISPOSITIVO_ESP32
+
+logger = logging.getLogger(__name__)
+
+# Granularidade -> tabela, da mais fina para a mais grossa
+TABELAS_ROLLUP = {
+    'minuto': 'T_ROLLUP_MINUTO',
+    'hora': 'T_ROLLUP_HORA',
+    'dia': 'T_ROLLUP_DIA',
+}
+
+# Maior intervalo entre leituras da bomba contado como tempo ligado (segundos)
+INTERVALO_MAX_BOMBA = 300
+
+# Colunas da serie temporal (mesmos nomes das leituras, valores medios por periodo)
+COLUNAS_SERIE = ['timestamp', 'fosforo', 'potassio', 'ph', 'umidade', 'bomba_ativa', 'segundos_bomba']
+
+SQL_MERGE_ROLLUP = """
+MERGE INTO {tabela} t
+USING (SELECT :1 cod_sensor, :2 inicio_periodo, :3 quantidade, :4 soma, :5 soma_quadrados,
+              :6 minimo, :7 maximo, :8 ultimo_valor, :9 ultimo_instante, :10 segundos_bomba
+       FROM DUAL) o
+ON (t.cod_sensor = o.cod_sensor AND t.inicio_periodo = o.inicio_periodo)
+WHEN MATCHED THEN UPDATE SET
+    t.quantidade = t.quantidade + o.quantidade,
+    t.soma = t.soma + o.soma,
+    t.soma_quadrados = t.soma_quadrados + o.soma_quadrados,
+    t.minimo = LEAST(t.minimo, o.minimo),
+    t.maximo = GREATEST(t.maximo, o.maximo),
+    t.ultimo_valor = CASE WHEN o.ultimo_instante >= t.ultimo_instante
+                          THEN o.ultimo_valor ELSE t.ultimo_valor END,
+    t.ultimo_instante = GREATEST(t.ultimo_instante, o.ultimo_instante),
+    t.segundos_bomba = t.segundos_bomba + o.segundos_bomba
+WHEN NOT MATCHED THEN INSERT
+    (cod_sensor, inicio_periodo, quantidade, soma, soma_quadrados,
+     minimo, maximo, ultimo_valor, ultimo_instante, segundos_bomba)
+    VALUES (o.cod_sensor, o.inicio_periodo, o.quantidade, o.soma, o.soma_quadrados,
+            o.minimo, o.maximo, o.ultimo_valor, o.ultimo_instante, o.segundos_bomba)
+"""
+TIPOS_BIND_ROLLUP = ([oracledb.DB_TYPE_NUMBER, oracledb.DB_TYPE_DATE] + [oracledb.DB_TYPE_NUMBER] * 6
+                     + [oracledb.DB_TYPE_TIMESTAMP, oracledb.DB_TYPE_NUMBER])
+
+# Bancos (identificar_banco) em que a migracao 5 ja foi encontrada
+_bancos_com_rollups = set()
+_estado_bomba = {}
+_lock_estado = threading.Lock()
+
+
+def piso(instante, granularidade):
+    """Inicio do periodo (minuto, hora ou dia) que contem o instante."""
+    instante = instante.replace(second=0, microsecond=0)
+    if granularidade in ('hora', 'dia'):
+        instante = instante.replace(minute=0)
+    if granularidade == 'dia':
+        instante = instante.replace(hour=0)
+    return instante
+
+
+def teto(instante, granularidade):
+    """Inicio do primeiro periodo que comeca em ou depois do instante."""
+    inicio = piso(instante, granularidade)
+    if inicio == instante:
+        return inicio
+    passo = {'minuto': timedelta(minutes=1), 'hora': timedelta(hours=1), 'dia': timedelta(days=1)}
+    return inicio + passo[granularidade]
+
+
+def rollups_disponiveis(cursor):
+    """Indica se a migracao 5 ja foi aplicada no banco do cursor (a resposta positiva fica em cache)."""
+    if dialeto(cursor) != 'oracle':
+        return False
+    banco = identificar_banco(cursor)
+    if banco not in _bancos_com_rollups and tabela_existe(cursor, TABELAS_ROLLUP['dia']):
+        _bancos_com_rollups.add(banco)
+    return banco in _bancos_com_rollups
+
+
+def descartar_estado_bomba():
+    """Esquece o ultimo estado da bomba (chamado apos rollback; recarregado dos rollups)."""
+    with _lock_estado:
+        _estado_bomba.clear()
+
+
+def _ultimo_estado_bomba(cursor, cod_sensor):
+    """(instante, valor) da ultima leitura da bomba, lido uma vez de T_ROLLUP_MINUTO."""
+    if cod_sensor not in _estado_bomba:
+        cursor.execute(f"""
+        SELECT ultimo_instante, ultimo_valor FROM {TABELAS_ROLLUP['minuto']}
+        WHERE cod_sensor = :1
+        ORDER BY inicio_periodo DESC
+        FETCH FIRST 1 ROW ONLY
+        """, [cod_sensor])
+        row = cursor.fetchone()
+        _estado_bomba[cod_sensor] = (row[0], row[1]) if row else (datetime.min, 0)
+    return _estado_bomba[cod_sensor]
+
+
+def agregar(sensores, leituras, instantes, estado_bomba):
+    """
+    Agrega leituras (fosforo, potassio, ph, umidade, bomba) por granularidade.
+
+    sensores e {grandeza: cod_sensor}; estado_bomba e o (instante, valor)
+    da leitura anterior da bomba. Retorna ({granularidade: {(cod_sensor,
+    inicio_periodo): [quantidade, soma, soma_quadrados, minimo, maximo,
+    ultimo_valor, ultimo_instante, segundos_bomba]}}, novo estado_bomba).
+    """
+    cod_bomba = sensores['bomba']
+    baldes = {granularidade: {} for granularidade in TABELAS_ROLLUP}
+
+    for instante, leitura in sorted(zip(instantes, leituras), key=lambda par: par[0]):
+        segundos = 0.0
+        if instante > estado_bomba[0]:
+            if estado_bomba[1]:
+                segundos = min((instante - estado_bomba[0]).total_seconds(), INTERVALO_MAX_BOMBA)
+            estado_bomba = (instante, leitura[-1])
+
+        for grandeza, valor in zip(TIPOS_SENSORES, leitura):
+            cod_sensor = sensores[grandeza]
+            for granularidade, periodos in baldes.items():
+                chave = (cod_sensor, piso(instante, granularidade))
+                agregado = periodos.get(chave)
+                if agregado is None:
+                    periodos[chave] = [1, valor, valor * valor, valor, valor, valor, instante,
+                                       segundos if cod_sensor == cod_bomba else 0.0]
+                    continue
+                agregado[0] += 1
+                agregado[1] += valor
+                agregado[2] += valor * valor
+                agregado[3] = min(agregado[3], valor)
+                agregado[4] = max(agregado[4], valor)
+                agregado[5], agregado[6] = valor, instante  # leituras em ordem de tempo
+                if cod_sensor == cod_bomba:
+                    agregado[7] += segundos
+    return baldes, estado_bomba
+
+
+def atualizar_rollups(cursor, sensores, leituras, instantes):
+    """
+    Aplica um lote de leituras nos rollups, sem commit (transacao do chamador).
+
+    Um executemany de MERGE por tabela, com as linhas em ordem de chave
+    para que sessoes concorrentes travem as mesmas linhas na mesma ordem.
+    Linhas recusadas por chave duplicada (dois MERGE inserindo o mesmo
+    periodo ao mesmo tempo) sao reenviadas uma vez, ja como atualizacao.
+    """
+    if not leituras:
+        return
+    cod_bomba = sensores['bomba']
+    with _lock_estado:
+        estado = _ultimo_estado_bomba(cursor, cod_bomba)
+        baldes, _estado_bomba[cod_bomba] = agregar(sensores, leituras, instantes, estado)
+
+    for granularidade, periodos in baldes.items():
+        sql = SQL_MERGE_ROLLUP.format(tabela=TABELAS_ROLLUP[granularidade])
+        linhas = [(*chave, *agregado) for chave, agregado in sorted(periodos.items())]
+        cursor.setinputsizes(*TIPOS_BIND_ROLLUP)
+        cursor.executemany(sql, linhas, batcherrors=True)
+        erros = cursor.getbatcherrors()
+        if erros:
+            if any(erro.code != 1 for erro in erros):  # ORA-00001
+                raise oracledb.DatabaseError(erros[0].message)
+            cursor.setinputsizes(*TIPOS_BIND_ROLLUP)
+            cursor.executemany(sql, [linhas[erro.offset] for erro in erros])
+
+
+def escolher_granularidade(inicio, fim=None):
+    """Granularidade da serie para o intervalo: algumas centenas de pontos no maximo."""
+    if inicio is None:
+        return 'dia'
+    duracao = (fim or datetime.now()) - inicio
+    if duracao <= timedelta(hours=6):
+        return 'minuto'
+    if duracao <= timedelta(days=14):
+        return 'hora'
+    return 'dia'
+
+
+def segmentos(inicio, fim):
+    """
+    Cobre [inicio, fim) com o menor numero de linhas de rollup.
+
+    Retorna [(tabela, inicio, fim)]: minutos ate a primeira hora cheia,
+    horas ate o primeiro dia cheio, dias no meio e o caminho inverso no
+    final. None em inicio/fim deixa o lado aberto. A resolucao e de um
+    minuto (os limites sao truncados para o minuto).
+    """
+    niveis = list(TABELAS_ROLLUP)
+    a = piso(inicio, 'minuto') if inicio is not None else None
+    b = piso(fim, 'minuto') if fim is not None else None
+    esquerda, direita = [], []
+
+    for nivel, proximo in zip(niveis, niveis[1:]):
+        tabela = TABELAS_ROLLUP[nivel]
+        if a is not None:
+            a_alinhado = teto(a, proximo)
+            if b is not None and a_alinhado >= b:
+                return esquerda + ([(tabela, a, b)] if a < b else []) + direita
+            if a_alinhado > a:
+                esquerda.append((tabela, a, a_alinhado))
+            a = a_alinhado
+        if b is not None:
+            b_alinhado = piso(b, proximo)
+            if b_alinhado < b:
+                direita.insert(0, (tabela, b_alinhado, b))
+            b = b_alinhado
+
+    if a is None or b is None or a < b:
+        esquerda.append((TABELAS_ROLLUP[niveis[-1]], a, b))
+    return esquerda + direita
+
+
+def serie_temporal(cursor, inicio=None, fim=None, granularidade=None):
+    """
+    Serie com a media de cada grandeza por periodo, lida dos rollups.
+
+    Retorna linhas com as colunas COLUNAS_SERIE; bomba_ativa e a fracao de
+    leituras com a bomba ligada e segundos_bomba o tempo ligado no periodo.
+    """
+    granularidade = granularidade or escolher_granularidade(inicio, fim)
+    medias = ",\n               ".join(
+        f"SUM(CASE WHEN s.tipo_sensor = '{tipo}' THEN r.soma END) / "
+        f"NULLIF(SUM(CASE WHEN s.tipo_sensor = '{tipo}' THEN r.quantidade END), 0)"
+        for tipo in TIPOS_SENSORES.values()
+    )
+    condicoes = ["s.tipo_dispositivo = :tipo_dispositivo"]
+    binds = {'tipo_dispositivo': TIPO_DISPOSITIVO_ESP32}
+    if inicio is not None:
+        condicoes.append("r.inicio_periodo >= :inicio")
+        binds['inicio'] = piso(inicio, granularidade)
+    if fim is not None:
+        condicoes.append("r.inicio_periodo < :fim")
+        binds['fim'] = fim
+
+    cursor.execute(f"""
+        SELECT r.inicio_periodo,
+               {medias},
+               SUM(CASE WHEN s.tipo_sensor = '{TIPOS_SENSORES['bomba']}' THEN r.segundos_bomba END)
+        FROM {TABELAS_ROLLUP[granularidade]} r
+        JOIN T_SENSORES s ON r.cod_sensor = s.cod_sensor
+        WHERE {' AND '.join(condicoes)}
+        GROUP BY r.inicio_periodo
+        ORDER BY r.inicio_periodo
+    """, binds)
+    return cursor.fetchall()
+
+
+# --- RECONSTRUCAO A PARTIR DAS MEDICOES ---
+
+SQL_FILTRO_ESP32 = "cod_sensor IN (SELECT cod_sensor FROM T_SENSORES WHERE tipo_dispositivo = :tipo_dispositivo)"
+
+# Minutos a partir de V_MEDICOES (os dois layouts). O LAG olha ate
+# INTERVALO_MAX_BOMBA antes do dia para o tempo de bomba da primeira leitura.
+SQL_RECONSTRUIR_MINUTOS = f"""
+INSERT INTO {TABELAS_ROLLUP['minuto']}
+    (cod_sensor, inicio_periodo, quantidade, soma, soma_quadrados,
+     minimo, maximo, ultimo_valor, ultimo_instante, segundos_bomba)
+SELECT cod_sensor, TRUNC(instante, 'MI'), COUNT(*), SUM(valor), SUM(valor * valor),
+       MIN(valor), MAX(valor), MAX(valor) KEEP (DENSE_RANK LAST ORDER BY instante),
+       MAX(instante), SUM(segundos)
+FROM (
+    SELECT m.cod_sensor, CAST(m.data_hora_medicao AS TIMESTAMP) instante, m.valor_medicao valor,
+           CASE WHEN s.tipo_sensor = '{TIPOS_SENSORES['bomba']}'
+                     AND LAG(m.valor_medicao) OVER (PARTITION BY m.cod_sensor
+                                                    ORDER BY m.data_hora_medicao) = 1
+                THEN LEAST((CAST(m.data_hora_medicao AS DATE)
+                            - CAST(LAG(m.data_hora_medicao) OVER (PARTITION BY m.cod_sensor
+                                                                  ORDER BY m.data_hora_medicao) AS DATE))
+                           * 86400, {INTERVALO_MAX_BOMBA})
+                ELSE 0
+           END segundos
+    FROM V_MEDICOES m
+    JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+    WHERE s.tipo_dispositivo = :tipo_dispositivo
+      AND m.data_hora_medicao >= :inicio_lag AND m.data_hora_medicao < :fim
+)
+WHERE instante >= :inicio
+GROUP BY cod_sensor, TRUNC(instante, 'MI')
+"""
+
+# Hora a partir dos minutos e dia a partir das horas
+SQL_RECONSTRUIR_NIVEL = """
+INSERT INTO {destino}
+    (cod_sensor, inicio_periodo, quantidade, soma, soma_quadrados,
+     minimo, maximo, ultimo_valor, ultimo_instante, segundos_bomba)
+SELECT cod_sensor, TRUNC(inicio_periodo, '{formato}'), SUM(quantidade), SUM(soma), SUM(soma_quadrados),
+       MIN(minimo), MAX(maximo), MAX(ultimo_valor) KEEP (DENSE_RANK LAST ORDER BY ultimo_instante),
+       MAX(ultimo_instante), SUM(segundos_bomba)
+FROM {origem}
+WHERE {filtro} AND inicio_periodo >= :inicio AND inicio_periodo < :fim
+GROUP BY cod_sensor, TRUNC(inicio_periodo, '{formato}')
+"""
+
+
+def reconstruir_dia(cursor, dia):
+    """Recalcula os rollups ESP32 de um dia (DELETE + INSERT ... SELECT, sem commit)."""
+    fim = dia + timedelta(days=1)
+    binds = {'tipo_dispositivo': TIPO_DISPOSITIVO_ESP32, 'inicio': dia, 'fim': fim}
+
+    for tabela in TABELAS_ROLLUP.values():
+        cursor.execute(f"DELETE FROM {tabela} WHERE {SQL_FILTRO_ESP32} "
+                       "AND inicio_periodo >= :inicio AND inicio_periodo < :fim", binds)
+
+    cursor.execute(SQL_RECONSTRUIR_MINUTOS,
+                   dict(binds, inicio_lag=dia - timedelta(seconds=INTERVALO_MAX_BOMBA)))
+    minutos = cursor.rowcount
+    for origem, destino, formato in (('minuto', 'hora', 'HH'), ('hora', 'dia', 'DD')):
+        cursor.execute(SQL_RECONSTRUIR_NIVEL.format(
+            origem=TABELAS_ROLLUP[origem], destino=TABELAS_ROLLUP[destino],
+            formato=formato, filtro=SQL_FILTRO_ESP32
+        ), binds)
+    return minutos
+
+
+def reconstruir_rollups(manager, desde=None, ate=None):
+    """
+    Recalcula os rollups de [desde, ate] dia a dia, com um commit por dia.
+
+    Sem desde, comeca na medicao ESP32 mais antiga; sem ate, vai ate hoje.
+    Pode ser repetido sobre os mesmos dias (cada dia e apagado antes).
+    """
+    if manager.backend.nome != 'oracle':
+        print(f"Rollups existem apenas no backend Oracle (backend atual: {manager.backend})")
+        return False
+    if not manager.connect():
+        return False
+
+    try:
+        if desde is None:
+            manager.cursor.execute("""
+            SELECT MIN(m.data_hora_medicao) FROM V_MEDICOES m
+            JOIN T_SENSORES s ON m.cod_sensor = s.cod_sensor
+            WHERE s.tipo_dispositivo = :1
+            """, [TIPO_DISPOSITIVO_ESP32])
+            desde = manager.cursor.fetchone()[0]
+            if desde is None:
+                print("Nenhuma medicao ESP32 para reconstruir")
+                return True
+        dia = piso(desde, 'dia')
+        ultimo = piso(ate or datetime.now(), 'dia')
+
+        while dia <= ultimo:
+            minutos = reconstruir_dia(manager.cursor, dia)
+            manager.conn.commit()
+            logger.info(f"Rollups de {dia:%Y-%m-%d} reconstruidos ({minutos} minutos)")
+            print(f"{dia:%Y-%m-%d}: {minutos} linhas por minuto")
+            dia += timedelta(days=1)
+
+        descartar_estado_bomba()
+        return True
+
+    except oracledb.DatabaseError as e:
+        logger.error(f"Erro ao reconstruir rollups: {e}")
+        manager.conn.rollback()
+        return False
+    finally:
+        manager.disconnect()
+
+
+def main():
+    """Interface de linha de comando dos rollups."""
+    # Importado aqui: farmtech_database usa este modulo ao gravar os lotes
+    from farmtech_database import FarmTechOracleManager
+
+    def data(texto):
+        return datetime.strptime(texto, '%Y-%m-%d')
+
+    parser = argparse.ArgumentParser(description="Rollups das medicoes ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_reconstruir = subparsers.add_parser('reconstruir', help="Recalcula os rollups a partir das medicoes")
+    p_reconstruir.add_argument('--desde', type=data, help="Primeiro dia (AAAA-MM-DD)")
+    p_reconstruir.add_argument('--ate', type=data, help="Ultimo dia (AAAA-MM-DD)")
+
+    args = parser.parse_args()
+
+    if args.comando == 'reconstruir':
+        reconstruir_rollups(FarmTechOracleManager(), args.desde, args.ate)
+
+
+if __name__ == "__main__":
+    main()
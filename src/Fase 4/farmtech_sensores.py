@@ -0,0 +1,125 @@
+"""
+FarmTech Solutions - Registro de Sensores
+Cache dos codigos dos sensores virtuais de cada dispositivo
+
+Os caminhos de insercao precisam do cod_sensor de cada grandeza do
+dispositivo (fosforo, potassio, ph, umidade, bomba). O registro resolve
+os sensores de todos os dispositivos em uma unica consulta (indice
+IX_SENS_DISP da migracao 3) e os mantem em memoria; depois disso a
+insercao nao faz nenhuma ida ao banco para buscar metadados.
+
+Opcionalmente o registro e salvo em um snapshot JSON
+(FARMTECH_CACHE_SENSORES), reaproveitado na proxima execucao. O CRUD de
+T_SENSORES chama invalidar() apos create/update/delete_sensor, o que
+descarta a memoria e o snapshot.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import json
+import threading
+import logging
+from farmtech_leituras import TIPOS_SENSORES, TIPO_DISPOSITIVO_ESP32
+
+logger = logging.getLogger(__name__)
+
+# Caminho do snapshot em disco (desativado se a variavel nao estiver definida)
+SNAPSHOT_PADRAO = os.environ.get('FARMTECH_CACHE_SENSORES')
+
+
+class RegistroSensores:
+    """Mapa dispositivo -> {grandeza: cod_sensor}, carregado sob demanda."""
+
+    def __init__(self, caminho_snapshot=SNAPSHOT_PADRAO):
+        """Inicializa o registro; caminho_snapshot=None desativa o snapshot em disco."""
+        self.caminho_snapshot = caminho_snapshot
+        self._dispositivos = None
+        self._lock = threading.Lock()
+
+    def sensores(self, dispositivo, cursor=None):
+        """
+        Retorna {grandeza: cod_sensor} do dispositivo, ou None se nao cadastrado.
+
+        Consulta a memoria e depois o snapshot; o cursor so e usado (uma
+        consulta para todos os dispositivos) quando nenhum dos dois tem dados.
+        """
+        with self._lock:
+            if self._dispositivos is None:
+                self._dispositivos = self._ler_snapshot()
+            if self._dispositivos is None:
+                if cursor is None:
+                    return None
+                self._dispositivos = self._consultar(cursor)
+                self._gravar_snapshot()
+            return self._dispositivos.get(dispositivo)
+
+    def carregado(self):
+        """Indica se o registro ja esta em memoria (sem idas ao banco)."""
+        with self._lock:
+            return self._dispositivos is not None
+
+    def recarregar(self, cursor):
+        """Descarta o cache e refaz a consulta."""
+        self.invalidar()
+        with self._lock:
+            self._dispositivos = self._consultar(cursor)
+            self._gravar_snapshot()
+
+    def invalidar(self):
+        """Descarta a memoria e o snapshot (chamado quando T_SENSORES muda)."""
+        with self._lock:
+            self._dispositivos = None
+            if self.caminho_snapshot and os.path.exists(self.caminho_snapshot):
+                os.remove(self.caminho_snapshot)
+        logger.debug("Registro de sensores invalidado")
+
+    def _consultar(self, cursor):
+        """Uma unica consulta com os sensores de todos os dispositivos ESP32."""
+        grandezas = {tipo: grandeza for grandeza, tipo in TIPOS_SENSORES.items()}
+        cursor.execute("""
+        SELECT cod_dispositivo, tipo_sensor, cod_sensor FROM T_SENSORES
+        WHERE tipo_dispositivo = :1
+        """, [TIPO_DISPOSITIVO_ESP32])
+
+        dispositivos = {}
+        for dispositivo, tipo, cod_sensor in cursor:
+            if tipo in grandezas:
+                dispositivos.setdefault(dispositivo, {})[grandezas[tipo]] = cod_sensor
+        logger.info(f"Registro de sensores carregado: {len(dispositivos)} dispositivo(s)")
+        return dispositivos
+
+    def _ler_snapshot(self):
+        if not self.caminho_snapshot or not os.path.exists(self.caminho_snapshot):
+            return None
+        try:
+            with open(self.caminho_snapshot, 'r') as arquivo:
+                return json.load(arquivo)['dispositivos']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Snapshot de sensores ignorado ({self.caminho_snapshot}): {e}")
+            return None
+
+    def _gravar_snapshot(self):
+        if not self.caminho_snapshot:
+            return
+        temporario = self.caminho_snapshot + '.tmp'
+        try:
+            with open(temporario, 'w') as arquivo:
+                json.dump({'dispositivos': self._dispositivos}, arquivo)
+            os.replace(temporario, self.caminho_snapshot)
+        except OSError as e:
+            logger.warning(f"Nao foi possivel gravar o snapshot de sensores: {e}")
+
+
+_registro = None
+_lock_registro = threading.Lock()
+
+
+def obter_registro_sensores():
+    """Retorna o registro de sensores compartilhado (por processo)."""
+    global _registro
+    with _lock_registro:
+        if _registro is None:
+            _registro = RegistroSensores()
+        return _registro
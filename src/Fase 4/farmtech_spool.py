@@ -0,0 +1,486 @@
+"""
+FarmTech Solutions - Spool Local de Leituras
+Armazenamento local duravel para a ingestao sobreviver a quedas do banco
+
+As leituras sao gravadas primeiro em arquivos de segmento locais
+(append-only) e depois drenadas para o Oracle em lotes grandes:
+
+- cada registro tem tamanho fixo, numero de sequencia (seq) e CRC32; um
+  registro cortado por queda de energia e descartado na abertura;
+- o registro guarda a origem da leitura (dispositivo, contador do
+  firmware), de modo que a drenagem passa pela mesma deduplicacao
+  (farmtech_dedup) da gravacao direta. O id do dispositivo ocupa ate
+  TAMANHO_MAX_DISPOSITIVO bytes em UTF-8 (o tamanho de cod_dispositivo);
+- um segmento novo e iniciado a cada registros_por_segmento registros e
+  o nome do arquivo guarda a seq do primeiro registro, de modo que a
+  posicao de qualquer seq e calculada sem varrer o arquivo;
+- o checkpoint local guarda a ultima seq confirmada no banco; segmentos
+  totalmente confirmados sao apagados;
+- o banco guarda a ultima seq aplicada de cada spool em
+  T_INGESTAO_CHECKPOINT (migracao 4), atualizada na mesma transacao dos
+  INSERTs. Reenviar um lote ja aplicado (queda entre o commit e a gravacao
+  do checkpoint local) nao duplica leituras.
+
+Cada diretorio de spool pertence a um unico processo: ao abrir o spool o
+processo trava o arquivo spool.lock do diretorio (outro processo recebe
+um erro em vez de corromper os segmentos). Dentro do processo todos os
+usuarios do mesmo diretorio (ingestao, gerenciadores, drenador) devem
+obter o spool por obter_spool(), que devolve sempre a mesma instancia,
+com uma unica sequencia e uma unica trava de escrita. Quem so grava no
+spool de vez em quando e nao o drena (o menu, com o banco fora do ar) usa
+anexar_sem_reter(), que libera a trava apos cada gravacao.
+
+Uso:
+    python farmtech_spool.py status [--dir spool_esp32]
+    python farmtech_spool.py drenar [--dir spool_esp32] [--lote 5000] [--colunar colunar_esp32]
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import json
+import uuid
+import zlib
+import glob
+import time
+import struct
+import bisect
+import logging
+import argparse
+import threading
+from datetime import datetime
+from farmtech_provisionamento import TAMANHO_MAX_DISPOSITIVO
+from farmtech_colunar import ArmazemColunar
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: a trava do diretorio usa msvcrt
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DIRETORIO_PADRAO = os.environ.get('FARMTECH_SPOOL_DIR', 'spool_esp32')
+
+# Registro: seq, instante (epoch), fosforo, potassio, ph, umidade, bomba, dispositivo
+# e contador (-1 sem contador; dispositivo vazio sem origem) + CRC32 do corpo
+_CORPO = struct.Struct(f'<QdBBddB{TAMANHO_MAX_DISPOSITIVO}sq')
+_CRC = struct.Struct('<I')
+TAMANHO_REGISTRO = _CORPO.size + _CRC.size
+
+_PREFIXO_SEGMENTO = 'segmento_'
+_EXTENSAO_SEGMENTO = '.spool'
+
+# Espera maxima (s) entre tentativas de drenagem com o banco indisponivel
+ESPERA_MAXIMA_DRENAGEM = 30.0
+
+
+def _bytes_dispositivo(dispositivo):
+    """Id do dispositivo em UTF-8; ValueError se nao couber no campo (struct.pack o cortaria em silencio)."""
+    bruto = dispositivo.encode('utf-8')
+    if len(bruto) > TAMANHO_MAX_DISPOSITIVO:
+        raise ValueError(f"Id de dispositivo com mais de {TAMANHO_MAX_DISPOSITIVO} bytes em UTF-8: {dispositivo!r}")
+    return bruto
+
+
+def _codificar(seq, instante, leitura, origem=None):
+    """Serializa um registro do spool; origem = (dispositivo, contador ou None) ou None."""
+    fosforo, potassio, ph, umidade, bomba = leitura
+    dispositivo, contador = origem or ('', None)
+    corpo = _CORPO.pack(seq, instante, int(fosforo), int(potassio), float(ph), float(umidade), int(bomba),
+                        _bytes_dispositivo(dispositivo), -1 if contador is None else int(contador))
+    return corpo + _CRC.pack(zlib.crc32(corpo))
+
+
+def _decodificar(dados):
+    """Retorna (seq, instante, leitura, origem) ou None se o CRC nao conferir."""
+    corpo = dados[:_CORPO.size]
+    if _CRC.unpack(dados[_CORPO.size:TAMANHO_REGISTRO])[0] != zlib.crc32(corpo):
+        return None
+    seq, instante, fosforo, potassio, ph, umidade, bomba, dispositivo, contador = _CORPO.unpack(corpo)
+    dispositivo = dispositivo.rstrip(b'\0').decode('utf-8')
+    origem = (dispositivo, None if contador < 0 else contador) if dispositivo else None
+    return seq, instante, (fosforo, potassio, ph, umidade, bomba), origem
+
+
+def _travar(arquivo):
+    """Trava exclusiva, sem espera, no arquivo aberto; False se outro processo ja a tem."""
+    try:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+class SpoolLocal:
+    """Fila duravel de leituras em arquivos de segmento locais (use obter_spool)."""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, registros_por_segmento=100000, fsync=True):
+        """
+        Abre (ou cria) o spool no diretorio informado, recuperando o estado.
+
+        Com fsync=True cada anexar() so retorna depois que os registros
+        estao no disco. RuntimeError se outro processo estiver com o spool
+        aberto.
+        """
+        self.diretorio = diretorio
+        self.registros_por_segmento = registros_por_segmento
+        self.fsync = fsync
+        self.novos_registros = threading.Event()
+
+        self._lock = threading.Lock()
+        self._arquivo = None
+        os.makedirs(diretorio, exist_ok=True)
+
+        # A trava vale enquanto o arquivo estiver aberto (liberada em fechar() ou no fim do processo)
+        self._trava = open(self._caminho('spool.lock'), 'a+')
+        if not _travar(self._trava):
+            self._trava.close()
+            raise RuntimeError(f"Spool {diretorio} em uso por outro processo")
+        self._trava.seek(0)
+        self._trava.truncate()
+        self._trava.write(f"{os.getpid()}\n")
+        self._trava.flush()
+
+        self.id_spool = self._carregar_identidade()
+        self._segmentos = sorted(
+            int(os.path.basename(caminho)[len(_PREFIXO_SEGMENTO):-len(_EXTENSAO_SEGMENTO)])
+            for caminho in glob.glob(os.path.join(diretorio, f"{_PREFIXO_SEGMENTO}*{_EXTENSAO_SEGMENTO}"))
+        )
+        # Seqs anteriores ao primeiro segmento existente ja foram confirmadas e apagadas
+        self._checkpoint = max(self._ler_checkpoint(), self._segmentos[0] - 1 if self._segmentos else 0)
+        self._proxima_seq = max(self._recuperar_ultimo_segmento(), self._checkpoint + 1)
+
+    # --- ESTADO EM DISCO ---
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _caminho_segmento(self, primeira_seq):
+        return self._caminho(f"{_PREFIXO_SEGMENTO}{primeira_seq:020d}{_EXTENSAO_SEGMENTO}")
+
+    def _carregar_identidade(self):
+        """id_spool (chave do checkpoint no banco), criado na primeira abertura."""
+        caminho = self._caminho('spool.json')
+        if os.path.exists(caminho):
+            with open(caminho, 'r') as arquivo:
+                return json.load(arquivo)['id_spool']
+        id_spool = str(uuid.uuid4())
+        self._gravar_atomico(caminho, {'id_spool': id_spool})
+        return id_spool
+
+    def _ler_checkpoint(self):
+        caminho = self._caminho('checkpoint.json')
+        if not os.path.exists(caminho):
+            return 0
+        with open(caminho, 'r') as arquivo:
+            return json.load(arquivo)['ultima_seq']
+
+    def _gravar_atomico(self, caminho, dados):
+        """Grava um JSON pequeno via arquivo temporario + rename."""
+        temporario = caminho + '.tmp'
+        with open(temporario, 'w') as arquivo:
+            json.dump(dados, arquivo)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+
+    def _recuperar_ultimo_segmento(self):
+        """Descarta registros incompletos ou corrompidos no fim do ultimo segmento."""
+        if not self._segmentos:
+            return 1
+        primeira = self._segmentos[-1]
+        caminho = self._caminho_segmento(primeira)
+        quantidade = os.path.getsize(caminho) // TAMANHO_REGISTRO
+
+        with open(caminho, 'r+b') as arquivo:
+            while quantidade > 0:
+                arquivo.seek((quantidade - 1) * TAMANHO_REGISTRO)
+                if _decodificar(arquivo.read(TAMANHO_REGISTRO)) is not None:
+                    break
+                quantidade -= 1
+            if arquivo.seek(0, os.SEEK_END) != quantidade * TAMANHO_REGISTRO:
+                logger.warning(f"Spool: registros incompletos descartados no fim de {caminho}")
+                arquivo.truncate(quantidade * TAMANHO_REGISTRO)
+
+        return primeira + quantidade
+
+    # --- ESCRITA ---
+
+    def anexar(self, registros):
+        """
+        Anexa leituras ao spool; registros e uma lista de (instante_epoch, leitura, origem).
+
+        origem e (dispositivo, contador) para a deduplicacao na drenagem
+        (contador None se a leitura nao tem contador) ou None.
+        Retorna a seq do ultimo registro gravado. ValueError (e nada e
+        gravado) se algum id de dispositivo nao couber no registro.
+        """
+        for _, _, origem in registros:
+            if origem is not None:
+                _bytes_dispositivo(origem[0])
+        with self._lock:
+            dados = bytearray()
+            for instante, leitura, origem in registros:
+                if self._arquivo is None or self._registros_no_segmento >= self.registros_por_segmento:
+                    self._gravar(dados)
+                    dados = bytearray()
+                    self._abrir_segmento()
+                dados += _codificar(self._proxima_seq, instante, leitura, origem)
+                self._proxima_seq += 1
+                self._registros_no_segmento += 1
+            self._gravar(dados)
+            ultima = self._proxima_seq - 1
+
+        self.novos_registros.set()
+        return ultima
+
+    def _abrir_segmento(self):
+        """Continua o ultimo segmento ou inicia um novo quando ele esta cheio."""
+        if self._arquivo is not None:
+            self._arquivo.close()
+        if self._segmentos and self._proxima_seq - self._segmentos[-1] < self.registros_por_segmento:
+            primeira = self._segmentos[-1]
+        else:
+            primeira = self._proxima_seq
+            self._segmentos.append(primeira)
+        self._arquivo = open(self._caminho_segmento(primeira), 'ab')
+        self._registros_no_segmento = self._proxima_seq - primeira
+
+    def _gravar(self, dados):
+        if not dados:
+            return
+        self._arquivo.write(dados)
+        self._arquivo.flush()
+        if self.fsync:
+            os.fsync(self._arquivo.fileno())
+
+    # --- LEITURA E CONFIRMACAO ---
+
+    def ler(self, desde_seq, limite):
+        """Retorna ate limite registros (seq, instante, leitura, origem) a partir de desde_seq."""
+        registros = []
+        with self._lock:
+            seq = max(desde_seq, self._segmentos[0] if self._segmentos else desde_seq)
+            while len(registros) < limite and seq < self._proxima_seq:
+                indice = bisect.bisect_right(self._segmentos, seq) - 1
+                primeira = self._segmentos[indice]
+                fim_segmento = (self._segmentos[indice + 1] if indice + 1 < len(self._segmentos)
+                                else self._proxima_seq)
+                quantidade = min(limite - len(registros), fim_segmento - seq)
+
+                with open(self._caminho_segmento(primeira), 'rb') as arquivo:
+                    arquivo.seek((seq - primeira) * TAMANHO_REGISTRO)
+                    dados = arquivo.read(quantidade * TAMANHO_REGISTRO)
+
+                for inicio in range(0, len(dados), TAMANHO_REGISTRO):
+                    registro = _decodificar(dados[inicio:inicio + TAMANHO_REGISTRO])
+                    if registro is None:
+                        raise IOError(f"Spool corrompido em {self._caminho_segmento(primeira)} (seq {seq})")
+                    registros.append(registro)
+                    seq += 1
+        return registros
+
+    def confirmar(self, ultima_seq):
+        """Registra ultima_seq como aplicada no banco e apaga os segmentos ja confirmados."""
+        with self._lock:
+            if ultima_seq <= self._checkpoint:
+                return
+            self._checkpoint = ultima_seq
+            self._gravar_atomico(self._caminho('checkpoint.json'), {'ultima_seq': ultima_seq})
+
+            # Um segmento pode ser apagado quando o seguinte ja comeca apos o checkpoint
+            while len(self._segmentos) > 1 and self._segmentos[1] <= ultima_seq + 1:
+                os.remove(self._caminho_segmento(self._segmentos.pop(0)))
+
+    @property
+    def checkpoint(self):
+        """Ultima seq confirmada no banco."""
+        return self._checkpoint
+
+    def pendentes(self):
+        """Quantidade de registros ainda nao confirmados no banco."""
+        with self._lock:
+            return self._proxima_seq - 1 - self._checkpoint
+
+    def fechar(self):
+        """Fecha o segmento aberto e libera o diretorio para outro processo."""
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+            if not self._trava.closed:
+                self._trava.close()
+        with _lock_spools:
+            if _spools.get(os.path.abspath(self.diretorio)) is self:
+                del _spools[os.path.abspath(self.diretorio)]
+
+
+_spools = {}
+_lock_spools = threading.Lock()
+
+
+def obter_spool(diretorio=DIRETORIO_PADRAO):
+    """Retorna o spool do diretorio compartilhado pelo processo (aberto no primeiro uso)."""
+    chave = os.path.abspath(diretorio)
+    with _lock_spools:
+        if chave not in _spools:
+            _spools[chave] = SpoolLocal(diretorio)
+        return _spools[chave]
+
+
+def anexar_sem_reter(diretorio, registros):
+    """
+    Anexa registros ao spool do diretorio sem manter a trava do processo.
+
+    Para quem grava no spool so de vez em quando (o menu, com o banco
+    fora do ar) e nao o drena: se o processo ja tem o spool aberto
+    (obter_spool), usa essa instancia; senao abre, anexa e fecha, deixando
+    o diretorio livre para 'python farmtech_spool.py drenar'. Retorna a
+    seq do ultimo registro; RuntimeError se outro processo estiver com o
+    spool aberto.
+    """
+    with _lock_spools:
+        spool = _spools.get(os.path.abspath(diretorio))
+    if spool is not None:
+        return spool.anexar(registros)
+    spool = SpoolLocal(diretorio)
+    try:
+        return spool.anexar(registros)
+    finally:
+        spool.fechar()
+
+
+class DrenadorSpool(threading.Thread):
+    """
+    Thread que drena o spool para o banco em lotes grandes.
+
+    manager e um FarmTechOracleManager; cada lote e gravado por
+    gravar_leituras_spool(), que ignora as seqs ja aplicadas no banco.
+    Com colunar (farmtech_colunar.ArmazemColunar) as leituras que o banco
+    aceitou (sem duplicadas nem recusadas) sao anexadas ao armazem.
+    """
+
+    def __init__(self, spool, manager, tamanho_lote=5000, intervalo=1.0, colunar=None):
+        super().__init__(name='spool-drenador', daemon=True)
+        self.spool = spool
+        self.manager = manager
+        self.colunar = colunar
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._contadores = {'drenadas': 0, 'duplicadas': 0, 'rejeitadas_banco': 0,
+                            'lotes_drenados': 0, 'falhas_drenagem': 0}
+
+    def contadores(self):
+        with self._lock:
+            dados = dict(self._contadores)
+        dados['pendentes_spool'] = self.spool.pendentes()
+        dados['checkpoint_spool'] = self.spool.checkpoint
+        return dados
+
+    def parar(self):
+        self._parar.set()
+        self.spool.novos_registros.set()
+
+    def run(self):
+        espera = self.intervalo
+        while not self._parar.is_set():
+            drenadas = self.drenar_lote()
+            if drenadas is None:
+                # Banco indisponivel: a ingestao continua no spool; nova tentativa com espera crescente
+                self._parar.wait(espera)
+                espera = min(espera * 2, ESPERA_MAXIMA_DRENAGEM)
+                continue
+            espera = self.intervalo
+            if drenadas == 0:
+                self.spool.novos_registros.wait(self.intervalo)
+                self.spool.novos_registros.clear()
+
+    def drenar_lote(self):
+        """Grava o proximo lote do spool; retorna o numero de registros ou None se o banco falhar."""
+        registros = self.spool.ler(self.spool.checkpoint + 1, self.tamanho_lote)
+        if not registros:
+            return 0
+
+        resultado = self.manager.gravar_leituras_spool(self.spool.id_spool, registros)
+        if resultado is None:
+            with self._lock:
+                self._contadores['falhas_drenagem'] += 1
+            return None
+
+        for seq, mensagem in resultado['erros'].items():
+            logger.warning(f"Spool: leitura seq {seq} recusada pelo banco - {mensagem}")
+        if self.colunar is not None and resultado['aceitas']:
+            aceitas = set(resultado['aceitas'])
+            gravados = [registro for registro in registros if registro[0] in aceitas]
+            self.colunar.anexar([datetime.fromtimestamp(instante) for _, instante, _, _ in gravados],
+                                [leitura for _, _, leitura, _ in gravados])
+        self.spool.confirmar(registros[-1][0])
+
+        with self._lock:
+            self._contadores['drenadas'] += resultado['gravadas']
+            self._contadores['duplicadas'] += resultado['duplicadas']
+            self._contadores['rejeitadas_banco'] += len(resultado['erros'])
+            self._contadores['lotes_drenados'] += 1
+        return len(registros)
+
+    def drenar_tudo(self):
+        """Drena ate esvaziar o spool; retorna False se o banco ficar indisponivel."""
+        while self.spool.pendentes() > 0:
+            if self.drenar_lote() is None:
+                return False
+        return True
+
+
+def main():
+    """Interface de linha de comando do spool."""
+    # Importado aqui: farmtech_database usa este modulo para o spool de contingencia
+    from farmtech_database import FarmTechOracleManager
+
+    parser = argparse.ArgumentParser(description="Spool local de leituras ESP32")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    p_status = subparsers.add_parser('status', help="Exibe o estado do spool")
+    p_status.add_argument('--dir', default=DIRETORIO_PADRAO)
+    p_drenar = subparsers.add_parser('drenar', help="Grava no banco as leituras pendentes")
+    p_drenar.add_argument('--dir', default=DIRETORIO_PADRAO)
+    p_drenar.add_argument('--lote', type=int, default=5000)
+    p_drenar.add_argument('--layout', choices=['eav', 'largo'])
+    p_drenar.add_argument('--colunar', help="Diretorio do armazem colunar que recebe as leituras gravadas")
+
+    args = parser.parse_args()
+    try:
+        spool = obter_spool(args.dir)
+    except RuntimeError as e:
+        print(f"Erro: {e}")
+        return
+
+    if args.comando == 'status':
+        print(f"Spool {spool.id_spool} em {spool.diretorio}")
+        print(f"Checkpoint: seq {spool.checkpoint} | pendentes: {spool.pendentes()}")
+    elif args.comando == 'drenar':
+        colunar = ArmazemColunar(args.colunar) if args.colunar else None
+        drenador = DrenadorSpool(spool, FarmTechOracleManager(layout=args.layout), args.lote, colunar=colunar)
+        inicio = time.perf_counter()
+        try:
+            concluido = drenador.drenar_tudo()
+        finally:
+            if colunar is not None:
+                colunar.fechar()
+        c = drenador.contadores()
+        print(f"{c['drenadas']} leituras drenadas em {time.perf_counter() - inicio:.2f}s "
+              f"({c['duplicadas']} ja aplicadas, {c['rejeitadas_banco']} recusadas)")
+        if not concluido:
+            print(f"Banco indisponivel: {c['pendentes_spool']} leituras continuam no spool")
+    spool.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+FarmTech Solutions - Configuracao dos Testes
+Fixtures comuns aos testes da Fase 4 (pytest)
+
+Os modulos da Fase 4 nao formam um pacote: o diretorio pai entra no
+sys.path. Os logs vao so para o console (sem farmtech_oracle.log no
+diretorio de execucao).
+
+A fixture manager roda cada teste em todos os backends e layouts:
+
+- sqlite: um arquivo novo por teste, sempre disponivel;
+- oracle: so com FARMTECH_TESTE_ORACLE_DSN (e _USER/_SENHA) definidos;
+  sem eles os testes sao ignorados. Use um esquema descartavel com as
+  migracoes aplicadas (farmtech_migracoes): as tabelas de leituras sao
+  esvaziadas antes de cada teste.
+
+Uso:
+    python -m pytest -q "src/Fase 4/tests"
+    FARMTECH_TESTE_ORACLE_DSN=localhost:1522/ORCLPDB FARMTECH_TESTE_ORACLE_USER=teste \\
+        FARMTECH_TESTE_ORACLE_SENHA=... python -m pytest -q "src/Fase 4/tests"
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+import sys
+
+os.environ.setdefault('FARMTECH_LOG_ARQUIVO', '')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from farmtech_backend import criar_backend, tabela_existe
+from farmtech_database import FarmTechOracleManager
+from farmtech_dedup import obter_deduplicador
+from farmtech_leituras import LAYOUTS
+from farmtech_sensores import obter_registro_sensores
+
+BACKENDS = ('sqlite', 'oracle')
+
+# Tabelas esvaziadas no Oracle antes de cada teste (filhas antes das maes)
+TABELAS_LEITURAS = ['T_APLICACOES', 'T_SUGESTOES', 'T_LEITURAS_ORIGEM', 'T_MEDICOES', 'T_LEITURAS_ESP32',
+                    'T_INGESTAO_CHECKPOINT', 'T_ROLLUP_MINUTO', 'T_ROLLUP_HORA', 'T_ROLLUP_DIA']
+
+
+def _backend_oracle():
+    """Backend Oracle de teste, ou skip se nao configurado."""
+    dsn = os.environ.get('FARMTECH_TESTE_ORACLE_DSN')
+    if not dsn:
+        pytest.skip("Oracle de teste nao configurado (FARMTECH_TESTE_ORACLE_DSN)")
+    backend = criar_backend('oracle', user=os.environ.get('FARMTECH_TESTE_ORACLE_USER'),
+                            password=os.environ.get('FARMTECH_TESTE_ORACLE_SENHA'), dsn=dsn)
+    conn = backend.conectar()
+    try:
+        cursor = conn.cursor()
+        for tabela in TABELAS_LEITURAS:
+            if tabela_existe(cursor, tabela):
+                cursor.execute(f"DELETE FROM {tabela}")
+        conn.commit()
+    finally:
+        conn.close()
+    return backend
+
+
+@pytest.fixture(params=[(backend, layout) for backend in BACKENDS for layout in LAYOUTS],
+                ids=lambda parametro: '-'.join(parametro))
+def manager(request, tmp_path):
+    """FarmTechOracleManager sobre um banco vazio, com os sensores do ESP32 cadastrados."""
+    nome, layout = request.param
+    if nome == 'oracle':
+        backend = _backend_oracle()
+    else:
+        backend = criar_backend('sqlite', caminho=str(tmp_path / 'farmtech.db'))
+    # Registros do processo guardam os sensores e contadores do banco anterior
+    obter_registro_sensores().invalidar()
+    obter_deduplicador().invalidar()
+
+    manager = FarmTechOracleManager(layout=layout, backend=backend)
+    assert manager.criar_sensores_esp32()
+    yield manager
+    manager.disconnect()
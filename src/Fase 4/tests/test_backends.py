@@ -0,0 +1,241 @@
+"""
+FarmTech Solutions - Testes dos Backends de Armazenamento
+Mesmo comportamento do gerenciador ESP32 no Oracle e no SQLite
+
+Cada teste roda nos dois backends e nos dois layouts (fixture manager,
+conftest.py): insercao, importacao bulk do CSV, deduplicacao, listagem
+paginada, estatisticas e exportacao.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import csv
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from farmtech_dedup import LEITURA_DUPLICADA
+from farmtech_estatisticas import PERCENTIS_PADRAO
+from farmtech_exportacao import abrir_dataset, exportar_leituras, exportar_parquet
+from farmtech_leituras import COLUNAS_LEITURA, sql_leituras
+
+CSV_EXEMPLO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..',
+                           'assets', 'Fase 4', 'dados_exemplo.csv')
+
+# (fosforo, potassio, ph, umidade, bomba)
+LEITURAS = [
+    (1, 1, 7.0, 40.0, 0),
+    (0, 1, 6.5, 20.0, 1),
+    (1, 0, 8.0, 60.0, 1),
+    (0, 0, 5.5, 80.0, 1),
+]
+
+
+def _gravar(manager, leituras, inicio=datetime(2025, 6, 1, 8, 0, 0), origens=None):
+    """Grava as leituras com instantes de 3 em 3 segundos a partir de inicio."""
+    instantes = [inicio + timedelta(seconds=3 * i) for i in range(len(leituras))]
+    assert manager.gravar_leituras(leituras, instantes, origens) == {}
+    return instantes
+
+
+def _total_leituras(manager):
+    estatisticas = manager.obter_estatisticas()
+    return estatisticas['ph']['total'] if estatisticas else 0
+
+
+def _cultura_padrao(manager):
+    """cod_cultura dos sensores do dispositivo padrao."""
+    assert manager.connect()
+    try:
+        manager.cursor.execute("SELECT MIN(cod_cultura) FROM T_SENSORES WHERE cod_dispositivo = 'ESP32'")
+        return manager.cursor.fetchone()[0]
+    finally:
+        manager.disconnect()
+
+
+def _segundo_dispositivo(manager):
+    """
+    Provisiona 'esp32-02' em uma cultura nova e grava LEITURAS alternando os dispositivos.
+
+    Retorna (cultura padrao, cultura do esp32-02): as leituras pares sao do
+    dispositivo padrao e as impares do esp32-02.
+    """
+    padrao = _cultura_padrao(manager)
+    assert manager.connect()
+    try:
+        manager.cursor.execute("SELECT MAX(cod_cultura) + 1 FROM T_CULTURAS")
+        nova = manager.cursor.fetchone()[0]
+        manager.cursor.execute("INSERT INTO T_CULTURAS (cod_cultura, desc_cultura, tamanho_cultura) "
+                               "VALUES (:1, :2, :3)", [nova, "Cultura esp32-02", 2.0])
+        manager.conn.commit()
+    finally:
+        manager.disconnect()
+    assert manager.provisionar_dispositivos(['esp32-02'], cod_cultura=nova)
+    _gravar(manager, LEITURAS, origens=[('esp32-02' if i % 2 else 'ESP32', i) for i in range(len(LEITURAS))])
+    return padrao, nova
+
+
+def test_inserir_medicao(manager):
+    cod = manager.inserir_medicao_esp32(1, 0, 6.5, 40.0, 1)
+
+    assert cod
+    [medicao] = manager.listar_medicoes_recentes(1)
+    assert medicao['id'] == cod
+    assert medicao['fosforo'] == 'PRESENTE' and medicao['potassio'] == 'AUSENTE'
+    assert medicao['ph'] == pytest.approx(6.5) and medicao['umidade'] == pytest.approx(40.0)
+    assert medicao['bomba'] == 'LIGADA'
+
+
+def test_importar_csv_bulk(manager, tmp_path):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text("timestamp,fosforo,potassio,ph,umidade,bomba_status\n"
+                       "1,0,1,7.25,45.30,0\n"
+                       "2,1,1,20.00,28.50,1\n"
+                       "3,1,0,7.10,75.20,0\n")
+
+    assert manager.importar_csv_esp32(str(arquivo), modo_bulk=True, exibir=False)
+
+    assert _total_leituras(manager) == 2
+    with open(tmp_path / 'leituras.rejeitos.csv', newline='') as rejeitos:
+        [_, (linha, motivo, _)] = list(csv.reader(rejeitos))
+    assert linha == '3' and 'ph' in motivo
+
+
+def test_importar_csv_exemplo(manager):
+    assert manager.importar_csv_esp32(CSV_EXEMPLO, modo_bulk=True, exibir=False)
+    assert _total_leituras(manager) == 20
+
+
+def test_reimportar_csv_nao_duplica(manager):
+    assert manager.importar_csv_esp32(CSV_EXEMPLO, modo_bulk=True, exibir=False)
+    assert manager.importar_csv_esp32(CSV_EXEMPLO, modo_bulk=True, exibir=False)
+    assert manager.importar_csv_esp32(CSV_EXEMPLO, exibir=False)
+
+    assert _total_leituras(manager) == 20
+
+
+def test_gravar_leituras_deduplica_origem(manager):
+    origens = [('ESP32', contador) for contador in range(1, len(LEITURAS) + 1)]
+    _gravar(manager, LEITURAS, origens=origens)
+
+    erros = manager.gravar_leituras(LEITURAS[:2] + [(1, 1, 7.0, 50.0, 0)],
+                                    origens=origens[:2] + [('ESP32', 99)])
+
+    assert erros == {0: LEITURA_DUPLICADA, 1: LEITURA_DUPLICADA}
+    assert _total_leituras(manager) == len(LEITURAS) + 1
+
+
+def test_listar_paginas(manager):
+    leituras = [(1, 1, 7.0, float(umidade), 0) for umidade in range(25)]
+    _gravar(manager, leituras)
+
+    paginas, token = [], None
+    while True:
+        pagina, token = manager.listar_pagina_medicoes(10, token)
+        paginas.append(pagina)
+        if token is None:
+            break
+
+    assert [len(pagina) for pagina in paginas] == [10, 10, 5]
+    medicoes = [medicao for pagina in paginas for medicao in pagina]
+    # Da mais recente para a mais antiga, sem repetir leituras entre as paginas
+    assert [medicao['umidade'] for medicao in medicoes] == pytest.approx(list(range(24, -1, -1)))
+    assert len({medicao['id'] for medicao in medicoes}) == 25
+
+
+def test_estatisticas(manager):
+    instantes = _gravar(manager, LEITURAS)
+
+    estatisticas = manager.obter_estatisticas(percentis=PERCENTIS_PADRAO)
+
+    assert list(estatisticas) == ['fosforo', 'potassio', 'ph', 'umidade', 'bomba']
+    ph = estatisticas['ph']
+    assert ph['total'] == 4
+    assert ph['media'] == pytest.approx(6.75)
+    assert (ph['minimo'], ph['maximo']) == pytest.approx((5.5, 8.0))
+    assert ph['percentis'][0.5] == pytest.approx(6.75)
+    assert estatisticas['bomba']['media'] == pytest.approx(0.75)
+    # Sem pedir percentis (opcao 4 do menu) as demais estatisticas nao mudam
+    basicas = manager.obter_estatisticas()
+    assert basicas['ph']['percentis'] == {}
+    assert basicas['ph']['media'] == pytest.approx(6.75) and basicas['ph']['total'] == 4
+
+    periodo = manager.obter_estatisticas(inicio=instantes[1], fim=instantes[3])
+    assert periodo['umidade']['total'] == 2
+    assert periodo['umidade']['media'] == pytest.approx(40.0)
+
+
+def test_varios_dispositivos_por_cultura(manager):
+    padrao, nova = _segundo_dispositivo(manager)
+
+    # Estatisticas, V_MEDICOES e leituras creditam cada leitura a cultura do seu dispositivo
+    assert manager.obter_estatisticas(cod_cultura=padrao)['ph']['media'] == pytest.approx(7.5)
+    assert manager.obter_estatisticas(cod_cultura=nova)['ph']['media'] == pytest.approx(6.0)
+    assert manager.connect()
+    try:
+        manager.cursor.execute("""
+        SELECT s.cod_cultura, COUNT(*) FROM V_MEDICOES v
+        JOIN T_SENSORES s ON s.cod_sensor = v.cod_sensor
+        GROUP BY s.cod_cultura
+        """)
+        medicoes = dict(manager.cursor.fetchall())
+        manager.cursor.execute(sql_leituras(manager.layout, cultura=True))
+        culturas = [linha[-1] for linha in manager.cursor.fetchall()]
+    finally:
+        manager.disconnect()
+    assert medicoes == {padrao: 10, nova: 10}
+    assert culturas == [padrao, nova, padrao, nova]
+
+
+def test_exportar_csv_incremental(manager, tmp_path):
+    _gravar(manager, LEITURAS[:2])
+    assert manager.connect()
+    try:
+        primeira = exportar_leituras(manager.cursor, str(tmp_path / 'a.csv.gz'), manager.layout)
+    finally:
+        manager.disconnect()
+    _gravar(manager, LEITURAS[2:], inicio=datetime(2025, 6, 2, 8, 0, 0))
+    assert manager.connect()
+    try:
+        segunda = exportar_leituras(manager.cursor, str(tmp_path / 'b.csv'), manager.layout,
+                                    desde=primeira['marca'])
+    finally:
+        manager.disconnect()
+
+    assert (primeira['linhas'], segunda['linhas']) == (2, 2)
+    with open(tmp_path / 'b.csv', newline='') as arquivo:
+        cabecalho, *linhas = list(csv.reader(arquivo))
+    assert cabecalho == COLUNAS_LEITURA
+    assert [float(linha[4]) for linha in linhas] == pytest.approx([8.0, 5.5])
+    assert linhas[0][1] == '2025-06-02 08:00:00'
+
+
+def test_exportar_parquet(manager, tmp_path):
+    pytest.importorskip('pyarrow')
+
+    _gravar(manager, LEITURAS)
+    assert manager.connect()
+    try:
+        resultado = exportar_parquet(manager.conn, str(tmp_path / 'dataset'), manager.layout)
+    finally:
+        manager.disconnect()
+
+    tabela = abrir_dataset(str(tmp_path / 'dataset')).to_table().sort_by('timestamp')
+    assert resultado['linhas'] == tabela.num_rows == len(LEITURAS)
+    assert tabela['ph'].to_pylist() == pytest.approx([leitura[2] for leitura in LEITURAS])
+    assert set(tabela['cod_cultura'].to_pylist()) == {_cultura_padrao(manager)}
+
+
+def test_exportar_parquet_varios_dispositivos(manager, tmp_path):
+    pytest.importorskip('pyarrow')
+    padrao, nova = _segundo_dispositivo(manager)
+
+    assert manager.connect()
+    try:
+        exportar_parquet(manager.conn, str(tmp_path / 'dataset'), manager.layout)
+    finally:
+        manager.disconnect()
+
+    tabela = abrir_dataset(str(tmp_path / 'dataset')).to_table().sort_by('timestamp')
+    assert tabela['cod_cultura'].to_pylist() == [padrao, nova, padrao, nova]
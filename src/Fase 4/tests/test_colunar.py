@@ -0,0 +1,156 @@
+"""
+FarmTech Solutions - Testes do Armazem Colunar
+Segmentos mapeados em memoria: anexacao, selagem, consultas e reabertura
+
+Os testes usam segmentos pequenos (registros_por_segmento) para passar
+pela troca e pela selagem de segmentos com poucas leituras.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from farmtech_colunar import ArmazemColunar, importar_csv
+from farmtech_spool import DrenadorSpool, SpoolLocal
+
+CSV_EXEMPLO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..',
+                           'assets', 'Fase 4', 'dados_exemplo.csv')
+
+INICIO = datetime(2025, 6, 1, 8, 0, 0)
+
+
+def _leituras(quantidade, inicio=INICIO):
+    """(instantes de segundo em segundo, leituras com umidade = posicao)."""
+    instantes = [inicio + timedelta(seconds=i) for i in range(quantidade)]
+    leituras = [(i % 2, 1, 6.0 + (i % 3), float(i), i % 2) for i in range(quantidade)]
+    return instantes, leituras
+
+
+@pytest.fixture
+def armazem(tmp_path):
+    armazem = ArmazemColunar(str(tmp_path / 'colunar'), registros_por_segmento=4)
+    yield armazem
+    armazem.fechar()
+
+
+def test_anexar_e_ler_entre_segmentos(armazem):
+    instantes, leituras = _leituras(10)
+
+    assert armazem.anexar(instantes, leituras) == 10
+
+    dados = armazem.ler()
+    assert dados['cod_medicao'].tolist() == list(range(1, 11))
+    assert dados['umidade'].tolist() == pytest.approx([float(i) for i in range(10)])
+    assert [quantidade for _, quantidade, *_ in armazem.status()] == [4, 4, 2]
+    # Periodo [2s, 7s): posicoes 2 a 6, em dois segmentos
+    periodo = armazem.ler(INICIO + timedelta(seconds=2), INICIO + timedelta(seconds=7), ['umidade'])
+    assert periodo['umidade'].tolist() == pytest.approx([2.0, 3.0, 4.0, 5.0, 6.0])
+    assert armazem.ultimas(3, ['cod_medicao'])['cod_medicao'].tolist() == [8, 9, 10]
+
+
+def test_visoes_somente_leitura(armazem):
+    armazem.anexar(*_leituras(3))
+
+    dados = armazem.ler()
+
+    with pytest.raises(ValueError):
+        dados['ph'][0] = 0.0
+
+
+def test_codigos_do_banco_e_leitura_fora_de_ordem(armazem):
+    instantes, leituras = _leituras(3)
+    armazem.anexar(instantes, leituras, codigos=[101, 102, 103])
+
+    # Leitura anterior a ultima anexada: inicia um segmento novo
+    armazem.anexar([INICIO - timedelta(minutes=1)], [(1, 1, 7.0, 50.0, 0)], codigos=[104])
+
+    assert len(armazem.status()) == 2
+    assert armazem.ler()['cod_medicao'].tolist() == [101, 102, 103, 104]
+    anteriores = armazem.ler(fim=INICIO, colunas=['cod_medicao'])
+    assert anteriores['cod_medicao'].tolist() == [104]
+
+
+def test_selagem_e_reabertura(armazem):
+    instantes, leituras = _leituras(6)
+    armazem.anexar(instantes, leituras)
+    armazem.selar()
+
+    selados = [selado for _, _, selado, *_ in armazem.status()]
+    assert selados == [True, True]
+    armazem.fechar()
+
+    reaberto = ArmazemColunar(armazem.diretorio, registros_por_segmento=4)
+    try:
+        assert reaberto.ler()['cod_medicao'].tolist() == list(range(1, 7))
+        # A numeracao continua apos a ultima leitura gravada
+        assert reaberto.anexar(*_leituras(1, INICIO + timedelta(minutes=1))) == 7
+    finally:
+        reaberto.fechar()
+
+
+def test_segmento_ativo_continua_apos_reabrir(armazem):
+    armazem.anexar(*_leituras(2))
+    armazem.fechar()
+
+    reaberto = ArmazemColunar(armazem.diretorio, registros_por_segmento=4)
+    try:
+        reaberto.anexar(*_leituras(1, INICIO + timedelta(seconds=2)))
+        assert [quantidade for _, quantidade, *_ in reaberto.status()] == [3]
+    finally:
+        reaberto.fechar()
+
+
+def test_leitor_de_outro_processo(armazem):
+    leitor = ArmazemColunar(armazem.diretorio, somente_leitura=True)
+    armazem.anexar(*_leituras(5))
+
+    # O leitor ve as leituras do gravador sem reabrir o armazem
+    assert leitor.ler()['cod_medicao'].tolist() == [1, 2, 3, 4, 5]
+    with pytest.raises(RuntimeError, match='somente para leitura'):
+        leitor.anexar(*_leituras(1))
+
+
+def test_agregar_igual_ao_numpy(armazem):
+    instantes, leituras = _leituras(10)
+    armazem.anexar(instantes, leituras)
+    valores = np.array(leituras, dtype=np.float64)
+
+    stats = armazem.agregar()
+
+    assert list(stats) == ['fosforo', 'potassio', 'ph', 'umidade', 'bomba']
+    assert stats['umidade']['total'] == 10
+    assert stats['umidade']['media'] == pytest.approx(round(valores[:, 3].mean(), 2))
+    assert stats['umidade']['desvio_padrao'] == pytest.approx(round(valores[:, 3].std(ddof=1), 2))
+    assert (stats['ph']['minimo'], stats['ph']['maximo']) == (6.0, 8.0)
+    assert armazem.agregar(INICIO + timedelta(seconds=8))['umidade']['total'] == 2
+    assert armazem.agregar(INICIO - timedelta(days=1), INICIO) == {}
+
+
+def test_importar_csv_exemplo(armazem):
+    relatorio = importar_csv(armazem, CSV_EXEMPLO, inicio=INICIO, intervalo=2.0)
+
+    assert relatorio == {'lidas': 20, 'anexadas': 20, 'rejeitadas': 0}
+    dados = armazem.ler()
+    # contador 1 -> inicio, contador n -> inicio + (n - 1) * intervalo
+    assert dados['timestamp'][0] == np.datetime64(INICIO, 'ms')
+    assert dados['timestamp'][-1] == np.datetime64(INICIO + timedelta(seconds=38), 'ms')
+    assert dados['ph'][:2].tolist() == pytest.approx([7.25, 6.80])
+
+
+def test_drenagem_anexa_so_as_leituras_aceitas(manager, armazem, tmp_path):
+    spool = SpoolLocal(str(tmp_path / 'spool'), fsync=False)
+    try:
+        instante = INICIO.timestamp()
+        # Contador 2 reenviado e um dispositivo sem sensores: o banco recusa as duas leituras
+        spool.anexar([(instante + i, (1, 1, 7.0, float(i), 0), origem) for i, origem in enumerate(
+            [('ESP32', 1), ('ESP32', 2), ('ESP32', 2), ('esp32-99', 1), ('ESP32', 3)])])
+
+        assert DrenadorSpool(spool, manager, colunar=armazem).drenar_tudo()
+    finally:
+        spool.fechar()
+
+    assert armazem.ler()['umidade'].tolist() == pytest.approx([0.0, 1.0, 4.0])
@@ -0,0 +1,133 @@
+"""
+FarmTech Solutions - Testes da Leitura de CSVs
+Validacao em bloco do CSV do ESP32 e arquivo de rejeitos
+
+Os testes de ler_csv_esp32 nao usam banco; os de importacao rodam em
+todos os backends e layouts (fixture manager, conftest.py) e conferem o
+caminho das linhas rejeitadas ate <arquivo>.rejeitos.csv.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import csv
+
+import pytest
+from farmtech_csv import ArquivoRejeitos, caminho_rejeitos, ler_csv_esp32
+
+CABECALHO = "timestamp,fosforo,potassio,ph,umidade,bomba_status\n"
+
+
+def _ler(caminho, **kwargs):
+    """(leituras concatenadas como tuplas, rejeitadas) de todos os blocos."""
+    leituras, rejeitadas = [], []
+    for bloco, rejeitadas_bloco in ler_csv_esp32(str(caminho), **kwargs):
+        leituras.extend(bloco.itertuples(index=False, name=None))
+        rejeitadas.extend(rejeitadas_bloco)
+    return leituras, rejeitadas
+
+
+def _rejeitos(caminho):
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        cabecalho, *linhas = list(csv.reader(arquivo))
+    assert cabecalho == ['linha', 'motivo', 'conteudo']
+    return linhas
+
+
+def test_linhas_validas_e_tipos(tmp_path):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text(CABECALHO + "1,0,1,7.25,45.30,0\n\n2, 1 ,1,6.5,28.5,1\n")
+
+    leituras, rejeitadas = _ler(arquivo)
+
+    # (linha, contador, fosforo, potassio, ph, umidade, bomba); linhas em branco ignoradas
+    assert leituras == [(2, 1, 0, 1, 7.25, 45.3, 0), (4, 2, 1, 1, 6.5, 28.5, 1)]
+    assert rejeitadas == []
+
+
+def test_motivos_de_rejeicao(tmp_path):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text(CABECALHO
+                       + "1,0,1,7.0,45.0,0\n"
+                       + "2,1,1,20.00,28.50,1\n"
+                       + "3,2,1,7.0,45.0,0\n"
+                       + "4,1,1,abc,45.0,0\n"
+                       + "5,1,1,7.0\n"
+                       + "6.5,1,1,7.0,101.0,1\n")
+
+    leituras, rejeitadas = _ler(arquivo)
+
+    assert [leitura[0] for leitura in leituras] == [2]
+    motivos = {linha: motivo for linha, motivo, _ in rejeitadas}
+    assert list(motivos) == [3, 4, 5, 6, 7]
+    assert 'ph fora da faixa' in motivos[3]
+    assert 'fosforo deve ser 0 ou 1' in motivos[4]
+    assert "ph nao numerico: 'abc'" in motivos[5]
+    assert motivos[6] == "esperadas 6 colunas, encontradas 4"
+    # Todas as violacoes da linha, separadas por '; '
+    assert motivos[7].split('; ')[0].startswith('contador invalido')
+    assert 'umidade fora da faixa' in motivos[7]
+    assert rejeitadas[0][2] == "2,1,1,20.00,28.50,1"
+
+
+def test_faixas_dos_sensores(tmp_path):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text("1,1,1,6.0,45.0,0\n2,1,1,8.5,45.0,0\n")
+    faixas = {'ph': (5.5, 8.0), 'umidade': (0, 100)}
+
+    leituras, rejeitadas = _ler(arquivo, faixas=faixas)
+
+    assert [leitura[1] for leitura in leituras] == [1]
+    assert [(linha, motivo) for linha, motivo, _ in rejeitadas] == [(2, "ph fora da faixa [5.5, 8.0]: 8.5")]
+
+
+def test_blocos_pequenos_mantem_o_numero_das_linhas(tmp_path):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text(CABECALHO + "".join(f"{i},1,1,{15 if i % 3 == 0 else 7},45,0\n" for i in range(1, 11)))
+
+    leituras, rejeitadas = _ler(arquivo, tamanho_bloco=4)
+
+    assert len(leituras) == 7
+    assert [linha for linha, _, _ in rejeitadas] == [4, 7, 10]
+
+
+def test_arquivo_de_rejeitos_so_criado_com_rejeicao(tmp_path):
+    caminho = tmp_path / 'dados.rejeitos.csv'
+
+    with ArquivoRejeitos(str(caminho)) as rejeitos:
+        rejeitos.gravar([])
+    assert not caminho.exists()
+
+    with ArquivoRejeitos(str(caminho)) as rejeitos:
+        rejeitos.gravar([(3, 'ph fora da faixa', '2,1,1,20,28,1')])
+        rejeitos.gravar([(5, 'umidade nao numerico', '4,1,1,7,x,0')])
+    assert rejeitos.quantidade == 2
+    assert _rejeitos(caminho) == [['3', 'ph fora da faixa', '2,1,1,20,28,1'],
+                                  ['5', 'umidade nao numerico', '4,1,1,7,x,0']]
+    assert caminho_rejeitos('/dados/leituras.csv') == '/dados/leituras.rejeitos.csv'
+
+
+@pytest.mark.parametrize('modo_bulk', [True, False], ids=['bulk', 'unitaria'])
+def test_importacao_grava_rejeitos(manager, tmp_path, modo_bulk):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text(CABECALHO
+                       + "1,0,1,7.25,45.30,0\n"
+                       + "2,1,1,20.00,28.50,1\n"
+                       + "3,1,0,7.10\n"
+                       + "4,1,0,7.10,75.20,0\n")
+
+    assert manager.importar_csv_esp32(str(arquivo), modo_bulk=modo_bulk, exibir=False)
+
+    assert manager.obter_estatisticas()['ph']['total'] == 2
+    rejeitos = _rejeitos(tmp_path / 'leituras.rejeitos.csv')
+    assert [(linha, conteudo) for linha, _, conteudo in rejeitos] == [('3', '2,1,1,20.00,28.50,1'),
+                                                                      ('4', '3,1,0,7.10')]
+
+
+def test_importacao_sem_rejeicao_nao_cria_arquivo(manager, tmp_path):
+    arquivo = tmp_path / 'leituras.csv'
+    arquivo.write_text(CABECALHO + "1,0,1,7.25,45.30,0\n")
+
+    assert manager.importar_csv_esp32(str(arquivo), modo_bulk=True, exibir=False)
+
+    assert not (tmp_path / 'leituras.rejeitos.csv').exists()
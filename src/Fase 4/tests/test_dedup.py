@@ -0,0 +1,160 @@
+"""
+FarmTech Solutions - Testes da Deduplicacao
+Filtro de Bloom por dispositivo e chave primaria de T_LEITURAS_ORIGEM
+
+Os testes do deduplicador usam uma instancia propria de
+DeduplicadorLeituras sobre a sessao do gerenciador (fixture manager,
+conftest.py), em todos os backends e layouts.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import numpy as np
+import pytest
+from farmtech_backend import criar_backend
+from farmtech_dedup import (CAPACIDADE_MINIMA, LEITURA_DUPLICADA, DeduplicadorLeituras, FiltroBloom,
+                            deduplicacao_disponivel)
+
+
+@pytest.fixture
+def cursor(manager):
+    """Sessao aberta do gerenciador; as origens registradas sao descartadas no fim."""
+    assert manager.connect()
+    yield manager.cursor
+    manager.conn.rollback()
+    manager.disconnect()
+
+
+def _origens(contadores, dispositivo='ESP32'):
+    return [(dispositivo, contador) for contador in contadores]
+
+
+def test_filtro_bloom_sem_falsos_negativos():
+    filtro = FiltroBloom(10000, taxa_erro=0.01)
+    filtro.adicionar(np.arange(0, 20000, 2))
+
+    assert filtro.contem(np.arange(0, 20000, 2)).all()
+    # Falsos positivos perto da taxa pedida
+    assert filtro.contem(np.arange(1, 20000, 2)).mean() < 0.03
+    assert filtro.cheio()
+    assert len(filtro.contem([])) == 0
+
+
+def test_registrar_recusa_contadores_ja_gravados(cursor):
+    deduplicador = DeduplicadorLeituras()
+    assert deduplicador.registrar(cursor, _origens([1, 2, 3]), [101, 102, 103]) == {}
+
+    recusadas = deduplicador.registrar(cursor, _origens([3, 4, 2]), [104, 105, 106])
+
+    assert recusadas == {0: LEITURA_DUPLICADA, 2: LEITURA_DUPLICADA}
+    # O mesmo contador de outro dispositivo e outra leitura
+    assert deduplicador.registrar(cursor, _origens([1], 'esp32-02'), [107]) == {}
+
+
+def test_filtro_carregado_do_banco(cursor):
+    DeduplicadorLeituras().registrar(cursor, _origens([1, 2]), [101, 102])
+
+    # Outro processo: filtro vazio na memoria, carregado de T_LEITURAS_ORIGEM
+    recusadas = DeduplicadorLeituras().registrar(cursor, _origens([2, 3]), [103, 104])
+
+    assert recusadas == {0: LEITURA_DUPLICADA}
+
+
+def test_falsos_positivos_sao_confirmados_e_gravados(cursor, monkeypatch):
+    deduplicador = DeduplicadorLeituras()
+    deduplicador.registrar(cursor, _origens([1]), [101])
+    # Filtro saturado: todo contador parece ja gravado
+    monkeypatch.setattr(FiltroBloom, 'contem', lambda self, chaves: np.ones(len(chaves), dtype=bool))
+
+    recusadas = deduplicador.registrar(cursor, _origens([1, 2, 3]), [102, 103, 104])
+
+    assert recusadas == {0: LEITURA_DUPLICADA}
+    assert deduplicador.falsos_positivos == 2
+    assert deduplicador.consultas == 1
+    cursor.execute("SELECT contador FROM T_LEITURAS_ORIGEM WHERE id_dispositivo = 'ESP32' ORDER BY contador")
+    assert [row[0] for row in cursor.fetchall()] == [1, 2, 3]
+
+
+def test_duplicata_desconhecida_do_filtro_recusada_pela_chave_primaria(cursor):
+    deduplicador = DeduplicadorLeituras()
+    deduplicador.registrar(cursor, _origens([1]), [101])
+    # Outro processo grava o contador 2 depois que o filtro foi carregado
+    DeduplicadorLeituras().registrar(cursor, _origens([2]), [102])
+
+    recusadas = deduplicador.registrar(cursor, _origens([2, 3]), [103, 104])
+
+    assert recusadas == {0: LEITURA_DUPLICADA}
+    assert deduplicador.consultas == 0
+    # A partir de agora o filtro conhece so o contador gravado por ele
+    assert deduplicador.registrar(cursor, _origens([3]), [105]) == {0: LEITURA_DUPLICADA}
+
+
+def test_contador_repetido_no_lote(cursor):
+    recusadas = DeduplicadorLeituras().registrar(cursor, _origens([7, 7]), [101, 102])
+
+    assert recusadas == {1: LEITURA_DUPLICADA}
+
+
+def test_esquecer_libera_novo_envio(cursor):
+    deduplicador = DeduplicadorLeituras()
+    deduplicador.registrar(cursor, _origens([1, 2]), [101, 102])
+
+    deduplicador.esquecer(cursor, _origens([2]))
+
+    # O contador 2 continua no filtro: a consulta confirma que e um falso positivo
+    assert deduplicador.registrar(cursor, _origens([2]), [103]) == {}
+    assert deduplicador.falsos_positivos == 1
+
+
+def test_camadas_crescem_com_o_filtro_cheio(cursor):
+    deduplicador = DeduplicadorLeituras(capacidade=4)
+
+    deduplicador.registrar(cursor, _origens(range(1, 11)), list(range(101, 111)))
+
+    # Os contadores de todas as camadas continuam sendo reconhecidos
+    assert deduplicador.registrar(cursor, _origens(range(1, 13)), list(range(111, 123))) == {
+        indice: LEITURA_DUPLICADA for indice in range(10)
+    }
+
+
+def test_primeira_camada_proporcional_ao_banco(cursor):
+    deduplicador = DeduplicadorLeituras()
+    deduplicador.registrar(cursor, _origens(range(1, 11)), list(range(101, 111)))
+    cursor.arraysize = 7
+
+    # Dispositivo novo: camada minima; dispositivo ja gravado: o dobro dos contadores
+    recarregado = DeduplicadorLeituras(capacidade=4)
+    assert recarregado.registrar(cursor, _origens([1]), [111]) == {0: LEITURA_DUPLICADA}
+    assert recarregado._filtros['ESP32'][0].capacidade == 20
+    assert deduplicador._filtros['ESP32'][0].capacidade == CAPACIDADE_MINIMA
+    # A carga em lotes grandes nao muda o arraysize da sessao do chamador
+    assert cursor.arraysize == 7
+
+
+def test_filtros_dos_dispositivos_menos_usados_sao_descartados(cursor):
+    deduplicador = DeduplicadorLeituras(max_dispositivos=2)
+    for dispositivo in ('dia-01', 'dia-02', 'dia-01', 'dia-03'):
+        deduplicador.registrar(cursor, _origens([1], dispositivo), [101])
+
+    assert list(deduplicador._filtros) == ['dia-01', 'dia-03']
+    # O filtro descartado e recarregado do banco quando o dispositivo volta a gravar
+    assert deduplicador.registrar(cursor, _origens([1, 2], 'dia-02'), [102, 103]) == {0: LEITURA_DUPLICADA}
+
+
+def test_disponibilidade_por_banco(manager, tmp_path):
+    if manager.backend.nome == 'oracle':
+        pytest.skip("Compara dois arquivos SQLite")
+    sem_origem = criar_backend('sqlite', caminho=str(tmp_path / 'sem_origem.db')).conectar()
+    try:
+        sem_origem.cursor().execute("DROP TABLE T_LEITURAS_ORIGEM")
+        assert manager.connect()
+        try:
+            assert deduplicacao_disponivel(manager.cursor)
+        finally:
+            manager.disconnect()
+
+        # A resposta do primeiro banco nao vale para outro banco do mesmo processo
+        assert not deduplicacao_disponivel(sem_origem.cursor())
+    finally:
+        sem_origem.close()
@@ -0,0 +1,125 @@
+"""
+FarmTech Solutions - Testes das Migracoes de Esquema
+Lista de versoes, backends sem migracoes e esquema Oracle migrado
+
+Os testes de esquema conferem os objetos criados pelas migracoes 1 a 9
+no esquema Oracle de teste (ja migrado, ver conftest.py) e sao ignorados
+nos demais backends.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import pytest
+from farmtech_chaves import SEQUENCIAS, incremento_sequencia
+from farmtech_migracoes import (BLOCO_CHAVES_MEDICOES, COLUNAS_AMPLIADAS, MIGRACOES, _sql_visao_medicoes,
+                                aplicar_migracoes, exibir_status, versao_atual)
+from farmtech_rollups import TABELAS_ROLLUP
+
+
+def test_versoes_em_sequencia():
+    versoes = [versao for versao, _, _ in MIGRACOES]
+
+    assert versoes == list(range(1, len(MIGRACOES) + 1))
+    # descricao cabe em T_SCHEMA_VERSAO.descricao VARCHAR2(100)
+    assert all(0 < len(descricao) <= 100 for _, descricao, _ in MIGRACOES)
+
+
+def test_visao_medicoes_usa_a_juncao():
+    sql = _sql_visao_medicoes("JOIN T_SENSORES s ON s.cod_dispositivo = l.cod_dispositivo")
+
+    assert "FROM T_LEITURAS_ESP32 l\n    JOIN T_SENSORES s ON s.cod_dispositivo = l.cod_dispositivo" in sql
+    assert "UNION ALL" in sql
+
+
+def test_backend_sem_migracoes(manager, capsys):
+    if manager.backend.nome == 'oracle':
+        pytest.skip("O backend Oracle aplica as migracoes")
+
+    assert aplicar_migracoes(manager)
+    exibir_status(manager)
+
+    saida = capsys.readouterr().out
+    assert 'criado completo ao conectar' in saida and '1 a 4 e 6 a 9' in saida
+
+
+# --- ORACLE: ESQUEMA MIGRADO ---
+
+@pytest.fixture
+def cursor_oracle(manager):
+    if manager.backend.nome != 'oracle':
+        pytest.skip("Migracoes se aplicam so ao Oracle")
+    assert manager.connect()
+    yield manager.cursor
+    manager.disconnect()
+
+
+def _colunas(cursor, tabela):
+    """{coluna: (tipo, precisao, escala, anulavel)} de uma tabela do usuario."""
+    cursor.execute("""
+    SELECT LOWER(column_name), data_type, data_precision, data_scale, nullable
+    FROM user_tab_columns WHERE table_name = :1
+    """, [tabela])
+    return {nome: tuple(resto) for nome, *resto in cursor.fetchall()}
+
+
+def _existe(cursor, tipo, nome):
+    cursor.execute("SELECT COUNT(*) FROM user_objects WHERE object_type = :1 AND object_name = :2",
+                   [tipo, nome])
+    return cursor.fetchone()[0] == 1
+
+
+def test_esquema_na_ultima_versao(cursor_oracle):
+    assert versao_atual(cursor_oracle) == MIGRACOES[-1][0]
+
+
+def test_migracao_1_chaves_ampliadas(cursor_oracle):
+    for tabela, colunas in COLUNAS_AMPLIADAS.items():
+        atuais = _colunas(cursor_oracle, tabela)
+        for coluna, tipo in colunas.items():
+            precisao, _, escala = tipo[len('NUMBER('):-1].partition(',')
+            assert atuais[coluna][1:3] == (int(precisao), int(escala or 0)), (tabela, coluna)
+
+
+def test_migracoes_2_e_8_leituras_largas(cursor_oracle):
+    colunas = _colunas(cursor_oracle, 'T_LEITURAS_ESP32')
+
+    assert {'cod_leitura', 'data_hora_leitura', 'fosforo', 'potassio', 'ph', 'umidade', 'bomba',
+            'cod_dispositivo'} <= set(colunas)
+    assert colunas['cod_dispositivo'][0] == 'VARCHAR2' and colunas['cod_dispositivo'][3] == 'N'
+    assert _existe(cursor_oracle, 'VIEW', 'V_MEDICOES')
+    cursor_oracle.execute("SELECT text FROM user_views WHERE view_name = 'V_MEDICOES'")
+    assert 'l.cod_dispositivo' in cursor_oracle.fetchone()[0]
+
+
+def test_migracao_3_classificacao_sensores(cursor_oracle):
+    colunas = _colunas(cursor_oracle, 'T_SENSORES')
+    assert {'tipo_dispositivo', 'cod_dispositivo', 'tipo_sensor'} <= set(colunas)
+    assert _existe(cursor_oracle, 'INDEX', 'IX_SENS_DISP')
+
+
+def test_migracao_9_indice_por_data(cursor_oracle):
+    cursor_oracle.execute("SELECT column_name FROM user_ind_columns WHERE index_name = 'IX_MED_DATA' "
+                          "ORDER BY column_position")
+    assert [row[0] for row in cursor_oracle.fetchall()] == ['DATA_HORA_MEDICAO', 'COD_MEDICAO', 'COD_SENSOR']
+
+
+def test_migracoes_4_a_7_tabelas_e_sequences(cursor_oracle):
+    checkpoint = _colunas(cursor_oracle, 'T_INGESTAO_CHECKPOINT')
+    assert set(checkpoint) == {'id_spool', 'ultima_seq', 'data_atualizacao'}
+    for tabela in TABELAS_ROLLUP.values():
+        cursor_oracle.execute("SELECT iot_type FROM user_tables WHERE table_name = :1", [tabela])
+        assert cursor_oracle.fetchone() == ('IOT',), tabela
+    cursor_oracle.execute("SELECT iot_type FROM user_tables WHERE table_name = 'T_LEITURAS_ORIGEM'")
+    assert cursor_oracle.fetchone() == ('IOT',)
+    for sequencia, _ in SEQUENCIAS.values():
+        assert _existe(cursor_oracle, 'SEQUENCE', sequencia), sequencia
+    assert incremento_sequencia(cursor_oracle, 'SEQ_MEDICOES') == BLOCO_CHAVES_MEDICOES
+
+
+def test_migrar_de_novo_nao_altera(manager, cursor_oracle, capsys):
+    manager.disconnect()
+
+    assert aplicar_migracoes(manager)
+
+    assert f"ja esta na versao {MIGRACOES[-1][0]}" in capsys.readouterr().out
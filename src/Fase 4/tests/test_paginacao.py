@@ -0,0 +1,139 @@
+"""
+FarmTech Solutions - Testes da Paginacao das Leituras
+Tokens de continuacao e paginas com varios dispositivos
+
+Os testes de token nao usam banco; os de paginas rodam em todos os
+backends e layouts (fixture manager, conftest.py).
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from farmtech_leituras import LAYOUT_LARGO
+from farmtech_paginacao import buscar_pagina, codificar_token, decodificar_token, sql_pagina_leituras
+
+INICIO = datetime(2025, 6, 1, 8, 0, 0)
+
+
+def _todas_as_paginas(manager, limite):
+    """Lista de paginas (listas de leituras) ate o token acabar."""
+    assert manager.connect()
+    try:
+        paginas, token = [], None
+        while True:
+            pagina, token = buscar_pagina(manager.cursor, manager.layout, limite, token)
+            paginas.append(pagina)
+            if token is None:
+                return paginas
+    finally:
+        manager.disconnect()
+
+
+def _gravar(manager, dispositivo, umidades, segundos):
+    """Grava uma leitura por umidade, nos instantes INICIO + segundos."""
+    leituras = [(1, 1, 7.0, float(umidade), 0) for umidade in umidades]
+    instantes = [INICIO + timedelta(seconds=s) for s in segundos]
+    origens = [(dispositivo, None)] * len(leituras)
+    assert manager.gravar_leituras(leituras, instantes, origens) == {}
+
+
+def test_token_ida_e_volta():
+    instante = datetime(2025, 6, 1, 8, 0, 0, 250000)
+
+    token = codificar_token(instante, 123456789012)
+
+    assert decodificar_token(token) == (instante, 123456789012)
+    assert '=' not in token and '/' not in token
+
+
+@pytest.mark.parametrize('token', ['', 'nao-e-base64!', codificar_token(datetime(2025, 6, 1), 1)[:-4],
+                                   'WyJ4IiwgMV0'])
+def test_token_invalido(token):
+    with pytest.raises(ValueError, match='Token de paginacao invalido'):
+        decodificar_token(token)
+
+
+def test_limite_invalido(manager):
+    assert manager.connect()
+    try:
+        with pytest.raises(ValueError, match='Limite'):
+            buscar_pagina(manager.cursor, manager.layout, 0)
+    finally:
+        manager.disconnect()
+
+
+def test_banco_vazio(manager):
+    assert _todas_as_paginas(manager, 5) == [[]]
+
+
+def test_ultima_pagina_cheia_sem_token(manager):
+    _gravar(manager, 'ESP32', range(10), range(10))
+
+    paginas = _todas_as_paginas(manager, 5)
+
+    assert [len(pagina) for pagina in paginas] == [5, 5]
+
+
+def test_paginas_com_varios_dispositivos(manager):
+    manager.provisionar_dispositivos(['esp32-02'])
+    # Leituras intercaladas: pares do dispositivo padrao, impares do esp32-02
+    _gravar(manager, 'ESP32', range(0, 30, 2), range(0, 30, 2))
+    _gravar(manager, 'esp32-02', range(1, 30, 2), range(1, 30, 2))
+
+    paginas = _todas_as_paginas(manager, 7)
+
+    assert [len(pagina) for pagina in paginas] == [7, 7, 7, 7, 2]
+    umidades = [leitura[5] for pagina in paginas for leitura in pagina]
+    assert umidades == pytest.approx(list(range(29, -1, -1)))
+
+
+def test_mesmo_instante_desempata_pelo_codigo(manager):
+    _gravar(manager, 'ESP32', range(6), [0] * 6)
+
+    paginas = _todas_as_paginas(manager, 4)
+
+    codigos = [leitura[0] for pagina in paginas for leitura in pagina]
+    assert codigos == sorted(codigos, reverse=True) and len(set(codigos)) == 6
+
+
+def test_pagina_eav_le_o_indice_por_data(manager):
+    if manager.backend.nome != 'sqlite' or manager.layout == LAYOUT_LARGO:
+        pytest.skip("Plano de execucao do SQLite, layout EAV")
+    manager.provisionar_dispositivos([f'esp32-{i:02d}' for i in range(20)])
+    assert manager.connect()
+    try:
+        manager.cursor.execute("EXPLAIN QUERY PLAN " + sql_pagina_leituras(manager.layout), {'limite': 11})
+        plano = [linha[3] for linha in manager.cursor.fetchall()]
+    finally:
+        manager.disconnect()
+
+    # Uma leitura do indice por data, sem um trecho por sensor da bomba nem ordenacao das medicoes
+    assert any('IX_MED_DATA' in passo for passo in plano)
+    assert not any('IX_MED_SENS_DATA' in passo for passo in plano)
+
+
+def test_leituras_incompletas_nao_encerram_as_paginas(manager):
+    if manager.layout == LAYOUT_LARGO:
+        pytest.skip("Leituras incompletas existem so no layout EAV")
+    _gravar(manager, 'ESP32', range(10), range(10))
+    assert manager.connect()
+    try:
+        # As leituras 3 a 7 perdem o pH: a segunda pagina so tem leituras incompletas
+        manager.cursor.execute("""
+        DELETE FROM T_MEDICOES
+        WHERE cod_sensor = (SELECT cod_sensor FROM T_SENSORES WHERE cod_dispositivo = 'ESP32'
+                            AND tipo_sensor = 'PH')
+          AND data_hora_medicao >= :1 AND data_hora_medicao < :2
+        """, [INICIO + timedelta(seconds=3), INICIO + timedelta(seconds=8)])
+        manager.conn.commit()
+    finally:
+        manager.disconnect()
+
+    paginas = _todas_as_paginas(manager, 3)
+
+    assert [len(pagina) for pagina in paginas] == [2, 0, 2, 1]
+    umidades = [leitura[5] for pagina in paginas for leitura in pagina]
+    assert umidades == pytest.approx([9.0, 8.0, 2.0, 1.0, 0.0])
@@ -0,0 +1,121 @@
+"""
+FarmTech Solutions - Testes do Provisionamento de Dispositivos
+Cadastro em lote dos sensores virtuais de varios ESP32
+
+Os testes de validacao, nomes e coordenadas nao usam banco; os de
+cadastro rodam em todos os backends e layouts (fixture manager,
+conftest.py), que ja cadastra o dispositivo padrao.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import numpy as np
+import pytest
+from farmtech_leituras import DISPOSITIVO_PADRAO, NOMES_SENSORES, TIPOS_SENSORES
+from farmtech_provisionamento import (TAMANHO_MAX_DISPOSITIVO, coordenadas, mapa_sensores, nome_sensor,
+                                      validar_dispositivos)
+
+
+def _sensores(manager, dispositivo):
+    """{tipo_sensor: (nm_sensor, cod_cultura)} dos sensores do dispositivo."""
+    assert manager.connect()
+    try:
+        manager.cursor.execute("SELECT tipo_sensor, nm_sensor, cod_cultura FROM T_SENSORES "
+                               "WHERE cod_dispositivo = :1", [dispositivo])
+        return {tipo.strip(): (nome, cultura) for tipo, nome, cultura in manager.cursor.fetchall()}
+    finally:
+        manager.disconnect()
+
+
+def test_validar_dispositivos():
+    assert validar_dispositivos([' esp32-02', 'esp32-01', 'esp32-02 ']) == ['esp32-02', 'esp32-01']
+    assert validar_dispositivos(['e' * TAMANHO_MAX_DISPOSITIVO]) == ['e' * TAMANHO_MAX_DISPOSITIVO]
+
+    with pytest.raises(ValueError, match='invalidos'):
+        validar_dispositivos(['esp32-01', '  '])
+    with pytest.raises(ValueError, match='invalidos'):
+        validar_dispositivos(['e' * (TAMANHO_MAX_DISPOSITIVO + 1)])
+    # O limite e em bytes: 'a' com til ocupa dois
+    with pytest.raises(ValueError, match='bytes'):
+        validar_dispositivos(['ã' * (TAMANHO_MAX_DISPOSITIVO // 2 + 1)])
+
+
+def test_nomes_dos_sensores():
+    assert nome_sensor(DISPOSITIVO_PADRAO, 'ph') == NOMES_SENSORES['ph']
+    nome = nome_sensor('e' * TAMANHO_MAX_DISPOSITIVO, 'umidade')
+    assert nome == f"Sensor {TIPOS_SENSORES['umidade']} {'e' * TAMANHO_MAX_DISPOSITIVO}"
+    # nm_sensor e VARCHAR2(30)
+    assert len(nome) <= 30
+
+
+def test_coordenadas_unicas_e_na_faixa():
+    codigos = np.arange(1, 200001)
+
+    latitudes, longitudes = coordenadas(codigos)
+
+    assert len(np.unique(latitudes)) == len(np.unique(longitudes)) == len(codigos)
+    assert ((latitudes >= -90) & (latitudes < 90)).all()
+    assert ((longitudes >= -180) & (longitudes < 180)).all()
+    # Cada codigo tem sempre as mesmas coordenadas, calculado sozinho ou em bloco
+    assert coordenadas([7])[0].tolist() == latitudes[6:7].tolist()
+
+
+def test_provisionar_varios_dispositivos(manager):
+    mapa = manager.provisionar_dispositivos(['esp32-01', 'esp32-02'])
+
+    assert set(mapa) == {'esp32-01', 'esp32-02'}
+    assert all(set(sensores) == set(TIPOS_SENSORES) for sensores in mapa.values())
+    codigos = [cod for sensores in mapa.values() for cod in sensores.values()]
+    assert len(set(codigos)) == 10
+    sensores = _sensores(manager, 'esp32-02')
+    assert sensores[TIPOS_SENSORES['ph']][0] == nome_sensor('esp32-02', 'ph')
+    # Cultura padrao: a dos sensores ja cadastrados
+    assert {cultura for _, cultura in sensores.values()} == {
+        cultura for _, cultura in _sensores(manager, DISPOSITIVO_PADRAO).values()
+    }
+
+
+def test_provisionar_de_novo_nao_altera(manager):
+    primeiro = manager.provisionar_dispositivos(['esp32-01'])
+
+    segundo = manager.provisionar_dispositivos(['esp32-01', DISPOSITIVO_PADRAO])
+
+    assert segundo['esp32-01'] == primeiro['esp32-01']
+    assert manager.connect()
+    try:
+        mapa = mapa_sensores(manager.cursor)
+    finally:
+        manager.disconnect()
+    assert set(mapa) == {DISPOSITIVO_PADRAO, 'esp32-01'}
+    assert sum(len(sensores) for sensores in mapa.values()) == 10
+
+
+def test_provisionar_completa_dispositivo_parcial(manager):
+    mapa = manager.provisionar_dispositivos(['esp32-01'])
+    assert manager.connect()
+    try:
+        manager.cursor.execute("DELETE FROM T_SENSORES WHERE cod_sensor = :1", [mapa['esp32-01']['bomba']])
+        manager.conn.commit()
+    finally:
+        manager.disconnect()
+
+    completo = manager.provisionar_dispositivos(['esp32-01'])
+
+    assert set(completo['esp32-01']) == set(TIPOS_SENSORES)
+    assert completo['esp32-01']['ph'] == mapa['esp32-01']['ph']
+
+
+def test_provisionar_id_invalido(manager):
+    assert manager.provisionar_dispositivos(['esp32-01', 'x' * (TAMANHO_MAX_DISPOSITIVO + 1)]) is None
+    assert _sensores(manager, 'esp32-01') == {}
+
+
+def test_leituras_vao_para_os_sensores_do_dispositivo(manager):
+    manager.provisionar_dispositivos(['esp32-01'])
+
+    erros = manager.gravar_leituras([(1, 1, 7.0, 40.0, 0), (1, 1, 6.0, 50.0, 1)],
+                                    origens=[('esp32-01', 1), ('esp32-99', 1)])
+
+    assert list(erros) == [1] and 'esp32-99' in erros[1]
+    assert manager.obter_estatisticas()['ph']['total'] == 1
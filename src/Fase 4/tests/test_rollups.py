@@ -0,0 +1,155 @@
+"""
+FarmTech Solutions - Testes dos Rollups
+Agregacao por minuto, hora e dia, MERGE incremental e reconstrucao
+
+agregar() e segmentos() sao testados sem banco. O MERGE e a reconstrucao
+existem so no Oracle: esses testes usam a fixture manager (conftest.py)
+e sao ignorados nos demais backends.
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from farmtech_rollups import (INTERVALO_MAX_BOMBA, TABELAS_ROLLUP, agregar, reconstruir_rollups, segmentos,
+                              teto)
+
+SENSORES = {'fosforo': 1, 'potassio': 2, 'ph': 3, 'umidade': 4, 'bomba': 5}
+INICIO = datetime(2025, 6, 1, 8, 0, 0)
+SEM_BOMBA = (datetime.min, 0)
+
+
+def test_agregar_por_minuto_hora_e_dia():
+    instantes = [INICIO, INICIO + timedelta(seconds=30), INICIO + timedelta(minutes=1)]
+    leituras = [(1, 1, 6.0, 40.0, 1), (1, 0, 8.0, 60.0, 0), (0, 1, 7.0, 50.0, 0)]
+
+    baldes, estado = agregar(SENSORES, leituras, instantes, SEM_BOMBA)
+
+    # [quantidade, soma, soma_quadrados, minimo, maximo, ultimo_valor, ultimo_instante, segundos_bomba]
+    assert baldes['minuto'][(3, INICIO)] == [2, 14.0, 100.0, 6.0, 8.0, 8.0, instantes[1], 0.0]
+    assert baldes['hora'][(3, INICIO)][:5] == [3, 21.0, 149.0, 6.0, 8.0]
+    assert baldes['dia'][(4, datetime(2025, 6, 1))][:2] == [3, 150.0]
+    assert len(baldes['minuto']) == 10 and len(baldes['hora']) == 5
+    assert estado == (instantes[-1], 0)
+
+
+def test_tempo_de_bomba_ligada():
+    instantes = [INICIO, INICIO + timedelta(seconds=40), INICIO + timedelta(seconds=70),
+                 INICIO + timedelta(hours=1)]
+    leituras = [(1, 1, 7.0, 20.0, 1), (1, 1, 7.0, 20.0, 1), (1, 1, 7.0, 60.0, 0), (1, 1, 7.0, 20.0, 1)]
+
+    baldes, _ = agregar(SENSORES, leituras, instantes, SEM_BOMBA)
+
+    minutos = baldes['minuto']
+    # 40 s no primeiro minuto; 30 s atribuidos a leitura de 08:01:10; desligada ate as 09:00
+    assert minutos[(5, INICIO)][7] == 40.0
+    assert minutos[(5, INICIO + timedelta(minutes=1))][7] == 30.0
+    assert minutos[(5, INICIO + timedelta(hours=1))][7] == 0.0
+    assert minutos[(3, INICIO)][7] == 0.0
+
+
+def test_tempo_de_bomba_continua_do_lote_anterior():
+    estado = (INICIO - timedelta(seconds=20), 1)
+
+    baldes, _ = agregar(SENSORES, [(1, 1, 7.0, 20.0, 0)], [INICIO], estado)
+
+    assert baldes['minuto'][(5, INICIO)][7] == 20.0
+    # Dispositivo fora do ar: o intervalo e limitado
+    baldes, _ = agregar(SENSORES, [(1, 1, 7.0, 20.0, 0)], [INICIO], (INICIO - timedelta(hours=2), 1))
+    assert baldes['minuto'][(5, INICIO)][7] == INTERVALO_MAX_BOMBA
+
+
+def test_leitura_fora_de_ordem_nao_conta_tempo_de_bomba():
+    estado = (INICIO, 1)
+
+    baldes, novo_estado = agregar(SENSORES, [(1, 1, 7.0, 20.0, 0)], [INICIO - timedelta(seconds=10)], estado)
+
+    assert baldes['minuto'][(5, INICIO - timedelta(minutes=1))][7] == 0.0
+    assert novo_estado == estado
+
+
+def test_segmentos_cobrem_o_intervalo():
+    inicio = datetime(2025, 6, 1, 22, 45)
+    fim = datetime(2025, 6, 4, 1, 30)
+
+    partes = segmentos(inicio, fim)
+
+    assert partes == [
+        (TABELAS_ROLLUP['minuto'], inicio, datetime(2025, 6, 1, 23, 0)),
+        (TABELAS_ROLLUP['hora'], datetime(2025, 6, 1, 23, 0), datetime(2025, 6, 2)),
+        (TABELAS_ROLLUP['dia'], datetime(2025, 6, 2), datetime(2025, 6, 4)),
+        (TABELAS_ROLLUP['hora'], datetime(2025, 6, 4), datetime(2025, 6, 4, 1, 0)),
+        (TABELAS_ROLLUP['minuto'], datetime(2025, 6, 4, 1, 0), fim),
+    ]
+    # Trechos contiguos, sem sobreposicao
+    assert all(a[2] == b[1] for a, b in zip(partes, partes[1:]))
+
+
+def test_segmentos_curtos_e_abertos():
+    assert segmentos(INICIO, INICIO + timedelta(minutes=5)) == [
+        (TABELAS_ROLLUP['minuto'], INICIO, INICIO + timedelta(minutes=5))
+    ]
+    assert segmentos(INICIO, INICIO) == []
+    assert segmentos(None, None) == [(TABELAS_ROLLUP['dia'], None, None)]
+    assert segmentos(None, datetime(2025, 6, 2))[-1] == (TABELAS_ROLLUP['dia'], None, datetime(2025, 6, 2))
+    assert teto(datetime(2025, 6, 1, 0, 0, 1), 'dia') == datetime(2025, 6, 2)
+
+
+# --- ORACLE: MERGE E RECONSTRUCAO ---
+
+def _rollups(manager):
+    """{granularidade: linhas ordenadas} das tabelas de rollup."""
+    assert manager.connect()
+    try:
+        resultado = {}
+        for granularidade, tabela in TABELAS_ROLLUP.items():
+            manager.cursor.execute(f"""
+            SELECT cod_sensor, inicio_periodo, quantidade, soma, soma_quadrados, minimo, maximo,
+                   ultimo_valor, segundos_bomba
+            FROM {tabela}
+            ORDER BY cod_sensor, inicio_periodo
+            """)
+            resultado[granularidade] = [tuple(float(v) if isinstance(v, (int, float)) else v for v in linha)
+                                        for linha in manager.cursor.fetchall()]
+        return resultado
+    finally:
+        manager.disconnect()
+
+
+@pytest.fixture
+def manager_oracle(manager):
+    if manager.backend.nome != 'oracle':
+        pytest.skip("Rollups existem so no backend Oracle")
+    return manager
+
+
+def test_merge_incremental(manager_oracle):
+    leituras = [(1, 1, 6.0, 40.0, 1), (1, 1, 8.0, 60.0, 0)]
+    assert manager_oracle.gravar_leituras(leituras[:1], [INICIO]) == {}
+    assert manager_oracle.gravar_leituras(leituras[1:], [INICIO + timedelta(seconds=20)]) == {}
+
+    minutos = _rollups(manager_oracle)['minuto']
+
+    # Os dois lotes caem na mesma linha de cada sensor
+    assert len(minutos) == 5
+    ph = [linha for linha in minutos if linha[5] == 6.0][0]
+    assert ph[2:8] == (2.0, 14.0, 100.0, 6.0, 8.0, 8.0)
+    assert max(linha[8] for linha in minutos) == 20.0
+    estatisticas = manager_oracle.obter_estatisticas()
+    assert estatisticas['ph']['total'] == 2 and estatisticas['ph']['media'] == pytest.approx(7.0)
+
+
+def test_reconstrucao_igual_ao_incremental(manager_oracle):
+    manager_oracle.provisionar_dispositivos(['esp32-02'])
+    instantes = [INICIO + timedelta(seconds=7 * i) for i in range(40)]
+    leituras = [(i % 2, 1, 6.0 + i % 3, float(i), i % 2) for i in range(40)]
+    origens = [('ESP32' if i % 2 else 'esp32-02', None) for i in range(40)]
+    assert manager_oracle.gravar_leituras(leituras, instantes, origens) == {}
+    incremental = _rollups(manager_oracle)
+
+    assert reconstruir_rollups(manager_oracle, desde=INICIO, ate=INICIO)
+
+    # Cada leitura continua creditada aos sensores do seu dispositivo
+    assert _rollups(manager_oracle) == incremental
@@ -0,0 +1,201 @@
+"""
+FarmTech Solutions - Testes do Spool Local
+Registros com CRC, recuperacao na abertura, checkpoint e drenagem idempotente
+
+Os testes do arquivo de spool nao usam banco; os de drenagem rodam em
+todos os backends e layouts (fixture manager, conftest.py).
+
+Autor: FarmTech Solutions
+Data: Junho 2025
+"""
+
+import os
+
+import pytest
+from farmtech_backend import criar_backend
+from farmtech_database import FarmTechOracleManager
+from farmtech_spool import TAMANHO_REGISTRO, DrenadorSpool, SpoolLocal
+
+# (fosforo, potassio, ph, umidade, bomba)
+LEITURA = (1, 1, 7.0, 40.0, 0)
+INSTANTE = 1748768400.0  # 2025-06-01 09:00:00 UTC
+
+
+def _registros(quantidade, dispositivo='ESP32', primeiro_contador=1):
+    """(instante_epoch, leitura, origem) de quantidade leituras, de 3 em 3 segundos."""
+    return [(INSTANTE + 3 * i, LEITURA, (dispositivo, primeiro_contador + i)) for i in range(quantidade)]
+
+
+def _segmentos(diretorio):
+    return sorted(nome for nome in os.listdir(diretorio) if nome.endswith('.spool'))
+
+
+def _total_leituras(manager):
+    estatisticas = manager.obter_estatisticas()
+    return estatisticas['ph']['total'] if estatisticas else 0
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = SpoolLocal(str(tmp_path / 'spool'), registros_por_segmento=3, fsync=False)
+    yield spool
+    spool.fechar()
+
+
+def test_anexar_e_ler(spool):
+    assert spool.anexar(_registros(7)) == 7
+
+    registros = spool.ler(1, 10)
+
+    assert [registro[0] for registro in registros] == list(range(1, 8))
+    assert registros[0][1:] == (INSTANTE, LEITURA, ('ESP32', 1))
+    assert registros[-1][3] == ('ESP32', 7)
+    assert len(_segmentos(spool.diretorio)) == 3
+    assert [registro[0] for registro in spool.ler(5, 2)] == [5, 6]
+
+
+def test_origem_ausente_e_contador_none(spool):
+    spool.anexar([(INSTANTE, LEITURA, None), (INSTANTE, LEITURA, ('esp32-02', None))])
+
+    assert [registro[3] for registro in spool.ler(1, 10)] == [None, ('esp32-02', None)]
+
+
+def test_id_de_dispositivo_longo_nao_grava_o_lote(spool):
+    spool.anexar(_registros(1))
+    # 'c' com cedilha ocupa dois bytes em UTF-8: 11 caracteres, 22 bytes
+    lote = _registros(1, primeiro_contador=2) + [(INSTANTE, LEITURA, ('ç' * 11, 1))]
+
+    with pytest.raises(ValueError, match='bytes'):
+        spool.anexar(lote)
+
+    assert spool.pendentes() == 1
+    assert spool.anexar(_registros(1, dispositivo='estação-1')) == 2
+    assert spool.ler(2, 1)[0][3] == ('estação-1', 1)
+
+
+def test_registro_cortado_e_descartado_na_abertura(spool):
+    spool.anexar(_registros(2))
+    spool.fechar()
+    caminho = os.path.join(spool.diretorio, _segmentos(spool.diretorio)[-1])
+    # Queda de energia no meio do terceiro registro
+    with open(caminho, 'ab') as arquivo:
+        arquivo.write(b'\x01' * (TAMANHO_REGISTRO // 2))
+
+    reaberto = SpoolLocal(spool.diretorio, registros_por_segmento=3, fsync=False)
+    try:
+        assert os.path.getsize(caminho) == 2 * TAMANHO_REGISTRO
+        assert reaberto.pendentes() == 2
+        assert reaberto.anexar(_registros(1, primeiro_contador=3)) == 3
+        assert [registro[3][1] for registro in reaberto.ler(1, 10)] == [1, 2, 3]
+    finally:
+        reaberto.fechar()
+
+
+def test_crc_invalido_no_fim_e_descartado(spool):
+    spool.anexar(_registros(3))
+    spool.fechar()
+    caminho = os.path.join(spool.diretorio, _segmentos(spool.diretorio)[-1])
+    with open(caminho, 'r+b') as arquivo:
+        arquivo.seek(2 * TAMANHO_REGISTRO + 10)
+        byte = arquivo.read(1)
+        arquivo.seek(-1, os.SEEK_CUR)
+        arquivo.write(bytes([byte[0] ^ 0xFF]))
+
+    reaberto = SpoolLocal(spool.diretorio, registros_por_segmento=3, fsync=False)
+    try:
+        assert reaberto.pendentes() == 2
+        assert [registro[0] for registro in reaberto.ler(1, 10)] == [1, 2]
+    finally:
+        reaberto.fechar()
+
+
+def test_checkpoint_apaga_segmentos_e_sobrevive_a_reabertura(spool):
+    spool.anexar(_registros(7))
+
+    spool.confirmar(4)
+
+    # Segmentos [1-3] confirmados; [4-6] ainda tem a seq 5 pendente
+    assert len(_segmentos(spool.diretorio)) == 2
+    assert spool.checkpoint == 4 and spool.pendentes() == 3
+    spool.confirmar(2)
+    assert spool.checkpoint == 4
+
+    spool.fechar()
+    reaberto = SpoolLocal(spool.diretorio, registros_por_segmento=3, fsync=False)
+    try:
+        assert reaberto.checkpoint == 4 and reaberto.pendentes() == 3
+        assert [registro[0] for registro in reaberto.ler(reaberto.checkpoint + 1, 10)] == [5, 6, 7]
+        assert reaberto.anexar(_registros(1, primeiro_contador=8)) == 8
+    finally:
+        reaberto.fechar()
+
+
+def test_diretorio_em_uso(spool):
+    with pytest.raises(RuntimeError, match='em uso'):
+        SpoolLocal(spool.diretorio, fsync=False)
+
+
+def test_drenar_spool(manager, spool):
+    spool.anexar(_registros(5))
+    drenador = DrenadorSpool(spool, manager, tamanho_lote=2)
+
+    assert drenador.drenar_tudo()
+
+    assert _total_leituras(manager) == 5
+    assert spool.pendentes() == 0
+    contadores = drenador.contadores()
+    assert contadores['drenadas'] == 5 and contadores['lotes_drenados'] == 3
+    assert contadores['duplicadas'] == 0 and contadores['checkpoint_spool'] == 5
+
+
+def test_menu_sem_banco_libera_o_spool_para_o_drenador(manager, tmp_path, monkeypatch):
+    diretorio = str(tmp_path / 'spool_menu')
+    monkeypatch.setenv('FARMTECH_SPOOL_DIR', diretorio)
+    # Banco inacessivel: o SQLite nao abre arquivo em diretorio inexistente
+    fora_do_ar = FarmTechOracleManager(layout=manager.layout,
+                                       backend=criar_backend('sqlite', caminho=str(tmp_path / 'x' / 'x.db')))
+
+    assert fora_do_ar.inserir_medicao_esp32(*LEITURA)
+    assert fora_do_ar.inserir_medicao_esp32(*LEITURA)
+
+    # Com o gerenciador ainda vivo, outro SpoolLocal (o 'drenar' da linha de comando) abre o diretorio
+    spool = SpoolLocal(diretorio, fsync=False)
+    try:
+        assert DrenadorSpool(spool, manager).drenar_tudo()
+        assert spool.pendentes() == 0
+    finally:
+        spool.fechar()
+    assert _total_leituras(manager) == 2
+
+
+def test_redrenar_apos_perder_o_checkpoint_local(manager, spool):
+    spool.anexar(_registros(3))
+    assert DrenadorSpool(spool, manager).drenar_tudo()
+    spool.fechar()
+    # Queda entre o commit no banco e a gravacao do checkpoint local
+    os.remove(os.path.join(spool.diretorio, 'checkpoint.json'))
+
+    reaberto = SpoolLocal(spool.diretorio, registros_por_segmento=3, fsync=False)
+    try:
+        assert reaberto.pendentes() == 3
+        drenador = DrenadorSpool(reaberto, manager)
+        assert drenador.drenar_tudo()
+
+        assert drenador.contadores()['duplicadas'] == 3
+        assert drenador.contadores()['drenadas'] == 0
+    finally:
+        reaberto.fechar()
+    assert _total_leituras(manager) == 3
+
+
+def test_drenagem_deduplica_leituras_gravadas_diretamente(manager, spool):
+    # As leituras 1 e 2 chegaram ao banco pela gravacao direta antes da queda
+    assert manager.gravar_leituras([LEITURA] * 2, origens=[('ESP32', 1), ('ESP32', 2)]) == {}
+    spool.anexar(_registros(4))
+
+    drenador = DrenadorSpool(spool, manager)
+    assert drenador.drenar_tudo()
+
+    assert drenador.contadores()['duplicadas'] == 2
+    assert drenador.contadores()['drenadas'] == 2
+    assert _total_leituras(manager) == 4